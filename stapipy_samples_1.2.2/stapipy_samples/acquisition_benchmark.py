@@ -0,0 +1,461 @@
+"""
+ This sample measures the host side cost per frame of the acquisition
+ patterns used by the other samples.
+ The following points will be demonstrated in this sample code:
+ - Polling loop with retrieve_buffer (grab.py)
+ - Datastream callback (grab_callback_class.py)
+ - StApi converter chain Reverse + BGR8 + resize (singleconverter_opencv.py)
+ - CDisplayConverter used by the OpenCV samples
+ - PyStDataStreamList.retrieve_buffer over all cameras (multiple_cameras.py)
+ - Configure Width, Height and PixelFormat for each measurement
+ - Report frames/s, p50/p99 retrieve-to-processed latency, CPU time per
+   frame and peak RSS, and write them as JSON
+ Run it with run_simulated.py for a deterministic synthetic source that
+ delivers frames as fast as the host retrieves them:
+    python run_simulated.py --fps 0 --cameras 2 --width 2448 \
+        --height 2048 --pixel-format BayerRG8 acquisition_benchmark.py \
+        --sizes 640x480,2448x2048 --pixel-formats BayerRG8,BayerRG12 \
+        --json result.json
+ The StApi converter is not simulated, so that pattern is skipped there.
+ Peak RSS is the high-water mark of the whole process; run one pattern per
+ process with --patterns to isolate it.
+ Note: opencv-python and numpy packages are required:
+    pip install numpy
+    pip install opencv-python
+ psutil is used for peak RSS on Windows if installed:
+    pip install psutil
+"""
+
+import argparse
+import json
+import platform
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+import stapipy as st
+
+from display_converter import CDisplayConverter
+from latency_stats import CLatencyStats
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Image scale when displaying using OpenCV.
+DISPLAY_RESIZE_FACTOR = 0.3
+
+# Names of the acquisition patterns.
+PATTERNS = ['polling', 'callback', 'converter', 'display_converter',
+            'multi_stream']
+
+# Number of bytes in one megabyte.
+MEGABYTE = 1024.0 * 1024.0
+
+
+def get_peak_rss_mb():
+    """
+    Get the peak resident set size of this process.
+
+    :return: peak RSS in megabytes, or None if it cannot be measured.
+    """
+    if psutil is not None:
+        # peak_wset is only available on Windows.
+        peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)
+        if peak is not None:
+            return peak / MEGABYTE
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+        if sys.platform == 'darwin':
+            return peak / MEGABYTE
+        return peak / 1024.0
+    return None
+
+
+class CFrameMeter:
+    """
+    Class to measure the frame rate, the latency and the CPU time.
+    """
+
+    def __init__(self):
+        self.latency_stats = CLatencyStats()
+        self.frame_count = 0
+        self._lock = threading.Lock()
+        self._start_time = 0.0
+        self._start_cpu_time = 0.0
+        self._elapsed_time = 0.0
+        self._cpu_time = 0.0
+
+    def start(self):
+        """Start the measurement."""
+        self._start_time = time.perf_counter()
+        self._start_cpu_time = time.process_time()
+
+    def stop(self):
+        """Stop the measurement."""
+        self._elapsed_time = time.perf_counter() - self._start_time
+        self._cpu_time = time.process_time() - self._start_cpu_time
+
+    def add_frame(self, retrieved_time):
+        """
+        Record one processed frame.
+
+        :param retrieved_time: time.perf_counter() when the buffer was
+            retrieved.
+        """
+        latency = time.perf_counter() - retrieved_time
+        with self._lock:
+            self.frame_count += 1
+        self.latency_stats.add(latency)
+
+    def result(self) -> dict:
+        """
+        Get the measured values.
+
+        :return: dict of the measured values.
+        """
+        frame_count = self.frame_count
+        return {
+            'frames': frame_count,
+            'elapsed_s': self._elapsed_time,
+            'fps': frame_count / self._elapsed_time
+            if self._elapsed_time > 0 else 0.0,
+            'latency_p50_ms': self.latency_stats.percentile(50) * 1000.0,
+            'latency_p99_ms': self.latency_stats.percentile(99) * 1000.0,
+            'latency_max_ms': self.latency_stats.max * 1000.0,
+            'cpu_ms_per_frame': self._cpu_time * 1000.0 / frame_count
+            if frame_count else 0.0,
+            'peak_rss_mb': get_peak_rss_mb(),
+        }
+
+
+def touch_image(st_image):
+    """Processing of grab.py: read the first byte of the image."""
+    return st_image.get_image_data()[0]
+
+
+class CStApiConverterChain:
+    """
+    Processing of singleconverter_opencv.py: reverse Y, convert to BGR8
+    with the StApi converters and resize with OpenCV.
+    """
+
+    def __init__(self):
+        self._converter_reverse = st.create_converter(
+            st.EStConverterType.Reverse)
+        self._converter_reverse.reverse_y = True
+        self._converter_pixelformat = \
+            st.create_converter(st.EStConverterType.PixelFormat)
+        self._converter_pixelformat.destination_pixel_format = \
+            st.EStPixelFormatNamingConvention.BGR8
+
+    def __call__(self, st_image):
+        st_image = self._converter_pixelformat.convert(
+            self._converter_reverse.convert(st_image))
+        nparr = np.frombuffer(st_image.get_image_data(), np.uint8)
+        nparr = nparr.reshape(st_image.height, st_image.width, 3)
+        return cv2.resize(nparr, None, fx=DISPLAY_RESIZE_FACTOR,
+                          fy=DISPLAY_RESIZE_FACTOR)
+
+
+def run_polling(st_device, st_datastream, frame_count, process):
+    """
+    Acquire with the polling loop of grab.py.
+
+    :param st_device: PyStDevice.
+    :param st_datastream: PyStDataStream of the device.
+    :param frame_count: number of frames to acquire.
+    :param process: function(st_image) called for each frame.
+    :return: CFrameMeter.
+    """
+    meter = CFrameMeter()
+    st_datastream.start_acquisition(frame_count)
+    st_device.acquisition_start()
+    meter.start()
+    while st_datastream.is_grabbing:
+        with st_datastream.retrieve_buffer() as st_buffer:
+            retrieved_time = time.perf_counter()
+            if st_buffer.info.is_image_present:
+                process(st_buffer.get_image())
+        # The frame is processed when the buffer is requeued.
+        meter.add_frame(retrieved_time)
+    meter.stop()
+    st_device.acquisition_stop()
+    st_datastream.stop_acquisition()
+    return meter
+
+
+def run_callback(st_device, st_datastream, frame_count, process,
+                 timeout=10.0):
+    """
+    Acquire with the datastream callback of grab_callback_class.py.
+
+    :param st_device: PyStDevice.
+    :param st_datastream: PyStDataStream of the device.
+    :param frame_count: number of frames to acquire.
+    :param process: function(st_image) called for each frame.
+    :param timeout: seconds to wait without a new frame.
+    :return: CFrameMeter.
+    """
+    meter = CFrameMeter()
+    is_done = threading.Event()
+
+    def datastream_callback(handle=None, context=None):
+        if handle.callback_type != \
+                st.EStCallbackType.GenTLDataStreamNewBuffer:
+            return
+        with handle.module.retrieve_buffer() as st_buffer:
+            retrieved_time = time.perf_counter()
+            if st_buffer.info.is_image_present:
+                process(st_buffer.get_image())
+        meter.add_frame(retrieved_time)
+        if meter.frame_count >= frame_count:
+            is_done.set()
+
+    callback = st_datastream.register_callback(datastream_callback)
+    try:
+        st_datastream.start_acquisition(frame_count)
+        st_device.acquisition_start()
+        meter.start()
+        last_count = -1
+        while not is_done.wait(timeout) and meter.frame_count != last_count:
+            last_count = meter.frame_count
+        meter.stop()
+        st_device.acquisition_stop()
+        st_datastream.stop_acquisition()
+    finally:
+        st_datastream.deregister_callback(callback)
+    return meter
+
+
+def run_multi_stream(device_list, stream_list, frame_count, process):
+    """
+    Acquire from all cameras with PyStDataStreamList of multiple_cameras.py.
+
+    :param device_list: PyStDeviceList.
+    :param stream_list: PyStDataStreamList of the devices.
+    :param frame_count: number of frames to acquire per camera.
+    :param process: function(st_image) called for each frame.
+    :return: CFrameMeter.
+    """
+    meter = CFrameMeter()
+    stream_list.start_acquisition(frame_count)
+    device_list.acquisition_start()
+    meter.start()
+    while stream_list.is_grabbing_any:
+        with stream_list.retrieve_buffer(5000) as st_buffer:
+            retrieved_time = time.perf_counter()
+            if st_buffer.info.is_image_present:
+                process(st_buffer.get_image())
+        meter.add_frame(retrieved_time)
+    meter.stop()
+    device_list.acquisition_stop()
+    stream_list.stop_acquisition()
+    return meter
+
+
+def configure_device(st_device, width, height, pixel_format):
+    """
+    Set Width, Height and PixelFormat of the camera.
+
+    :param st_device: PyStDevice.
+    :param width: image width.
+    :param height: image height.
+    :param pixel_format: symbolic name of the pixel format.
+    """
+    nodemap = st_device.remote_port.nodemap
+    enum_pixel_format = st.PyIEnumeration(nodemap.get_node('PixelFormat'))
+    if pixel_format not in enum_pixel_format.symbolics_list:
+        raise ValueError("PixelFormat {0} is not supported by {1}.".format(
+                         pixel_format, st_device.info.display_name))
+    enum_pixel_format.set_symbolic_value(pixel_format)
+
+    # Clear the offsets first so that the maximum size can be set.
+    for node_name in ['OffsetX', 'OffsetY']:
+        node = nodemap.get_node(node_name)
+        if node is not None and node.is_writable:
+            st.PyIInteger(node).value = 0
+    for node_name, value in [('Width', width), ('Height', height)]:
+        node_value = st.PyIInteger(nodemap.get_node(node_name))
+        if not node_value.min <= value <= node_value.max:
+            raise ValueError("{0}={1} is out of range [{2}, {3}].".format(
+                             node_name, value, node_value.min,
+                             node_value.max))
+        node_value.value = value
+
+
+def open_devices(st_system, camera_count):
+    """
+    Connect to the cameras.
+
+    :param st_system: PyStSystem.
+    :param camera_count: maximum number of cameras.
+    :return: list of (PyStDevice, PyStDataStream).
+    """
+    devices = []
+    while len(devices) < camera_count:
+        try:
+            st_device = st_system.create_first_device()
+        except Exception:
+            if not devices:
+                raise
+            break
+        devices.append((st_device, st_device.create_datastream(0)))
+    return devices
+
+
+def run_case(pattern, devices, frame_count):
+    """
+    Measure one pattern with the current camera settings.
+
+    :param pattern: name of the pattern.
+    :param devices: list of (PyStDevice, PyStDataStream).
+    :param frame_count: number of frames to acquire per camera.
+    :return: dict of the measured values, or None if skipped.
+    """
+    st_device, st_datastream = devices[0]
+    if pattern == 'polling':
+        return run_polling(st_device, st_datastream, frame_count,
+                           touch_image).result()
+    if pattern == 'callback':
+        return run_callback(st_device, st_datastream, frame_count,
+                            touch_image).result()
+    if pattern == 'converter':
+        # The StApi converter is not available in simulation.
+        if not hasattr(st, 'create_converter'):
+            return None
+        return run_polling(st_device, st_datastream, frame_count,
+                           CStApiConverterChain()).result()
+    if pattern == 'display_converter':
+        converter = CDisplayConverter(DISPLAY_RESIZE_FACTOR)
+        return run_polling(st_device, st_datastream, frame_count,
+                           converter.convert).result()
+    if pattern == 'multi_stream':
+        device_list = st.PyStDeviceList()
+        stream_list = st.PyStDataStreamList()
+        for st_device, st_datastream in devices:
+            device_list.register(st_device)
+            stream_list.register(st_datastream)
+        return run_multi_stream(device_list, stream_list, frame_count,
+                                touch_image).result()
+    raise ValueError("Unknown pattern {0}.".format(pattern))
+
+
+def parse_size(text):
+    """Parse 'WIDTHxHEIGHT'."""
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def parse_arguments():
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(
+        description="Measure the host side cost per frame of the "
+                    "acquisition patterns.")
+    parser.add_argument('--patterns', default=','.join(PATTERNS),
+                        help="comma separated patterns (default: all)")
+    parser.add_argument('--sizes', default='640x480',
+                        help="comma separated WIDTHxHEIGHT "
+                             "(default: 640x480)")
+    parser.add_argument('--pixel-formats', default='Mono8',
+                        help="comma separated pixel formats "
+                             "(default: Mono8)")
+    parser.add_argument('--frames', type=int, default=1000,
+                        help="frames per camera and case (default: 1000)")
+    parser.add_argument('--cameras', type=int, default=2,
+                        help="maximum number of cameras for multi_stream "
+                             "(default: 2)")
+    parser.add_argument('--json', default=None,
+                        help="path of the JSON output ('-' for stdout)")
+    args = parser.parse_args()
+    args.patterns = args.patterns.split(',')
+    for pattern in args.patterns:
+        if pattern not in PATTERNS:
+            parser.error("unknown pattern {0}".format(pattern))
+    args.sizes = [parse_size(size) for size in args.sizes.split(',')]
+    args.pixel_formats = args.pixel_formats.split(',')
+    return args
+
+
+if __name__ == "__main__":
+    try:
+        args = parse_arguments()
+
+        # Initialize StApi before using.
+        st.initialize()
+
+        # Create a system object for device scan and connection.
+        st_system = st.create_system()
+
+        # Connect to the cameras used for the measurements.
+        devices = open_devices(st_system, max(args.cameras, 1))
+        report = {
+            'backend': st.__name__,
+            'stapi_version': st.get_version(),
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+            'device': devices[0][0].info.display_name,
+            'camera_count': len(devices),
+            'results': [],
+        }
+
+        print("{0:<18} {1:>10} {2:<10} {3:>9} {4:>8} {5:>8} {6:>9} "
+              "{7:>8}".format("Pattern", "Size", "Format", "FPS",
+                              "p50[ms]", "p99[ms]", "CPU[ms]", "RSS[MB]"))
+        for width, height in args.sizes:
+            for pixel_format in args.pixel_formats:
+                error = None
+                try:
+                    for st_device, _ in devices:
+                        configure_device(st_device, width, height,
+                                         pixel_format)
+                except ValueError as exception:
+                    # Keep measuring the other settings.
+                    error = str(exception)
+                for pattern in args.patterns:
+                    result = None
+                    if error is None:
+                        result = run_case(pattern, devices, args.frames)
+                    case = {'pattern': pattern, 'width': width,
+                            'height': height, 'pixel_format': pixel_format}
+                    if result is None:
+                        case['skipped'] = error or "not supported"
+                        print("{0:<18} {1:>10} {2:<10} skipped: {3}".format(
+                              pattern, "{0}x{1}".format(width, height),
+                              pixel_format, case['skipped']))
+                    else:
+                        case.update(result)
+                        print("{0:<18} {1:>10} {2:<10} {3:>9.1f} {4:>8.3f} "
+                              "{5:>8.3f} {6:>9.3f} {7:>8}".format(
+                                  pattern, "{0}x{1}".format(width, height),
+                                  pixel_format, result['fps'],
+                                  result['latency_p50_ms'],
+                                  result['latency_p99_ms'],
+                                  result['cpu_ms_per_frame'],
+                                  "-" if result['peak_rss_mb'] is None
+                                  else "{0:.1f}".format(
+                                      result['peak_rss_mb'])))
+                    report['results'].append(case)
+
+        for st_device, st_datastream in devices:
+            st_datastream.release()
+            st_device.release()
+
+        # Write the machine-readable report.
+        if args.json == '-':
+            print(json.dumps(report, indent=2))
+        elif args.json:
+            with open(args.json, 'w') as json_file:
+                json.dump(report, json_file, indent=2)
+
+    except Exception as exception:
+        print(exception)
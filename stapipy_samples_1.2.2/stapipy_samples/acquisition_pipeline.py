@@ -0,0 +1,300 @@
+"""
+ This module provides a producer/consumer acquisition pipeline which keeps
+ the GenTL stream buffer checked out only as long as needed to copy it.
+ The following points are covered by this module:
+ - Retrieve buffers in a dedicated thread and requeue them immediately
+ - Take the image with PyStImage.clone() (or a custom copy function)
+ - Fan frames out to a bounded worker pool
+ - Back-pressure policies: drop oldest, drop newest or block
+ - Per-stage latency metrics (buffer hold, queue wait, process, total)
+"""
+
+import collections
+import enum
+import threading
+import time
+
+from latency_stats import CLatencyStats
+
+
+class EBackPressure(enum.Enum):
+    """Enumeration: behavior when the frame queue is full."""
+    DropOldest = 0
+    DropNewest = 1
+    Block = 2
+
+
+def clone_image(st_buffer):
+    """
+    Default copy function of CAcquisitionPipeline.
+
+    :param st_buffer: PyStStreamBuffer holding an image.
+    :return: deep copy of the image (PyStImage).
+    """
+    return st_buffer.get_image().clone()
+
+
+class CFrame:
+    """
+    Frame taken from a stream buffer.
+    """
+    __slots__ = ('frame_id', 'timestamp', 'image', 'datastream',
+                 'retrieved_time', 'requeued_time', 'started_time',
+                 'processed_time')
+
+    def __init__(self, frame_id, timestamp, image, datastream, retrieved_time):
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.image = image
+        self.datastream = datastream
+        self.retrieved_time = retrieved_time
+        self.requeued_time = 0.0
+        self.started_time = 0.0
+        self.processed_time = 0.0
+
+
+class CFrameQueue:
+    """
+    Bounded queue with a back-pressure policy.
+    """
+
+    def __init__(self, max_size, back_pressure=EBackPressure.DropOldest):
+        """
+        :param max_size: maximum number of queued frames.
+        :param back_pressure: EBackPressure applied when the queue is full.
+        """
+        self._items = collections.deque()
+        self._max_size = max_size
+        self._back_pressure = back_pressure
+        self._condition = threading.Condition()
+        self._is_closed = False
+        self._dropped_count = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def dropped_count(self) -> int:
+        """Property: number of frames dropped by the back-pressure policy."""
+        return self._dropped_count
+
+    def put(self, item) -> bool:
+        """
+        Put an item according to the back-pressure policy.
+
+        :param item: item to queue.
+        :return: True if item was queued, False if it was dropped or the
+            queue is closed.
+        """
+        with self._condition:
+            if self._is_closed:
+                return False
+            if len(self._items) >= self._max_size:
+                if self._back_pressure == EBackPressure.DropNewest:
+                    self._dropped_count += 1
+                    return False
+                elif self._back_pressure == EBackPressure.DropOldest:
+                    self._items.popleft()
+                    self._dropped_count += 1
+                else:
+                    while len(self._items) >= self._max_size and \
+                            not self._is_closed:
+                        self._condition.wait()
+                    if self._is_closed:
+                        return False
+            self._items.append(item)
+            self._condition.notify_all()
+            return True
+
+    def get(self):
+        """
+        Get the oldest item. Blocks until an item is available.
+
+        :return: item, or None if the queue is closed and empty.
+        """
+        with self._condition:
+            while not self._items:
+                if self._is_closed:
+                    return None
+                self._condition.wait()
+            item = self._items.popleft()
+            self._condition.notify_all()
+            return item
+
+    def close(self):
+        """Close the queue. Remaining items can still be taken."""
+        with self._condition:
+            self._is_closed = True
+            self._condition.notify_all()
+
+
+class CAcquisitionPipeline:
+    """
+    Class that retrieves buffers from a datastream in a producer thread and
+    processes the copied frames in a pool of worker threads.
+
+    The frames are processed in parallel, so process_func may be called out
+    of order. process_func receives a CFrame whose image is owned by the
+    frame (not by the stream buffer).
+    """
+
+    def __init__(self, st_datastream, process_func, worker_count=2,
+                 queue_size=8, back_pressure=EBackPressure.DropOldest,
+                 copy_func=clone_image, timeout=5000):
+        """
+        :param st_datastream: PyStDataStream (acquisition must be started).
+        :param process_func: function called with CFrame in worker threads.
+        :param worker_count: number of worker threads.
+        :param queue_size: maximum number of frames waiting for a worker.
+        :param back_pressure: EBackPressure when all workers are busy and
+            the queue is full.
+        :param copy_func: function(st_buffer) returning the data to keep
+            after the buffer is requeued (default: PyStImage.clone()).
+        :param timeout: timeout of retrieve_buffer in milliseconds.
+        """
+        self._datastream = st_datastream
+        self._process_func = process_func
+        self._copy_func = copy_func
+        self._timeout = timeout
+        self._queue = CFrameQueue(queue_size, back_pressure)
+        self._stop_event = threading.Event()
+        self._producer = threading.Thread(target=self._produce)
+        self._workers = [threading.Thread(target=self._consume)
+                         for _ in range(worker_count)]
+        self._lock = threading.Lock()
+        self._error = None
+        self._delivered_count = 0
+        self._no_image_count = 0
+        self._processed_count = 0
+        self._process_error_count = 0
+
+        # Per-stage latency.
+        self.hold_stats = CLatencyStats()
+        self.queue_stats = CLatencyStats()
+        self.process_stats = CLatencyStats()
+        self.total_stats = CLatencyStats()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        self.join()
+
+    @property
+    def delivered_count(self) -> int:
+        """Property: number of images retrieved from the datastream."""
+        return self._delivered_count
+
+    @property
+    def processed_count(self) -> int:
+        """Property: number of frames processed by the workers."""
+        return self._processed_count
+
+    @property
+    def dropped_count(self) -> int:
+        """Property: number of frames dropped by the back-pressure policy."""
+        return self._queue.dropped_count
+
+    @property
+    def no_image_count(self) -> int:
+        """Property: number of buffers without image data."""
+        return self._no_image_count
+
+    @property
+    def process_error_count(self) -> int:
+        """Property: number of exceptions raised by process_func."""
+        return self._process_error_count
+
+    @property
+    def queue_depth(self) -> int:
+        """Property: number of frames waiting for a worker."""
+        return len(self._queue)
+
+    @property
+    def is_running(self) -> bool:
+        """Property: True while the producer thread is running."""
+        return self._producer.is_alive()
+
+    def start(self):
+        """Start the producer and worker threads."""
+        for worker in self._workers:
+            worker.start()
+        self._producer.start()
+
+    def stop(self):
+        """Request the producer to stop after the current retrieve_buffer."""
+        self._stop_event.set()
+
+    def join(self):
+        """
+        Wait until the datastream stops grabbing (or stop() is called) and
+        all queued frames are processed.
+        An exception raised while retrieving buffers is raised again here.
+        """
+        self._producer.join()
+        for worker in self._workers:
+            worker.join()
+        if self._error is not None:
+            raise self._error
+
+    def statistics(self) -> dict:
+        """
+        Get the counters and the per-stage latency.
+
+        :return: dict of counters and latency summaries in milliseconds.
+        """
+        return {'delivered': self.delivered_count,
+                'processed': self.processed_count,
+                'dropped': self.dropped_count,
+                'no_image': self.no_image_count,
+                'process_errors': self.process_error_count,
+                'hold': self.hold_stats.summary(),
+                'queue': self.queue_stats.summary(),
+                'process': self.process_stats.summary(),
+                'total': self.total_stats.summary()}
+
+    def _produce(self):
+        """Producer thread: retrieve, copy and requeue the buffers."""
+        try:
+            while not self._stop_event.is_set() and \
+                    self._datastream.is_grabbing:
+                with self._datastream.retrieve_buffer(self._timeout) \
+                        as st_buffer:
+                    retrieved_time = time.perf_counter()
+                    if not st_buffer.info.is_image_present:
+                        self._no_image_count += 1
+                        continue
+                    frame = CFrame(st_buffer.info.frame_id,
+                                   st_buffer.info.timestamp,
+                                   self._copy_func(st_buffer),
+                                   self._datastream, retrieved_time)
+                # The stream buffer is requeued at this point.
+                frame.requeued_time = time.perf_counter()
+                self._delivered_count += 1
+                self.hold_stats.add(frame.requeued_time - retrieved_time)
+                self._queue.put(frame)
+        except Exception as exception:
+            self._error = exception
+        finally:
+            self._queue.close()
+
+    def _consume(self):
+        """Worker thread: process the queued frames."""
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                return
+            frame.started_time = time.perf_counter()
+            self.queue_stats.add(frame.started_time - frame.requeued_time)
+            try:
+                self._process_func(frame)
+            except Exception:
+                with self._lock:
+                    self._process_error_count += 1
+            frame.processed_time = time.perf_counter()
+            self.process_stats.add(frame.processed_time - frame.started_time)
+            self.total_stats.add(frame.processed_time - frame.retrieved_time)
+            with self._lock:
+                self._processed_count += 1
@@ -0,0 +1,103 @@
+"""
+ This sample compares processing inside the retrieve_buffer block with
+ CAcquisitionPipeline, using the simulated datastream of stapipy_sim.
+ The following points will be demonstrated in this sample code:
+ - Create a simulated datastream with a finite number of stream buffers
+ - Process frames slower than the frame period inside retrieve_buffer
+ - Process the same load with CAcquisitionPipeline for each back-pressure
+   policy
+ - Display num_underrun, dropped frames and the per-stage latency
+ No camera is required.
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import time
+
+import stapipy_sim as st
+
+from acquisition_pipeline import CAcquisitionPipeline, EBackPressure
+
+# Number of images to grab
+number_of_images_to_grab = 400
+
+# Frame rate of the simulated camera.
+FRAME_RATE = 200.0
+
+# Number of stream buffers.
+BUFFER_COUNT = 8
+
+# Processing time of one frame (twice the frame period).
+PROCESSING_TIME = 0.010
+
+# Pipeline settings.
+WORKER_COUNT = 4
+QUEUE_SIZE = 8
+
+
+def process_frame(frame):
+    """
+    Simulated processing. time.sleep releases the GIL like OpenCV/StApi
+    image processing does.
+
+    :param frame: CFrame to process.
+    """
+    time.sleep(PROCESSING_TIME)
+
+
+def run_inline():
+    """Process the frames inside the retrieve_buffer block."""
+    st_datastream = st.PyStDataStream(fps=FRAME_RATE,
+                                      buffer_count=BUFFER_COUNT)
+    st_datastream.start_acquisition(number_of_images_to_grab)
+    start_time = time.perf_counter()
+    while st_datastream.is_grabbing:
+        with st_datastream.retrieve_buffer() as st_buffer:
+            if st_buffer.info.is_image_present:
+                process_frame(st_buffer.get_image())
+    elapsed_time = time.perf_counter() - start_time
+    st_datastream.stop_acquisition()
+    print("Inline: {0:.2f}[s] Underrun={1}".format(
+          elapsed_time, st_datastream.info.num_underrun))
+
+
+def run_pipeline(back_pressure):
+    """
+    Process the frames with CAcquisitionPipeline.
+
+    :param back_pressure: EBackPressure of the pipeline.
+    """
+    st_datastream = st.PyStDataStream(fps=FRAME_RATE,
+                                      buffer_count=BUFFER_COUNT)
+    st_datastream.start_acquisition(number_of_images_to_grab)
+    start_time = time.perf_counter()
+    with CAcquisitionPipeline(st_datastream, process_frame,
+                              worker_count=WORKER_COUNT,
+                              queue_size=QUEUE_SIZE,
+                              back_pressure=back_pressure) as pipeline:
+        while pipeline.is_running:
+            time.sleep(0.1)
+    elapsed_time = time.perf_counter() - start_time
+    st_datastream.stop_acquisition()
+    print("Pipeline({0}): {1:.2f}[s] Underrun={2} Processed={3} "
+          "Dropped={4}".format(back_pressure.name, elapsed_time,
+                               st_datastream.info.num_underrun,
+                               pipeline.processed_count,
+                               pipeline.dropped_count))
+    print("  hold    :", pipeline.hold_stats)
+    print("  queue   :", pipeline.queue_stats)
+    print("  process :", pipeline.process_stats)
+    print("  total   :", pipeline.total_stats)
+
+
+if __name__ == "__main__":
+    try:
+        print("Frames={0} FPS={1} Buffers={2} Processing={3}[ms]".format(
+              number_of_images_to_grab, FRAME_RATE, BUFFER_COUNT,
+              PROCESSING_TIME * 1000.0))
+        run_inline()
+        for back_pressure in EBackPressure:
+            run_pipeline(back_pressure)
+
+    except Exception as exception:
+        print(exception)
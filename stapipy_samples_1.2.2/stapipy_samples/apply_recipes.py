@@ -0,0 +1,109 @@
+"""
+ This sample shows how to switch between recipes (sets of features) with
+ CFeatureApplier.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Connect to camera
+ - Describe a full frame recipe and a centered ROI recipe
+ - Write a recipe one feature at a time in the given order, which fails
+   when OffsetX is moved before Width is reduced
+ - Apply the recipes with CFeatureApplier (dependency order, local range
+   check, unchanged features skipped, rollback on failure)
+ - Display the written features and the time of each switch
+"""
+
+import stapipy as st
+
+from feature_apply import CFeatureApplier
+from node_registry import CNodeRegistry
+
+# Number of recipe switches.
+number_of_switches = 10
+
+# Feature names
+PIXEL_FORMAT = "PixelFormat"
+OFFSET_X = "OffsetX"
+OFFSET_Y = "OffsetY"
+WIDTH = "Width"
+HEIGHT = "Height"
+WIDTH_MAX = "WidthMax"
+HEIGHT_MAX = "HeightMax"
+EXPOSURE_TIME = "ExposureTime"
+
+
+def write_one_by_one(nodemap, recipe):
+    """
+    Write the features in the order of the recipe, as the samples do.
+
+    :param nodemap: node map.
+    :param recipe: dict of feature name to value.
+    """
+    for name, value in recipe.items():
+        node = nodemap.get_node(name)
+        if node.principal_interface_type == st.EGCInterfaceType.IEnumeration:
+            st.PyIEnumeration(node).set_symbolic_value(value)
+        else:
+            node.get().value = value
+
+
+if __name__ == "__main__":
+    try:
+        # Initialize StApi before using.
+        st.initialize()
+
+        # Create a system object for device scan and connection.
+        st_system = st.create_system()
+
+        # Connect to first detected device.
+        st_device = st_system.create_first_device()
+
+        # Display DisplayName of the device.
+        print('Device=', st_device.info.display_name)
+
+        # Get INodeMap object to access the setting of the device.
+        remote_nodemap = st_device.remote_port.nodemap
+
+        with CNodeRegistry(remote_nodemap) as registry:
+            applier = CFeatureApplier(registry)
+
+            # Describe the recipes. The ROI is the center quarter.
+            width_max = registry.get_value(WIDTH_MAX)
+            height_max = registry.get_value(HEIGHT_MAX)
+            full_recipe = {OFFSET_X: 0, OFFSET_Y: 0, WIDTH: width_max,
+                           HEIGHT: height_max, EXPOSURE_TIME: 10000.0}
+            roi_recipe = {OFFSET_X: width_max // 4 // 8 * 8,
+                          OFFSET_Y: height_max // 4 // 8 * 8,
+                          WIDTH: width_max // 2 // 8 * 8,
+                          HEIGHT: height_max // 2 // 8 * 8,
+                          EXPOSURE_TIME: 5000.0}
+            applier.apply(full_recipe)
+
+            # Write the ROI recipe one feature at a time.
+            try:
+                write_one_by_one(remote_nodemap, roi_recipe)
+                print("One by one: written")
+            except Exception as exception:
+                print("One by one: failed:", exception)
+            registry.invalidate()
+
+            # Switch between the recipes.
+            for index in range(number_of_switches):
+                recipe = roi_recipe if index % 2 == 0 else full_recipe
+                report = applier.apply(recipe)
+                print("{0}: written={1} skipped={2} postponed={3} "
+                      "write={4:.3f}[ms] total={5:.3f}[ms]".format(
+                          "ROI" if recipe is roi_recipe else "Full",
+                          report['written'], len(report['skipped']),
+                          report['postponed'], report['write_ms'],
+                          report['total_ms']))
+
+            # A recipe out of range is rolled back.
+            try:
+                applier.apply({EXPOSURE_TIME: 20000.0, WIDTH: width_max * 2})
+            except Exception as exception:
+                print("Rejected:", exception)
+            print("ExposureTime={0} after the rollback".format(
+                  registry.get_value(EXPOSURE_TIME)))
+
+    except Exception as exception:
+        print(exception)
@@ -0,0 +1,384 @@
+"""
+ This module provides asyncio frame iterators for PyStDataStream and
+ PyStDataStreamList.
+ The following points are covered by this module:
+ - Bridge the GenTLDataStreamNewBuffer callback into the event loop with
+   loop.call_soon_threadsafe
+ - Bounded buffering between the SDK thread and the event loop with a
+   drop-oldest or drop-newest policy
+ - 'async for frame in stream.frames()' with clean acquisition stop on
+   break, cancellation or error
+ - Stop the acquisition in the default executor (aclose) so that the
+   event loop is not blocked while the SDK threads are joined
+ - Merge the frames of all datastreams of a PyStDataStreamList
+"""
+
+import asyncio
+import collections
+import threading
+import time
+
+import stapipy as st
+
+from acquisition_pipeline import CFrame, EBackPressure, clone_image
+
+
+class CFrameBridge:
+    """
+    Bounded hand-over of frames from any thread to an asyncio event loop.
+
+    The frames are kept in a deque guarded by a lock. The event loop is
+    woken up with call_soon_threadsafe only when the deque becomes non-empty,
+    so a burst of frames costs one wake-up.
+    """
+
+    def __init__(self, loop, max_queue_size=8,
+                 back_pressure=EBackPressure.DropOldest):
+        """
+        :param loop: event loop that consumes the frames.
+        :param max_queue_size: maximum number of frames waiting for the loop.
+        :param back_pressure: EBackPressure.DropOldest or DropNewest.
+        """
+        if back_pressure == EBackPressure.Block:
+            raise ValueError("EBackPressure.Block would stall the SDK "
+                             "thread.")
+        if max_queue_size < 1:
+            raise ValueError("max_queue_size must be 1 or more.")
+        self._loop = loop
+        self._max_queue_size = max_queue_size
+        self._back_pressure = back_pressure
+        self._frames = collections.deque()
+        self._lock = threading.Lock()
+        self._wakeup = asyncio.Event()
+        self._is_finished = False
+        self._error = None
+        self._dropped_count = 0
+
+    @property
+    def dropped_count(self) -> int:
+        """Property: number of frames dropped because the queue was full."""
+        return self._dropped_count
+
+    def __len__(self):
+        return len(self._frames)
+
+    def put(self, frame) -> bool:
+        """
+        Put a frame. Can be called from any thread.
+
+        :param frame: frame to hand over.
+        :return: True if the frame was queued, False if it was dropped.
+        """
+        with self._lock:
+            if self._is_finished:
+                return False
+            if len(self._frames) >= self._max_queue_size:
+                self._dropped_count += 1
+                if self._back_pressure == EBackPressure.DropNewest:
+                    return False
+                self._frames.popleft()
+            self._frames.append(frame)
+            need_wakeup = len(self._frames) == 1
+        if need_wakeup:
+            self._notify()
+        return True
+
+    def finish(self, error=None):
+        """
+        Mark the end of the frames. Can be called from any thread.
+
+        :param error: exception raised by get() after the remaining frames,
+            or None.
+        """
+        with self._lock:
+            if self._is_finished:
+                return
+            self._is_finished = True
+            self._error = error
+        self._notify()
+
+    async def get(self):
+        """
+        Get the oldest frame.
+
+        :return: frame, or None after finish() when no frame remains.
+        """
+        while True:
+            self._wakeup.clear()
+            with self._lock:
+                if self._frames:
+                    return self._frames.popleft()
+                if self._is_finished:
+                    if self._error is not None:
+                        raise self._error
+                    return None
+            await self._wakeup.wait()
+
+    def _notify(self):
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # The event loop is already closed.
+            pass
+
+
+class CAsyncFrameStreamBase:
+    """
+    Common part of the asyncio frame iterators.
+    """
+
+    def __init__(self, max_queue_size, back_pressure, copy_func,
+                 num_to_acquire):
+        self._max_queue_size = max_queue_size
+        self._back_pressure = back_pressure
+        self._copy_func = copy_func
+        self._num_to_acquire = num_to_acquire
+        self._bridge = None
+        self._is_started = False
+        self._stop_lock = threading.Lock()
+        self._delivered_count = 0
+        self._no_image_count = 0
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    @property
+    def is_started(self) -> bool:
+        """Property: True while the acquisition is started."""
+        return self._is_started
+
+    @property
+    def delivered_count(self) -> int:
+        """Property: number of frames taken from the stream buffers."""
+        return self._delivered_count
+
+    @property
+    def dropped_count(self) -> int:
+        """Property: number of frames dropped because the queue was full."""
+        return self._bridge.dropped_count \
+            if self._bridge is not None else 0
+
+    @property
+    def no_image_count(self) -> int:
+        """Property: number of buffers without image data."""
+        return self._no_image_count
+
+    def start(self):
+        """
+        Start the acquisition. Must be called from the event loop thread.
+        """
+        if self._is_started:
+            return
+        self._bridge = CFrameBridge(asyncio.get_running_loop(),
+                                    self._max_queue_size,
+                                    self._back_pressure)
+        self._is_started = True
+        try:
+            self._start_acquisition()
+        except Exception:
+            self.stop()
+            raise
+
+    async def aclose(self):
+        """
+        Stop the acquisition like stop(), in the default executor of the
+        running loop: stopping joins the SDK threads, which may wait up to
+        the retrieve timeout.
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.stop)
+
+    def stop(self):
+        """
+        Stop the acquisition of the camera side and the host side.
+        Frames already queued can still be taken from frames(). Blocks
+        until the SDK threads are joined: use aclose() from a coroutine.
+        """
+        with self._stop_lock:
+            if not self._is_started:
+                return
+            self._is_started = False
+        try:
+            self._stop_acquisition()
+        finally:
+            self._bridge.finish()
+
+    async def frames(self):
+        """
+        Asynchronous generator of CFrame.
+
+        The acquisition is started if needed and stopped when the generator
+        ends, is cancelled or is closed. Leaving 'async for' with break
+        closes the generator only when it is finalized, so use
+        'async with stream:' to stop the acquisition right away.
+
+        :return: asynchronous iterator of CFrame.
+        """
+        self.start()
+        bridge = self._bridge
+        try:
+            while True:
+                frame = await bridge.get()
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            await self.aclose()
+
+    def _take_frame(self, st_buffer, st_datastream):
+        """Copy the frame out of the stream buffer and hand it over."""
+        retrieved_time = time.perf_counter()
+        if not st_buffer.info.is_image_present:
+            self._no_image_count += 1
+            return
+        frame = CFrame(st_buffer.info.frame_id, st_buffer.info.timestamp,
+                       self._copy_func(st_buffer), st_datastream,
+                       retrieved_time)
+        frame.requeued_time = time.perf_counter()
+        self._delivered_count += 1
+        self._bridge.put(frame)
+
+    def _start_acquisition(self):
+        raise NotImplementedError
+
+    def _stop_acquisition(self):
+        raise NotImplementedError
+
+
+class CAsyncFrameStream(CAsyncFrameStreamBase):
+    """
+    asyncio frame iterator of one PyStDataStream, driven by the
+    GenTLDataStreamNewBuffer callback.
+
+    Usage:
+        async with CAsyncFrameStream(st_datastream, st_device) as stream:
+            async for frame in stream.frames():
+                ...
+    """
+
+    def __init__(self, st_datastream, st_device=None, num_to_acquire=-1,
+                 max_queue_size=8, back_pressure=EBackPressure.DropOldest,
+                 copy_func=clone_image):
+        """
+        :param st_datastream: PyStDataStream (acquisition not started).
+        :param st_device: PyStDevice for acquisition_start/stop, or None if
+            the camera side is controlled by the caller.
+        :param num_to_acquire: number of frames to acquire (-1: unlimited).
+        :param max_queue_size: maximum number of frames waiting for the
+            event loop.
+        :param back_pressure: EBackPressure.DropOldest or DropNewest.
+        :param copy_func: function(st_buffer) returning the data to keep
+            after the buffer is requeued (default: PyStImage.clone()).
+        """
+        super().__init__(max_queue_size, back_pressure, copy_func,
+                         num_to_acquire)
+        self._datastream = st_datastream
+        self._device = st_device
+        self._callback = None
+
+    def _start_acquisition(self):
+        self._callback = self._datastream.register_callback(
+            self._datastream_callback)
+        self._datastream.start_acquisition(self._num_to_acquire)
+        if self._device is not None:
+            self._device.acquisition_start()
+
+    def _stop_acquisition(self):
+        try:
+            if self._device is not None:
+                self._device.acquisition_stop()
+            self._datastream.stop_acquisition()
+        finally:
+            if self._callback is not None:
+                self._datastream.deregister_callback(self._callback)
+                self._callback = None
+
+    def _datastream_callback(self, handle=None, context=None):
+        """
+        Callback to handle events from DataStream (SDK thread).
+
+        :param handle: handle that trigger the callback.
+        :param context: user data passed on during callback registration.
+        """
+        if handle.callback_type != st.EStCallbackType.GenTLDataStreamNewBuffer:
+            return
+        st_datastream = handle.module
+        try:
+            with st_datastream.retrieve_buffer(0) as st_buffer:
+                self._take_frame(st_buffer, st_datastream)
+            if not st_datastream.is_grabbing:
+                self._bridge.finish()
+        except Exception as exception:
+            # Errors caused by stop() are not reported.
+            if self._is_started:
+                self._bridge.finish(exception)
+
+
+class CAsyncFrameStreamList(CAsyncFrameStreamBase):
+    """
+    asyncio frame iterator merging all datastreams of a PyStDataStreamList.
+    The buffers are retrieved by a thread with
+    PyStDataStreamList.retrieve_buffer. CFrame.datastream tells which
+    datastream the frame comes from.
+    """
+
+    def __init__(self, stream_list, device_list=None, num_to_acquire=-1,
+                 max_queue_size=8, back_pressure=EBackPressure.DropOldest,
+                 copy_func=clone_image, timeout=5000):
+        """
+        :param stream_list: PyStDataStreamList (acquisition not started).
+        :param device_list: PyStDeviceList for acquisition_start/stop, or
+            None if the camera side is controlled by the caller.
+        :param num_to_acquire: number of frames to acquire per datastream
+            (-1: unlimited).
+        :param max_queue_size: maximum number of frames waiting for the
+            event loop.
+        :param back_pressure: EBackPressure.DropOldest or DropNewest.
+        :param copy_func: function(st_buffer) returning the data to keep
+            after the buffer is requeued (default: PyStImage.clone()).
+        :param timeout: timeout of retrieve_buffer in milliseconds.
+        """
+        super().__init__(max_queue_size, back_pressure, copy_func,
+                         num_to_acquire)
+        self._stream_list = stream_list
+        self._device_list = device_list
+        self._timeout = timeout
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _start_acquisition(self):
+        self._stop_event.clear()
+        self._stream_list.start_acquisition(self._num_to_acquire)
+        if self._device_list is not None:
+            self._device_list.acquisition_start()
+        self._thread = threading.Thread(target=self._retrieve, daemon=True)
+        self._thread.start()
+
+    def _stop_acquisition(self):
+        # Stopping the host side also ends a pending retrieve_buffer.
+        self._stop_event.set()
+        try:
+            if self._device_list is not None:
+                self._device_list.acquisition_stop()
+            self._stream_list.stop_acquisition()
+        finally:
+            if self._thread is not None:
+                self._thread.join()
+                self._thread = None
+
+    def _retrieve(self):
+        """Retrieve thread: take the buffers of all datastreams."""
+        try:
+            while not self._stop_event.is_set() and \
+                    self._stream_list.is_grabbing_any:
+                with self._stream_list.retrieve_buffer(self._timeout) \
+                        as st_buffer:
+                    self._take_frame(st_buffer, st_buffer.datastream)
+        except Exception as exception:
+            # Errors caused by stop() are not reported.
+            if not self._stop_event.is_set():
+                self._bridge.finish(exception)
+        self._bridge.finish()
@@ -0,0 +1,95 @@
+"""
+ This sample shows how to use CAsyncFrameStream and CAsyncFrameStreamList
+ with the simulated datastreams of stapipy_sim.
+ The following points will be demonstrated in this sample code:
+ - Iterate frames with 'async for' (callback driven)
+ - Bounded buffering when the consumer is slower than the camera
+ - Cancel the consumer task and check that the acquisition is stopped and
+   the callback is deregistered
+ - Merge the frames of a PyStDataStreamList
+ No camera is required.
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import asyncio
+import sys
+
+import stapipy_sim as st
+
+# async_frames imports stapipy: use the simulator.
+sys.modules['stapipy'] = st
+
+from async_frames import CAsyncFrameStream, CAsyncFrameStreamList
+
+# Number of images to grab
+number_of_images_to_grab = 100
+
+
+async def iterate_frames():
+    """Iterate all frames of one datastream."""
+    st_datastream = st.PyStDataStream(fps=500.0, buffer_count=8)
+    async with CAsyncFrameStream(st_datastream,
+                                 num_to_acquire=number_of_images_to_grab,
+                                 max_queue_size=4) as stream:
+        frame_count = 0
+        async for frame in stream.frames():
+            frame_count += 1
+            # Consumer slower than the camera.
+            await asyncio.sleep(0.004)
+    print("Iterate: Received={0} Delivered={1} Dropped={2} "
+          "Underrun={3}".format(frame_count, stream.delivered_count,
+                                stream.dropped_count,
+                                st_datastream.info.num_underrun))
+
+
+async def cancel_consumer():
+    """Cancel a consumer task waiting for frames."""
+    st_datastream = st.PyStDataStream(fps=100.0)
+    stream = CAsyncFrameStream(st_datastream)
+    frame_ids = []
+
+    async def consume():
+        async for frame in stream.frames():
+            frame_ids.append(frame.frame_id)
+
+    task = asyncio.ensure_future(consume())
+    await asyncio.sleep(0.2)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    print("Cancel: Received={0} Started={1} Grabbing={2} "
+          "Callbacks={3}".format(len(frame_ids), stream.is_started,
+                                 st_datastream.is_grabbing,
+                                 st_datastream.get_registered_callbacks()))
+
+
+async def merge_streams():
+    """Merge the frames of two datastreams."""
+    stream_list = st.PyStDataStreamList()
+    stream_list.register(st.PyStDataStream(fps=300.0))
+    stream_list.register(st.PyStDataStream(fps=100.0))
+    frame_counts = {}
+    async with CAsyncFrameStreamList(
+            stream_list, num_to_acquire=number_of_images_to_grab) as stream:
+        async for frame in stream.frames():
+            key = id(frame.datastream)
+            frame_counts[key] = frame_counts.get(key, 0) + 1
+    print("Merge: Frames per datastream={0} Dropped={1}".format(
+          sorted(frame_counts.values()), stream.dropped_count))
+
+
+async def main():
+    await iterate_frames()
+    await cancel_consumer()
+    await merge_streams()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+
+    except Exception as exception:
+        print(exception)
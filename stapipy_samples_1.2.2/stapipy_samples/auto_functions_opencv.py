@@ -16,9 +16,11 @@
 
 import cv2
 import threading
-import numpy as np
 import stapipy as st
 
+from display_converter import CDisplayConverter
+from latest_frame import CLatestFrameMailbox
+
 # Image scale when displaying using OpenCV.
 DISPLAY_RESIZE_FACTOR = 0.3
 
@@ -45,18 +47,18 @@ class CMyCallback:
     """
 
     def __init__(self):
-        self._image = None
-        self._lock = threading.Lock()
+        self._mailbox = CLatestFrameMailbox()
+        self._converter = CDisplayConverter(DISPLAY_RESIZE_FACTOR)
 
     @property
     def image(self):
-        """Property: return PyIStImage of the grabbed image."""
-        duplicate = None
-        self._lock.acquire()
-        if self._image is not None:
-            duplicate = self._image.copy()
-        self._lock.release()
-        return duplicate
+        """Property: return the latest image if it is new, None otherwise."""
+        return self._mailbox.take()
+
+    @property
+    def mailbox(self):
+        """Property: return CLatestFrameMailbox holding the latest image."""
+        return self._mailbox
 
     def datastream_callback(self, handle=None, context=None):
         """
@@ -73,49 +75,17 @@ class CMyCallback:
                     # Create an image object.
                     st_image = st_buffer.get_image()
 
-                    # Check the pixelformat of the input image.
-                    pixel_format = st_image.pixel_format
-                    pixel_format_info = st.get_pixel_format_info(pixel_format)
-
                     # Only mono or bayer is processed.
-                    if not(pixel_format_info.is_mono or pixel_format_info.is_bayer):
+                    if not self._converter.is_supported(st_image.pixel_format):
                         return
 
-                    # Get raw image data.
-                    data = st_image.get_image_data()
-
-                    # Perform pixel value scaling if each pixel component is
-                    # larger than 8bit. Example: 10bit Bayer/Mono, 12bit, etc.
-                    if pixel_format_info.each_component_total_bit_count > 8:
-                        nparr = np.frombuffer(data, np.uint16)
-                        division = pow(2, pixel_format_info
-                                       .each_component_valid_bit_count - 8)
-                        nparr = (nparr / division).astype('uint8')
-                    else:
-                        nparr = np.frombuffer(data, np.uint8)
-
-                    # Process image for display.
-                    nparr = nparr.reshape(st_image.height, st_image.width, 1)
-
-                    # Perform color conversion for Bayer.
-                    if pixel_format_info.is_bayer:
-                        bayer_type = pixel_format_info.get_pixel_color_filter()
-                        if bayer_type == st.EStPixelColorFilter.BayerRG:
-                            nparr = cv2.cvtColor(nparr, cv2.COLOR_BAYER_RG2RGB)
-                        elif bayer_type == st.EStPixelColorFilter.BayerGR:
-                            nparr = cv2.cvtColor(nparr, cv2.COLOR_BAYER_GR2RGB)
-                        elif bayer_type == st.EStPixelColorFilter.BayerGB:
-                            nparr = cv2.cvtColor(nparr, cv2.COLOR_BAYER_GB2RGB)
-                        elif bayer_type == st.EStPixelColorFilter.BayerBG:
-                            nparr = cv2.cvtColor(nparr, cv2.COLOR_BAYER_BG2RGB)
-
-                    # Resize image and store to self._image.
-                    nparr = cv2.resize(nparr, None,
-                                       fx=DISPLAY_RESIZE_FACTOR,
-                                       fy=DISPLAY_RESIZE_FACTOR)
-                    self._lock.acquire()
-                    self._image = nparr
-                    self._lock.release()
+                    # Scale, demosaic and resize the image directly into the
+                    # back buffer of the mailbox, then publish it. This never
+                    # blocks even if the display loop is busy.
+                    frame = self._mailbox.write_buffer(
+                        self._converter.output_shape(st_image))
+                    self._converter.convert(st_image, dst=frame)
+                    self._mailbox.publish()
 
 
 def edit_enumeration(nodemap, enum_name):
@@ -325,5 +295,11 @@ if __name__ == "__main__":
         # Stop the image acquisition of the host side
         st_datastream.stop_acquisition()
 
+        # Display the number of frames displayed and overwritten.
+        mailbox = my_callback.mailbox
+        print("Published={0} Displayed={1} Overwritten={2}".format(
+              mailbox.published_count, mailbox.taken_count,
+              mailbox.overwritten_count))
+
     except Exception as exception:
         print(exception)
@@ -0,0 +1,266 @@
+"""
+ This module provides an adaptive stream buffer count tuner.
+ The following points are covered by this module:
+ - Observe the frame period (timestamp_ns of the buffers) and the age of
+   each frame when it is retrieved, which tells how many buffers were
+   filled ahead of it; the host - camera clock offset is re-estimated
+   over the recent frames, so that a clock drift does not grow the age
+ - Recommend the buffer_count which keeps the probability of an underrun
+   below a target, within a memory budget (payload_size x buffer_count)
+   and not below buf_announce_min
+ - Grow the recommendation when num_underrun increases, and let it
+   decay again after the recommendations without new underruns
+ - Apply the recommendation while the datastream is not grabbing
+ - Keep and log the decisions
+"""
+
+import collections
+import math
+import time
+
+from latency_stats import CLatencyStats
+
+# Number of bytes in one megabyte.
+MEGABYTE = 1024 * 1024
+
+
+class CBufferDecision:
+    """
+    One decision of CBufferTuner.
+    """
+    __slots__ = ('time', 'previous_count', 'buffer_count', 'reason',
+                 'frame_period', 'age_quantile',
+                 'estimated_drop_probability', 'memory_size')
+
+    def __init__(self, previous_count, buffer_count, reason, frame_period,
+                 age_quantile, estimated_drop_probability, memory_size):
+        self.time = time.time()
+        self.previous_count = previous_count
+        self.buffer_count = buffer_count
+        self.reason = reason
+        self.frame_period = frame_period
+        self.age_quantile = age_quantile
+        self.estimated_drop_probability = estimated_drop_probability
+        self.memory_size = memory_size
+
+    def __str__(self):
+        return "buffer_count {0} -> {1} ({2}): period={3:.3f}[ms] " \
+               "age={4:.3f}[ms] drop={5:.5f} memory={6:.1f}[MB]".format(
+                   self.previous_count, self.buffer_count, self.reason,
+                   self.frame_period * 1000.0, self.age_quantile * 1000.0,
+                   self.estimated_drop_probability,
+                   self.memory_size / float(MEGABYTE))
+
+
+class CBufferTuner:
+    """
+    Class to recommend and apply PyStDataStream.buffer_count.
+
+    A frame retrieved with an age of A seconds at a frame period of T
+    seconds means that about A / T more buffers were filled behind it. The
+    buffer_count is chosen so that the (1 - target_drop_probability)
+    quantile of this occupancy, plus the buffer being processed and a
+    margin, fits. Frames lost by an underrun are never observed, so the
+    count is also grown by growth_factor whenever num_underrun increases.
+    This underrun floor is divided by growth_factor at each recommendation
+    without new underruns, so that a single burst does not hold the
+    buffers forever.
+
+    The age is the host time of the retrieval minus timestamp_ns, minus
+    the smallest of these offsets over the last offset_window frames (the
+    offset of a frame retrieved without waiting). The minimum is taken
+    over a window and not since the start, because the camera clock
+    drifts from the host clock.
+    """
+
+    def __init__(self, target_drop_probability=0.001,
+                 memory_budget=256 * MEGABYTE, margin=2, growth_factor=1.5,
+                 min_buffer_count=1, max_sample_count=8192,
+                 offset_window=1000, log_func=None):
+        """
+        :param target_drop_probability: acceptable ratio of frames finding
+            no free buffer.
+        :param memory_budget: maximum memory for the stream buffers in
+            bytes.
+        :param margin: number of spare buffers.
+        :param growth_factor: factor applied to buffer_count when an
+            underrun is observed.
+        :param min_buffer_count: minimum buffer_count.
+        :param max_sample_count: number of recent frames used.
+        :param offset_window: number of recent frames over which the
+            host - camera clock offset is estimated.
+        :param log_func: function(str) called for each decision, or None.
+        """
+        if not 0 < target_drop_probability < 1:
+            raise ValueError("target_drop_probability must be between 0 "
+                             "and 1.")
+        self._target_drop_probability = target_drop_probability
+        self._memory_budget = memory_budget
+        self._margin = margin
+        self._growth_factor = growth_factor
+        self._min_buffer_count = min_buffer_count
+        self._log_func = log_func
+        self.age_stats = CLatencyStats(max_sample_count)
+        self.period_stats = CLatencyStats(max_sample_count)
+        self._offset_window = offset_window
+        self._offsets = collections.deque()
+        self._observed_count = 0
+        self._last_frame_id = None
+        self._last_timestamp_ns = None
+        self._last_underrun = None
+        self._underrun_floor = 0
+        self._has_new_underrun = False
+        self.decisions = []
+
+    @property
+    def frame_period(self) -> float:
+        """Property: median frame period in seconds (0.0 if unknown)."""
+        return self.period_stats.percentile(50)
+
+    @property
+    def underrun_floor(self) -> int:
+        """Property: minimum buffer_count after the recent underruns."""
+        return self._underrun_floor
+
+    def observe_buffer(self, buffer_info, retrieved_time=None):
+        """
+        Observe a retrieved buffer.
+
+        :param buffer_info: PyStStreamBufferInfo of the buffer.
+        :param retrieved_time: time.perf_counter() when the buffer was
+            retrieved, or None for now.
+        """
+        if retrieved_time is None:
+            retrieved_time = time.perf_counter()
+        timestamp_ns = buffer_info.timestamp_ns
+        frame_id = buffer_info.frame_id
+
+        # The smallest host - camera offset of the recent frames is the age
+        # of a frame retrieved without waiting. self._offsets holds
+        # (index, offset) with increasing offsets: the sliding minimum.
+        offset_ns = int(retrieved_time * 1000000000) - timestamp_ns
+        while self._offsets and self._offsets[-1][1] >= offset_ns:
+            self._offsets.pop()
+        self._offsets.append((self._observed_count, offset_ns))
+        if self._offsets[0][0] <= self._observed_count - self._offset_window:
+            self._offsets.popleft()
+        self._observed_count += 1
+        self.age_stats.add((offset_ns - self._offsets[0][1]) / 1000000000.0)
+
+        # Frame period, divided by the frame ID step for lost frames.
+        if self._last_timestamp_ns is not None and \
+                frame_id > self._last_frame_id and \
+                timestamp_ns > self._last_timestamp_ns:
+            self.period_stats.add(
+                (timestamp_ns - self._last_timestamp_ns) / 1000000000.0 /
+                (frame_id - self._last_frame_id))
+        self._last_frame_id = frame_id
+        self._last_timestamp_ns = timestamp_ns
+
+    def observe_datastream(self, st_datastream) -> bool:
+        """
+        Check num_underrun of the datastream.
+
+        :param st_datastream: PyStDataStream.
+        :return: True if new underruns were observed.
+        """
+        underrun = st_datastream.info.num_underrun
+        previous, self._last_underrun = self._last_underrun, underrun
+        if previous is None or underrun <= previous:
+            return False
+        self._underrun_floor = max(
+            self._underrun_floor,
+            int(math.ceil(st_datastream.buffer_count * self._growth_factor)))
+        self._has_new_underrun = True
+        return True
+
+    def reset_observations(self):
+        """Clear the observed frames (e.g. before a new acquisition)."""
+        self.age_stats.reset()
+        self.period_stats.reset()
+        self._offsets.clear()
+        self._observed_count = 0
+        self._last_frame_id = None
+        self._last_timestamp_ns = None
+        self._last_underrun = None
+
+    def estimate_drop_probability(self, buffer_count) -> float:
+        """
+        Estimate the ratio of frames lost with a buffer_count.
+
+        :param buffer_count: number of stream buffers.
+        :return: ratio of the observed frames whose occupancy exceeds
+            buffer_count.
+        """
+        frame_period = self.frame_period
+        if frame_period <= 0:
+            return 0.0
+        return self.age_stats.fraction_above(
+            (buffer_count - 1) * frame_period)
+
+    def recommend(self, st_datastream) -> CBufferDecision:
+        """
+        Recommend the buffer_count of a datastream.
+
+        :param st_datastream: PyStDataStream.
+        :return: CBufferDecision (also appended to decisions and logged).
+        """
+        info = st_datastream.info
+        payload_size = max(info.payload_size, 1)
+        current_count = st_datastream.buffer_count
+        frame_period = self.frame_period
+        age_quantile = self.age_stats.percentile(
+            100.0 * (1.0 - self._target_drop_probability))
+
+        reasons = []
+        if frame_period > 0:
+            buffer_count = int(math.ceil(age_quantile / frame_period)) + \
+                1 + self._margin
+            reasons.append("occupancy")
+        else:
+            buffer_count = current_count
+            reasons.append("no frame observed")
+        if self._underrun_floor > buffer_count:
+            buffer_count = self._underrun_floor
+            reasons.append("underrun" if self._has_new_underrun
+                           else "recent underrun")
+        if not self._has_new_underrun:
+            # Decay the floor for the next recommendation.
+            self._underrun_floor = int(
+                self._underrun_floor / self._growth_factor)
+        self._has_new_underrun = False
+        minimum = max(self._min_buffer_count, info.buf_announce_min)
+        if buffer_count < minimum:
+            buffer_count = minimum
+            reasons.append("minimum")
+        maximum = max(self._memory_budget // payload_size, minimum)
+        if buffer_count > maximum:
+            buffer_count = maximum
+            reasons.append("memory budget")
+
+        decision = CBufferDecision(
+            current_count, buffer_count, ", ".join(reasons), frame_period,
+            age_quantile, self.estimate_drop_probability(buffer_count),
+            buffer_count * payload_size)
+        self.decisions.append(decision)
+        if self._log_func is not None:
+            self._log_func(str(decision))
+        return decision
+
+    def apply(self, st_datastream) -> bool:
+        """
+        Recommend and set the buffer_count of a datastream. The buffers
+        can only be reallocated while the datastream is not grabbing.
+
+        :param st_datastream: PyStDataStream.
+        :return: True if buffer_count was changed.
+        """
+        if st_datastream.is_grabbing:
+            if self._log_func is not None:
+                self._log_func("buffer_count not changed while grabbing.")
+            return False
+        decision = self.recommend(st_datastream)
+        if decision.buffer_count == st_datastream.buffer_count:
+            return False
+        st_datastream.buffer_count = decision.buffer_count
+        return True
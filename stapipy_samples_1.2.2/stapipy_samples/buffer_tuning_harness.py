@@ -0,0 +1,110 @@
+"""
+ This sample validates CBufferTuner with the simulated datastream of
+ stapipy_sim and a processing which stalls from time to time.
+ The following points will be demonstrated in this sample code:
+ - Process frames inside the retrieve_buffer block with injected stalls
+ - Observe the buffers and num_underrun with CBufferTuner
+ - Apply the recommended buffer_count between acquisitions until no
+   frame is lost
+ - Limit the memory of the stream buffers with a budget
+ - Check that the last acquisition loses no frame when the budget is large
+   enough, and that the stream buffers never exceed the budget
+ No camera is required.
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import random
+import time
+
+import stapipy_sim as st
+
+from buffer_tuning import CBufferTuner, MEGABYTE
+
+# Number of images to grab in each round
+number_of_images_to_grab = 1000
+
+# Frame rate of the simulated camera.
+FRAME_RATE = 500.0
+
+# Initial number of stream buffers.
+BUFFER_COUNT = 4
+
+# Processing time of one frame, and stalls injected in the processing.
+PROCESSING_TIME = 0.001
+STALL_PROBABILITY = 0.01
+STALL_TIME = 0.030
+
+# Number of acquisitions.
+ROUND_COUNT = 4
+
+
+def run_round(st_datastream, tuner, random_generator):
+    """
+    Acquire and process the frames once.
+
+    :param st_datastream: PyStDataStream (not grabbing).
+    :param tuner: CBufferTuner observing the buffers.
+    :param random_generator: random.Random for the stalls.
+    :return: number of underruns in this acquisition.
+    """
+    # num_underrun is counted since the datastream was opened.
+    initial_underrun = st_datastream.info.num_underrun
+    tuner.reset_observations()
+    st_datastream.start_acquisition(number_of_images_to_grab)
+    tuner.observe_datastream(st_datastream)
+    while st_datastream.is_grabbing:
+        with st_datastream.retrieve_buffer() as st_buffer:
+            tuner.observe_buffer(st_buffer.info)
+            # Simulated processing. time.sleep releases the GIL like
+            # OpenCV/StApi image processing does.
+            if random_generator.random() < STALL_PROBABILITY:
+                time.sleep(STALL_TIME)
+            else:
+                time.sleep(PROCESSING_TIME)
+    tuner.observe_datastream(st_datastream)
+    st_datastream.stop_acquisition()
+    return st_datastream.info.num_underrun - initial_underrun
+
+
+def run(memory_budget, is_lossless):
+    """
+    Tune the buffer count over several acquisitions.
+
+    :param memory_budget: memory budget of the stream buffers in bytes.
+    :param is_lossless: True if the budget is large enough to lose no
+        frame in the last acquisition.
+    """
+    print("Budget={0:.1f}[MB]".format(memory_budget / float(MEGABYTE)))
+    st_datastream = st.PyStDataStream(fps=FRAME_RATE,
+                                      buffer_count=BUFFER_COUNT)
+    tuner = CBufferTuner(target_drop_probability=0.001,
+                         memory_budget=memory_budget,
+                         log_func=lambda text: print("  Tuner:", text))
+    random_generator = random.Random(0)
+    for round_index in range(ROUND_COUNT):
+        buffer_count = st_datastream.buffer_count
+        underrun = run_round(st_datastream, tuner, random_generator)
+        print("  Round {0}: Buffers={1} Underrun={2}".format(
+              round_index, buffer_count, underrun))
+        if buffer_count * st_datastream.payload_size > memory_budget:
+            raise RuntimeError("Buffers={0} exceed the budget.".format(
+                buffer_count))
+        tuner.apply(st_datastream)
+    if is_lossless and underrun:
+        raise RuntimeError("The last round lost {0} frames.".format(
+            underrun))
+
+
+if __name__ == "__main__":
+    try:
+        print("Frames={0} FPS={1} Processing={2}[ms] Stall={3}[ms] "
+              "x{4}".format(number_of_images_to_grab, FRAME_RATE,
+                            PROCESSING_TIME * 1000.0, STALL_TIME * 1000.0,
+                            STALL_PROBABILITY))
+        run(64 * MEGABYTE, True)
+        run(4 * MEGABYTE, False)
+        print("OK")
+
+    except Exception as exception:
+        print(exception)
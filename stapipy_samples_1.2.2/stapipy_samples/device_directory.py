@@ -0,0 +1,355 @@
+"""
+ This module provides CDeviceDirectory which indexes the devices of the
+ interfaces, to find a device by IP address, MAC address, serial number,
+ user defined name or device ID without scanning the device list.
+ The following points are covered by this module:
+ - Read the devices of an interface once after each update of its device
+   list: PyStDeviceInfo, and for GigE Vision one DeviceSelector write and
+   the GevDeviceIPAddress/SubnetMask/MACAddress reads of each device
+ - Keep one dict per key, so that each lookup is O(1)
+ - Refresh only the interface whose device list was updated, from the
+   GenTLDeviceListUpdated callback of the interface
+ - Serialize the refreshes of an interface: the callback thread and
+   update() would otherwise interleave their DeviceSelector writes and
+   attach the address of one device to another
+ - Wait for a device (e.g. after GevDeviceForceIP) on a condition notified
+   by the refresh instead of sleeping between linear scans
+
+ GigE Vision devices are only discovered by update_device_list (a
+ broadcast), so wait_for_ip_address() still updates the device lists
+ while waiting, with an increasing interval; the lookup itself is done
+ when the device list changes, not on each try.
+"""
+
+import ipaddress
+import threading
+import time
+
+import stapipy as st
+
+# Feature names of the interface nodemap.
+DEVICE_SELECTOR = "DeviceSelector"
+GEV_DEVICE_IP_ADDRESS = "GevDeviceIPAddress"
+GEV_DEVICE_SUBNET_MASK = "GevDeviceSubnetMask"
+GEV_DEVICE_MAC_ADDRESS = "GevDeviceMACAddress"
+
+# Intervals of the device list updates while waiting (seconds).
+MIN_UPDATE_INTERVAL = 0.05
+MAX_UPDATE_INTERVAL = 1.0
+
+
+def to_ip_address(value) -> int:
+    """
+    Convert an IP address to integer.
+
+    :param value: integer or string (x.x.x.x).
+    :return: IP address as integer.
+    """
+    if isinstance(value, str):
+        return int(ipaddress.IPv4Address(value))
+    return int(value)
+
+
+def to_mac_address(value) -> int:
+    """
+    Convert a MAC address to integer.
+
+    :param value: integer or string (xx:xx:xx:xx:xx:xx or xx-xx-...).
+    :return: MAC address as integer.
+    """
+    if isinstance(value, str):
+        text = value.replace(':', '').replace('-', '')
+        if len(text) != 12:
+            raise ValueError("Invalid MAC address: {0}".format(value))
+        return int(text, 16)
+    return int(value)
+
+
+class CDeviceEntry:
+    """
+    Device of an interface, as it was at the last update of the device
+    list. ip_address, subnet_mask and mac_address are None if the
+    interface does not provide them.
+    """
+
+    __slots__ = ('st_interface', 'index', 'device_id', 'serial_number',
+                 'user_defined_name', 'model', 'display_name',
+                 'access_status', 'ip_address', 'subnet_mask', 'mac_address')
+
+    def __init__(self, st_interface, index, device_info):
+        self.st_interface = st_interface
+        self.index = index
+        self.device_id = device_info.device_id
+        self.serial_number = device_info.serial_number
+        self.user_defined_name = device_info.user_defined_name
+        self.model = device_info.model
+        self.display_name = device_info.display_name
+        self.access_status = device_info.access_status
+        self.ip_address = None
+        self.subnet_mask = None
+        self.mac_address = None
+
+    @property
+    def ip_address_string(self) -> str:
+        """Property: IP address as string (x.x.x.x), or empty."""
+        if self.ip_address is None:
+            return ''
+        return str(ipaddress.IPv4Address(self.ip_address))
+
+    def create_device(self, access_flags=None) -> st.PyStDevice:
+        """
+        Open the device.
+
+        :param access_flags: ETLDeviceAccessFlags (default: AccessControl).
+        :return: PyStDevice.
+        """
+        if access_flags is None:
+            access_flags = st.ETLDeviceAccessFlags.AccessControl
+        return self.st_interface.create_device_by_index(self.index,
+                                                        access_flags)
+
+
+class CDeviceDirectory:
+    """
+    Class that indexes the devices of a list of interfaces.
+
+    The callback of each interface refreshes its devices when its device
+    list is updated, by this class or by any other code.
+    """
+
+    def __init__(self, interfaces, is_callback_used=True):
+        """
+        :param interfaces: list of PyStInterface.
+        :param is_callback_used: True to refresh an interface from its
+            GenTLDeviceListUpdated callback.
+        """
+        self.interfaces = list(interfaces)
+        self._condition = threading.Condition()
+        self._entries = {}
+        self._by_ip_address = {}
+        self._by_mac_address = {}
+        self._by_serial_number = {}
+        self._by_user_defined_name = {}
+        self._by_device_id = {}
+        self._index_counts = {}
+        # One lock per interface around DeviceSelector and the publishing
+        # of its entries.
+        self._index_locks = {id(st_interface): threading.Lock()
+                             for st_interface in self.interfaces}
+        self._registered_callbacks = []
+        if is_callback_used:
+            for st_interface in self.interfaces:
+                self._registered_callbacks.append(
+                    (st_interface, st_interface.register_callback(
+                        self._on_interface_event, st_interface)))
+                st_interface.start_event_acquisition()
+        for st_interface in self.interfaces:
+            self._index(st_interface)
+
+    @staticmethod
+    def from_system(st_system, interface_type=None, **kwargs):
+        """
+        Create the directory of the interfaces of a system.
+
+        :param st_system: PyStSystem.
+        :param interface_type: EStInterfaceType to keep, or None for all.
+        :return: CDeviceDirectory.
+        """
+        interfaces = [st_system.get_interface(index)
+                      for index in range(st_system.interface_count)]
+        if interface_type is not None:
+            interfaces = [st_interface for st_interface in interfaces
+                          if st_interface.interface_type == interface_type]
+        return CDeviceDirectory(interfaces, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        with self._condition:
+            return sum(len(entries) for entries in self._entries.values())
+
+    def __iter__(self):
+        """Iterate CDeviceEntry of all interfaces."""
+        with self._condition:
+            entries = [entry for entries in self._entries.values()
+                       for entry in entries]
+        return iter(entries)
+
+    def close(self):
+        """Deregister the callbacks."""
+        for st_interface, registered_cb in self._registered_callbacks:
+            st_interface.stop_event_acquisition()
+            st_interface.deregister_callback(registered_cb)
+        self._registered_callbacks = []
+
+    def update(self) -> bool:
+        """
+        Update the device lists of all interfaces and refresh the ones
+        which changed.
+
+        :return: True if a device list changed.
+        """
+        is_changed = False
+        for st_interface in self.interfaces:
+            index_count = self._index_counts.get(id(st_interface), 0)
+            if st_interface.update_device_list():
+                is_changed = True
+                # Not refreshed by the callback yet.
+                if self._index_counts.get(id(st_interface), 0) == \
+                        index_count:
+                    self._index(st_interface)
+        return is_changed
+
+    def find_by_ip_address(self, ip_address):
+        """
+        :param ip_address: integer or string (x.x.x.x).
+        :return: CDeviceEntry, or None if not found.
+        """
+        return self._by_ip_address.get(to_ip_address(ip_address))
+
+    def find_by_mac_address(self, mac_address):
+        """
+        :param mac_address: integer or string (xx:xx:xx:xx:xx:xx).
+        :return: CDeviceEntry, or None if not found.
+        """
+        return self._by_mac_address.get(to_mac_address(mac_address))
+
+    def find_by_serial_number(self, serial_number):
+        """
+        :param serial_number: serial number.
+        :return: CDeviceEntry, or None if not found.
+        """
+        return self._by_serial_number.get(serial_number)
+
+    def find_by_user_defined_name(self, user_defined_name):
+        """
+        :param user_defined_name: user defined name (DeviceUserID).
+        :return: CDeviceEntry, or None if not found.
+        """
+        return self._by_user_defined_name.get(user_defined_name)
+
+    def find_by_device_id(self, device_id):
+        """
+        :param device_id: GenTL device ID.
+        :return: CDeviceEntry, or None if not found.
+        """
+        return self._by_device_id.get(device_id)
+
+    def wait_for_ip_address(self, ip_address, timeout=30.0):
+        """
+        Wait until a device has the IP address (e.g. after
+        GevDeviceForceIP).
+
+        :param ip_address: integer or string (x.x.x.x).
+        :param timeout: timeout in seconds.
+        :return: CDeviceEntry, or None on timeout.
+        """
+        ip_address = to_ip_address(ip_address)
+        return self._wait(lambda: self._by_ip_address.get(ip_address),
+                          timeout)
+
+    def wait_for_serial_number(self, serial_number, timeout=30.0):
+        """
+        Wait until a device with the serial number is found (e.g. after a
+        reboot).
+
+        :param serial_number: serial number.
+        :param timeout: timeout in seconds.
+        :return: CDeviceEntry, or None on timeout.
+        """
+        return self._wait(
+            lambda: self._by_serial_number.get(serial_number), timeout)
+
+    def _wait(self, find_func, timeout):
+        """Wait until find_func returns an entry."""
+        end_time = time.monotonic() + timeout
+        interval = MIN_UPDATE_INTERVAL
+        while True:
+            with self._condition:
+                entry = find_func()
+                remaining_time = end_time - time.monotonic()
+                if entry is None and remaining_time > 0:
+                    # Woken by a refresh from a callback or by timeout.
+                    self._condition.wait(min(interval, remaining_time))
+                    entry = find_func()
+            if entry is not None:
+                return entry
+            if time.monotonic() >= end_time:
+                return None
+            self.update()
+            interval = min(interval * 2, MAX_UPDATE_INTERVAL)
+
+    def _on_interface_event(self, handle=None, context=None):
+        """
+        Callback of the interfaces. context is the PyStInterface of
+        self.interfaces, which keys the entries and the lock.
+        """
+        if handle.callback_type == \
+                st.EStCallbackType.GenTLDeviceListUpdated:
+            self._index(context)
+
+    def _index(self, st_interface):
+        """
+        Read the devices of an interface and replace its entries. Called
+        from the callback thread and from update(): the whole pass holds
+        the lock of the interface.
+        """
+        key = id(st_interface)
+        with self._index_locks[key]:
+            entries = [CDeviceEntry(st_interface, index,
+                                    st_interface.get_device_info(index))
+                       for index in range(st_interface.device_count)]
+            self._read_addresses(st_interface, entries)
+            with self._condition:
+                for entry in self._entries.get(key, ()):
+                    self._remove(entry)
+                self._entries[key] = entries
+                for entry in entries:
+                    self._add(entry)
+                self._index_counts[key] = \
+                    self._index_counts.get(key, 0) + 1
+                self._condition.notify_all()
+
+    @staticmethod
+    def _read_addresses(st_interface, entries):
+        """Read the GigE Vision addresses with DeviceSelector."""
+        if not entries:
+            return
+        nodemap = st_interface.port.nodemap
+        device_selector = nodemap.get_node(DEVICE_SELECTOR)
+        ip_address = nodemap.get_node(GEV_DEVICE_IP_ADDRESS)
+        if device_selector is None or ip_address is None:
+            return
+        subnet_mask = nodemap.get_node(GEV_DEVICE_SUBNET_MASK)
+        mac_address = nodemap.get_node(GEV_DEVICE_MAC_ADDRESS)
+        for entry in entries:
+            device_selector.value = entry.index
+            if not ip_address.is_available:
+                continue
+            entry.ip_address = ip_address.value
+            if subnet_mask is not None and subnet_mask.is_available:
+                entry.subnet_mask = subnet_mask.value
+            if mac_address is not None and mac_address.is_available:
+                entry.mac_address = mac_address.value
+
+    def _add(self, entry):
+        for mapping, key in self._get_keys(entry):
+            mapping[key] = entry
+
+    def _remove(self, entry):
+        for mapping, key in self._get_keys(entry):
+            if mapping.get(key) is entry:
+                del mapping[key]
+
+    def _get_keys(self, entry):
+        """Get (dict, key) of the entry, for the keys which are set."""
+        keys = ((self._by_ip_address, entry.ip_address),
+                (self._by_mac_address, entry.mac_address),
+                (self._by_serial_number, entry.serial_number),
+                (self._by_user_defined_name, entry.user_defined_name),
+                (self._by_device_id, entry.device_id))
+        return [(mapping, key) for mapping, key in keys if key]
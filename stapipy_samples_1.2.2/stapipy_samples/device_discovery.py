@@ -0,0 +1,248 @@
+"""
+ This module provides CDeviceDiscovery which discovers and opens all the
+ devices of several systems and interfaces concurrently.
+ The following points are covered by this module:
+ - Create the system of each available GenTL producer (EStSystemVendor)
+ - Update the device list of all interfaces at the same time, with an
+   optional update_device_list_timeout
+ - Open the devices in a thread pool, with a limited number of opens at
+   the same time on each interface (e.g. one GigE NIC)
+ - Create the datastreams in parallel
+ - Return PyStDeviceList and PyStDataStreamList in discovery order, with
+   the timing of each interface and device
+"""
+
+import concurrent.futures
+import threading
+import time
+
+import stapipy as st
+
+
+def create_systems(system_vendors=None) -> list:
+    """
+    Create the systems of the available GenTL producers.
+
+    :param system_vendors: list of EStSystemVendor, or None for all.
+    :return: list of PyStSystem.
+    """
+    if system_vendors is None:
+        system_vendors = [system_vendor for system_vendor in
+                          st.EStSystemVendor
+                          if system_vendor != st.EStSystemVendor.Count]
+    systems = []
+    for system_vendor in system_vendors:
+        try:
+            systems.append(st.create_system(system_vendor,
+                                            st.EStInterfaceType.All))
+        except st.PyStError:
+            # The GenTL producer is not installed.
+            pass
+    return systems
+
+
+class CDeviceReport:
+    """
+    Timing and result of one device.
+    """
+
+    __slots__ = ('interface_id', 'index', 'display_name', 'serial_number',
+                 'wait_time', 'open_time', 'datastream_time', 'error',
+                 'st_device', 'st_datastream')
+
+    def __init__(self, interface_id, index, display_name, serial_number):
+        self.interface_id = interface_id
+        self.index = index
+        self.display_name = display_name
+        self.serial_number = serial_number
+        self.wait_time = 0.0
+        self.open_time = 0.0
+        self.datastream_time = 0.0
+        self.error = None
+        self.st_device = None
+        self.st_datastream = None
+
+    @property
+    def is_opened(self) -> bool:
+        """Property: True if the device (and datastream) is opened."""
+        return self.error is None and self.st_device is not None
+
+
+class CDeviceDiscovery:
+    """
+    Class that discovers and opens the devices of several systems.
+    """
+
+    def __init__(self, systems, max_opens_per_interface=4,
+                 update_timeout=None, worker_count=16,
+                 access_flags=None, is_datastream_created=True):
+        """
+        :param systems: list of PyStSystem (see create_systems()).
+        :param max_opens_per_interface: maximum number of devices opened
+            at the same time on one interface.
+        :param update_timeout: update_device_list_timeout of the
+            interfaces in milliseconds, or None to keep it.
+        :param worker_count: number of threads opening devices.
+        :param access_flags: ETLDeviceAccessFlags (default: AccessControl).
+        :param is_datastream_created: True to create the datastream 0 of
+            each device.
+        """
+        if max_opens_per_interface < 1:
+            raise ValueError("max_opens_per_interface must be 1 or more.")
+        self.systems = systems
+        self.max_opens_per_interface = max_opens_per_interface
+        self.update_timeout = update_timeout
+        self.worker_count = worker_count
+        self.access_flags = access_flags if access_flags is not None \
+            else st.ETLDeviceAccessFlags.AccessControl
+        self.is_datastream_created = is_datastream_created
+        self.interface_times = {}
+        self.interface_errors = {}
+        self.reports = []
+        self.device_list = None
+        self.datastream_list = None
+
+    def get_interfaces(self) -> list:
+        """
+        Get the interfaces of all systems.
+
+        :return: list of PyStInterface.
+        """
+        interfaces = []
+        for st_system in self.systems:
+            st_system.update_interface_list()
+            interfaces.extend(st_system.get_interface(index)
+                              for index in range(st_system.interface_count))
+        return interfaces
+
+    def discover(self) -> list:
+        """
+        Update the device lists of all interfaces concurrently. An
+        interface whose update fails is recorded in interface_errors and
+        skipped.
+
+        :return: list of (PyStInterface, index of the device) of the
+            devices which can be opened.
+        """
+        interfaces = self.get_interfaces()
+        self.interface_times = {}
+        self.interface_errors = {}
+        if not interfaces:
+            return []
+        updated_interfaces = []
+        with concurrent.futures.ThreadPoolExecutor(len(interfaces)) as \
+                executor:
+            for st_interface, update_time, error in executor.map(
+                    self._update_device_list, interfaces):
+                interface_id = st_interface.info.interface_id
+                self.interface_times[interface_id] = update_time
+                if error is None:
+                    updated_interfaces.append(st_interface)
+                else:
+                    self.interface_errors[interface_id] = error
+        devices = []
+        for st_interface in updated_interfaces:
+            for index in range(st_interface.device_count):
+                if st_interface.is_device_available(index,
+                                                    self.access_flags):
+                    devices.append((st_interface, index))
+        return devices
+
+    def open_all(self, filter_func=None) -> list:
+        """
+        Discover and open the devices. A device which fails to open is
+        reported and skipped.
+
+        :param filter_func: function(PyStDeviceInfo) returning True to open
+            the device, or None to open all.
+        :return: list of CDeviceReport in discovery order. The opened
+            devices and datastreams are registered to device_list and
+            datastream_list in the same order.
+        """
+        reports = []
+        semaphores = {}
+        for st_interface, index in self.discover():
+            device_info = st_interface.get_device_info(index)
+            if filter_func is not None and not filter_func(device_info):
+                continue
+            interface_id = st_interface.info.interface_id
+            if interface_id not in semaphores:
+                semaphores[interface_id] = threading.BoundedSemaphore(
+                    self.max_opens_per_interface)
+            reports.append((st_interface, CDeviceReport(
+                interface_id, index, device_info.display_name,
+                device_info.serial_number)))
+
+        if reports:
+            with concurrent.futures.ThreadPoolExecutor(
+                    self.worker_count) as executor:
+                futures = [executor.submit(
+                    self._open, st_interface, report,
+                    semaphores[report.interface_id])
+                    for st_interface, report in reports]
+                concurrent.futures.wait(futures)
+
+        # Register in discovery order.
+        self.reports = [report for _, report in reports]
+        self.device_list = st.PyStDeviceList()
+        self.datastream_list = st.PyStDataStreamList()
+        for report in self.reports:
+            if report.is_opened:
+                self.device_list.register(report.st_device)
+                if report.st_datastream is not None:
+                    self.datastream_list.register(report.st_datastream)
+        return self.reports
+
+    @property
+    def devices(self) -> list:
+        """Property: list of the opened PyStDevice."""
+        return [report.st_device for report in self.reports
+                if report.is_opened]
+
+    @property
+    def datastreams(self) -> list:
+        """Property: list of the created PyStDataStream."""
+        return [report.st_datastream for report in self.reports
+                if report.is_opened and report.st_datastream is not None]
+
+    def _update_device_list(self, st_interface):
+        """
+        Update the device list of one interface.
+
+        :return: (PyStInterface, update time, exception or None).
+        """
+        start_time = time.perf_counter()
+        error = None
+        try:
+            if self.update_timeout is not None:
+                st_interface.update_device_list_timeout = \
+                    self.update_timeout
+            st_interface.update_device_list()
+        except Exception as exception:
+            error = exception
+        return st_interface, time.perf_counter() - start_time, error
+
+    def _open(self, st_interface, report, semaphore):
+        """Open one device and its datastream in a worker thread."""
+        start_time = time.perf_counter()
+        try:
+            with semaphore:
+                open_start_time = time.perf_counter()
+                report.wait_time = open_start_time - start_time
+                report.st_device = st_interface.create_device_by_index(
+                    report.index, self.access_flags)
+                report.open_time = time.perf_counter() - open_start_time
+            if self.is_datastream_created:
+                datastream_start_time = time.perf_counter()
+                report.st_datastream = report.st_device.create_datastream(0)
+                report.datastream_time = \
+                    time.perf_counter() - datastream_start_time
+        except Exception as exception:
+            report.error = exception
+            if report.st_device is not None:
+                # Do not keep a device without its datastream.
+                try:
+                    report.st_device.release()
+                except st.PyStError:
+                    pass
+                report.st_device = None
@@ -0,0 +1,357 @@
+"""
+ This module provides CDeviceSupervisor which keeps the acquisition of a
+ device running across device lost: the device is opened again, its
+ settings are restored and the acquisition is resumed automatically.
+ The following points are covered by this module:
+ - Detect device lost with the EventDeviceLost node callback, and with
+   is_device_lost in case the event is missed
+ - Open the device again with exponential backoff, looking it up by
+   device ID or serial number in a CDeviceDirectory
+ - Restore the last known feature snapshot (CFeatureSnapshot), compared
+   with the live nodemap since the camera may have been power cycled
+ - Create the datastream again with the same buffer_count, then resume
+   the acquisition of the host and camera side
+ - Measure the outages, the recovery time and the frames lost
+"""
+
+import threading
+import time
+
+import stapipy as st
+
+from device_directory import CDeviceDirectory
+from feature_snapshot import CFeatureSnapshot, CSnapshotLoader
+from latency_stats import CLatencyStats
+
+# Feature names of the local (TLDevice) nodemap.
+EVENT_SELECTOR = "EventSelector"
+EVENT_NOTIFICATION = "EventNotification"
+EVENT_NOTIFICATION_ON = "On"
+TARGET_EVENT_NAME = "DeviceLost"
+CALLBACK_NODE_NAME = "EventDeviceLost"
+
+
+class CDeviceSupervisor:
+    """
+    Class that supervises the acquisition of one device.
+
+    on_buffer(st_buffer, user_data) is called from the callback thread of
+    the datastream for each buffer. The supervisor owns the device: it may
+    be replaced by a new PyStDevice after device lost, and is released by
+    close().
+
+    frames_lost is an estimate: the outage duration multiplied by the
+    frame rate measured before the device was lost. frames_dropped counts
+    the gaps of frame_id while the device is running.
+    """
+
+    def __init__(self, st_system, st_device, on_buffer, user_data=None,
+                 snapshot=None, buffer_count=None, min_backoff=0.05,
+                 max_backoff=2.0, poll_interval=0.5):
+        """
+        :param st_system: PyStSystem of the device.
+        :param st_device: PyStDevice to supervise.
+        :param on_buffer: function(st_buffer, user_data) called for each
+            buffer.
+        :param user_data: data passed to on_buffer.
+        :param snapshot: CFeatureSnapshot restored after the device is
+            opened again, or None to store the features of the device
+            when start() is called (requires PyStFeatureBag).
+        :param buffer_count: number of stream buffers, or None to keep the
+            default of the first datastream.
+        :param min_backoff: first interval between the reconnections in
+            seconds.
+        :param max_backoff: maximum interval between the reconnections.
+        :param poll_interval: interval to check is_device_lost in seconds.
+        """
+        if not 0 < min_backoff <= max_backoff:
+            raise ValueError("Invalid backoff: {0}, {1}".format(
+                min_backoff, max_backoff))
+        self.st_system = st_system
+        self.on_buffer = on_buffer
+        self.user_data = user_data
+        self.snapshot = snapshot
+        self.buffer_count = buffer_count
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self._st_device = st_device
+        self._st_datastream = None
+        self._device_id = st_device.info.device_id
+        self._serial_number = st_device.info.serial_number
+        self._directory = None
+        self._loader = CSnapshotLoader()
+        self._thread = None
+        self._lost_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._state = 'stopped'
+        self._lost_time = None
+        self._last_error = None
+        self._last_restore_report = None
+        self.outage_stats = CLatencyStats()
+        self.recovery_stats = CLatencyStats()
+        self._reconnect_attempts = 0
+        self._frames_delivered = 0
+        self._frames_lost = 0
+        self._frames_dropped = 0
+        self._last_frame_id = None
+        self._session_frame_count = 0
+        self._session_start_time = None
+        self._last_frame_time = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def device(self):
+        """Property: current PyStDevice (replaced after device lost)."""
+        return self._st_device
+
+    @property
+    def datastream(self):
+        """Property: current PyStDataStream, or None."""
+        return self._st_datastream
+
+    @property
+    def state(self) -> str:
+        """Property: 'running', 'recovering' or 'stopped'."""
+        return self._state
+
+    def start(self):
+        """Store the snapshot if needed and start the acquisition."""
+        if self._thread is not None:
+            return
+        if self.snapshot is None:
+            self.snapshot = CFeatureSnapshot.from_nodemap(
+                self._st_device.remote_port.nodemap)
+        self._directory = CDeviceDirectory(
+            [self.st_system.get_interface(index)
+             for index in range(self.st_system.interface_count)])
+        self._stop_event.clear()
+        self._lost_event.clear()
+        self._start_acquisition(self._st_device)
+        self._state = 'running'
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the supervision and the acquisition."""
+        self._stop_event.set()
+        self._lost_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stop_acquisition()
+        self._state = 'stopped'
+
+    def close(self):
+        """Stop, then release the device and the callbacks."""
+        self.stop()
+        if self._st_device is not None:
+            self._release_device()
+            self._st_device = None
+        if self._directory is not None:
+            self._directory.close()
+            self._directory = None
+        self._loader.close()
+
+    def statistics(self) -> dict:
+        """
+        Get the statistics.
+
+        :return: dict of the outages, recovery time (from the reopening of
+            the device to the resumed acquisition) and frame counts.
+        """
+        with self._lock:
+            return {'state': self._state,
+                    'outage_count': self.outage_stats.count,
+                    'outage': self.outage_stats.summary(),
+                    'recovery': self.recovery_stats.summary(),
+                    'reconnect_attempts': self._reconnect_attempts,
+                    'frames_delivered': self._frames_delivered,
+                    'frames_lost': self._frames_lost,
+                    'frames_dropped': self._frames_dropped,
+                    'restored_feature_count':
+                        self._last_restore_report['changed']
+                        if self._last_restore_report else 0,
+                    'last_error': str(self._last_error)
+                    if self._last_error else None}
+
+    def _run(self):
+        """Supervisor thread: wait for device lost and recover."""
+        while not self._stop_event.is_set():
+            self._lost_event.wait(self.poll_interval)
+            if self._stop_event.is_set():
+                break
+            if self._lost_event.is_set() or \
+                    self._st_device.is_device_lost:
+                self._recover()
+
+    def _recover(self):
+        """Open the device again until the acquisition is resumed."""
+        with self._lock:
+            self._state = 'recovering'
+            lost_time = self._lost_time or time.perf_counter()
+            frame_rate = self._get_frame_rate()
+        self._stop_acquisition()
+        self._release_device()
+        backoff = self.min_backoff
+        st_device = None
+        while st_device is None:
+            if self._stop_event.is_set():
+                return
+            with self._lock:
+                self._reconnect_attempts += 1
+            try:
+                st_device, reopen_time = self._reopen()
+            except Exception as exception:
+                self._last_error = exception
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+        now = time.perf_counter()
+        with self._lock:
+            self._st_device = st_device
+            self._lost_time = None
+            self._lost_event.clear()
+            self._state = 'running'
+            self.outage_stats.add(now - lost_time)
+            self.recovery_stats.add(now - reopen_time)
+            self._frames_lost += int(round((now - lost_time) * frame_rate))
+
+    def _reopen(self):
+        """
+        Open the device, restore the snapshot and start the acquisition.
+
+        :return: (PyStDevice, time when the device was found).
+        """
+        self._directory.update()
+        entry = self._directory.find_by_device_id(self._device_id) or \
+            self._directory.find_by_serial_number(self._serial_number)
+        if entry is None:
+            raise RuntimeError("Device {0} is not found.".format(
+                self._serial_number))
+        reopen_time = time.perf_counter()
+        st_device = entry.create_device()
+        try:
+            # The camera may have been power cycled: compare with the
+            # live nodemap.
+            report = self._loader.load(st_device, self.snapshot,
+                                       verify=True)
+            self._last_restore_report = report
+            self._start_acquisition(st_device)
+        except Exception:
+            self._stop_acquisition()
+            self._loader.forget(self._serial_number)
+            self._loader.release_registry(self._serial_number)
+            st_device.release()
+            raise
+        return st_device, reopen_time
+
+    def _start_acquisition(self, st_device):
+        """Enable the DeviceLost event, create the datastream and start."""
+        nodemap = st_device.local_port.nodemap
+        st_device_lost = nodemap.get_node(CALLBACK_NODE_NAME)
+        if st_device_lost is not None:
+            # OutsideLock: is_device_lost is already updated when fired.
+            st_device_lost.register_callback(
+                self._on_device_lost, st_device,
+                st.EGCCallbackType.OutsideLock)
+            st.PyIEnumeration(nodemap.get_node(EVENT_SELECTOR))\
+                .set_symbolic_value(TARGET_EVENT_NAME)
+            st.PyIEnumeration(nodemap.get_node(EVENT_NOTIFICATION))\
+                .set_symbolic_value(EVENT_NOTIFICATION_ON)
+            st_device.start_event_acquisition()
+        st_datastream = st_device.create_datastream(0)
+        if self.buffer_count is None:
+            self.buffer_count = st_datastream.buffer_count
+        else:
+            st_datastream.buffer_count = self.buffer_count
+        st_datastream.register_callback(self._on_datastream_event)
+        with self._lock:
+            self._last_frame_id = None
+            self._session_frame_count = 0
+            self._session_start_time = None
+        self._st_datastream = st_datastream
+        st_datastream.start_acquisition()
+        st_device.acquisition_start()
+
+    def _stop_acquisition(self):
+        """Stop the acquisition, ignoring the errors of a lost device."""
+        st_datastream, self._st_datastream = self._st_datastream, None
+        if st_datastream is None:
+            return
+        try:
+            st_datastream.device.acquisition_stop()
+        except Exception:
+            pass
+        try:
+            st_datastream.stop_acquisition()
+            st_datastream.release()
+        except Exception:
+            pass
+
+    def _release_device(self):
+        """Release the device, ignoring the errors of a lost device."""
+        # The node callbacks must be deregistered before the nodemap is
+        # released with the device.
+        self._loader.release_registry(self._serial_number)
+        try:
+            self._st_device.stop_event_acquisition()
+            self._st_device.release()
+        except Exception:
+            pass
+
+    def _get_frame_rate(self):
+        """Frame rate measured since the acquisition was started."""
+        if self._session_frame_count < 2:
+            return 0.0
+        elapsed_time = self._last_frame_time - self._session_start_time
+        if elapsed_time <= 0:
+            return 0.0
+        return (self._session_frame_count - 1) / elapsed_time
+
+    def _on_device_lost(self, node=None, st_device=None):
+        """Callback of EventDeviceLost."""
+        if node.is_available and st_device is self._st_device and \
+                st_device.is_device_lost:
+            with self._lock:
+                if self._lost_time is None:
+                    self._lost_time = time.perf_counter()
+            self._lost_event.set()
+
+    def _on_datastream_event(self, handle=None, context=None):
+        """Callback of the datastream: count and deliver the buffer."""
+        if handle.callback_type != \
+                st.EStCallbackType.GenTLDataStreamNewBuffer:
+            return
+        st_datastream = handle.module
+        try:
+            with st_datastream.retrieve_buffer() as st_buffer:
+                now = time.perf_counter()
+                frame_id = st_buffer.info.frame_id
+                with self._lock:
+                    if self._last_frame_id is not None and \
+                            frame_id > self._last_frame_id + 1:
+                        self._frames_dropped += \
+                            frame_id - self._last_frame_id - 1
+                    self._last_frame_id = frame_id
+                    if self._session_start_time is None:
+                        self._session_start_time = now
+                    self._last_frame_time = now
+                    self._session_frame_count += 1
+                    self._frames_delivered += 1
+                self.on_buffer(st_buffer, self.user_data)
+        except st.PyStError:
+            device = st_datastream.device
+            if device is not None and device.is_device_lost:
+                with self._lock:
+                    if self._lost_time is None:
+                        self._lost_time = time.perf_counter()
+                self._lost_event.set()
+            else:
+                raise
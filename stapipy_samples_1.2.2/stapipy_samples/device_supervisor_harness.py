@@ -0,0 +1,151 @@
+"""
+ This sample injects device lost into a simulated camera of stapipy_sim
+ and measures the recovery of CDeviceSupervisor.
+ The following points will be demonstrated in this sample code:
+ - Configure the camera with a feature snapshot and start the supervised
+   acquisition with a given buffer_count
+ - Disconnect the camera several times; it comes back with its power-on
+   settings, like a camera which was power cycled
+ - Check that the settings and buffer_count are restored and that the
+   acquisition is resumed without user action
+ - Display the outage duration, recovery time and frames lost
+ No camera is required.
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import sys
+import threading
+import time
+
+import stapipy_sim as st
+
+# The supervisor modules import stapipy: use the simulator.
+sys.modules['stapipy'] = st
+
+from device_supervisor import CDeviceSupervisor
+from feature_snapshot import CFeatureSnapshot, CSnapshotLoader
+
+# Frame rate and size of the camera (power-on settings).
+FRAME_RATE = 200.0
+WIDTH = 640
+
+# Settings of the snapshot, different from the power-on settings.
+SNAPSHOT_WIDTH = 320
+SNAPSHOT = "Width\t{0}\nHeight\t240\nAcquisitionFrameRate\t100\n".format(
+    SNAPSHOT_WIDTH)
+
+# Number of stream buffers.
+BUFFER_COUNT = 8
+
+# Injected faults.
+OUTAGE_COUNT = 3
+RUN_TIME = 0.5
+OUTAGE_TIME = 1.0
+
+# Maximum time to wait for a recovery in seconds.
+RECOVERY_TIMEOUT = 10.0
+
+
+class CFrameLog:
+    """
+    Class that keeps the arrival time and width of the frames.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frames = []
+
+    def on_buffer(self, st_buffer, user_data=None):
+        """on_buffer function of CDeviceSupervisor."""
+        if st_buffer.info.is_image_present:
+            width = st_buffer.get_image().width
+            with self._lock:
+                self._frames.append((time.perf_counter(), width))
+
+    def first_frame_after(self, start_time):
+        """Get (time, width) of the first frame after start_time."""
+        with self._lock:
+            for frame in self._frames:
+                if frame[0] > start_time:
+                    return frame
+        return None
+
+
+def wait_for_frame(frame_log, start_time, timeout):
+    """Wait until a frame arrives after start_time."""
+    end_time = time.perf_counter() + timeout
+    while time.perf_counter() < end_time:
+        frame = frame_log.first_frame_after(start_time)
+        if frame is not None:
+            return frame
+        time.sleep(0.01)
+    return None
+
+
+if __name__ == "__main__":
+    try:
+        camera = st.reset_cameras(1, fps=FRAME_RATE, width=WIDTH)[0]
+
+        # Initialize StApi before using.
+        st.initialize()
+
+        # Create a system object for device scan and connection.
+        st_system = st.create_system()
+
+        # Connect to first detected device.
+        st_device = st_system.create_first_device()
+        print('Device=', st_device.info.display_name)
+
+        # Configure the camera with the snapshot.
+        snapshot = CFeatureSnapshot.from_string(SNAPSHOT)
+        with CSnapshotLoader() as loader:
+            loader.load(st_device, snapshot)
+
+        frame_log = CFrameLog()
+        with CDeviceSupervisor(st_system, st_device, frame_log.on_buffer,
+                               snapshot=snapshot, buffer_count=BUFFER_COUNT,
+                               max_backoff=0.2) as supervisor:
+            for outage in range(OUTAGE_COUNT):
+                time.sleep(RUN_TIME)
+
+                # Unplug the camera, which comes back after OUTAGE_TIME
+                # with its power-on settings.
+                lost_time = time.perf_counter()
+                camera.disconnect(reconnect_after=OUTAGE_TIME)
+                camera.reset_settings()
+                reconnect_time = lost_time + OUTAGE_TIME
+
+                # Wait for the first frame after the camera is back.
+                frame = wait_for_frame(frame_log, reconnect_time,
+                                       OUTAGE_TIME + RECOVERY_TIMEOUT)
+                if frame is None:
+                    raise RuntimeError("The acquisition was not resumed.")
+                print("Outage {0}: first frame {1:.1f}[ms] after "
+                      "reconnection, Width={2} BufferCount={3}".format(
+                          outage + 1, (frame[0] - reconnect_time) * 1000.0,
+                          frame[1], supervisor.datastream.buffer_count))
+                if frame[1] != SNAPSHOT_WIDTH:
+                    raise RuntimeError("Width was not restored.")
+                if supervisor.datastream.buffer_count != BUFFER_COUNT:
+                    raise RuntimeError("BufferCount was not restored.")
+
+            time.sleep(RUN_TIME)
+            statistics = supervisor.statistics()
+
+        print("Outages: {0} (mean={1:.1f}[ms] max={2:.1f}[ms])".format(
+              statistics['outage_count'], statistics['outage']['mean_ms'],
+              statistics['outage']['max_ms']))
+        print("Recovery: mean={0:.1f}[ms] max={1:.1f}[ms] Attempts={2} "
+              "Restored features={3}".format(
+                  statistics['recovery']['mean_ms'],
+                  statistics['recovery']['max_ms'],
+                  statistics['reconnect_attempts'],
+                  statistics['restored_feature_count']))
+        print("Frames: Delivered={0} Lost={1} Dropped={2}".format(
+              statistics['frames_delivered'], statistics['frames_lost'],
+              statistics['frames_dropped']))
+
+    except Exception as exception:
+        print(exception)
+        sys.exit(1)
@@ -0,0 +1,210 @@
+"""
+ This module provides a reusable Mono/Bayer to display image converter for
+ OpenCV.
+ The following points are covered by this module:
+ - Cache a conversion plan per pixel format and image size
+   (demosaic code, bit shift, output dtype and target size)
+ - Reuse preallocated output buffers with the dst argument of OpenCV
+ - Convert PyStImage or NumPy array to an 8bit RGB/Mono image for display
+ Note: opencv-python and numpy packages are required:
+    pip install numpy
+    pip install opencv-python
+"""
+
+import cv2
+import numpy as np
+import stapipy as st
+
+from image_ndarray import as_ndarray, to_uint8
+
+# OpenCV demosaic code for each Bayer color filter.
+BAYER_TO_RGB_CODES = {
+    st.EStPixelColorFilter.BayerRG: cv2.COLOR_BAYER_RG2RGB,
+    st.EStPixelColorFilter.BayerGR: cv2.COLOR_BAYER_GR2RGB,
+    st.EStPixelColorFilter.BayerGB: cv2.COLOR_BAYER_GB2RGB,
+    st.EStPixelColorFilter.BayerBG: cv2.COLOR_BAYER_BG2RGB,
+}
+
+
+class CConversionPlan:
+    """
+    Conversion settings and output buffers for one pixel format and size.
+    """
+
+    def __init__(self, pixel_format, width, height, resize_factor=1.0):
+        """
+        Build the conversion plan.
+
+        :param pixel_format: EStPixelFormatNamingConvention of the source.
+        :param width: width of the source image.
+        :param height: height of the source image.
+        :param resize_factor: scale of the output image.
+        """
+        pixel_format_info = st.get_pixel_format_info(pixel_format)
+        if not (pixel_format_info.is_mono or pixel_format_info.is_bayer):
+            raise ValueError("Pixel format {0} is not Mono or Bayer."
+                             .format(pixel_format_info.name))
+        self.pixel_format = pixel_format
+        self.pixel_format_info = pixel_format_info
+        self.width = width
+        self.height = height
+
+        # Bit shift to scale each pixel component to 8bit.
+        self.valid_bit_count = pixel_format_info.each_component_valid_bit_count
+        self.shift = 0
+        if pixel_format_info.each_component_total_bit_count > 8:
+            self.shift = max(self.valid_bit_count - 8, 0)
+        self.dtype = np.dtype(np.uint8)
+
+        # OpenCV demosaic code, or None for Mono.
+        self.demosaic_code = None
+        if pixel_format_info.is_bayer:
+            self.demosaic_code = BAYER_TO_RGB_CODES.get(
+                pixel_format_info.get_pixel_color_filter())
+        channel_count = 1 if self.demosaic_code is None else 3
+
+        # Target size as (width, height), following cv2.resize with fx/fy.
+        self.resize_factor = resize_factor
+        self.target_size = (max(int(round(width * resize_factor)), 1),
+                            max(int(round(height * resize_factor)), 1))
+        self.output_shape = (self.target_size[1], self.target_size[0])
+        if channel_count > 1:
+            self.output_shape += (channel_count,)
+
+        # Preallocated buffers reused for every frame.
+        self._shifted = None
+        if pixel_format_info.each_component_total_bit_count > 8:
+            self._shifted = np.empty((height, width), self.dtype)
+        self._color = None
+        if self.demosaic_code is not None:
+            self._color = np.empty((height, width, 3), self.dtype)
+        self._resized = None
+        if self.target_size != (width, height):
+            self._resized = np.empty(self.output_shape, self.dtype)
+
+    def convert(self, nparr, dst=None):
+        """
+        Convert the raw data using the preallocated buffers.
+
+        :param nparr: raw data as numpy.ndarray of shape (height, width).
+        :param dst: numpy.ndarray of output_shape to store the result.
+            If None, the internal buffer of this plan is used.
+        :return: converted numpy.ndarray. If dst is None, the array is
+            overwritten by the next call.
+        """
+        # Scale the pixel values to 8bit.
+        if self._shifted is not None:
+            nparr = to_uint8(nparr, self.valid_bit_count, self._shifted)
+
+        # Perform color conversion for Bayer.
+        is_last = self._resized is None
+        if self.demosaic_code is not None:
+            out = dst if is_last and dst is not None else self._color
+            nparr = cv2.cvtColor(nparr, self.demosaic_code, dst=out)
+
+        # Resize image.
+        if not is_last:
+            out = self._resized if dst is None else dst
+            nparr = cv2.resize(nparr, None, dst=out, fx=self.resize_factor,
+                               fy=self.resize_factor)
+        elif dst is not None and nparr is not dst:
+            np.copyto(dst, nparr)
+            nparr = dst
+        return nparr
+
+
+class CDisplayConverter:
+    """
+    Class to convert Mono/Bayer images to 8bit images for display.
+
+    The converter keeps one CConversionPlan per (pixel format, width, height)
+    so that the pixel format info and the branch on the color filter are
+    evaluated only once. The buffers of the plan are reused for every frame;
+    use one converter per thread.
+    """
+
+    def __init__(self, resize_factor=1.0, max_plan_count=16):
+        """
+        :param resize_factor: scale of the output image.
+        :param max_plan_count: maximum number of cached plans.
+        """
+        self._resize_factor = resize_factor
+        self._max_plan_count = max_plan_count
+        self._plans = {}
+        self._supported = {}
+
+    @property
+    def resize_factor(self):
+        """Property: scale of the output image."""
+        return self._resize_factor
+
+    def get_plan(self, pixel_format, width, height) -> CConversionPlan:
+        """
+        Get the cached conversion plan or build a new one.
+
+        :param pixel_format: EStPixelFormatNamingConvention of the source.
+        :param width: width of the source image.
+        :param height: height of the source image.
+        :return: conversion plan.
+        """
+        key = (pixel_format, width, height)
+        plan = self._plans.get(key)
+        if plan is None:
+            if len(self._plans) >= self._max_plan_count:
+                # Drop the oldest plan.
+                del self._plans[next(iter(self._plans))]
+            plan = CConversionPlan(pixel_format, width, height,
+                                   self._resize_factor)
+            self._plans[key] = plan
+        return plan
+
+    def is_supported(self, pixel_format) -> bool:
+        """
+        Check if the pixel format can be converted.
+
+        :param pixel_format: EStPixelFormatNamingConvention.
+        :return: True for Mono and Bayer pixel formats.
+        """
+        is_supported = self._supported.get(pixel_format)
+        if is_supported is None:
+            pixel_format_info = st.get_pixel_format_info(pixel_format)
+            is_supported = pixel_format_info.is_mono or \
+                pixel_format_info.is_bayer
+            self._supported[pixel_format] = is_supported
+        return is_supported
+
+    def output_shape(self, st_image):
+        """
+        Get the shape of the converted image.
+
+        :param st_image: PyStImage to convert.
+        :return: shape tuple of the output numpy.ndarray.
+        """
+        return self.get_plan(st_image.pixel_format, st_image.width,
+                             st_image.height).output_shape
+
+    def convert(self, st_image, dst=None):
+        """
+        Convert PyStImage for display.
+
+        :param st_image: PyStImage (Mono or Bayer).
+        :param dst: numpy.ndarray of output_shape(st_image) to store the
+            result. If None, an internal buffer is returned.
+        :return: converted numpy.ndarray. If dst is None, the array is
+            overwritten by the next call with the same format and size.
+        """
+        plan = self.get_plan(st_image.pixel_format, st_image.width,
+                             st_image.height)
+        return plan.convert(as_ndarray(st_image, plan.pixel_format_info), dst)
+
+    def convert_ndarray(self, nparr, pixel_format, dst=None):
+        """
+        Convert raw data held in a NumPy array for display.
+
+        :param nparr: raw data as numpy.ndarray of shape (height, width).
+        :param pixel_format: EStPixelFormatNamingConvention of the data.
+        :param dst: numpy.ndarray to store the result, or None.
+        :return: converted numpy.ndarray.
+        """
+        plan = self.get_plan(pixel_format, nparr.shape[1], nparr.shape[0])
+        return plan.convert(nparr, dst)
@@ -0,0 +1,136 @@
+"""
+ This sample compares the per-frame display conversion used by the OpenCV
+ samples with CDisplayConverter on synthetic Bayer images.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Create synthetic Bayer8/Bayer12 PyStImage with create_from_data
+ - Convert with frombuffer/astype/cvtColor/resize for every frame
+ - Convert with the cached conversion plan of CDisplayConverter
+ - Check that both outputs are identical and display the timing
+ No camera is required.
+ Note: opencv-python and numpy packages are required:
+    pip install numpy
+    pip install opencv-python
+"""
+
+import time
+
+import cv2
+import numpy as np
+import stapipy as st
+
+from display_converter import CDisplayConverter
+
+# Size of the synthetic images (5M pixels).
+IMAGE_WIDTH = 2448
+IMAGE_HEIGHT = 2048
+
+# Number of conversions for each measurement.
+number_of_iterations = 100
+
+# Image scale when displaying using OpenCV.
+DISPLAY_RESIZE_FACTOR = 0.3
+
+# Pixel formats to measure.
+PIXEL_FORMATS = [st.EStPixelFormatNamingConvention.BayerRG8,
+                 st.EStPixelFormatNamingConvention.BayerRG12]
+
+
+def convert_per_frame(st_image):
+    """
+    Conversion used by the OpenCV samples before CDisplayConverter.
+
+    :param st_image: image to convert.
+    :return: converted numpy.ndarray.
+    """
+    pixel_format = st_image.pixel_format
+    pixel_format_info = st.get_pixel_format_info(pixel_format)
+    data = st_image.get_image_data()
+    if pixel_format_info.each_component_total_bit_count > 8:
+        nparr = np.frombuffer(data, np.uint16)
+        division = pow(2, pixel_format_info
+                       .each_component_valid_bit_count - 8)
+        nparr = (nparr / division).astype('uint8')
+    else:
+        nparr = np.frombuffer(data, np.uint8)
+    nparr = nparr.reshape(st_image.height, st_image.width, 1)
+    if pixel_format_info.is_bayer:
+        bayer_type = pixel_format_info.get_pixel_color_filter()
+        if bayer_type == st.EStPixelColorFilter.BayerRG:
+            nparr = cv2.cvtColor(nparr, cv2.COLOR_BAYER_RG2RGB)
+        elif bayer_type == st.EStPixelColorFilter.BayerGR:
+            nparr = cv2.cvtColor(nparr, cv2.COLOR_BAYER_GR2RGB)
+        elif bayer_type == st.EStPixelColorFilter.BayerGB:
+            nparr = cv2.cvtColor(nparr, cv2.COLOR_BAYER_GB2RGB)
+        elif bayer_type == st.EStPixelColorFilter.BayerBG:
+            nparr = cv2.cvtColor(nparr, cv2.COLOR_BAYER_BG2RGB)
+    nparr = cv2.resize(nparr, None,
+                       fx=DISPLAY_RESIZE_FACTOR,
+                       fy=DISPLAY_RESIZE_FACTOR)
+    return nparr
+
+
+def create_synthetic_image(pixel_format):
+    """
+    Create a PyStImage filled with random data.
+
+    :param pixel_format: pixel format of the image.
+    :return: PyStImage.
+    """
+    pixel_format_info = st.get_pixel_format_info(pixel_format)
+    random_generator = np.random.default_rng(0)
+    if pixel_format_info.each_component_total_bit_count > 8:
+        max_value = (1 << pixel_format_info.each_component_valid_bit_count)
+        nparr = random_generator.integers(0, max_value,
+                                          (IMAGE_HEIGHT, IMAGE_WIDTH),
+                                          dtype=np.uint16)
+    else:
+        nparr = random_generator.integers(0, 256, (IMAGE_HEIGHT, IMAGE_WIDTH),
+                                          dtype=np.uint8)
+    return st.PyStImage.create_from_data(IMAGE_WIDTH, IMAGE_HEIGHT,
+                                         pixel_format,
+                                         bytearray(nparr.tobytes()))
+
+
+def measure(function, st_image) -> float:
+    """
+    Measure the average time of function(st_image).
+
+    :param function: conversion function.
+    :param st_image: image to convert.
+    :return: average time per frame in milliseconds.
+    """
+    function(st_image)
+    start_time = time.perf_counter()
+    for _ in range(number_of_iterations):
+        function(st_image)
+    return (time.perf_counter() - start_time) * 1000.0 / number_of_iterations
+
+
+if __name__ == "__main__":
+    try:
+        # Initialize StApi before using.
+        st.initialize()
+
+        print("Size={0} x {1} Resize={2} Iterations={3}".format(
+              IMAGE_WIDTH, IMAGE_HEIGHT, DISPLAY_RESIZE_FACTOR,
+              number_of_iterations))
+
+        converter = CDisplayConverter(DISPLAY_RESIZE_FACTOR)
+        for pixel_format in PIXEL_FORMATS:
+            st_image = create_synthetic_image(pixel_format)
+
+            # Check that both conversions give the same result.
+            is_identical = np.array_equal(convert_per_frame(st_image),
+                                          converter.convert(st_image))
+
+            per_frame_ms = measure(convert_per_frame, st_image)
+            converter_ms = measure(converter.convert, st_image)
+            print("{0}: per-frame={1:.2f}[ms] converter={2:.2f}[ms] "
+                  "x{3:.2f} {4}".format(
+                      pixel_format.name, per_frame_ms, converter_ms,
+                      per_frame_ms / converter_ms,
+                      "identical" if is_identical else "DIFFERENT"))
+
+    except Exception as exception:
+        print(exception)
@@ -0,0 +1,210 @@
+"""
+ This module provides CFeatureApplier which writes a set of features
+ (e.g. a recipe) to a nodemap as one transaction.
+ The following points are covered by this module:
+ - Write the features in dependency order: a node is written before the
+   nodes it invalidates (selectors before the selected features, PixelFormat
+   before PayloadSize dependent nodes, ...)
+ - Check the values locally with the cached min/max/inc of CNodeRegistry
+   and postpone a write until it is in range (e.g. shrink Width before
+   moving OffsetX), so that no write fails on the device
+ - Skip the features which already have the value
+ - Write selected features for several selector values
+ - Restore the written features if the transaction fails
+ - Report the written and skipped features and the time spent
+"""
+
+import collections
+import time
+
+import stapipy as st
+
+from node_registry import CNodeRegistry
+
+# Interface types which can be written by CFeatureApplier.
+_WRITABLE_INTERFACE_TYPES = (st.EGCInterfaceType.IInteger,
+                             st.EGCInterfaceType.IFloat,
+                             st.EGCInterfaceType.IBoolean,
+                             st.EGCInterfaceType.IString,
+                             st.EGCInterfaceType.IEnumeration)
+
+
+class CFeatureApplier:
+    """
+    Class that applies configurations to the nodemap of a CNodeRegistry.
+
+    A configuration is a dict of feature name to value. Enumerations take
+    the symbolic value (or the integer value). To set a selected feature
+    for several selector values, give the selector a dict of selector value
+    to configuration:
+
+        {'ExposureTime': 5000.0,
+         'BalanceRatioSelector': {'Red': {'BalanceRatio': 1.2},
+                                  'Blue': {'BalanceRatio': 1.6}}}
+
+    The selector is restored to its previous value after the selected
+    features are written. Keep one applier for the device: the registry
+    keeps the values and the limits cached between two configurations.
+    """
+
+    def __init__(self, registry):
+        """
+        :param registry: CNodeRegistry, or PyNodeMap to create one.
+        """
+        if not isinstance(registry, CNodeRegistry):
+            registry = CNodeRegistry(registry)
+        self.registry = registry
+        self._depending_names = {}
+
+    def apply(self, config) -> dict:
+        """
+        Apply a configuration. If a value is invalid or a write fails, the
+        written features are restored and the exception is raised again.
+
+        :param config: dict of feature name to value.
+        :return: dict with the names of the 'written' and 'skipped'
+            features, the number of 'postponed' writes, the time of the
+            writes ('write_ms') and of the whole transaction ('total_ms').
+        """
+        start_time = time.perf_counter()
+        report = {'written': [], 'skipped': [], 'postponed': 0,
+                  'write_ms': 0.0}
+        history = []
+        try:
+            self._apply(config, report, history)
+        except Exception:
+            # Restore in the reverse order, which also restores the
+            # selectors before the features they select.
+            for handle, value in reversed(history):
+                try:
+                    handle.value = value
+                except Exception:
+                    pass
+            raise
+        report['total_ms'] = (time.perf_counter() - start_time) * 1000.0
+        return report
+
+    def _apply(self, config, report, history):
+        """Apply one level of the configuration."""
+        values = collections.OrderedDict()
+        groups = []
+        for name, value in config.items():
+            handle = self.registry[name]
+            if handle.interface_type not in _WRITABLE_INTERFACE_TYPES:
+                raise ValueError("{0} cannot be applied.".format(name))
+            if isinstance(value, dict):
+                groups.append((handle, value))
+            else:
+                values[name] = self.to_node_value(handle, value)
+
+        # Write in dependency order, postponing the values out of range.
+        pending = self._sort(list(values))
+        while pending:
+            postponed = []
+            for name in pending:
+                if not self._write(self.registry[name], values[name], report,
+                                   history):
+                    postponed.append(name)
+            if len(postponed) == len(pending):
+                raise ValueError("Out of range: {0}.".format(", ".join(
+                    "{0}={1} {2}".format(name, values[name],
+                                         self.registry[name].limits[:2])
+                    for name in postponed)))
+            report['postponed'] += len(postponed)
+            pending = postponed
+
+        # Write the selected features for each selector value.
+        for handle, selected_configs in groups:
+            previous_value = handle.value
+            for selector_value, selected_config in selected_configs.items():
+                self._write(handle, self.to_node_value(
+                    handle, selector_value), report, history)
+                self._apply(selected_config, report, history)
+            self._write(handle, previous_value, report, history)
+
+    def _write(self, handle, value, report, history) -> bool:
+        """
+        Write a value unless it is already set.
+
+        :return: False if the value is out of the current range.
+        """
+        current_value = handle.value
+        if current_value == value:
+            if handle.name not in report['skipped']:
+                report['skipped'].append(handle.name)
+            return True
+        if handle.interface_type in (st.EGCInterfaceType.IInteger,
+                                     st.EGCInterfaceType.IFloat):
+            min_value, max_value, inc = handle.limits
+            if not min_value <= value <= max_value:
+                return False
+            if inc and handle.interface_type == \
+                    st.EGCInterfaceType.IInteger and (value - min_value) % inc:
+                raise ValueError("{0}={1} does not match the increment "
+                                 "{2}.".format(handle.name, value, inc))
+        start_time = time.perf_counter()
+        history.append((handle, current_value))
+        handle.value = value
+        report['write_ms'] += (time.perf_counter() - start_time) * 1000.0
+        report['written'].append(handle.name)
+        return True
+
+    def _sort(self, names) -> list:
+        """
+        Sort names so that a node comes before the nodes it invalidates.
+        Nodes invalidating each other (e.g. Width and OffsetX) keep the
+        given order and are resolved with the current limits.
+        """
+        names_set = set(names)
+        depending = {}
+        for name in names:
+            if name not in self._depending_names:
+                self._depending_names[name] = set(
+                    node.name for node in self.registry[name].node
+                    .get_children(st.EGCLinkType.DependingNodes))
+            depending[name] = self._depending_names[name] & names_set
+
+        def is_blocked(name):
+            return any(other != name and name in depending[other] and
+                       other not in depending[name] for other in pending)
+
+        # A node is ready when no pending node invalidates it one way.
+        sorted_names = []
+        pending = list(names)
+        while pending:
+            ready = [name for name in pending if not is_blocked(name)]
+            if not ready:
+                ready = pending
+            sorted_names.extend(ready)
+            pending = [name for name in pending if name not in ready]
+        return sorted_names
+
+    @staticmethod
+    def to_node_value(handle, value):
+        """
+        Convert and check a value for a node.
+
+        :param handle: CNodeHandle of the node.
+        :param value: value, or str (e.g. from a feature bag).
+        :return: value to write (the integer value for enumerations).
+        """
+        interface_type = handle.interface_type
+        if interface_type == st.EGCInterfaceType.IEnumeration:
+            if isinstance(value, str):
+                if value not in handle.symbolic_to_int:
+                    raise ValueError("{0} has no entry {1}.".format(
+                        handle.name, value))
+                return handle.symbolic_to_int[value]
+            if value not in handle.int_to_symbolic:
+                raise ValueError("{0} has no entry {1}.".format(
+                    handle.name, value))
+            return value
+        if interface_type == st.EGCInterfaceType.IInteger:
+            return int(value)
+        if interface_type == st.EGCInterfaceType.IFloat:
+            return float(value)
+        if interface_type == st.EGCInterfaceType.IBoolean:
+            if isinstance(value, str):
+                return value.strip().lower() in ('1', 'true')
+            return bool(value)
+        return str(value)
@@ -0,0 +1,348 @@
+"""
+ This module provides feature snapshots parsed from the text of a feature
+ bag (PyStFeatureBag.save_to_string), to load only the features which
+ changed instead of the whole feature bag.
+ The following points are covered by this module:
+ - Parse the feature bag text into features keyed by name and selector
+   values (e.g. BalanceRatio for BalanceRatioSelector=Red)
+ - Diff two snapshots, or a snapshot against the live nodemap
+ - Load the changed features in dependency order with CFeatureApplier
+ - Keep the last loaded snapshot of each device serial number, in memory
+   and optionally in a directory
+"""
+
+import collections
+import os
+
+import stapipy as st
+
+from feature_apply import CFeatureApplier
+from node_registry import CNodeRegistry
+
+# Suffix of the selector names (SFNC naming convention).
+SELECTOR_SUFFIX = "Selector"
+
+# Selectors of SFNC whose name does not end with SELECTOR_SUFFIX.
+SELECTOR_NAMES = frozenset(['LUTIndex'])
+
+
+class CFeatureSnapshot:
+    """
+    Class that holds the features of a feature bag.
+
+    A feature bag lists "name<TAB>value" lines in load order; a selector
+    line changes the feature selected by the following lines. The key of
+    a feature is (name, selectors), selectors being the tuple of
+    (selector name, value) set before it. A selector is a feature whose
+    name ends with SELECTOR_SUFFIX or is in SELECTOR_NAMES (e.g.
+    LUTIndex, which selects LUTValue). The selectors are kept as
+    recorded: the nodemap does not tell reliably which features a selector
+    selects (pIndex/pSelected links), and one wrong guess would merge e.g.
+    BalanceRatio of Red and Blue. Selectors only select features: they
+    are not features of the snapshot and keep their value when it is
+    loaded.
+    """
+
+    def __init__(self, features=None, header=()):
+        """
+        :param features: OrderedDict of (name, selectors) to value (str).
+        :param header: comment lines of the feature bag.
+        """
+        self.features = features if features is not None else \
+            collections.OrderedDict()
+        self.header = list(header)
+
+    def __len__(self):
+        return len(self.features)
+
+    def __iter__(self):
+        return iter(self.features.items())
+
+    def __eq__(self, other):
+        return isinstance(other, CFeatureSnapshot) and \
+            self.features == other.features
+
+    @staticmethod
+    def from_string(text):
+        """
+        Parse the text of a feature bag.
+
+        :param text: text of PyStFeatureBag.save_to_string() or of a file
+            saved with save_to_file().
+        :return: CFeatureSnapshot.
+        """
+        features = collections.OrderedDict()
+        header = []
+        selectors = collections.OrderedDict()
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            if line.startswith('#'):
+                header.append(line)
+                continue
+            name, _, value = line.partition('\t')
+            if not _:
+                name, _, value = line.strip().partition(' ')
+            name = name.strip()
+            value = value.strip()
+            if is_selector(name):
+                # Keep the selectors in the order they were first set.
+                selectors[name] = value
+            else:
+                features[(name, tuple(selectors.items()))] = value
+        return CFeatureSnapshot(features, header)
+
+    @staticmethod
+    def from_nodemap(nodemap):
+        """
+        Store the streamable features of a nodemap (slow: every feature
+        is read).
+
+        :param nodemap: PyNodeMap.
+        :return: CFeatureSnapshot.
+        """
+        featurebag = st.create_featurebag()
+        featurebag.store_nodemap_to_bag(nodemap)
+        return CFeatureSnapshot.from_string(featurebag.save_to_string())
+
+    @staticmethod
+    def from_file(filename):
+        """
+        Read a feature bag file.
+
+        :param filename: file saved with PyStFeatureBag.save_to_file() or
+            save_to_file().
+        :return: CFeatureSnapshot.
+        """
+        with open(filename, 'r') as file:
+            return CFeatureSnapshot.from_string(file.read())
+
+    def to_string(self) -> str:
+        """
+        Get the feature bag text of the snapshot, which can be loaded with
+        PyStFeatureBag.store_string_to_bag().
+
+        :return: text.
+        """
+        lines = list(self.header)
+        current = {}
+        for (name, selectors), value in self.features.items():
+            for selector_name, selector_value in selectors:
+                if current.get(selector_name) != selector_value:
+                    lines.append("{0}\t{1}".format(selector_name,
+                                                   selector_value))
+                    current[selector_name] = selector_value
+            lines.append("{0}\t{1}".format(name, value))
+        return "\n".join(lines) + "\n"
+
+    def save_to_file(self, filename):
+        """
+        Save the snapshot as feature bag file.
+
+        :param filename: file name.
+        """
+        with open(filename, 'w') as file:
+            file.write(self.to_string())
+
+    def diff(self, other):
+        """
+        Get the features of this snapshot which differ from other.
+
+        :param other: CFeatureSnapshot, or None to get all the features.
+        :return: CFeatureSnapshot of the changed or added features.
+        """
+        features = collections.OrderedDict(
+            (key, value) for key, value in self.features.items()
+            if other is None or other.features.get(key) != value)
+        return CFeatureSnapshot(features, self.header)
+
+    def diff_live(self, registry):
+        """
+        Get the features of this snapshot which differ from the nodemap.
+        Selectors are written to read the selected features, then
+        restored.
+
+        :param registry: CNodeRegistry of the nodemap.
+        :return: CFeatureSnapshot of the changed features.
+        """
+        features = collections.OrderedDict()
+        for selectors, items in _group_by_selectors(self):
+            previous_values = []
+            for selector_name, selector_value in selectors:
+                previous_values.append((selector_name,
+                                        registry.get_value(selector_name)))
+                registry.set_value(selector_name, selector_value)
+            try:
+                for key, value in items:
+                    handle = registry[key[0]]
+                    if handle.value != \
+                            CFeatureApplier.to_node_value(handle, value):
+                        features[key] = value
+            finally:
+                for selector_name, value in reversed(previous_values):
+                    registry.set_value(selector_name, value)
+        return CFeatureSnapshot(features, self.header)
+
+    def to_config(self) -> dict:
+        """
+        Get the configuration of CFeatureApplier which loads the snapshot.
+        Each feature is nested under the selector values recorded for it.
+
+        :return: dict of feature name to value, with a dict of selector
+            value to configuration for the selectors.
+        """
+        config = collections.OrderedDict()
+        for selectors, items in _group_by_selectors(self):
+            target = config
+            for selector_name, selector_value in selectors:
+                group = target.setdefault(selector_name,
+                                          collections.OrderedDict())
+                target = group.setdefault(selector_value,
+                                          collections.OrderedDict())
+            for (name, _), value in items:
+                target[name] = value
+        return config
+
+
+class CSnapshotLoader:
+    """
+    Class that loads snapshots incrementally and keeps the last loaded
+    snapshot of each device serial number.
+
+    The cache assumes that the features are only changed by the loader.
+    Use verify=True after the camera was changed by other means (e.g.
+    power cycle, UserSetLoad).
+    """
+
+    def __init__(self, cache_directory=None):
+        """
+        :param cache_directory: directory to keep the last loaded snapshot
+            of each serial number across restarts, or None.
+        """
+        self.cache_directory = cache_directory
+        self._snapshots = {}
+        self._registries = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_registry(self, st_device) -> CNodeRegistry:
+        """
+        Get the node registry of the remote nodemap of a device.
+
+        :param st_device: PyStDevice.
+        :return: CNodeRegistry.
+        """
+        serial_number = st_device.info.serial_number
+        nodemap = st_device.remote_port.nodemap
+        registry = self._registries.get(serial_number)
+        if registry is None or registry.nodemap is not nodemap:
+            # The device was opened again.
+            if registry is not None:
+                registry.close()
+            registry = self._registries[serial_number] = \
+                CNodeRegistry(nodemap)
+        return registry
+
+    def get_snapshot(self, serial_number):
+        """
+        Get the last loaded snapshot of a device.
+
+        :param serial_number: serial number of the device.
+        :return: CFeatureSnapshot or None.
+        """
+        snapshot = self._snapshots.get(serial_number)
+        if snapshot is None and self.cache_directory:
+            filename = self._get_filename(serial_number)
+            if os.path.isfile(filename):
+                snapshot = CFeatureSnapshot.from_file(filename)
+                self._snapshots[serial_number] = snapshot
+        return snapshot
+
+    def forget(self, serial_number):
+        """
+        Forget the last loaded snapshot of a device: the next load
+        compares with the live nodemap.
+
+        :param serial_number: serial number of the device.
+        """
+        self._snapshots.pop(serial_number, None)
+        if self.cache_directory:
+            filename = self._get_filename(serial_number)
+            if os.path.isfile(filename):
+                os.remove(filename)
+
+    def load(self, st_device, snapshot, verify=False) -> dict:
+        """
+        Load the features of snapshot which differ from the last loaded
+        snapshot (or from the live nodemap if there is none or if verify
+        is True).
+
+        :param st_device: PyStDevice.
+        :param snapshot: CFeatureSnapshot to load.
+        :param verify: True to compare with the live nodemap.
+        :return: report of CFeatureApplier.apply() with 'changed', the
+            number of changed features.
+        """
+        serial_number = st_device.info.serial_number
+        registry = self.get_registry(st_device)
+        previous = None if verify else self.get_snapshot(serial_number)
+        if previous is None:
+            changes = snapshot.diff_live(registry)
+        else:
+            changes = snapshot.diff(previous)
+        # Forget the cache first: a failed load leaves the camera unknown.
+        self.forget(serial_number)
+        report = CFeatureApplier(registry).apply(changes.to_config())
+        report['changed'] = len(changes)
+        self._snapshots[serial_number] = snapshot
+        if self.cache_directory:
+            snapshot.save_to_file(self._get_filename(serial_number))
+        return report
+
+    def release_registry(self, serial_number):
+        """
+        Release the node registry of a device. Call it before the device
+        is released.
+
+        :param serial_number: serial number of the device.
+        """
+        registry = self._registries.pop(serial_number, None)
+        if registry is not None:
+            registry.close()
+
+    def close(self):
+        """Release the node registries."""
+        for registry in self._registries.values():
+            registry.close()
+        self._registries.clear()
+
+    def _get_filename(self, serial_number):
+        return os.path.join(self.cache_directory,
+                            "{0}.cfg".format(serial_number))
+
+
+def is_selector(name) -> bool:
+    """
+    Check if a feature of a feature bag is a selector.
+
+    :param name: name of the feature.
+    :return: True if the name ends with SELECTOR_SUFFIX or is in
+        SELECTOR_NAMES.
+    """
+    return name.endswith(SELECTOR_SUFFIX) or name in SELECTOR_NAMES
+
+
+def _group_by_selectors(snapshot):
+    """
+    Group the features by the selector values recorded for them.
+
+    :return: list of (selectors, [(key, value), ...]) in snapshot order.
+    """
+    groups = collections.OrderedDict()
+    for key, value in snapshot:
+        groups.setdefault(key[1], []).append((key, value))
+    return list(groups.items())
@@ -0,0 +1,158 @@
+"""
+ This sample checks CFeatureSnapshot on a feature bag text with a selected
+ feature, and loads it into a simulated color camera of stapipy_sim.
+ The following points will be demonstrated in this sample code:
+ - Parse a feature bag text where BalanceRatio is recorded for two values
+   of BalanceRatioSelector, and check that both are kept
+ - Check that to_string() gives the same text and parses to the same
+   snapshot
+ - Check the diff and the CFeatureApplier configuration of a recipe
+ - Load the recipes with CSnapshotLoader and read back the values of each
+   selector value
+ - Same with a LUT (LUTIndex selects LUTValue without the Selector
+   suffix): each entry is kept, and changing one entry loads only it
+ No camera is required (stapipy_sim does not simulate feature bags, so
+ the text is given here).
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import sys
+
+import stapipy_sim as st
+
+# The snapshot modules import stapipy: use the simulator.
+sys.modules['stapipy'] = st
+
+from feature_snapshot import CFeatureSnapshot, CSnapshotLoader
+
+# Feature bag text, with the settings of the camera.
+FEATURE_BAG = ("# Feature bag of a simulated camera\n"
+               "Width\t320\n"
+               "BalanceRatioSelector\tRed\n"
+               "BalanceRatio\t1.5\n"
+               "BalanceRatioSelector\tBlue\n"
+               "BalanceRatio\t2.5\n")
+
+# Keys of the selected features.
+RED = ('BalanceRatio', (('BalanceRatioSelector', 'Red'),))
+BLUE = ('BalanceRatio', (('BalanceRatioSelector', 'Blue'),))
+
+# Feature bag text with three entries of the LUT.
+LUT_VALUES = {0: 10, 1: 20, 2: 30}
+LUT_BAG = "LUTEnable\t1\n" + "".join(
+    "LUTIndex\t{0}\nLUTValue\t{1}\n".format(index, value)
+    for index, value in LUT_VALUES.items())
+
+
+def check(condition, message):
+    """Raise RuntimeError with message if condition is False."""
+    if not condition:
+        raise RuntimeError(message)
+
+
+def lut_key(index):
+    """Key of LUTValue of a LUT entry."""
+    return ('LUTValue', (('LUTIndex', str(index)),))
+
+
+def read_lut_values(nodemap):
+    """Read LUTValue of the entries of LUT_VALUES."""
+    values = {}
+    for index in LUT_VALUES:
+        nodemap.get_node('LUTIndex').value = index
+        values[index] = nodemap.get_node('LUTValue').value
+    return values
+
+
+def read_balance_ratios(nodemap):
+    """Read BalanceRatio of Red and Blue."""
+    selector = st.PyIEnumeration(nodemap.get_node('BalanceRatioSelector'))
+    ratios = {}
+    for selector_value in ('Red', 'Blue'):
+        selector.set_symbolic_value(selector_value)
+        ratios[selector_value] = nodemap.get_node('BalanceRatio').value
+    return ratios
+
+
+if __name__ == "__main__":
+    try:
+        # Parse the feature bag.
+        recipe_a = CFeatureSnapshot.from_string(FEATURE_BAG)
+        check(len(recipe_a) == 3, "Features: {0}".format(len(recipe_a)))
+        check(recipe_a.features[RED] == '1.5' and
+              recipe_a.features[BLUE] == '2.5',
+              "BalanceRatio: {0}".format(list(recipe_a)))
+
+        # The text of the snapshot parses to the same snapshot.
+        check(recipe_a.to_string() == FEATURE_BAG,
+              "to_string:\n{0}".format(recipe_a.to_string()))
+        check(CFeatureSnapshot.from_string(recipe_a.to_string()) ==
+              recipe_a, "Round-trip changed the snapshot.")
+
+        # Change BalanceRatio of Blue only.
+        recipe_b = CFeatureSnapshot(recipe_a.features.copy(),
+                                    recipe_a.header)
+        recipe_b.features[BLUE] = '2.0'
+        changes = recipe_b.diff(recipe_a)
+        check(list(changes) == [(BLUE, '2.0')],
+              "Diff: {0}".format(list(changes)))
+        check(changes.to_config() ==
+              {'BalanceRatioSelector': {'Blue': {'BalanceRatio': '2.0'}}},
+              "Configuration: {0}".format(changes.to_config()))
+        config = recipe_a.to_config()
+        check(config['Width'] == '320' and
+              list(config['BalanceRatioSelector']) == ['Red', 'Blue'],
+              "Configuration: {0}".format(config))
+        print("Parse, to_string and diff: OK")
+
+        # Each entry of the LUT is kept.
+        lut_a = CFeatureSnapshot.from_string(LUT_BAG)
+        check(len(lut_a) == 1 + len(LUT_VALUES) and
+              all(lut_a.features[lut_key(index)] == str(value)
+                  for index, value in LUT_VALUES.items()),
+              "LUT: {0}".format(list(lut_a)))
+        check(lut_a.to_string() == LUT_BAG,
+              "LUT to_string:\n{0}".format(lut_a.to_string()))
+        lut_b = CFeatureSnapshot(lut_a.features.copy())
+        lut_b.features[lut_key(1)] = '25'
+        check(list(lut_b.diff(lut_a)) == [(lut_key(1), '25')],
+              "LUT diff: {0}".format(list(lut_b.diff(lut_a))))
+        print("LUT parse and diff: OK")
+
+        # Load the recipes into a simulated color camera.
+        st.reset_cameras(1, pixel_format='BayerRG8')
+        st.initialize()
+        st_system = st.create_system()
+        st_device = st_system.create_first_device()
+        nodemap = st_device.remote_port.nodemap
+        with CSnapshotLoader() as loader:
+            report = loader.load(st_device, recipe_a)
+            ratios = read_balance_ratios(nodemap)
+            check(report['changed'] == 3 and
+                  ratios == {'Red': 1.5, 'Blue': 2.5},
+                  "Recipe A: {0} {1}".format(report['changed'], ratios))
+            report = loader.load(st_device, recipe_b)
+            ratios = read_balance_ratios(nodemap)
+            check(report['changed'] == 1 and
+                  ratios == {'Red': 1.5, 'Blue': 2.0},
+                  "Recipe B: {0} {1}".format(report['changed'], ratios))
+            check(nodemap.get_node('Width').value == 320, "Width")
+
+            # Load the LUT, then change one entry.
+            report = loader.load(st_device, lut_a)
+            values = read_lut_values(nodemap)
+            check(report['changed'] == 1 + len(LUT_VALUES) and
+                  values == LUT_VALUES,
+                  "LUT A: {0} {1}".format(report['changed'], values))
+            report = loader.load(st_device, lut_b)
+            values = read_lut_values(nodemap)
+            check(report['changed'] == 1 and
+                  values == {0: 10, 1: 25, 2: 30},
+                  "LUT B: {0} {1}".format(report['changed'], values))
+            loader.release_registry(st_device.info.serial_number)
+        st_device.release()
+        print("Load: OK")
+
+    except Exception as exception:
+        print(exception)
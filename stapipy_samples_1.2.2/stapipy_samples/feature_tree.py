@@ -0,0 +1,325 @@
+"""
+ This module provides an index of the feature tree of a nodemap, built
+ once and kept on disk for each camera model and XML file.
+ The following points are covered by this module:
+ - Walk the tree from "Root" once (without recursion), on first access
+ - Keep the interface type, access mode, category path and enumeration
+   entries of each implemented node
+ - Look up a feature by name in O(1), and search by prefix (sorted names
+   and bisect) or by substring
+ - Save the index to a JSON file keyed by the model and the SHA1 hash (or
+   the file version) of the XML file (PyStPortURLInfo), so that
+   reconnecting to the same model skips the walk
+"""
+
+import bisect
+import json
+import os
+import re
+
+import stapipy as st
+
+# Version of the index file format.
+INDEX_FILE_VERSION = 1
+
+
+class CFeatureInfo:
+    """
+    Metadata of one node, as it was when the index was built.
+
+    access_mode is the access mode at that time: it can change with the
+    state of the camera (e.g. TLParamsLocked), read the node for the
+    current one.
+    """
+
+    __slots__ = ('name', 'interface_type', 'access_mode', 'category_path',
+                 'display_name', 'visibility', 'entries', 'children')
+
+    def __init__(self, name, interface_type, access_mode, category_path,
+                 display_name='', visibility=None, entries=(),
+                 children=()):
+        """
+        :param name: name of the node.
+        :param interface_type: EGCInterfaceType.
+        :param access_mode: EGCAccessMode.
+        :param category_path: tuple of the names of the parent categories.
+        :param display_name: display name of the node.
+        :param visibility: EGCVisibility.
+        :param entries: tuple of (symbolic value, integer value) of the
+            implemented entries of an enumeration.
+        :param children: tuple of the names of the features of a category.
+        """
+        self.name = name
+        self.interface_type = interface_type
+        self.access_mode = access_mode
+        self.category_path = tuple(category_path)
+        self.display_name = display_name
+        self.visibility = visibility
+        self.entries = tuple(tuple(entry) for entry in entries)
+        self.children = tuple(children)
+
+    @property
+    def path(self) -> str:
+        """Property: category path and name (e.g. Root/AnalogControl/Gain)."""
+        return '/'.join(self.category_path + (self.name,))
+
+    def to_dict(self) -> dict:
+        """Get the metadata as JSON compatible dict."""
+        return {'name': self.name,
+                'interface_type': self.interface_type.name,
+                'access_mode': self.access_mode.name,
+                'category_path': list(self.category_path),
+                'display_name': self.display_name,
+                'visibility': self.visibility.name if self.visibility
+                else None,
+                'entries': [list(entry) for entry in self.entries],
+                'children': list(self.children)}
+
+    @staticmethod
+    def from_dict(data):
+        """Create the metadata from to_dict()."""
+        visibility = data['visibility']
+        return CFeatureInfo(
+            data['name'], st.EGCInterfaceType[data['interface_type']],
+            st.EGCAccessMode[data['access_mode']], data['category_path'],
+            data['display_name'],
+            st.EGCVisibility[visibility] if visibility else None,
+            data['entries'], data['children'])
+
+
+class CFeatureTree:
+    """
+    Class that indexes the feature tree of a nodemap.
+
+    The tree is walked (or read from the cache directory) on first access.
+    """
+
+    def __init__(self, nodemap, cache_directory=None, cache_key=None,
+                 root_name="Root"):
+        """
+        :param nodemap: PyNodeMap to index.
+        :param cache_directory: directory of the index files, or None.
+        :param cache_key: name of the index file, e.g. get_cache_key(port).
+            The index is not saved without a key.
+        :param root_name: name of the root category.
+        """
+        self.nodemap = nodemap
+        self.cache_directory = cache_directory
+        self.cache_key = cache_key
+        self.root_name = root_name
+        self.is_loaded_from_cache = False
+        self._infos = None
+        self._sorted_names = None
+        self._lower_names = None
+
+    @staticmethod
+    def get_cache_key(st_port) -> str:
+        """
+        Get the cache key of the XML file of a port: the model and the SHA1
+        hash of the file, or its file version if there is no hash.
+
+        :param st_port: PyStPort (e.g. st_device.remote_port).
+        :return: key usable as file name.
+        """
+        url_info = st_port.url_info
+        sha1_hash = bytes(url_info.sha1_hash or b'')
+        if sha1_hash.strip(b'\0'):
+            version = sha1_hash.hex()
+        else:
+            version = 'v{0}.{1}.{2}'.format(url_info.file_ver_major,
+                                            url_info.file_ver_minor,
+                                            url_info.file_ver_subminor)
+        key = '{0}_{1}'.format(st_port.info.model, version)
+        return re.sub(r'[^A-Za-z0-9._-]', '_', key)
+
+    @staticmethod
+    def from_device(st_device, cache_directory=None):
+        """
+        Create the index of the remote nodemap of a device.
+
+        :param st_device: PyStDevice.
+        :param cache_directory: directory of the index files, or None.
+        :return: CFeatureTree.
+        """
+        st_port = st_device.remote_port
+        return CFeatureTree(st_port.nodemap, cache_directory,
+                            CFeatureTree.get_cache_key(st_port))
+
+    def __len__(self):
+        return len(self._get_infos())
+
+    def __contains__(self, name):
+        return name in self._get_infos()
+
+    def __iter__(self):
+        """Iterate CFeatureInfo in tree order."""
+        return iter(self._get_infos().values())
+
+    def __getitem__(self, name) -> CFeatureInfo:
+        info = self._get_infos().get(name)
+        if info is None:
+            raise ValueError("Node {0} is not found.".format(name))
+        return info
+
+    def get(self, name):
+        """
+        Get the metadata of a node.
+
+        :param name: node name.
+        :return: CFeatureInfo, or None if not found.
+        """
+        return self._get_infos().get(name)
+
+    def get_node(self, name):
+        """
+        Get the live node (e.g. for its current value).
+
+        :param name: node name.
+        :return: PyNode or None.
+        """
+        return self.nodemap.get_node(name)
+
+    def find_prefix(self, prefix) -> list:
+        """
+        Get the nodes whose name starts with prefix.
+
+        :param prefix: case-sensitive prefix.
+        :return: list of CFeatureInfo sorted by name.
+        """
+        infos = self._get_infos()
+        names = self._sorted_names
+        index = bisect.bisect_left(names, prefix)
+        result = []
+        while index < len(names) and names[index].startswith(prefix):
+            result.append(infos[names[index]])
+            index += 1
+        return result
+
+    def search(self, text, interface_type=None) -> list:
+        """
+        Get the nodes whose name or display name contains text.
+
+        :param text: case-insensitive text.
+        :param interface_type: EGCInterfaceType to keep, or None for all.
+        :return: list of CFeatureInfo in tree order.
+        """
+        infos = self._get_infos()
+        text = text.lower()
+        return [infos[name] for name, lower_name in self._lower_names
+                if text in lower_name and (
+                    interface_type is None or
+                    infos[name].interface_type == interface_type)]
+
+    def walk(self, name=None):
+        """
+        Iterate the nodes of a category and its sub categories.
+
+        :param name: name of the category (default: the root).
+        :return: iterator of (depth, CFeatureInfo) in tree order.
+        """
+        infos = self._get_infos()
+        stack = [(0, name or self.root_name)]
+        while stack:
+            depth, name = stack.pop()
+            info = infos.get(name)
+            if info is None:
+                continue
+            yield depth, info
+            stack.extend((depth + 1, child)
+                         for child in reversed(info.children))
+
+    def build(self):
+        """Walk the nodemap again and save the index."""
+        self._set_infos(self._walk())
+        self.is_loaded_from_cache = False
+        self._save()
+
+    def _get_infos(self):
+        """Get the index, loading or building it on first access."""
+        if self._infos is None:
+            infos = self._load()
+            if infos is not None:
+                self._set_infos(infos)
+                self.is_loaded_from_cache = True
+            else:
+                self.build()
+        return self._infos
+
+    def _set_infos(self, infos):
+        self._infos = infos
+        self._sorted_names = sorted(infos)
+        self._lower_names = [
+            (name, (name + '\n' + info.display_name).lower())
+            for name, info in infos.items()]
+
+    def _walk(self) -> dict:
+        """Walk the tree from the root category without recursion."""
+        infos = {}
+        stack = [(self.nodemap.get_node(self.root_name), ())]
+        while stack:
+            node, category_path = stack.pop()
+            if node is None or not node.is_implemented or \
+                    node.name in infos:
+                continue
+            interface_type = node.principal_interface_type
+            entries = ()
+            children = ()
+            if interface_type == st.EGCInterfaceType.ICategory:
+                features = st.PyICategory(node).feature_list
+                children = [feature.name for feature in features]
+                child_path = category_path + (node.name,)
+                stack.extend((feature, child_path)
+                             for feature in reversed(features))
+            elif interface_type == st.EGCInterfaceType.IEnumeration:
+                entries = [(st.PyIEnumEntry(entry).symbolic_value,
+                            entry.value)
+                           for entry in st.PyIEnumeration(node).entries
+                           if entry.is_implemented]
+            infos[node.name] = CFeatureInfo(
+                node.name, interface_type, node.access_mode, category_path,
+                node.display_name, node.visibility, entries, children)
+        # Keep the children which are implemented.
+        for info in infos.values():
+            if info.children:
+                info.children = tuple(name for name in info.children
+                                      if name in infos)
+        return infos
+
+    def _get_filename(self):
+        if not self.cache_directory or not self.cache_key:
+            return None
+        return os.path.join(self.cache_directory,
+                            '{0}.json'.format(self.cache_key))
+
+    def _load(self):
+        """Read the index file, or return None."""
+        filename = self._get_filename()
+        if filename is None or not os.path.isfile(filename):
+            return None
+        try:
+            with open(filename, 'r') as file:
+                data = json.load(file)
+            if data.get('version') != INDEX_FILE_VERSION or \
+                    data.get('root') != self.root_name:
+                return None
+            infos = {}
+            for item in data['nodes']:
+                info = CFeatureInfo.from_dict(item)
+                infos[info.name] = info
+            return infos
+        except (ValueError, KeyError, TypeError):
+            # Broken or incompatible file: walk the tree again.
+            return None
+
+    def _save(self):
+        """Write the index file through a temporary file."""
+        filename = self._get_filename()
+        if filename is None:
+            return
+        os.makedirs(self.cache_directory, exist_ok=True)
+        data = {'version': INDEX_FILE_VERSION, 'root': self.root_name,
+                'nodes': [info.to_dict() for info in self._infos.values()]}
+        temporary_filename = filename + '.tmp'
+        with open(temporary_filename, 'w') as file:
+            json.dump(data, file)
+        os.replace(temporary_filename, filename)
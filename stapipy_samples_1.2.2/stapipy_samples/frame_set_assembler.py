@@ -0,0 +1,451 @@
+"""
+ This module provides a frame-set assembler which groups the frames of
+ several cameras that belong together.
+ The following points are covered by this module:
+ - Match the frames by frame_id or by timestamp_ns within a tolerance
+ - Emit complete sets in order, and partial sets as soon as a missing
+   frame can no longer arrive or after a timeout
+ - Bounded memory: the number of pending sets is limited
+ - Per-camera skew statistics
+ - Retrieve the buffers of a PyStDataStreamList in a thread and hand the
+   sets to a consumer thread
+ Timestamp matching needs synchronized camera clocks (e.g. PTP) or a
+ common hardware/action trigger.
+"""
+
+import enum
+import threading
+import time
+
+import stapipy as st
+
+from acquisition_pipeline import CFrameQueue, EBackPressure, clone_image
+from latency_stats import CLatencyStats
+
+
+class EMatchKey(enum.Enum):
+    """Enumeration: value used to group the frames."""
+    FrameId = 0
+    Timestamp = 1
+
+
+class CSetFrame:
+    """
+    Frame of one camera in a frame set.
+    """
+    __slots__ = ('camera_index', 'frame_id', 'timestamp_ns', 'image',
+                 'retrieved_time')
+
+    def __init__(self, camera_index, frame_id, timestamp_ns, image,
+                 retrieved_time):
+        self.camera_index = camera_index
+        self.frame_id = frame_id
+        self.timestamp_ns = timestamp_ns
+        self.image = image
+        self.retrieved_time = retrieved_time
+
+
+class CFrameSet:
+    """
+    Frames of all cameras that belong together.
+    frames[camera_index] is CSetFrame, or None if the frame is missing.
+    """
+
+    def __init__(self, key, camera_count, created_time):
+        self.key = key
+        self.frames = [None] * camera_count
+        self.frame_count = 0
+        self.created_time = created_time
+        self.is_timed_out = False
+
+    @property
+    def is_complete(self) -> bool:
+        """Property: True if the frames of all cameras are present."""
+        return self.frame_count == len(self.frames)
+
+    @property
+    def missing_cameras(self) -> list:
+        """Property: list of the camera indexes without frame."""
+        return [index for index, frame in enumerate(self.frames)
+                if frame is None]
+
+    @property
+    def skew_ns(self) -> int:
+        """Property: difference of the earliest and latest timestamp_ns."""
+        timestamps = [frame.timestamp_ns for frame in self.frames
+                      if frame is not None]
+        return max(timestamps) - min(timestamps) if timestamps else 0
+
+
+class CFrameSetAssembler:
+    """
+    Class to group the frames of several cameras into CFrameSet.
+
+    Each camera delivers its frames in order, so a pending set which misses
+    the frame of a camera that already delivered a later frame can never
+    be completed: it is emitted as a partial set right away. Sets are
+    emitted in the order of their key. add() and poll() are thread-safe.
+    """
+
+    def __init__(self, camera_count, match_key=EMatchKey.FrameId,
+                 tolerance_ns=1000000, set_timeout=0.1, max_pending_sets=16):
+        """
+        :param camera_count: number of cameras.
+        :param match_key: EMatchKey used to group the frames.
+        :param tolerance_ns: maximum difference of timestamp_ns within a
+            set (EMatchKey.Timestamp only).
+        :param set_timeout: seconds after which a pending set is emitted
+            even if it is partial.
+        :param max_pending_sets: maximum number of pending sets. When
+            exceeded, the oldest set is emitted even if it is partial.
+        """
+        if camera_count < 1:
+            raise ValueError("camera_count must be 1 or more.")
+        if max_pending_sets < 1:
+            raise ValueError("max_pending_sets must be 1 or more.")
+        self._camera_count = camera_count
+        self._match_key = match_key
+        self._tolerance = tolerance_ns if match_key == EMatchKey.Timestamp \
+            else 0
+        self._set_timeout = set_timeout
+        self._max_pending_sets = max_pending_sets
+        self._lock = threading.Lock()
+        # Pending sets ordered by key.
+        self._pending = []
+        self._last_keys = [None] * camera_count
+        self._emitted_key = None
+        self._complete_count = 0
+        self._partial_count = 0
+        self._timed_out_count = 0
+        self._overflow_count = 0
+        self._late_count = 0
+        self._duplicate_count = 0
+
+        # Offset of each camera from the earliest frame of the set.
+        self.skew_stats = [CLatencyStats() for _ in range(camera_count)]
+
+    @property
+    def camera_count(self) -> int:
+        """Property: number of cameras."""
+        return self._camera_count
+
+    @property
+    def pending_count(self) -> int:
+        """Property: number of sets waiting for frames."""
+        return len(self._pending)
+
+    @property
+    def complete_count(self) -> int:
+        """Property: number of complete sets emitted."""
+        return self._complete_count
+
+    @property
+    def partial_count(self) -> int:
+        """Property: number of partial sets emitted."""
+        return self._partial_count
+
+    @property
+    def timed_out_count(self) -> int:
+        """Property: number of partial sets emitted by the timeout."""
+        return self._timed_out_count
+
+    @property
+    def overflow_count(self) -> int:
+        """Property: number of sets emitted because too many were pending."""
+        return self._overflow_count
+
+    @property
+    def late_count(self) -> int:
+        """Property: number of frames arriving after their set was emitted."""
+        return self._late_count
+
+    @property
+    def duplicate_count(self) -> int:
+        """Property: number of frames whose camera was already in the set."""
+        return self._duplicate_count
+
+    def add(self, camera_index, frame_id, timestamp_ns, image,
+            retrieved_time=None) -> list:
+        """
+        Add the frame of a camera.
+
+        :param camera_index: index of the camera (0 to camera_count - 1).
+        :param frame_id: frame ID of the buffer.
+        :param timestamp_ns: timestamp of the buffer in nanoseconds.
+        :param image: image data kept in the set (e.g. PyStImage clone).
+        :param retrieved_time: time.perf_counter() of the retrieval.
+        :return: list of CFrameSet ready to be emitted (may be empty).
+        """
+        now = time.perf_counter()
+        frame = CSetFrame(camera_index, frame_id, timestamp_ns, image,
+                          now if retrieved_time is None else retrieved_time)
+        key = frame_id if self._match_key == EMatchKey.FrameId \
+            else timestamp_ns
+        with self._lock:
+            self._last_keys[camera_index] = key
+            if self._emitted_key is not None and \
+                    key <= self._emitted_key + self._tolerance:
+                self._late_count += 1
+            else:
+                self._insert_locked(frame, key, now)
+            return self._collect_locked(now)
+
+    def poll(self) -> list:
+        """
+        Emit the sets whose timeout has expired.
+
+        :return: list of CFrameSet ready to be emitted (may be empty).
+        """
+        with self._lock:
+            return self._collect_locked(time.perf_counter())
+
+    def flush(self) -> list:
+        """
+        Emit all pending sets (e.g. at the end of the acquisition).
+
+        :return: list of CFrameSet.
+        """
+        with self._lock:
+            frame_sets = self._pending
+            self._pending = []
+            for frame_set in frame_sets:
+                self._emit_locked(frame_set)
+            return frame_sets
+
+    def statistics(self) -> dict:
+        """
+        Get the counters and the skew of each camera.
+
+        :return: dict of counters and skew summaries in milliseconds.
+        """
+        return {'complete': self.complete_count,
+                'partial': self.partial_count,
+                'timed_out': self.timed_out_count,
+                'overflow': self.overflow_count,
+                'late': self.late_count,
+                'duplicate': self.duplicate_count,
+                'pending': self.pending_count,
+                'skew': [stats.summary() for stats in self.skew_stats]}
+
+    def _insert_locked(self, frame, key, now):
+        """Put the frame into the matching set or a new set."""
+        index = len(self._pending)
+        while index > 0 and self._pending[index - 1].key > key + \
+                self._tolerance:
+            index -= 1
+        # Sets within the tolerance are at index - 1, index - 2, ...
+        candidate = index - 1
+        while candidate >= 0 and \
+                self._pending[candidate].key >= key - self._tolerance:
+            frame_set = self._pending[candidate]
+            if frame_set.frames[frame.camera_index] is None:
+                frame_set.frames[frame.camera_index] = frame
+                frame_set.frame_count += 1
+                return
+            if self._match_key == EMatchKey.FrameId:
+                self._duplicate_count += 1
+                return
+            candidate -= 1
+        frame_set = CFrameSet(key, self._camera_count, now)
+        frame_set.frames[frame.camera_index] = frame
+        frame_set.frame_count = 1
+        self._pending.insert(index, frame_set)
+
+    def _is_dead_locked(self, frame_set):
+        """True if no missing frame of frame_set can arrive any more."""
+        for camera_index in frame_set.missing_cameras:
+            last_key = self._last_keys[camera_index]
+            if last_key is None or \
+                    last_key <= frame_set.key + self._tolerance:
+                return False
+        return True
+
+    def _collect_locked(self, now):
+        """Take the sets ready to be emitted, oldest first."""
+        frame_sets = []
+        while self._pending:
+            frame_set = self._pending[0]
+            if len(self._pending) > self._max_pending_sets:
+                self._overflow_count += 1
+            elif now - frame_set.created_time >= self._set_timeout:
+                if not frame_set.is_complete:
+                    frame_set.is_timed_out = True
+                    self._timed_out_count += 1
+            elif not (frame_set.is_complete or
+                      self._is_dead_locked(frame_set)):
+                break
+            del self._pending[0]
+            self._emit_locked(frame_set)
+            frame_sets.append(frame_set)
+        return frame_sets
+
+    def _emit_locked(self, frame_set):
+        """Update the counters and the skew statistics."""
+        if self._emitted_key is None or frame_set.key > self._emitted_key:
+            self._emitted_key = frame_set.key
+        if frame_set.is_complete:
+            self._complete_count += 1
+        else:
+            self._partial_count += 1
+        timestamps = [frame.timestamp_ns for frame in frame_set.frames
+                      if frame is not None]
+        earliest = min(timestamps)
+        for frame in frame_set.frames:
+            if frame is not None:
+                self.skew_stats[frame.camera_index].add(
+                    (frame.timestamp_ns - earliest) / 1000000000.0)
+
+
+class CFrameSetGrabber:
+    """
+    Class that retrieves the buffers of all cameras of a PyStDataStreamList
+    in a producer thread, assembles the frame sets and passes them to
+    set_func in a consumer thread.
+    """
+
+    def __init__(self, stream_list, device_ids, set_func,
+                 match_key=EMatchKey.FrameId, tolerance_ns=1000000,
+                 set_timeout=0.1, max_pending_sets=16, queue_size=8,
+                 back_pressure=EBackPressure.DropOldest,
+                 copy_func=clone_image, timeout=100):
+        """
+        :param stream_list: PyStDataStreamList (acquisition must be
+            started).
+        :param device_ids: device IDs (PyStDeviceInfo.device_id) of the
+            cameras, in the order of the camera indexes.
+        :param set_func: function called with CFrameSet in the consumer
+            thread.
+        :param match_key: EMatchKey used to group the frames.
+        :param tolerance_ns: maximum difference of timestamp_ns within a
+            set (EMatchKey.Timestamp only).
+        :param set_timeout: seconds after which a pending set is emitted
+            even if it is partial.
+        :param max_pending_sets: maximum number of pending sets.
+        :param queue_size: maximum number of sets waiting for set_func.
+        :param back_pressure: EBackPressure when the queue is full.
+        :param copy_func: function(st_buffer) returning the data to keep
+            after the buffer is requeued (default: PyStImage.clone()).
+        :param timeout: timeout of retrieve_buffer in milliseconds. Pending
+            sets are checked for their timeout at least this often.
+        """
+        self._stream_list = stream_list
+        self._camera_indexes = {device_id: index
+                                for index, device_id in enumerate(device_ids)}
+        self._set_func = set_func
+        self._copy_func = copy_func
+        self._timeout = timeout
+        self.assembler = CFrameSetAssembler(len(device_ids), match_key,
+                                            tolerance_ns, set_timeout,
+                                            max_pending_sets)
+        self._queue = CFrameQueue(queue_size, back_pressure)
+        self._stop_event = threading.Event()
+        self._producer = threading.Thread(target=self._produce)
+        self._consumer = threading.Thread(target=self._consume)
+        self._error = None
+        self._delivered_count = 0
+        self._set_error_count = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        self.join()
+
+    @property
+    def delivered_count(self) -> int:
+        """Property: number of images retrieved from the datastreams."""
+        return self._delivered_count
+
+    @property
+    def dropped_count(self) -> int:
+        """Property: number of sets dropped by the back-pressure policy."""
+        return self._queue.dropped_count
+
+    @property
+    def set_error_count(self) -> int:
+        """Property: number of exceptions raised by set_func."""
+        return self._set_error_count
+
+    @property
+    def is_running(self) -> bool:
+        """Property: True while the producer thread is running."""
+        return self._producer.is_alive()
+
+    def start(self):
+        """Start the producer and consumer threads."""
+        self._consumer.start()
+        self._producer.start()
+
+    def stop(self):
+        """Request the producer to stop after the current retrieve_buffer."""
+        self._stop_event.set()
+
+    def join(self):
+        """
+        Wait until no datastream is grabbing (or stop() is called) and all
+        sets are passed to set_func. The pending sets are flushed.
+        An exception raised while retrieving buffers is raised again here.
+        """
+        self._producer.join()
+        self._consumer.join()
+        if self._error is not None:
+            raise self._error
+
+    def statistics(self) -> dict:
+        """
+        Get the counters of the grabber and the assembler.
+
+        :return: dict of counters and skew summaries in milliseconds.
+        """
+        statistics = self.assembler.statistics()
+        statistics.update({'delivered': self.delivered_count,
+                           'dropped': self.dropped_count,
+                           'set_errors': self.set_error_count})
+        return statistics
+
+    def _produce(self):
+        """Producer thread: retrieve, copy, requeue and assemble."""
+        try:
+            while not self._stop_event.is_set() and \
+                    self._stream_list.is_grabbing_any:
+                st_buffer = self._stream_list.retrieve_buffer(
+                    self._timeout, st.EStTimeoutHandling.Return)
+                if st_buffer is None:
+                    # Emit the sets whose timeout has expired.
+                    frame_sets = self.assembler.poll()
+                else:
+                    with st_buffer:
+                        frame_sets = self._add_buffer(st_buffer)
+                for frame_set in frame_sets:
+                    self._queue.put(frame_set)
+            for frame_set in self.assembler.flush():
+                self._queue.put(frame_set)
+        except Exception as exception:
+            self._error = exception
+        finally:
+            self._queue.close()
+
+    def _add_buffer(self, st_buffer):
+        """Copy the frame out of the stream buffer and assemble it."""
+        retrieved_time = time.perf_counter()
+        if not st_buffer.info.is_image_present:
+            return self.assembler.poll()
+        camera_index = self._camera_indexes[
+            st_buffer.datastream.device.info.device_id]
+        self._delivered_count += 1
+        return self.assembler.add(camera_index, st_buffer.info.frame_id,
+                                  st_buffer.info.timestamp_ns,
+                                  self._copy_func(st_buffer), retrieved_time)
+
+    def _consume(self):
+        """Consumer thread: pass the sets to set_func."""
+        while True:
+            frame_set = self._queue.get()
+            if frame_set is None:
+                return
+            try:
+                self._set_func(frame_set)
+            except Exception:
+                self._set_error_count += 1
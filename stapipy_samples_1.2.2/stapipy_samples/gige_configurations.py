@@ -8,10 +8,11 @@
  - Update heartbeat timeout of GigE camera
 """
 
-import time
 import ipaddress
 import stapipy as st
 
+from device_directory import CDeviceDirectory
+
 # Number of images to grab
 number_of_images_to_grab = 100
 
@@ -116,25 +117,20 @@ def update_heartbeat_timeout(nodemap):
         return
 
 
-def create_ist_device_by_ip(pinterface, ip_address) -> st.PyStDevice:
+def create_ist_device_by_ip(device_directory, ip_address,
+                            timeout=30.0) -> st.PyStDevice:
     """
     Function to connect to device based on the given ip address.
 
-    :param pinterface PyStDevice: interface of the device.
+    :param device_directory: CDeviceDirectory of the interface.
     :param ip_address: IP address of the device in integer.
-    :return: connected device (PyStDevice).
+    :param timeout: time to wait for the device in seconds.
+    :return: connected device (PyStDevice) or None if not found.
     """
-    pinterface.update_device_list()
-    iface_nodemap = pinterface.port.nodemap
-    device_selector = iface_nodemap.get_node("DeviceSelector").get()
-    max_index = device_selector.max
-    device_ip = iface_nodemap.get_node("GevDeviceIPAddress")
-    for index in range(max_index+1):
-        device_selector.value = index
-        if device_ip.is_available:
-            if device_ip.value == ip_address:
-                return pinterface.create_device_by_index(index)
-    return None
+    entry = device_directory.wait_for_ip_address(ip_address, timeout)
+    if entry is None:
+        return None
+    return entry.create_device()
 
 
 if __name__ == "__main__":
@@ -157,14 +153,11 @@ if __name__ == "__main__":
         device_force_ip = st_interface.port.nodemap\
             .get_node(GEV_DEVICE_FORCE_IP_ADDRESS)
 
-        # Create a camera device object and connect.
-        st_device = None
-        for loop in range(30):
-            time.sleep(1)
-            st_device = create_ist_device_by_ip(st_interface,
+        # Create a camera device object and connect when the device is
+        # found with the new IP address.
+        with CDeviceDirectory([st_interface]) as device_directory:
+            st_device = create_ist_device_by_ip(device_directory,
                                                 device_force_ip.value)
-            if st_device:
-                break
         if st_device is None:
             raise Exception("A device ip IP address {0} could not be found"\
                             .format(device_force_ip.get().to_string()))
@@ -0,0 +1,59 @@
+"""
+ This sample shows how to acquire image data in an asyncio application.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Connect to camera
+ - Acquire image data with 'async for' on CAsyncFrameStream
+ - Stop the acquisition when leaving the 'async with' block
+"""
+
+import asyncio
+
+import stapipy as st
+
+from async_frames import CAsyncFrameStream
+
+# Number of images to grab
+number_of_images_to_grab = 100
+
+
+async def grab(st_device, st_datastream):
+    """
+    Display the information of the acquired images.
+
+    :param st_device: PyStDevice.
+    :param st_datastream: PyStDataStream of the device.
+    """
+    async with CAsyncFrameStream(
+            st_datastream, st_device,
+            num_to_acquire=number_of_images_to_grab) as stream:
+        async for frame in stream.frames():
+            st_image = frame.image
+            print("BlockID={0} Size={1} x {2} First Byte={3}".format(
+                  frame.frame_id, st_image.width, st_image.height,
+                  st_image.get_image_data()[0]))
+    print("Delivered={0} Dropped={1}".format(stream.delivered_count,
+                                              stream.dropped_count))
+
+
+try:
+    # Initialize StApi before using.
+    st.initialize()
+
+    # Create a system object for device scan and connection.
+    st_system = st.create_system()
+
+    # Connect to first detected device.
+    st_device = st_system.create_first_device()
+
+    # Display DisplayName of the device.
+    print('Device=', st_device.info.display_name)
+
+    # Create a datastream object for handling image stream data.
+    st_datastream = st_device.create_datastream()
+
+    # Run the event loop until all images are acquired.
+    asyncio.run(grab(st_device, st_datastream))
+
+except Exception as exception:
+    print(exception)
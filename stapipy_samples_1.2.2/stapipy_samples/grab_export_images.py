@@ -0,0 +1,121 @@
+"""
+ This sample shows how to save the images judged as NG without stopping
+ the acquisition, with CImageExporter.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Connect to camera
+ - Judge each image with a simple brightness check
+ - Save the NG images as PNG (compression level 9) and every 100th image
+   as JPEG in background worker threads
+ - Display the time spent in the acquisition loop, the queue depth and the
+   encode latency of each format
+ Note: opencv-python and numpy packages are required:
+    pip install numpy
+    pip install opencv-python
+"""
+
+import os
+import tempfile
+import time
+
+import stapipy as st
+
+from acquisition_pipeline import EBackPressure
+from image_export import CImageExporter
+from image_ndarray import as_ndarray, as_uint8_ndarray
+from latency_stats import CLatencyStats
+
+# Number of images to grab
+number_of_images_to_grab = 1000
+
+# Range of the mean of the 8bit pixel values of an OK image.
+MIN_MEAN = 64
+MAX_MEAN = 192
+
+# Interval of the images saved as JPEG for reference.
+JPEG_INTERVAL = 100
+
+# Folder of the saved images.
+EXPORT_FOLDER = tempfile.gettempdir()
+
+try:
+    # Initialize StApi before using.
+    st.initialize()
+
+    # Create a system object for device scan and connection.
+    st_system = st.create_system()
+
+    # Connect to first detected device.
+    st_device = st_system.create_first_device()
+
+    # Display DisplayName of the device.
+    print('Device=', st_device.info.display_name)
+
+    # Create a datastream object for handling image stream data.
+    st_datastream = st_device.create_datastream()
+
+    # Time spent in the acquisition loop for each image.
+    loop_stats = CLatencyStats()
+
+    # Create the exporter. Jobs are dropped rather than blocking the
+    # acquisition loop when the workers cannot keep up.
+    exporter = CImageExporter(back_pressure=EBackPressure.DropNewest,
+                              png_compression_level=9)
+
+    # Start the image acquisition of the host (local machine) side.
+    st_datastream.start_acquisition(number_of_images_to_grab)
+
+    # Start the image acquisition of the camera side.
+    st_device.acquisition_start()
+
+    ng_count = 0
+    with exporter:
+        # A while loop for acquiring data and checking status
+        while st_datastream.is_grabbing:
+            with st_datastream.retrieve_buffer() as st_buffer:
+                start_time = time.perf_counter()
+                if not st_buffer.info.is_image_present:
+                    continue
+                st_image = st_buffer.get_image()
+                frame_id = st_buffer.info.frame_id
+
+                # Judge the image.
+                nparr = as_uint8_ndarray(st_image)
+                mean = nparr.mean()
+                if st_buffer.info.is_incomplete or \
+                        not MIN_MEAN <= mean <= MAX_MEAN:
+                    # Save the raw image data of the NG image.
+                    ng_count += 1
+                    exporter.submit(
+                        os.path.join(EXPORT_FOLDER,
+                                     "NG_{0:08d}.png".format(frame_id)),
+                        as_ndarray(st_image))
+
+                # Save an 8bit image for reference.
+                if frame_id % JPEG_INTERVAL == 0:
+                    exporter.submit(
+                        os.path.join(EXPORT_FOLDER,
+                                     "{0:08d}.jpg".format(frame_id)), nparr)
+                loop_stats.add(time.perf_counter() - start_time)
+
+    # Stop the image acquisition of the camera side
+    st_device.acquisition_stop()
+
+    # Stop the image acquisition of the host side
+    st_datastream.stop_acquisition()
+
+    # Display the statistics.
+    print("NG={0} Loop: {1}".format(ng_count, loop_stats))
+    for file_format, statistics in exporter.statistics().items():
+        if statistics['exported'] or statistics['dropped'] or \
+                statistics['errors']:
+            print("{0}: Exported={1} Dropped={2} Errors={3} "
+                  "Encode={4:.3f}[ms] (p99 {5:.3f}[ms]) Total={6:.3f}[ms]"
+                  .format(file_format, statistics['exported'],
+                          statistics['dropped'], statistics['errors'],
+                          statistics['encode']['mean_ms'],
+                          statistics['encode']['p99_ms'],
+                          statistics['total']['mean_ms']))
+
+except Exception as exception:
+    print(exception)
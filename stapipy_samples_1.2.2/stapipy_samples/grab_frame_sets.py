@@ -0,0 +1,111 @@
+"""
+ This sample shows how to get the images of all cameras as synchronized
+ frame sets with CFrameSetGrabber.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Connect to all available cameras
+ - Acquire image from the list of camera in a producer thread
+ - Group the frames of all cameras by frame ID (or timestamp)
+ - Display complete and partial sets and the skew of each camera
+ Use the same trigger for all cameras (e.g. gige_action_command.py) so that
+ the frames with the same frame ID were exposed together.
+"""
+
+import time
+
+import stapipy as st
+
+from frame_set_assembler import CFrameSetGrabber, EMatchKey
+
+# Number of images to grab per camera
+number_of_images_to_grab = 100
+
+# Value used to group the frames, and maximum timestamp difference in a set
+# for EMatchKey.Timestamp.
+MATCH_KEY = EMatchKey.FrameId
+TOLERANCE_NS = 1000000
+
+# Seconds to wait for the missing frames of a set.
+SET_TIMEOUT = 0.5
+
+
+def on_frame_set(frame_set):
+    """
+    Function called in the consumer thread for each frame set.
+
+    :param frame_set: CFrameSet.
+    """
+    if frame_set.is_complete:
+        print("Set {0}: complete, skew={1:.3f}[ms]".format(
+              frame_set.key, frame_set.skew_ns / 1000000.0))
+    else:
+        print("Set {0}: partial, missing cameras={1}{2}".format(
+              frame_set.key, frame_set.missing_cameras,
+              " (timed out)" if frame_set.is_timed_out else ""))
+
+
+try:
+    # Initialize StApi before using.
+    st.initialize()
+
+    # Create a system object for device scan and connection.
+    st_system = st.create_system()
+
+    # Create a camera device list object to store all the cameras.
+    device_list = st.PyStDeviceList()
+
+    # Create a DataStream list object to store all the data stream object
+    # related to the cameras.
+    stream_list = st.PyStDataStreamList()
+
+    # Device ID of each camera index.
+    device_ids = []
+
+    while True:
+        try:
+            st_device = st_system.create_first_device()
+        except:
+            if not device_list:
+                raise
+            break
+        # Add the camera into device object list for later usage.
+        device_list.register(st_device)
+        device_ids.append(st_device.info.device_id)
+
+        # Display the DisplayName of the device.
+        print("Camera {0} = {1}".format(len(device_list) - 1,
+                                        st_device.info.display_name))
+
+        # Create a DataStream object then add into DataStream list for later
+        # usage.
+        stream_list.register(st_device.create_datastream(0))
+
+    # Start the image acquisition of the host side.
+    stream_list.start_acquisition(number_of_images_to_grab)
+
+    # Start the image acquisition of the camera side.
+    device_list.acquisition_start()
+
+    # Assemble the frame sets until no datastream is grabbing.
+    with CFrameSetGrabber(stream_list, device_ids, on_frame_set,
+                          match_key=MATCH_KEY, tolerance_ns=TOLERANCE_NS,
+                          set_timeout=SET_TIMEOUT) as grabber:
+        while grabber.is_running:
+            time.sleep(0.1)
+
+    # Stop the image acquisition of the camera side.
+    device_list.acquisition_stop()
+
+    # Stop the image acquisition of the host side.
+    stream_list.stop_acquisition()
+
+    # Display the statistics.
+    assembler = grabber.assembler
+    print("Complete={0} Partial={1} TimedOut={2} Late={3}".format(
+          assembler.complete_count, assembler.partial_count,
+          assembler.timed_out_count, assembler.late_count))
+    for index, skew_stats in enumerate(assembler.skew_stats):
+        print("Camera {0} skew : {1}".format(index, skew_stats))
+
+except Exception as exception:
+    print(exception)
@@ -0,0 +1,87 @@
+"""
+ This sample shows how to decouple buffer retrieval from image processing
+ with CAcquisitionPipeline.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Connect to camera
+ - Acquire image data in a producer thread and requeue the buffer
+   immediately after cloning the image
+ - Process the images in a pool of worker threads
+ - Display the per-stage latency and the stream counters
+"""
+
+import time
+
+import stapipy as st
+
+from acquisition_pipeline import CAcquisitionPipeline, EBackPressure
+
+# Number of images to grab
+number_of_images_to_grab = 100
+
+# Number of worker threads and maximum number of waiting frames.
+WORKER_COUNT = 2
+QUEUE_SIZE = 8
+
+
+def process_frame(frame):
+    """
+    Function called in a worker thread for each frame.
+
+    :param frame: CFrame holding a clone of the acquired image.
+    """
+    st_image = frame.image
+    # Display the information of the acquired image data.
+    print("BlockID={0} Size={1} x {2} First Byte={3}".format(
+          frame.frame_id, st_image.width, st_image.height,
+          st_image.get_image_data()[0]))
+
+
+try:
+    # Initialize StApi before using.
+    st.initialize()
+
+    # Create a system object for device scan and connection.
+    st_system = st.create_system()
+
+    # Connect to first detected device.
+    st_device = st_system.create_first_device()
+
+    # Display DisplayName of the device.
+    print('Device=', st_device.info.display_name)
+
+    # Create a datastream object for handling image stream data.
+    st_datastream = st_device.create_datastream()
+
+    # Start the image acquisition of the host (local machine) side.
+    st_datastream.start_acquisition(number_of_images_to_grab)
+
+    # Start the image acquisition of the camera side.
+    st_device.acquisition_start()
+
+    # Run the pipeline until the datastream stops grabbing.
+    with CAcquisitionPipeline(st_datastream, process_frame,
+                              worker_count=WORKER_COUNT,
+                              queue_size=QUEUE_SIZE,
+                              back_pressure=EBackPressure.DropOldest) \
+            as pipeline:
+        while pipeline.is_running:
+            time.sleep(0.1)
+
+    # Stop the image acquisition of the camera side
+    st_device.acquisition_stop()
+
+    # Stop the image acquisition of the host side
+    st_datastream.stop_acquisition()
+
+    # Display the statistics.
+    print("Processed={0} Dropped={1} Underrun={2}".format(
+          pipeline.processed_count, pipeline.dropped_count,
+          st_datastream.info.num_underrun))
+    print("Buffer hold :", pipeline.hold_stats)
+    print("Queue wait  :", pipeline.queue_stats)
+    print("Process     :", pipeline.process_stats)
+    print("Total       :", pipeline.total_stats)
+
+except Exception as exception:
+    print(exception)
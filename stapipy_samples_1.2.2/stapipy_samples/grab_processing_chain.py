@@ -0,0 +1,117 @@
+"""
+ This sample shows how to process the received images with a chain of StApi
+ converters, filters and OpenCV functions run by CProcessingChain.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Connect to camera
+ - Describe the chain: edge enhancement, reverse Y and conversion to BGR8
+   (fused into one converter), then resize with OpenCV into a reused array
+ - Process the frames in parallel and display them in order
+ - Display the time of each stage
+ Note: opencv-python and numpy packages are required:
+    pip install numpy
+    pip install opencv-python
+"""
+
+import cv2
+import stapipy as st
+
+from processing_chain import CConverterStage, CFilterStage, CNdarrayStage, \
+    CProcessingChain
+
+# Number of images to grab
+number_of_images_to_grab = 100
+
+# Image scale when displaying using OpenCV.
+DISPLAY_RESIZE_FACTOR = 0.3
+
+# Number of worker threads.
+WORKER_COUNT = 2
+
+
+def resize(nparr, out):
+    """
+    Resize the image for display, reusing the previous output array.
+
+    :param nparr: BGR8 image.
+    :param out: array returned for the previous frame, or None.
+    :return: resized image.
+    """
+    size = (int(nparr.shape[1] * DISPLAY_RESIZE_FACTOR),
+            int(nparr.shape[0] * DISPLAY_RESIZE_FACTOR))
+    if out is None or out.shape[1::-1] != size:
+        return cv2.resize(nparr, size)
+    return cv2.resize(nparr, size, dst=out)
+
+
+def display(frame_id, nparr):
+    """
+    Display a processed image. Called in order of frame ID.
+
+    :param frame_id: BlockID of the image.
+    :param nparr: resized BGR8 image.
+    """
+    print("BlockID={0} Size={1} x {2}".format(frame_id, nparr.shape[1],
+                                             nparr.shape[0]))
+    cv2.imshow('image', nparr)
+    cv2.waitKey(1)
+
+
+try:
+    # Initialize StApi before using.
+    st.initialize()
+
+    # Create a system object for device scan and connection.
+    st_system = st.create_system()
+
+    # Connect to first detected device.
+    st_device = st_system.create_first_device()
+
+    # Display DisplayName of the device.
+    print('Device=', st_device.info.display_name)
+
+    # Describe the processing chain.
+    stages = [
+        CFilterStage(st.EStFilterType.EdgeEnhancement, strength=5),
+        CConverterStage(st.EStConverterType.Reverse, reverse_y=True),
+        CConverterStage(st.EStConverterType.PixelFormat,
+                        destination_pixel_format=st
+                        .EStPixelFormatNamingConvention.BGR8),
+        CNdarrayStage(resize),
+    ]
+
+    # Create a datastream object for handling image stream data.
+    st_datastream = st_device.create_datastream()
+
+    # Start the image acquisition of the host (local machine) side.
+    st_datastream.start_acquisition(number_of_images_to_grab)
+
+    # Start the image acquisition of the camera side.
+    st_device.acquisition_start()
+
+    with CProcessingChain(stages, display, WORKER_COUNT) as chain:
+        print("Stages:", chain.stage_names)
+
+        # A while loop for acquiring data and checking status
+        while st_datastream.is_grabbing:
+            with st_datastream.retrieve_buffer() as st_buffer:
+                # Copy the image into the chain. The buffer is requeued at
+                # the end of this block.
+                if st_buffer.info.is_image_present:
+                    chain.submit(st_buffer.info.frame_id,
+                                 st_buffer.get_image())
+
+    # Stop the image acquisition of the camera side
+    st_device.acquisition_stop()
+
+    # Stop the image acquisition of the host side
+    st_datastream.stop_acquisition()
+
+    # Display the time of each stage.
+    for name, summary in chain.statistics().items():
+        if name != 'delivered':
+            print("{0}: mean={1:.3f}[ms] p99={2:.3f}[ms]".format(
+                  name, summary['mean_ms'], summary['p99_ms']))
+
+except Exception as exception:
+    print(exception)
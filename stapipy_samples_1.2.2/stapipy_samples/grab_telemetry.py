@@ -0,0 +1,121 @@
+"""
+ This sample shows how to monitor the health of all datastreams with
+ CTelemetryCollector while acquiring images.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Connect to all available cameras
+ - Sample the datastream counters in a background thread
+ - Count the incomplete frames
+ - Display the rates and export them in Prometheus text format or statsd
+"""
+
+import stapipy as st
+
+from stream_telemetry import CPrometheusFileExporter, CStatsdExporter, \
+    CTelemetryCollector
+
+# Number of images to grab per camera
+number_of_images_to_grab = 1000
+
+# Sampling interval in seconds.
+TELEMETRY_INTERVAL = 1.0
+
+# Path of the .prom file for the Prometheus node exporter, or None.
+PROMETHEUS_FILE = None
+
+# Host of the statsd server (e.g. '127.0.0.1'), or None.
+STATSD_HOST = None
+STATSD_PORT = 8125
+
+
+class CConsoleExporter:
+    """
+    Exporter displaying the rates of each datastream.
+    """
+
+    def export(self, collector):
+        """Display the latest rates of the collector."""
+        for telemetry in collector.streams:
+            rates = telemetry.rates()
+            print("{0}: {1:.1f}[fps] {2:.1f}[Mbps] Queued={3} "
+                  "Underrun={4:.1f}/s Incomplete={5:.1f}/s".format(
+                      telemetry.name, rates['fps'], rates['bps'] / 1000000.0,
+                      rates['queue_depth'], rates['underrun_per_s'],
+                      rates['incomplete_per_s']))
+
+
+try:
+    # Initialize StApi before using.
+    st.initialize()
+
+    # Create a system object for device scan and connection.
+    st_system = st.create_system()
+
+    # Create a camera device list object to store all the cameras.
+    device_list = st.PyStDeviceList()
+
+    # Create a DataStream list object to store all the data stream object
+    # related to the cameras.
+    stream_list = st.PyStDataStreamList()
+
+    # Create the telemetry collector and its exporters.
+    collector = CTelemetryCollector(TELEMETRY_INTERVAL)
+    collector.add_exporter(CConsoleExporter())
+    if PROMETHEUS_FILE:
+        collector.add_exporter(CPrometheusFileExporter(PROMETHEUS_FILE))
+    if STATSD_HOST:
+        collector.add_exporter(CStatsdExporter(STATSD_HOST, STATSD_PORT))
+
+    while True:
+        try:
+            st_device = st_system.create_first_device()
+        except:
+            if not device_list:
+                raise
+            break
+        # Add the camera into device object list for later usage.
+        device_list.register(st_device)
+
+        # Display the DisplayName of the device.
+        print("Device {0} = {1}".format(len(device_list),
+                                        st_device.info.display_name))
+
+        # Create a DataStream object then add into DataStream list for later
+        # usage, and register it to the collector.
+        st_datastream = st_device.create_datastream(0)
+        stream_list.register(st_datastream)
+        collector.register(st_device.info.display_name, st_datastream)
+
+    # Start the image acquisition of the host side.
+    stream_list.start_acquisition(number_of_images_to_grab)
+
+    # Start the image acquisition of the camera side.
+    device_list.acquisition_start()
+
+    # Start sampling the counters.
+    collector.start()
+
+    # Loop for aquiring data and checking status
+    while stream_list.is_grabbing_any:
+        # Retrieve data buffer of image data from any camera with a timeout
+        # of 5000ms.
+        with stream_list.retrieve_buffer(5000) as st_buffer:
+            # Record incomplete frames.
+            collector.get(st_buffer.datastream.device.info.display_name)\
+                .record_buffer_info(st_buffer.info)
+
+    # Stop sampling the counters.
+    collector.stop()
+
+    # Stop the image acquisition of the camera side.
+    device_list.acquisition_stop()
+
+    # Stop the image acquisition of the host side.
+    stream_list.stop_acquisition()
+
+    # Display the final counters in Prometheus text format.
+    collector.sample_once()
+    print(collector.to_prometheus())
+
+except Exception as exception:
+    print(exception)
@@ -6,8 +6,9 @@
  - Connect to camera
  - Acquire image
  - Process image ROI in host side (local computer)
- - Copy image data for OpenCV
- - Convert Bayer image format to RGB using OpenCV
+ - Convert Bayer image format to RGB once using OpenCV and get the ROI
+   images as views with CRoiTiler
+ - Resize the ROI images in a thread pool
  - Preview image using OpenCV
  Note: opencv-python and numpy packages are required:
     pip install numpy
@@ -15,9 +16,11 @@
 """
 
 import cv2
-import numpy as np
 import stapipy as st
 
+from display_converter import CDisplayConverter
+from roi_tiling import CRoiTiler, CTileLayout
+
 # Number of images to grab
 number_of_images_to_grab = 1000
 
@@ -29,46 +32,15 @@ HORIZONTAL_ROI_COUNT = 4
 VERTICAL_ROI_COUNT = 2
 
 
-def display_with_opencv(window_title, img, pixel_format_info):
+def resize_tile(tile):
     """
-    Function to convert PyIStImage pixel format and display it using OpenCV.
+    Function called in the thread pool to resize a ROI image for display.
 
-    :param img: Image to process
-    :param pixel_format_info: Pixel format info.
+    :param tile: CTile of the converted image.
+    :return: resized numpy.ndarray.
     """
-    # Get raw image data.
-    data = img.get_image_data()
-
-    # Perform pixel value scaling if each pixel component is
-    # larger than 8bit. Example: 10bit Bayer/Mono, 12bit, etc.
-    if pixel_format_info.each_component_total_bit_count > 8:
-        nparr = np.frombuffer(data, np.uint16)
-        division = pow(2, pixel_format_info
-                       .each_component_valid_bit_count - 8)
-        nparr = (nparr / division).astype('uint8')
-    else:
-        nparr = np.frombuffer(data, np.uint8)
-
-    # Process image for display.
-    nparr = nparr.reshape(img.height, img.width, 1)
-
-    # Perform color conversion for Bayer.
-    if pixel_format_info.is_bayer:
-        bayer_type = pixel_format_info.get_pixel_color_filter()
-        if bayer_type == st.EStPixelColorFilter.BayerRG:
-            nparr = cv2.cvtColor(nparr, cv2.COLOR_BAYER_RG2RGB)
-        elif bayer_type == st.EStPixelColorFilter.BayerGR:
-            nparr = cv2.cvtColor(nparr, cv2.COLOR_BAYER_GR2RGB)
-        elif bayer_type == st.EStPixelColorFilter.BayerGB:
-            nparr = cv2.cvtColor(nparr, cv2.COLOR_BAYER_GB2RGB)
-        elif bayer_type == st.EStPixelColorFilter.BayerBG:
-            nparr = cv2.cvtColor(nparr, cv2.COLOR_BAYER_BG2RGB)
-
-    # Resize image and display.
-    nparr = cv2.resize(nparr, None,
-                       fx=DISPLAY_RESIZE_FACTOR,
-                       fy=DISPLAY_RESIZE_FACTOR)
-    cv2.imshow(window_title, nparr)
+    return cv2.resize(tile.image, None, fx=DISPLAY_RESIZE_FACTOR,
+                      fy=DISPLAY_RESIZE_FACTOR)
 
 
 if __name__ == "__main__":
@@ -103,25 +75,27 @@ if __name__ == "__main__":
         pixel_increment = [pixel_format_info.pixel_increment_x,
                            pixel_format_info.pixel_increment_y]
 
-        # Calculate the size of the ROI.
-        roi_window_count = [HORIZONTAL_ROI_COUNT, VERTICAL_ROI_COUNT]
-        roi_image_size = []
-        for index in range(2):
-            size = image_size[index] // roi_window_count[index]
-            size = size - (size % pixel_increment[index])
-            roi_image_size.append(size)
+        # Calculate the ROI of each window aligned to the pixel increment.
+        layout = CTileLayout.grid(image_size[0], image_size[1],
+                                  HORIZONTAL_ROI_COUNT, VERTICAL_ROI_COUNT,
+                                  pixel_increment_x=pixel_increment[0],
+                                  pixel_increment_y=pixel_increment[1])
+
+        # Create a tiler which demosaics the whole image once. The
+        # conversion plan is built once and reused.
+        tiler = CRoiTiler(layout, converter=CDisplayConverter())
 
         # Prepare display window
-        for pos_y in range(roi_window_count[1]):
-            for pos_x in range(roi_window_count[0]):
-                window_title = "image_{0}{1}".format(pos_y, pos_x)
-                cv2.namedWindow(window_title, cv2.WINDOW_NORMAL)
-                cv2.moveWindow(window_title,
-                    int(pos_x * roi_image_size[0] * DISPLAY_RESIZE_FACTOR),
-                    int(pos_y * roi_image_size[1] * DISPLAY_RESIZE_FACTOR))
-                cv2.resizeWindow(window_title,
-                    int(roi_image_size[0] * DISPLAY_RESIZE_FACTOR),
-                    int(roi_image_size[1] * DISPLAY_RESIZE_FACTOR))
+        for index, (pos_x, pos_y, width, height) in enumerate(layout):
+            window_title = "image_{0}{1}".format(
+                index // HORIZONTAL_ROI_COUNT, index % HORIZONTAL_ROI_COUNT)
+            cv2.namedWindow(window_title, cv2.WINDOW_NORMAL)
+            cv2.moveWindow(window_title,
+                int(pos_x * DISPLAY_RESIZE_FACTOR),
+                int(pos_y * DISPLAY_RESIZE_FACTOR))
+            cv2.resizeWindow(window_title,
+                int(width * DISPLAY_RESIZE_FACTOR),
+                int(height * DISPLAY_RESIZE_FACTOR))
 
         # Start the image acquisition of the host (local machine) side.
         st_datastream.start_acquisition(number_of_images_to_grab)
@@ -154,20 +128,22 @@ if __name__ == "__main__":
                 if not(pixel_format_info.is_mono or pixel_format_info.is_bayer):
                     continue
 
+                # Convert the whole image once and get the ROI images as
+                # views of it.
+                nparr = tiler.convert(st_image)
+                tiles = layout.tiles(nparr)
+
                 # Display image.
-                display_with_opencv("image", st_image, pixel_format_info)
-
-                # Process and display each ROI image.
-                for pos_y in range(roi_window_count[1]):
-                    for pos_x in range(roi_window_count[0]):
-                        roi_image = st_image.get_roi_image(
-                            pos_x * roi_image_size[0],
-                            pos_y * roi_image_size[1],
-                            roi_image_size[0],
-                            roi_image_size[1])
-                        window_title = "image_{0}{1}".format(pos_y, pos_x)
-                        display_with_opencv(window_title,
-                                            roi_image, pixel_format_info)
+                cv2.imshow("image", cv2.resize(nparr, None,
+                                               fx=DISPLAY_RESIZE_FACTOR,
+                                               fy=DISPLAY_RESIZE_FACTOR))
+
+                # Resize the ROI images in the thread pool and display them.
+                for tile, roi_image in zip(tiles,
+                                           tiler.map(resize_tile, tiles)):
+                    window_title = "image_{0}{1}".format(tile.row,
+                                                         tile.column)
+                    cv2.imshow(window_title, roi_image)
                 cv2.waitKey(1)
 
         # Stop the image acquisition of the camera side
@@ -176,5 +152,8 @@ if __name__ == "__main__":
         # Stop the image acquisition of the host side
         st_datastream.stop_acquisition()
 
+        # Shut down the thread pool of the tiler.
+        tiler.close()
+
     except Exception as exception:
         print(exception)
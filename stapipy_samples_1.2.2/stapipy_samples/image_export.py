@@ -0,0 +1,298 @@
+"""
+ This module provides a background still image export service.
+ The following points are covered by this module:
+ - Accept PyStImage or NumPy array export jobs without blocking the caller
+ - Encode them in worker threads with a separate queue and number of
+   workers for each file format (BMP, TIFF, PNG, JPEG, CSV, StApiRaw)
+ - Save PyStImage with PyStStillImageFiler and NumPy arrays with OpenCV
+ - Write the files atomically (temporary file, then rename)
+ - Back-pressure policies: drop oldest, drop newest or block
+ - Report the queue depth and the encode latency of each format
+ Note: opencv-python and numpy packages are required:
+    pip install numpy
+    pip install opencv-python
+"""
+
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+import stapipy as st
+
+from acquisition_pipeline import CFrameQueue, EBackPressure
+from latency_stats import CLatencyStats
+
+# File format of each file extension.
+FILE_FORMAT_NAMES = {
+    '.bmp': 'Bitmap',
+    '.tif': 'TIFF',
+    '.tiff': 'TIFF',
+    '.png': 'PNG',
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.csv': 'CSV',
+    '.stapiraw': 'StApiRaw',
+}
+
+# Default number of worker threads of each file format.
+DEFAULT_WORKER_COUNTS = {
+    'Bitmap': 1,
+    'TIFF': 1,
+    'PNG': 2,
+    'JPEG': 2,
+    'CSV': 1,
+    'StApiRaw': 1,
+}
+
+# File formats which can be written from a NumPy array with OpenCV.
+NDARRAY_FILE_FORMATS = ('Bitmap', 'TIFF', 'PNG', 'JPEG')
+
+
+class CExportJob:
+    """
+    One image to export.
+    """
+    __slots__ = ('path', 'image', 'file_format', 'submitted_time',
+                 'started_time', 'encoded_time', 'finished_time', 'error')
+
+    def __init__(self, path, image, file_format):
+        self.path = path
+        self.image = image
+        self.file_format = file_format
+        self.submitted_time = time.perf_counter()
+        self.started_time = 0.0
+        self.encoded_time = 0.0
+        self.finished_time = 0.0
+        self.error = None
+
+
+class CExportLane:
+    """
+    Queue, workers and statistics of one file format.
+    """
+
+    def __init__(self, file_format, worker_count, queue_size,
+                 back_pressure):
+        """
+        :param file_format: name of EStStillImageFileFormat.
+        :param worker_count: number of worker threads.
+        :param queue_size: maximum number of waiting jobs.
+        :param back_pressure: EBackPressure when the queue is full.
+        """
+        self.file_format = file_format
+        self.queue = CFrameQueue(queue_size, back_pressure)
+        self.workers = []
+        self.worker_count = worker_count
+        self.exported_count = 0
+        self.error_count = 0
+        self.done_error_count = 0
+        self.last_done_error = None
+        self.queue_stats = CLatencyStats()
+        self.encode_stats = CLatencyStats()
+        self.write_stats = CLatencyStats()
+        self.total_stats = CLatencyStats()
+
+    def statistics(self) -> dict:
+        """
+        Get the counters and the latency of this format.
+
+        :return: dict of counters and latency summaries in milliseconds.
+        """
+        return {'queue_depth': len(self.queue),
+                'exported': self.exported_count,
+                'dropped': self.queue.dropped_count,
+                'errors': self.error_count,
+                'done_errors': self.done_error_count,
+                'queue': self.queue_stats.summary(),
+                'encode': self.encode_stats.summary(),
+                'write': self.write_stats.summary(),
+                'total': self.total_stats.summary()}
+
+
+class CImageExporter:
+    """
+    Class that saves images in background worker threads.
+
+    The encoders of OpenCV and StApi release the GIL, so the workers encode
+    in parallel with the acquisition loop. Each file format has its own
+    queue: a burst of slow PNG jobs does not delay the JPEG jobs, and with
+    EBackPressure.DropOldest or DropNewest submit() never waits.
+    """
+
+    def __init__(self, worker_counts=None, queue_size=16,
+                 back_pressure=EBackPressure.DropNewest,
+                 png_compression_level=6, jpeg_quality=95, done_func=None):
+        """
+        :param worker_counts: dict of the number of worker threads for
+            each file format name (default: DEFAULT_WORKER_COUNTS). Formats
+            not in the dict cannot be exported.
+        :param queue_size: maximum number of waiting jobs of each format.
+        :param back_pressure: EBackPressure when the queue of a format is
+            full.
+        :param png_compression_level: compression level of PNG (0-9).
+        :param jpeg_quality: quality of JPEG (0-100).
+        :param done_func: function(CExportJob) called in the worker thread
+            after each job (job.error is set if it failed), or None. An
+            exception raised by done_func is counted in the statistics
+            ('done_errors') and does not stop the worker.
+        """
+        if worker_counts is None:
+            worker_counts = DEFAULT_WORKER_COUNTS
+        self._png_compression_level = png_compression_level
+        self._jpeg_quality = jpeg_quality
+        self._done_func = done_func
+        self._lock = threading.Lock()
+        self._is_started = False
+        self._lanes = {}
+        for file_format, worker_count in worker_counts.items():
+            if worker_count <= 0:
+                continue
+            lane = CExportLane(file_format, worker_count, queue_size,
+                               back_pressure)
+            lane.workers = [threading.Thread(target=self._work, args=(lane,))
+                            for _ in range(worker_count)]
+            self._lanes[file_format] = lane
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def queue_depth(self) -> int:
+        """Property: number of jobs waiting for a worker."""
+        return sum(len(lane.queue) for lane in self._lanes.values())
+
+    @property
+    def dropped_count(self) -> int:
+        """Property: number of jobs dropped by the back-pressure policy."""
+        return sum(lane.queue.dropped_count for lane in self._lanes.values())
+
+    def start(self):
+        """Start the worker threads."""
+        if self._is_started:
+            return
+        self._is_started = True
+        for lane in self._lanes.values():
+            for worker in lane.workers:
+                worker.start()
+
+    def close(self):
+        """Export the waiting jobs and stop the worker threads."""
+        for lane in self._lanes.values():
+            lane.queue.close()
+        if not self._is_started:
+            return
+        for lane in self._lanes.values():
+            for worker in lane.workers:
+                worker.join()
+
+    def submit(self, path, image, copy=True) -> bool:
+        """
+        Queue an image to save. The file format is chosen from the file
+        extension of path.
+
+        :param path: path of the file.
+        :param image: PyStImage, or numpy.ndarray (8bit or 16bit Mono,
+            BGR or BGRA) for Bitmap, TIFF, PNG and JPEG.
+        :param copy: copy the image, so that the stream buffer can be
+            requeued. Set False if the image is not used by the caller
+            any more.
+        :return: True if the job was queued, False if it was dropped.
+        """
+        extension = os.path.splitext(path)[1].lower()
+        file_format = FILE_FORMAT_NAMES.get(extension)
+        lane = self._lanes.get(file_format)
+        if lane is None:
+            raise ValueError("{0} files cannot be exported.".format(
+                extension))
+        if isinstance(image, np.ndarray):
+            if file_format not in NDARRAY_FILE_FORMATS:
+                raise ValueError("NumPy array cannot be saved as {0}."
+                                 .format(file_format))
+            if copy:
+                image = image.copy()
+        elif copy:
+            image = image.clone()
+        return lane.queue.put(CExportJob(path, image, file_format))
+
+    def statistics(self) -> dict:
+        """
+        Get the counters and the latency of each file format.
+
+        :return: dict of the statistics of CExportLane for each format.
+        """
+        return {file_format: lane.statistics()
+                for file_format, lane in self._lanes.items()}
+
+    def _work(self, lane):
+        """Worker thread of a file format."""
+        st_filer = None
+        while True:
+            job = lane.queue.get()
+            if job is None:
+                return
+            job.started_time = time.perf_counter()
+            lane.queue_stats.add(job.started_time - job.submitted_time)
+            temporary_path = "{0}.{1}.tmp".format(job.path,
+                                                  threading.get_ident())
+            try:
+                if isinstance(job.image, np.ndarray):
+                    self._save_ndarray(job, temporary_path)
+                else:
+                    # One filer per worker thread.
+                    if st_filer is None:
+                        st_filer = st.create_filer(
+                            st.EStFilerType.StillImage)
+                        st_filer.compression_level = \
+                            self._png_compression_level
+                        st_filer.quality = self._jpeg_quality
+                    st_filer.save(
+                        job.image,
+                        getattr(st.EStStillImageFileFormat, job.file_format),
+                        temporary_path)
+                    job.encoded_time = time.perf_counter()
+                os.replace(temporary_path, job.path)
+            except Exception as exception:
+                job.error = exception
+                if os.path.exists(temporary_path):
+                    os.remove(temporary_path)
+            job.finished_time = time.perf_counter()
+            job.image = None
+            with self._lock:
+                if job.error is None:
+                    lane.exported_count += 1
+                    lane.encode_stats.add(job.encoded_time - job.started_time)
+                    lane.write_stats.add(job.finished_time - job.encoded_time)
+                    lane.total_stats.add(
+                        job.finished_time - job.submitted_time)
+                else:
+                    lane.error_count += 1
+            if self._done_func is not None:
+                try:
+                    self._done_func(job)
+                except Exception as exception:
+                    with self._lock:
+                        lane.done_error_count += 1
+                        lane.last_done_error = exception
+
+    def _save_ndarray(self, job, temporary_path):
+        """Encode a NumPy array with OpenCV and write it."""
+        if job.file_format == 'PNG':
+            parameters = [cv2.IMWRITE_PNG_COMPRESSION,
+                          self._png_compression_level]
+        elif job.file_format == 'JPEG':
+            parameters = [cv2.IMWRITE_JPEG_QUALITY, self._jpeg_quality]
+        else:
+            parameters = []
+        extension = os.path.splitext(job.path)[1]
+        is_success, encoded = cv2.imencode(extension, job.image, parameters)
+        if not is_success:
+            raise ValueError("{0} cannot be encoded.".format(job.path))
+        job.encoded_time = time.perf_counter()
+        with open(temporary_path, 'wb') as image_file:
+            image_file.write(encoded)
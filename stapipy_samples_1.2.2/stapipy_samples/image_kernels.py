@@ -0,0 +1,344 @@
+"""
+ This module provides NumPy kernels equivalent to the StApi reverse
+ converter, the gamma correction filter and the level adjustment filter,
+ which can be fused into one pass over the image.
+ The following points are covered by this module:
+ - Reverse X/Y and 90 degrees rotation as strided views (no copy)
+ - Lookup tables (256/1024/4096/65536 entries) for gamma correction, level
+   adjustment with correction points and bit shift
+ - Compose the lookup tables into one table, so that reverse + bit shift +
+   gamma + level adjustment read and write each pixel once
+ - Build the kernels from the settings of PyStReverseConverter,
+   PyStGammaCorrectionFilter and PyStLevelAdjustmentFilter, or from the
+   same settings stored as a dict
+ Only the level adjustment of Mono images in Manual_Points mode can be
+ reproduced: the other modes depend on the image, and the points of the
+ R, G and B components are not read.
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import numpy as np
+import stapipy as st
+
+
+def reverse_view(nparr, reverse_x=False, reverse_y=False, rotation=0):
+    """
+    Get a reversed/rotated view of an image without copying it.
+
+    The view is applied as PyStReverseConverter does: reverse first, then
+    rotate. Reversing or rotating a Bayer image changes its color filter
+    (see reversed_color_filter()).
+
+    :param nparr: numpy.ndarray of shape (height, width[, components]).
+    :param reverse_x: True to reverse horizontally.
+    :param reverse_y: True to reverse vertically.
+    :param rotation: 0, 90 (clockwise) or -90 (counter-clockwise).
+    :return: view of nparr.
+    """
+    if reverse_y:
+        nparr = nparr[::-1]
+    if reverse_x:
+        nparr = nparr[:, ::-1]
+    if rotation == 90:
+        nparr = np.rot90(nparr, -1)
+    elif rotation == -90:
+        nparr = np.rot90(nparr, 1)
+    elif rotation != 0:
+        raise ValueError("rotation must be 0, 90 or -90.")
+    return nparr
+
+
+def reversed_color_filter(color_filter, reverse_x=False, reverse_y=False):
+    """
+    Get the color filter of a reversed Bayer image.
+
+    :param color_filter: EStPixelColorFilter of the source image.
+    :param reverse_x: True if reversed horizontally.
+    :param reverse_y: True if reversed vertically.
+    :return: EStPixelColorFilter of the reversed image.
+    """
+    # 2x2 pattern of each Bayer color filter: first row, second row.
+    patterns = {'RG': ('RG', 'GB'), 'GR': ('GR', 'BG'),
+                'GB': ('GB', 'RG'), 'BG': ('BG', 'GR')}
+    name = getattr(color_filter, 'name', '')
+    if not name.startswith('Bayer') or name[5:] not in patterns:
+        return color_filter
+    rows = list(patterns[name[5:]])
+    if reverse_x:
+        rows = [row[::-1] for row in rows]
+    if reverse_y:
+        rows = rows[::-1]
+    return getattr(st.EStPixelColorFilter, 'Bayer' + rows[0])
+
+
+def shift_lut(input_bit_count, output_bit_count):
+    """
+    Create the lookup table of a bit shift.
+
+    :param input_bit_count: number of valid bits of the input.
+    :param output_bit_count: number of bits of the output.
+    :return: numpy.ndarray of 2 ** input_bit_count entries.
+    """
+    values = np.arange(1 << input_bit_count, dtype=np.uint32)
+    if output_bit_count <= input_bit_count:
+        values >>= input_bit_count - output_bit_count
+    else:
+        values <<= output_bit_count - input_bit_count
+    return values.astype(_get_dtype(output_bit_count))
+
+
+def gamma_lut(gamma_value, bit_count):
+    """
+    Create the lookup table of a gamma correction:
+    output = max * (input / max) ** (1 / gamma_value), rounded.
+
+    :param gamma_value: gamma value (PyStGammaCorrectionFilter.gamma_value).
+    :param bit_count: number of valid bits of the input and the output.
+    :return: numpy.ndarray of 2 ** bit_count entries.
+    """
+    if gamma_value <= 0:
+        raise ValueError("gamma_value must be larger than 0.")
+    max_value = (1 << bit_count) - 1
+    values = np.arange(max_value + 1, dtype=np.float64) / max_value
+    values = np.power(values, 1.0 / gamma_value) * max_value
+    return np.rint(values).astype(_get_dtype(bit_count))
+
+
+def level_adjustment_lut(points, bit_count, is_curve=False):
+    """
+    Create the lookup table of a level adjustment with correction points.
+
+    :param points: list of (input, output) pairs from 0.0 to 1.0
+        (PyStLevelAdjustPointInfo), sorted by input.
+    :param bit_count: number of valid bits of the input and the output.
+    :param is_curve: True to interpolate with a monotone cubic curve,
+        False to interpolate linearly.
+    :return: numpy.ndarray of 2 ** bit_count entries.
+    """
+    if len(points) < 2:
+        raise ValueError("At least 2 correction points are required.")
+    inputs = np.array([point[0] for point in points], np.float64)
+    outputs = np.array([point[1] for point in points], np.float64)
+    if np.any(np.diff(inputs) <= 0):
+        raise ValueError("The inputs of the points must be increasing.")
+    max_value = (1 << bit_count) - 1
+    values = np.arange(max_value + 1, dtype=np.float64) / max_value
+    if is_curve and len(points) > 2:
+        values = _monotone_cubic(inputs, outputs, values)
+    else:
+        values = np.interp(values, inputs, outputs)
+    values = np.clip(np.rint(values * max_value), 0, max_value)
+    return values.astype(_get_dtype(bit_count))
+
+
+def compose_luts(*luts):
+    """
+    Compose lookup tables: the result of compose_luts(a, b)[x] is
+    b[a[x]].
+
+    :param luts: lookup tables applied in order. Each table must have an
+        entry for every output value of the previous table.
+    :return: numpy.ndarray with the entries of the first table.
+    """
+    result = luts[0]
+    for lut in luts[1:]:
+        if int(result.max()) >= len(lut):
+            raise ValueError("Lookup table of {0} entries cannot take values "
+                             "up to {1}.".format(len(lut), int(result.max())))
+        result = lut[result]
+    return result
+
+
+def get_sdk_settings(st_reverse_converter=None, st_gamma_filter=None,
+                     st_level_filter=None) -> dict:
+    """
+    Read the settings of StApi objects as arguments of
+    CFusedKernel.from_settings().
+
+    Only the level adjustment of Mono images in Manual_Points mode is
+    read: the points of EStPixelComponent.Mono are used whatever the
+    pixel format, and the other modes (which compute the levels from the
+    image) raise ValueError.
+
+    :param st_reverse_converter: PyStReverseConverter or None.
+    :param st_gamma_filter: PyStGammaCorrectionFilter or None.
+    :param st_level_filter: PyStLevelAdjustmentFilter or None.
+    :return: dict of the settings (values which can be stored as JSON).
+    """
+    settings = {}
+    if st_reverse_converter is not None:
+        settings['reverse_x'] = bool(st_reverse_converter.reverse_x)
+        settings['reverse_y'] = bool(st_reverse_converter.reverse_y)
+        settings['rotation'] = {
+            st.EStRotationMode.Clockwise90: 90,
+            st.EStRotationMode.Counterclockwise90: -90}.get(
+            st_reverse_converter.rotation_mode, 0)
+    if st_gamma_filter is not None:
+        settings['gamma_value'] = float(st_gamma_filter.gamma_value)
+    if st_level_filter is not None:
+        mode = st_level_filter.level_adjustment_mode
+        if mode == st.EStLevelAdjustmentMode.Manual_Points:
+            settings['level_points'] = [
+                (float(point.input), float(point.output)) for point in
+                st_level_filter.get_level_adjustment_correction_points(
+                    st.EStPixelComponent.Mono)]
+            settings['is_level_curve'] = st_level_filter\
+                .level_adjustment_correction_points_interpolation_mode\
+                == st.EStLevelAdjustmentCorrectionPointsInterpolationMode\
+                .Curve
+        elif mode != st.EStLevelAdjustmentMode.Off:
+            raise ValueError("Level adjustment mode {0} depends on the "
+                             "image.".format(mode.name))
+    return settings
+
+
+class CFusedKernel:
+    """
+    Class that applies a reverse/rotation view and a composed lookup table
+    in one pass.
+
+    The input is read through the strided view and each pixel is looked up
+    once, so the chain costs one read and one write of the image whatever
+    the number of lookup tables.
+    """
+
+    def __init__(self, luts=(), reverse_x=False, reverse_y=False,
+                 rotation=0):
+        """
+        :param luts: lookup tables applied in order (e.g. gamma_lut(),
+            level_adjustment_lut(), shift_lut()).
+        :param reverse_x: True to reverse horizontally.
+        :param reverse_y: True to reverse vertically.
+        :param rotation: 0, 90 (clockwise) or -90 (counter-clockwise).
+        """
+        self.lut = compose_luts(*luts) if luts else None
+        self.reverse_x = reverse_x
+        self.reverse_y = reverse_y
+        self.rotation = rotation
+
+    @staticmethod
+    def from_settings(input_bit_count, reverse_x=False, reverse_y=False,
+                      rotation=0, gamma_value=None, level_points=None,
+                      is_level_curve=False, output_bit_count=None):
+        """
+        Create a kernel applying, in order, reverse, gamma correction,
+        level adjustment and bit shift.
+
+        :param input_bit_count: number of valid bits of the input.
+        :param reverse_x: True to reverse horizontally.
+        :param reverse_y: True to reverse vertically.
+        :param rotation: 0, 90 (clockwise) or -90 (counter-clockwise).
+        :param gamma_value: gamma value, or None for no gamma correction.
+        :param level_points: (input, output) correction points of the
+            level adjustment, or None for no level adjustment.
+        :param is_level_curve: True to interpolate the points with a curve.
+        :param output_bit_count: number of bits of the output, or None to
+            keep input_bit_count.
+        :return: CFusedKernel.
+        """
+        luts = []
+        if gamma_value is not None:
+            luts.append(gamma_lut(gamma_value, input_bit_count))
+        if level_points is not None:
+            luts.append(level_adjustment_lut(level_points, input_bit_count,
+                                             is_level_curve))
+        if output_bit_count is not None and \
+                output_bit_count != input_bit_count:
+            luts.append(shift_lut(input_bit_count, output_bit_count))
+        return CFusedKernel(luts, reverse_x, reverse_y, rotation)
+
+    @staticmethod
+    def from_sdk(input_bit_count, st_reverse_converter=None,
+                 st_gamma_filter=None, st_level_filter=None,
+                 output_bit_count=None):
+        """
+        Create a kernel with the settings of StApi objects (see
+        get_sdk_settings()), applied in the order reverse, gamma
+        correction, level adjustment, bit shift.
+
+        :param input_bit_count: number of valid bits of the input.
+        :param st_reverse_converter: PyStReverseConverter or None.
+        :param st_gamma_filter: PyStGammaCorrectionFilter or None.
+        :param st_level_filter: PyStLevelAdjustmentFilter or None. Only
+            Manual_Points mode of Mono images is supported.
+        :param output_bit_count: number of bits of the output, or None to
+            keep input_bit_count.
+        :return: CFusedKernel.
+        """
+        return CFusedKernel.from_settings(
+            input_bit_count, output_bit_count=output_bit_count,
+            **get_sdk_settings(st_reverse_converter, st_gamma_filter,
+                               st_level_filter))
+
+    def output_shape(self, shape) -> tuple:
+        """
+        Get the shape of the result for an input shape.
+
+        :param shape: shape of the input.
+        :return: shape of the output.
+        """
+        if self.rotation:
+            return (shape[1], shape[0]) + tuple(shape[2:])
+        return tuple(shape)
+
+    def apply(self, nparr, out=None):
+        """
+        Apply the kernel.
+
+        :param nparr: numpy.ndarray of the image (uint8 or uint16).
+        :param out: numpy.ndarray of output_shape() and the dtype of the
+            lookup table to store the result, or None.
+        :return: result (out if given).
+        """
+        view = reverse_view(nparr, self.reverse_x, self.reverse_y,
+                            self.rotation)
+        if self.lut is None:
+            if out is None:
+                return view.copy()
+            np.copyto(out, view)
+            return out
+        if out is None:
+            out = np.empty(view.shape, self.lut.dtype)
+        # np.take with mode='clip' avoids the bounds check of each index.
+        np.take(self.lut, view, out=out, mode='clip')
+        return out
+
+
+def _get_dtype(bit_count):
+    """Get the dtype holding bit_count bits."""
+    return np.dtype(np.uint8) if bit_count <= 8 else np.dtype(np.uint16)
+
+
+def _monotone_cubic(inputs, outputs, values):
+    """Monotone cubic (Fritsch-Carlson) interpolation of the points."""
+    slopes = np.diff(outputs) / np.diff(inputs)
+    tangents = np.empty_like(outputs)
+    tangents[0] = slopes[0]
+    tangents[-1] = slopes[-1]
+    tangents[1:-1] = (slopes[:-1] + slopes[1:]) / 2.0
+    # Flat where the slope changes sign, limited to keep monotonicity.
+    for index, slope in enumerate(slopes):
+        if slope == 0:
+            tangents[index] = tangents[index + 1] = 0.0
+            continue
+        alpha = tangents[index] / slope
+        beta = tangents[index + 1] / slope
+        if index > 0 and slopes[index - 1] * slope <= 0:
+            tangents[index] = 0.0
+            alpha = 0.0
+        norm = alpha * alpha + beta * beta
+        if norm > 9.0:
+            scale = 3.0 / np.sqrt(norm)
+            tangents[index] = scale * alpha * slope
+            tangents[index + 1] = scale * beta * slope
+    segments = np.clip(np.searchsorted(inputs, values, 'right') - 1, 0,
+                       len(inputs) - 2)
+    width = inputs[segments + 1] - inputs[segments]
+    position = np.clip((values - inputs[segments]) / width, 0.0, 1.0)
+    position2 = position * position
+    position3 = position2 * position
+    return (2 * position3 - 3 * position2 + 1) * outputs[segments] + \
+        (position3 - 2 * position2 + position) * width * tangents[segments] + \
+        (-2 * position3 + 3 * position2) * outputs[segments + 1] + \
+        (position3 - position2) * width * tangents[segments + 1]
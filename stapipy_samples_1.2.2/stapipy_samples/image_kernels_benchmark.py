@@ -0,0 +1,226 @@
+"""
+ This sample compares the reverse + gamma correction + level adjustment +
+ bit shift chain done step by step with the fused CFusedKernel of
+ image_kernels, on synthetic Mono8/Mono12 images.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Create synthetic Mono8/Mono12 PyStImage with create_from_data
+ - Run each step as a separate NumPy pass (reverse copy, gamma, level
+   adjustment, shift)
+ - Run the same steps as one strided view and one composed lookup table
+ - Run the same steps with the StApi reverse converter, gamma correction
+   and level adjustment filters and pixel format converter, when available
+ - Compare the outputs and display the timing
+ The comparison is only displayed: image_kernels_check checks the bit
+ exactness against StApi outputs recorded from a camera.
+ No camera is required.
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import time
+
+import numpy as np
+import stapipy as st
+
+from image_kernels import CFusedKernel, gamma_lut, level_adjustment_lut, \
+    reverse_view, shift_lut
+from image_ndarray import as_ndarray
+
+# Size of the synthetic images (5M pixels).
+IMAGE_WIDTH = 2448
+IMAGE_HEIGHT = 2048
+
+# Number of runs for each measurement.
+number_of_iterations = 50
+
+# Settings of the chain.
+REVERSE_X = True
+REVERSE_Y = False
+ROTATION = 90
+GAMMA_VALUE = 2.2
+
+# Pixel formats to measure.
+PIXEL_FORMATS = [st.EStPixelFormatNamingConvention.Mono8,
+                 st.EStPixelFormatNamingConvention.Mono12]
+
+
+def create_synthetic_image(pixel_format):
+    """
+    Create a PyStImage filled with random data.
+
+    :param pixel_format: pixel format of the image.
+    :return: PyStImage.
+    """
+    pixel_format_info = st.get_pixel_format_info(pixel_format)
+    random_generator = np.random.default_rng(0)
+    if pixel_format_info.each_component_total_bit_count > 8:
+        max_value = (1 << pixel_format_info.each_component_valid_bit_count)
+        nparr = random_generator.integers(0, max_value,
+                                          (IMAGE_HEIGHT, IMAGE_WIDTH),
+                                          dtype=np.uint16)
+    else:
+        nparr = random_generator.integers(0, 256, (IMAGE_HEIGHT, IMAGE_WIDTH),
+                                          dtype=np.uint8)
+    return st.PyStImage.create_from_data(IMAGE_WIDTH, IMAGE_HEIGHT,
+                                         pixel_format,
+                                         bytearray(nparr.tobytes()))
+
+
+def create_step_function(bit_count, points):
+    """
+    Create the chain done step by step, one NumPy pass for each step.
+
+    :param bit_count: number of valid bits of the input.
+    :param points: correction points of the level adjustment.
+    :return: function(st_image) returning numpy.ndarray (8bit).
+    """
+    max_value = (1 << bit_count) - 1
+    level = level_adjustment_lut(points, bit_count)
+
+    def run(st_image):
+        nparr = reverse_view(as_ndarray(st_image), REVERSE_X, REVERSE_Y,
+                             ROTATION).copy()
+        nparr = np.power(nparr / max_value, 1.0 / GAMMA_VALUE) * max_value
+        nparr = level[np.rint(nparr).astype(np.uint16)]
+        return (nparr >> (bit_count - 8)).astype(np.uint8)
+    return run
+
+
+def create_fused_function(bit_count, points):
+    """
+    Create the chain done with CFusedKernel, reusing the output array.
+
+    :param bit_count: number of valid bits of the input.
+    :param points: correction points of the level adjustment.
+    :return: function(st_image) returning numpy.ndarray (8bit).
+    """
+    kernel = CFusedKernel([gamma_lut(GAMMA_VALUE, bit_count),
+                           level_adjustment_lut(points, bit_count),
+                           shift_lut(bit_count, 8)],
+                          REVERSE_X, REVERSE_Y, ROTATION)
+    out = np.empty(kernel.output_shape((IMAGE_HEIGHT, IMAGE_WIDTH)),
+                   np.uint8)
+
+    def run(st_image):
+        return kernel.apply(as_ndarray(st_image), out)
+    return run
+
+
+def create_sdk_function():
+    """
+    Create the chain done with the StApi converters and filters.
+
+    :return: (function(st_image) returning numpy.ndarray (8bit),
+        correction points of the level adjustment filter).
+    """
+    st_reverse_converter = st.create_converter(st.EStConverterType.Reverse)
+    st_reverse_converter.reverse_x = REVERSE_X
+    st_reverse_converter.reverse_y = REVERSE_Y
+    st_reverse_converter.rotation_mode = \
+        st.EStRotationMode.Clockwise90 if ROTATION == 90 else \
+        st.EStRotationMode.Counterclockwise90 if ROTATION == -90 else \
+        st.EStRotationMode.Off
+    st_gamma_filter = st.create_filter(st.EStFilterType.GammaCorrection)
+    st_gamma_filter.gamma_value = GAMMA_VALUE
+    st_level_filter = st.create_filter(st.EStFilterType.LevelAdjustment)
+    st_level_filter.level_adjustment_mode = \
+        st.EStLevelAdjustmentMode.Manual_Points
+    st_level_filter.level_adjustment_correction_points_interpolation_mode = \
+        st.EStLevelAdjustmentCorrectionPointsInterpolationMode.Linear
+    st_pixel_format_converter = st.create_converter(
+        st.EStConverterType.PixelFormat)
+    st_pixel_format_converter.destination_pixel_format = \
+        st.EStPixelFormatNamingConvention.Mono8
+    points = [(point.input, point.output) for point in
+              st_level_filter.get_level_adjustment_correction_points(
+                  st.EStPixelComponent.Mono)]
+
+    def run(st_image):
+        st_image = st_reverse_converter.convert(st_image)
+        st_gamma_filter.apply_filter(st_image)
+        st_level_filter.apply_filter(st_image)
+        st_image = st_pixel_format_converter.convert(st_image)
+        return as_ndarray(st_image)
+    return run, points
+
+
+def measure(function, st_image) -> float:
+    """
+    Measure the average time of function(st_image).
+
+    :param function: chain function.
+    :param st_image: image to process.
+    :return: average time per frame in milliseconds.
+    """
+    function(st_image)
+    start_time = time.perf_counter()
+    for _ in range(number_of_iterations):
+        function(st_image)
+    return (time.perf_counter() - start_time) * 1000.0 / number_of_iterations
+
+
+def compare(reference, result) -> str:
+    """
+    Compare two results.
+
+    :param reference: numpy.ndarray of the reference.
+    :param result: numpy.ndarray to compare.
+    :return: text of the result of the comparison.
+    """
+    if reference.shape != result.shape:
+        return "DIFFERENT shape {0}".format(result.shape)
+    difference = np.abs(reference.astype(np.int32) - result.astype(np.int32))
+    if not difference.any():
+        return "identical"
+    return "DIFFERENT max={0} pixels={1}".format(
+        int(difference.max()), int(np.count_nonzero(difference)))
+
+
+if __name__ == "__main__":
+    try:
+        # Initialize StApi before using.
+        st.initialize()
+
+        print("Size={0} x {1} Reverse X={2} Y={3} Rotation={4} Gamma={5} "
+              "Iterations={6}".format(IMAGE_WIDTH, IMAGE_HEIGHT, REVERSE_X,
+                                      REVERSE_Y, ROTATION, GAMMA_VALUE,
+                                      number_of_iterations))
+
+        # Use the default points of the StApi filter when available.
+        sdk_function = None
+        level_points = [(0.0, 0.1), (0.5, 0.6), (1.0, 0.9)]
+        if hasattr(st, 'create_filter') and hasattr(st, 'create_converter'):
+            sdk_function, level_points = create_sdk_function()
+        else:
+            print("StApi converters and filters are not available: "
+                  "the StApi chain is skipped.")
+        print("Level adjustment points:", level_points)
+
+        for pixel_format in PIXEL_FORMATS:
+            st_image = create_synthetic_image(pixel_format)
+            bit_count = st.get_pixel_format_info(
+                pixel_format).each_component_valid_bit_count
+            step_function = create_step_function(bit_count, level_points)
+            fused_function = create_fused_function(bit_count, level_points)
+
+            # Compare the fused kernel with the steps.
+            reference = step_function(st_image).copy()
+            text = compare(reference, fused_function(st_image))
+            step_ms = measure(step_function, st_image)
+            fused_ms = measure(fused_function, st_image)
+            print("{0}: steps={1:.2f}[ms] fused={2:.2f}[ms] x{3:.2f} "
+                  "{4}".format(pixel_format.name, step_ms, fused_ms,
+                               step_ms / fused_ms, text))
+
+            # Compare with StApi (random data, displayed only).
+            if sdk_function is not None:
+                text = compare(sdk_function(st_image).copy(),
+                               fused_function(st_image))
+                sdk_ms = measure(sdk_function, st_image)
+                print("{0}: StApi={1:.2f}[ms] fused={2:.2f}[ms] x{3:.2f} "
+                      "{4}".format(pixel_format.name, sdk_ms, fused_ms,
+                                   sdk_ms / fused_ms, text))
+
+    except Exception as exception:
+        print(exception)
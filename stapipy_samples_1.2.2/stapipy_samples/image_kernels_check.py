@@ -0,0 +1,248 @@
+"""
+ This sample checks that CFusedKernel of image_kernels is bit-exact with
+ the StApi reverse converter, gamma correction filter and level
+ adjustment filter, on frames recorded from a camera.
+ The following points will be demonstrated in this sample code:
+ - With --record: grab frames from a Mono camera, process them with the
+   StApi converter and filters for each case (gamma correction, level
+   adjustment with linear and curve interpolation, reverse and rotation)
+   and store the frames, the StApi outputs and the settings of the case
+   in <directory>/<case>.npz; the kernels of CFusedKernel.from_sdk() are
+   checked against the StApi outputs at the same time
+ - Without --record: rebuild each kernel from the stored settings with
+   CFusedKernel.from_settings() and compare it with the stored StApi
+   outputs; this needs neither a camera nor the StApi filters
+ - Fail (exit status 1) if an output differs; the cases without a
+   recorded reference are reported as skipped (no reference is shipped:
+   it depends on the camera and the StApi version)
+ CFusedKernel.from_sdk() only reproduces the level adjustment of Mono
+ images in Manual_Points mode, so the level adjustment cases use the
+ default correction points of the filter on a Mono camera.
+ This check is separate from image_kernels_benchmark, which measures the
+ timing on synthetic images.
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import stapipy as st
+
+from image_kernels import CFusedKernel, get_sdk_settings
+from image_ndarray import as_ndarray
+
+# Directory of the reference (next to this file by default).
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'image_kernels_reference')
+
+# Number of frames to record for each case.
+DEFAULT_FRAME_COUNT = 4
+
+# Settings of the StApi objects of each case.
+CASES = {
+    'gamma': {'gamma_value': 2.2},
+    'level_linear': {'level_interpolation': 'Linear'},
+    'level_curve': {'level_interpolation': 'Curve'},
+    'reverse_xy': {'reverse_x': True, 'reverse_y': True},
+    'rotation_cw': {'rotation_mode': 'Clockwise90'},
+    'reverse_x_rotation_ccw': {'reverse_x': True,
+                               'rotation_mode': 'Counterclockwise90'},
+}
+
+
+def create_sdk_objects(case):
+    """
+    Create the StApi converter and filters of a case.
+
+    :param case: settings of the case (see CASES).
+    :return: (PyStReverseConverter, PyStGammaCorrectionFilter,
+        PyStLevelAdjustmentFilter), None for the unused objects.
+    """
+    st_reverse_converter = st_gamma_filter = st_level_filter = None
+    if 'reverse_x' in case or 'reverse_y' in case or 'rotation_mode' in case:
+        st_reverse_converter = st.create_converter(
+            st.EStConverterType.Reverse)
+        st_reverse_converter.reverse_x = case.get('reverse_x', False)
+        st_reverse_converter.reverse_y = case.get('reverse_y', False)
+        st_reverse_converter.rotation_mode = getattr(
+            st.EStRotationMode, case.get('rotation_mode', 'Off'))
+    if 'gamma_value' in case:
+        st_gamma_filter = st.create_filter(st.EStFilterType.GammaCorrection)
+        st_gamma_filter.gamma_value = case['gamma_value']
+    if 'level_interpolation' in case:
+        st_level_filter = st.create_filter(st.EStFilterType.LevelAdjustment)
+        st_level_filter.level_adjustment_mode = \
+            st.EStLevelAdjustmentMode.Manual_Points
+        st_level_filter\
+            .level_adjustment_correction_points_interpolation_mode = getattr(
+                st.EStLevelAdjustmentCorrectionPointsInterpolationMode,
+                case['level_interpolation'])
+    return st_reverse_converter, st_gamma_filter, st_level_filter
+
+
+def apply_sdk(sdk_objects, st_image):
+    """
+    Process an image with the StApi objects of a case, in the order of
+    CFusedKernel.from_sdk().
+
+    :param sdk_objects: tuple returned by create_sdk_objects().
+    :param st_image: PyStImage (not modified).
+    :return: numpy.ndarray of the result (copied).
+    """
+    st_reverse_converter, st_gamma_filter, st_level_filter = sdk_objects
+    if st_reverse_converter is not None:
+        st_image = st_reverse_converter.convert(st_image)
+    else:
+        # The filters overwrite the image.
+        st_image = st_image.clone()
+    if st_gamma_filter is not None:
+        st_gamma_filter.apply_filter(st_image)
+    if st_level_filter is not None:
+        st_level_filter.apply_filter(st_image)
+    return as_ndarray(st_image).copy()
+
+
+def check_outputs(name, kernel, inputs, outputs):
+    """
+    Raise RuntimeError if the kernel does not give the outputs.
+
+    :param name: name of the case.
+    :param kernel: CFusedKernel.
+    :param inputs: sequence of input numpy.ndarray.
+    :param outputs: sequence of expected numpy.ndarray.
+    """
+    for index, (nparr, expected) in enumerate(zip(inputs, outputs)):
+        result = kernel.apply(nparr)
+        if result.shape != expected.shape:
+            raise RuntimeError("{0} frame {1}: shape {2} instead of {3}."
+                               .format(name, index, result.shape,
+                                       expected.shape))
+        difference = np.abs(result.astype(np.int32) -
+                            expected.astype(np.int32))
+        if difference.any():
+            raise RuntimeError("{0} frame {1}: max difference={2} "
+                               "pixels={3}.".format(
+                                   name, index, int(difference.max()),
+                                   int(np.count_nonzero(difference))))
+
+
+def grab_frames(frame_count):
+    """
+    Grab frames from the first Mono camera.
+
+    :param frame_count: number of frames.
+    :return: list of PyStImage (cloned).
+    """
+    st_system = st.create_system()
+    st_device = st_system.create_first_device()
+    print('Device=', st_device.info.display_name)
+    st_datastream = st_device.create_datastream()
+    st_datastream.start_acquisition(frame_count)
+    st_device.acquisition_start()
+    images = []
+    while st_datastream.is_grabbing:
+        with st_datastream.retrieve_buffer() as st_buffer:
+            if st_buffer.info.is_image_present:
+                images.append(st_buffer.get_image().clone())
+    st_device.acquisition_stop()
+    st_datastream.stop_acquisition()
+    if not images:
+        raise RuntimeError("No image was grabbed.")
+    if not images[0].pixel_format.name.startswith('Mono'):
+        raise RuntimeError("A Mono camera is required, not {0}.".format(
+            images[0].pixel_format.name))
+    return images
+
+
+def record(directory, frame_count):
+    """
+    Record the frames and the StApi outputs of each case.
+
+    :param directory: directory of the reference.
+    :param frame_count: number of frames.
+    """
+    if not hasattr(st, 'create_filter') or \
+            not hasattr(st, 'create_converter'):
+        raise RuntimeError("The StApi converters and filters are required "
+                           "to record the reference.")
+    images = grab_frames(frame_count)
+    bit_count = st.get_pixel_format_info(
+        images[0].pixel_format).each_component_valid_bit_count
+    inputs = [as_ndarray(st_image).copy() for st_image in images]
+    os.makedirs(directory, exist_ok=True)
+    for name, case in CASES.items():
+        sdk_objects = create_sdk_objects(case)
+        outputs = [apply_sdk(sdk_objects, st_image) for st_image in images]
+        settings = get_sdk_settings(*sdk_objects)
+        np.savez_compressed(os.path.join(directory, name + '.npz'),
+                            inputs=np.stack(inputs),
+                            outputs=np.stack(outputs),
+                            bit_count=bit_count,
+                            pixel_format=images[0].pixel_format.name,
+                            settings=json.dumps(settings))
+
+        # Check from_sdk with the live objects.
+        check_outputs(name, CFusedKernel.from_sdk(bit_count, *sdk_objects),
+                      inputs, outputs)
+        print("{0}: recorded {1} frames ({2}) {3}: OK".format(
+            name, len(images), images[0].pixel_format.name, settings))
+
+
+def check(directory):
+    """
+    Check the kernels against the recorded StApi outputs. The cases
+    without a reference are skipped.
+
+    :param directory: directory of the reference.
+    """
+    for name in CASES:
+        path = os.path.join(directory, name + '.npz')
+        if not os.path.isfile(path):
+            print("{0}: no reference, skipped (record it with --record; "
+                  "StApi and a Mono camera are required)".format(name))
+            continue
+        with np.load(path) as reference:
+            settings = json.loads(str(reference['settings']))
+            kernel = CFusedKernel.from_settings(int(reference['bit_count']),
+                                                **settings)
+            check_outputs(name, kernel, reference['inputs'],
+                          reference['outputs'])
+            print("{0}: {1} frames ({2}): OK".format(
+                name, len(reference['inputs']), reference['pixel_format']))
+
+
+def parse_arguments():
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(
+        description="Check the bit exactness of the image_kernels against "
+                    "recorded StApi outputs.")
+    parser.add_argument('--record', action='store_true',
+                        help="grab frames and record the StApi outputs")
+    parser.add_argument('--directory', default=DEFAULT_DIRECTORY,
+                        help="directory of the reference (default: "
+                             "image_kernels_reference)")
+    parser.add_argument('--frames', type=int, default=DEFAULT_FRAME_COUNT,
+                        help="frames to record (default: {0})".format(
+                            DEFAULT_FRAME_COUNT))
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    try:
+        args = parse_arguments()
+
+        # Initialize StApi before using.
+        st.initialize()
+
+        if args.record:
+            record(args.directory, args.frames)
+        else:
+            check(args.directory)
+
+    except Exception as exception:
+        print(exception)
+        sys.exit(1)
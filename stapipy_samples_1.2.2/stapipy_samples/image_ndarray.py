@@ -0,0 +1,132 @@
+"""
+ This module provides helpers to access the image data of PyStImage as NumPy
+ arrays without going through np.frombuffer/astype for every frame.
+ The following points are covered by this module:
+ - Create a read-only, strided NumPy view of PyStImage (no copy)
+ - Honour the line pitch (line padding) of the image
+ - Share the pixel format check and the strided view with other image
+   containers (e.g. raw_archive)
+ - Scale 10/12/14/16bit pixel data to 8bit with an integer bit shift
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import numpy as np
+import stapipy as st
+
+
+def get_ndarray_layout(pixel_format_info):
+    """
+    Get the NumPy layout of a pixel format. Only unpacked, non-planar pixel
+    formats can be viewed directly.
+
+    :param pixel_format_info: PyStPixelFormatInfo of the pixel format.
+    :return: tuple of (dtype, number of components of one pixel). dtype is
+        uint8 for 8bit components and uint16 for 10-16bit components.
+    """
+    component_bits = pixel_format_info.each_component_total_bit_count
+    component_count = pixel_format_info.each_pixel_total_component_count
+    if pixel_format_info.plane_count != 1 or component_bits not in (8, 16) or\
+            pixel_format_info.each_pixel_total_bit_count != \
+            component_bits * component_count:
+        raise ValueError("Pixel format {0} cannot be viewed as ndarray."
+                         .format(pixel_format_info.name))
+    dtype = np.dtype(np.uint8) if component_bits == 8 else np.dtype('<u2')
+    return dtype, component_count
+
+
+def create_ndarray(buffer, width, height, line_pitch, layout, offset=0):
+    """
+    Create a read-only, strided NumPy view of image data in a buffer.
+
+    :param buffer: object exposing the buffer interface.
+    :param width: width of the image.
+    :param height: height of the image.
+    :param line_pitch: number of bytes of one line, padding included.
+    :param layout: tuple returned by get_ndarray_layout().
+    :param offset: offset of the image data in buffer.
+    :return: numpy.ndarray with shape (height, width) for single component
+        pixel formats or (height, width, components) otherwise.
+    """
+    dtype, component_count = layout
+    if component_count == 1:
+        shape = (height, width)
+        strides = (line_pitch, dtype.itemsize)
+    else:
+        shape = (height, width, component_count)
+        strides = (line_pitch, dtype.itemsize * component_count,
+                   dtype.itemsize)
+
+    nparr = np.ndarray(shape, dtype, buffer=buffer, offset=offset,
+                       strides=strides)
+    nparr.flags.writeable = False
+    return nparr
+
+
+def as_ndarray(st_image, pixel_format_info=None):
+    """
+    Get a read-only NumPy view of the image data of PyStImage.
+
+    The returned array shares the memory of st_image: it is only valid while
+    st_image (and the stream buffer it belongs to) is alive. Use .copy() or
+    PyStImage.clone() if the data must outlive the buffer.
+
+    :param st_image: PyStImage to access.
+    :param pixel_format_info: PyStPixelFormatInfo of st_image. If None, it is
+        acquired with st.get_pixel_format_info().
+    :return: numpy.ndarray with shape (height, width) for single component
+        pixel formats (Mono, Bayer) or (height, width, components) otherwise.
+        dtype is uint8 for 8bit components and uint16 for 10-16bit components.
+    """
+    if pixel_format_info is None:
+        pixel_format_info = st.get_pixel_format_info(st_image.pixel_format)
+    return create_ndarray(st_image.get_image_data(), st_image.width,
+                          st_image.height, st_image.line_pitch,
+                          get_ndarray_layout(pixel_format_info))
+
+
+def to_uint8(nparr, valid_bit_count, out=None):
+    """
+    Scale pixel values to 8bit with an integer right shift.
+
+    The shift and the narrowing to uint8 are done in a single pass without
+    any float or full-frame temporary array.
+
+    :param nparr: uint8 or uint16 numpy.ndarray.
+    :param valid_bit_count: number of valid bits of each pixel component
+        (PyStPixelFormatInfo.each_component_valid_bit_count).
+    :param out: uint8 numpy.ndarray of the same shape to store the result.
+        If None, a new array is allocated.
+    :return: uint8 numpy.ndarray (out if given). If nparr is already uint8
+        and out is None, nparr itself is returned.
+    """
+    if nparr.dtype == np.uint8:
+        if out is None:
+            return nparr
+        np.copyto(out, nparr)
+        return out
+
+    if out is None:
+        out = np.empty(nparr.shape, np.uint8)
+    np.right_shift(nparr, max(valid_bit_count - 8, 0), out=out,
+                   casting='unsafe')
+    return out
+
+
+def as_uint8_ndarray(st_image, pixel_format_info=None, out=None):
+    """
+    Get the image data of PyStImage as 8bit NumPy array.
+
+    8bit pixel formats are returned as a read-only view (no copy) unless out
+    is given. Pixel formats larger than 8bit are shifted into out.
+
+    :param st_image: PyStImage to access.
+    :param pixel_format_info: PyStPixelFormatInfo of st_image. If None, it is
+        acquired with st.get_pixel_format_info().
+    :param out: uint8 numpy.ndarray to store the result, or None.
+    :return: uint8 numpy.ndarray.
+    """
+    if pixel_format_info is None:
+        pixel_format_info = st.get_pixel_format_info(st_image.pixel_format)
+    return to_uint8(as_ndarray(st_image, pixel_format_info),
+                    pixel_format_info.each_component_valid_bit_count, out)
@@ -0,0 +1,106 @@
+"""
+ This module provides a small thread-safe latency statistics collector.
+ The following points are covered by this module:
+ - Count, mean and maximum of all recorded samples
+ - Percentiles (e.g. p50/p99) of the most recent samples
+"""
+
+import collections
+import threading
+
+
+class CLatencyStats:
+    """
+    Class to collect latency samples in seconds.
+    """
+
+    def __init__(self, max_sample_count=4096):
+        """
+        :param max_sample_count: number of recent samples kept for
+            percentiles.
+        """
+        self._samples = collections.deque(maxlen=max_sample_count)
+        self._lock = threading.Lock()
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    def add(self, seconds):
+        """
+        Record one sample.
+
+        :param seconds: latency in seconds.
+        """
+        with self._lock:
+            self._samples.append(seconds)
+            self._count += 1
+            self._total += seconds
+            if seconds > self._max:
+                self._max = seconds
+
+    def reset(self):
+        """Clear all samples."""
+        with self._lock:
+            self._samples.clear()
+            self._count = 0
+            self._total = 0.0
+            self._max = 0.0
+
+    @property
+    def count(self) -> int:
+        """Property: number of recorded samples."""
+        return self._count
+
+    @property
+    def mean(self) -> float:
+        """Property: mean of all recorded samples in seconds."""
+        return self._total / self._count if self._count else 0.0
+
+    @property
+    def max(self) -> float:
+        """Property: maximum of all recorded samples in seconds."""
+        return self._max
+
+    def percentile(self, percent) -> float:
+        """
+        Get the percentile of the recent samples.
+
+        :param percent: percentile from 0 to 100.
+        :return: latency in seconds (0.0 if there is no sample).
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        index = int(round(percent / 100.0 * (len(samples) - 1)))
+        return samples[min(max(index, 0), len(samples) - 1)]
+
+    def fraction_above(self, seconds) -> float:
+        """
+        Get the ratio of the recent samples larger than a value.
+
+        :param seconds: threshold in seconds.
+        :return: ratio from 0.0 to 1.0 (0.0 if there is no sample).
+        """
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return 0.0
+        return sum(1 for sample in samples if sample > seconds) / \
+            len(samples)
+
+    def summary(self) -> dict:
+        """
+        Get the statistics in milliseconds.
+
+        :return: dict with count, mean_ms, p50_ms, p99_ms and max_ms.
+        """
+        return {'count': self.count,
+                'mean_ms': self.mean * 1000.0,
+                'p50_ms': self.percentile(50) * 1000.0,
+                'p99_ms': self.percentile(99) * 1000.0,
+                'max_ms': self.max * 1000.0}
+
+    def __str__(self):
+        return "n={count} mean={mean_ms:.3f} p50={p50_ms:.3f} " \
+               "p99={p99_ms:.3f} max={max_ms:.3f}[ms]".format(**self.summary())
@@ -0,0 +1,167 @@
+"""
+ This module provides a triple-buffered "latest frame" mailbox to pass
+ images from a callback thread to a display/processing thread.
+ The following points are covered by this module:
+ - The writer (e.g. datastream callback) never blocks
+ - The reader takes a frame only when a new one has been published
+ - No full-frame copy: frames are handed over by reference
+ - Sequence numbers and published/taken/overwritten/dropped counters
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import collections
+
+import numpy as np
+
+
+class CFrameSlot:
+    """
+    One buffer of the mailbox.
+    """
+
+    def __init__(self):
+        self.buffer = None
+        self.frame = None
+        self.sequence = 0
+
+
+class CLatestFrameMailbox:
+    """
+    Class that holds the latest published frame for a single writer thread
+    and a single reader thread.
+
+    The slots are exchanged with deque.append()/popleft(), which are atomic
+    in CPython, so neither side takes a lock. Three slots are used normally:
+    one written by the writer, one waiting in the mailbox and one held by
+    the reader. A fourth slot is allocated only if the writer runs out of
+    free slots while the reader is swapping.
+    """
+
+    def __init__(self):
+        self._back = CFrameSlot()
+        self._front = None
+        self._latest = collections.deque()
+        self._free = collections.deque([CFrameSlot(), CFrameSlot()])
+        self._slot_count = 3
+        self._published_count = 0
+        self._overwritten_count = 0
+        self._taken_count = 0
+        self._taken_sequence = 0
+        self._dropped_count = 0
+
+    @property
+    def sequence(self) -> int:
+        """Property: sequence number of the last published frame."""
+        return self._published_count
+
+    @property
+    def taken_sequence(self) -> int:
+        """Property: sequence number of the last taken frame."""
+        return self._taken_sequence
+
+    @property
+    def has_new_frame(self) -> bool:
+        """Property: True if a frame is waiting to be taken."""
+        return len(self._latest) > 0
+
+    @property
+    def published_count(self) -> int:
+        """Property: number of frames published by the writer."""
+        return self._published_count
+
+    @property
+    def taken_count(self) -> int:
+        """Property: number of frames taken by the reader."""
+        return self._taken_count
+
+    @property
+    def overwritten_count(self) -> int:
+        """Property: number of frames replaced before being taken."""
+        return self._overwritten_count
+
+    @property
+    def dropped_count(self) -> int:
+        """Property: number of sequence numbers the reader never received."""
+        return self._dropped_count
+
+    @property
+    def slot_count(self) -> int:
+        """Property: number of allocated slots."""
+        return self._slot_count
+
+    def write_buffer(self, shape, dtype=np.uint8):
+        """
+        Get the back buffer to be filled by the writer.
+
+        The buffer is reallocated only when shape or dtype changes.
+
+        :param shape: shape of the frame.
+        :param dtype: dtype of the frame.
+        :return: numpy.ndarray owned by the mailbox.
+        """
+        slot = self._back
+        buffer = slot.buffer
+        if buffer is None or buffer.shape != tuple(shape) or \
+                buffer.dtype != np.dtype(dtype):
+            buffer = np.empty(shape, dtype)
+            slot.buffer = buffer
+        return buffer
+
+    def publish(self, frame=None) -> int:
+        """
+        Publish a frame. Never blocks.
+
+        :param frame: frame object to publish by reference. If None, the
+            buffer returned by write_buffer() is published.
+        :return: sequence number of the published frame.
+        """
+        slot = self._back
+        slot.frame = slot.buffer if frame is None else frame
+        self._published_count += 1
+        slot.sequence = self._published_count
+
+        # Take back the frame that has not been taken yet, then publish.
+        try:
+            stale = self._latest.popleft()
+        except IndexError:
+            stale = None
+        self._latest.append(slot)
+
+        # Get the next back buffer.
+        if stale is not None:
+            self._overwritten_count += 1
+            stale.frame = None
+            self._back = stale
+        else:
+            try:
+                self._back = self._free.popleft()
+            except IndexError:
+                self._back = CFrameSlot()
+                self._slot_count += 1
+        return slot.sequence
+
+    def take(self):
+        """
+        Take the latest frame if a new one has been published.
+
+        The returned frame stays valid until the next successful take().
+
+        :return: the new frame, or None if nothing new was published.
+        """
+        try:
+            slot = self._latest.popleft()
+        except IndexError:
+            return None
+
+        # Give the previously taken slot back to the writer.
+        previous = self._front
+        self._front = slot
+        if previous is not None:
+            previous.frame = None
+            self._free.append(previous)
+
+        self._dropped_count += slot.sequence - self._taken_sequence - 1
+        self._taken_sequence = slot.sequence
+        self._taken_count += 1
+        return slot.frame
@@ -0,0 +1,79 @@
+"""
+ This sample shows how to load camera settings incrementally with feature
+ snapshots, instead of loading the whole feature bag.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Connect to camera
+ - Store the camera setting into a snapshot (once) and derive a second
+   recipe with another exposure time
+ - Load the whole feature bag with PyStFeatureBag.load
+ - Load the recipes with CSnapshotLoader: only the features which differ
+   from the last loaded recipe of the camera are written
+ - Display the changed features and the time of each load
+"""
+
+import os
+import tempfile
+import time
+
+import stapipy as st
+
+from feature_snapshot import CFeatureSnapshot, CSnapshotLoader
+
+# Number of recipe changes.
+number_of_changes = 4
+
+# Feature names
+EXPOSURE_TIME = "ExposureTime"
+
+try:
+    # Initialize StApi before using.
+    st.initialize()
+
+    # Create a system object for device scan and connection.
+    st_system = st.create_system()
+
+    # Connect to first detected device.
+    st_device = st_system.create_first_device()
+
+    # Display DisplayName of the device.
+    print('Device=', st_device.info.display_name)
+
+    # Get the remote nodemap.
+    nodemap = st_device.remote_port.nodemap
+
+    # Store the current setting as first recipe.
+    recipe_a = CFeatureSnapshot.from_nodemap(nodemap)
+    print("Features:", len(recipe_a))
+
+    # Derive the second recipe with another exposure time.
+    recipe_b = CFeatureSnapshot(recipe_a.features.copy(), recipe_a.header)
+    # The key also holds the selector values recorded before the feature.
+    for key in recipe_b.features:
+        if key[0] == EXPOSURE_TIME:
+            recipe_b.features[key] = str(float(recipe_b.features[key]) * 2)
+
+    # Load the whole feature bag.
+    featurebag = st.create_featurebag()
+    featurebag.store_string_to_bag(recipe_b.to_string())
+    start_time = time.perf_counter()
+    featurebag.load(nodemap, True)
+    print("Feature bag load: {0:.1f}[ms]".format(
+          (time.perf_counter() - start_time) * 1000.0))
+
+    # Keep the last loaded recipe of each camera in the temp directory.
+    cache_directory = os.path.join(tempfile.gettempdir(), "feature_cache")
+    os.makedirs(cache_directory, exist_ok=True)
+    with CSnapshotLoader(cache_directory) as loader:
+        # The first load compares with the camera.
+        loader.load(st_device, recipe_b, verify=True)
+        for index in range(number_of_changes):
+            recipe = recipe_a if index % 2 == 0 else recipe_b
+            report = loader.load(st_device, recipe)
+            print("Recipe {0}: changed={1} written={2} total={3:.1f}[ms]"
+                  .format("A" if recipe is recipe_a else "B",
+                          report['changed'], report['written'],
+                          report['total_ms']))
+
+except Exception as exception:
+    print(exception)
@@ -0,0 +1,238 @@
+"""
+ This module provides a registry of typed node handles for a nodemap, to
+ access the same features repeatedly (e.g. every frame) at low cost.
+ The following points are covered by this module:
+ - Resolve each node once with get_node() and cast it once to PyIInteger,
+   PyIFloat, PyIEnumeration, ...
+ - Cache the symbolic <-> integer maps of the enumeration entries
+ - Cache the value and the limits of cachable nodes, and invalidate them
+   with node callbacks (fired when the node is written or invalidated by
+   another node) instead of reading them again
+"""
+
+import threading
+
+import stapipy as st
+
+# Interface types with a value to cache.
+_VALUE_INTERFACE_TYPES = (st.EGCInterfaceType.IInteger,
+                          st.EGCInterfaceType.IFloat,
+                          st.EGCInterfaceType.IBoolean,
+                          st.EGCInterfaceType.IString,
+                          st.EGCInterfaceType.IEnumeration)
+
+
+class CNodeHandle:
+    """
+    Typed handle of one node with a cached value.
+
+    The cache is dropped by the node callback, so a value read while the
+    node changes is never kept: each read records the generation of the
+    cache and only stores the value if no callback happened meanwhile.
+    """
+
+    __slots__ = ('name', 'node', 'interface', 'interface_type',
+                 'is_cachable', 'symbolic_to_int', 'int_to_symbolic',
+                 'read_count', 'hit_count', '_callback', '_generation',
+                 '_value', '_limits')
+
+    def __init__(self, node):
+        """
+        :param node: PyNode.
+        """
+        self.name = node.name
+        self.node = node
+        self.interface_type = node.principal_interface_type
+        self.interface = node.get()
+        self.is_cachable = node.is_cachable and \
+            self.interface_type in _VALUE_INTERFACE_TYPES
+        self.symbolic_to_int = {}
+        self.int_to_symbolic = {}
+        if self.interface_type == st.EGCInterfaceType.IEnumeration:
+            for entry in self.interface.entries:
+                entry = st.PyIEnumEntry(entry)
+                self.symbolic_to_int[entry.symbolic_value] = entry.value
+                self.int_to_symbolic[entry.value] = entry.symbolic_value
+        self.read_count = 0
+        self.hit_count = 0
+        self._generation = 0
+        self._value = None
+        self._limits = None
+        self._callback = None
+        if self.is_cachable:
+            # OutsideLock: the new value is readable when the cache drops.
+            self._callback = node.register_callback(
+                self._on_node_changed, None, st.EGCCallbackType.OutsideLock)
+
+    @property
+    def value(self):
+        """
+        Property: value of the node (the integer value for enumerations),
+        from the cache when valid.
+        """
+        self.read_count += 1
+        value = self._value
+        if value is not None:
+            self.hit_count += 1
+            return value
+        generation = self._generation
+        value = self.interface.value
+        if self.is_cachable and generation == self._generation:
+            self._value = value
+        return value
+
+    @value.setter
+    def value(self, value):
+        if self.interface_type == st.EGCInterfaceType.IEnumeration:
+            self.interface.set_int_value(value)
+        else:
+            self.interface.value = value
+        # The node callback has dropped the cache: the device may have
+        # adjusted the value.
+
+    @property
+    def symbolic_value(self) -> str:
+        """Property: symbolic value of an enumeration node."""
+        return self.int_to_symbolic[self.value]
+
+    @symbolic_value.setter
+    def symbolic_value(self, symbolic):
+        try:
+            value = self.symbolic_to_int[symbolic]
+        except KeyError:
+            raise ValueError("{0} has no entry {1}.".format(self.name,
+                                                            symbolic))
+        self.value = value
+
+    @property
+    def limits(self) -> tuple:
+        """
+        Property: (min, max, inc) of an integer or float node, from the
+        cache when valid. inc is None without a fixed increment.
+        """
+        limits = self._limits
+        if limits is not None:
+            return limits
+        generation = self._generation
+        interface = self.interface
+        inc = None
+        if interface.inc_mode == st.EGCIncMode.FixedIncrement:
+            inc = interface.inc
+        limits = (interface.min, interface.max, inc)
+        if self.is_cachable and generation == self._generation:
+            self._limits = limits
+        return limits
+
+    def invalidate(self):
+        """Drop the cached value and limits."""
+        self._generation += 1
+        self._value = None
+        self._limits = None
+
+    def release(self):
+        """Deregister the node callback."""
+        if self._callback is not None:
+            self.node.deregister_callback(self._callback)
+            self._callback = None
+        self.invalidate()
+
+    def _on_node_changed(self, node=None, context=None):
+        """Node callback: the value or the limits may have changed."""
+        self.invalidate()
+
+
+class CNodeRegistry:
+    """
+    Class that keeps one CNodeHandle per node name of a nodemap.
+
+    Handles are created on first use. Use it as a context manager, or call
+    close(), to deregister the node callbacks before the device is closed.
+    """
+
+    def __init__(self, nodemap):
+        """
+        :param nodemap: PyNodeMap (e.g. st_device.remote_port.nodemap).
+        """
+        self.nodemap = nodemap
+        self._handles = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __getitem__(self, name) -> CNodeHandle:
+        handle = self.get(name)
+        if handle is None:
+            raise ValueError("Node {0} is not found.".format(name))
+        return handle
+
+    def get(self, name):
+        """
+        Get the handle of a node.
+
+        :param name: node name.
+        :return: CNodeHandle, or None if the node is not found.
+        """
+        handle = self._handles.get(name)
+        if handle is None:
+            with self._lock:
+                if name not in self._handles:
+                    node = self.nodemap.get_node(name)
+                    self._handles[name] = CNodeHandle(node) if node else None
+                handle = self._handles[name]
+        return handle
+
+    def get_value(self, name):
+        """
+        Get the value of a node.
+
+        :param name: node name.
+        :return: value (the integer value for enumerations).
+        """
+        return self[name].value
+
+    def set_value(self, name, value):
+        """
+        Set the value of a node.
+
+        :param name: node name.
+        :param value: value, or symbolic value (str) for enumerations.
+        """
+        handle = self[name]
+        if handle.interface_type == st.EGCInterfaceType.IEnumeration and \
+                isinstance(value, str):
+            handle.symbolic_value = value
+        else:
+            handle.value = value
+
+    def invalidate(self):
+        """Drop all cached values (e.g. after loading a user set)."""
+        for handle in list(self._handles.values()):
+            if handle is not None:
+                handle.invalidate()
+
+    def statistics(self) -> dict:
+        """
+        Get the cache statistics.
+
+        :return: dict with the number of handles, reads and cache hits.
+        """
+        handles = [handle for handle in list(self._handles.values())
+                   if handle is not None]
+        return {'handles': len(handles),
+                'reads': sum(handle.read_count for handle in handles),
+                'hits': sum(handle.hit_count for handle in handles)}
+
+    def close(self):
+        """Deregister the node callbacks and drop the handles."""
+        with self._lock:
+            handles, self._handles = self._handles, {}
+        for handle in handles.values():
+            if handle is not None:
+                handle.release()
@@ -0,0 +1,125 @@
+"""
+ This sample compares the node access used by the samples (get_node() and
+ cast for every access) with the cached handles of CNodeRegistry.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Connect to camera
+ - Read Width, ExposureTime and the symbolic PixelFormat with get_node()
+   and PyIInteger/PyIFloat/PyIEnumeration for every read
+ - Read them with CNodeRegistry, resolving and casting the nodes once
+ - Check that a value written without the registry invalidates its cache
+ - Display the timing of the lookups and of the reads
+"""
+
+import time
+
+import stapipy as st
+
+from node_registry import CNodeRegistry
+
+# Number of accesses for each measurement.
+number_of_iterations = 10000
+
+# Feature names
+WIDTH = "Width"
+EXPOSURE_TIME = "ExposureTime"
+PIXEL_FORMAT = "PixelFormat"
+
+
+def lookup_per_access(nodemap):
+    """
+    Resolve and cast the nodes as the samples do.
+
+    :param nodemap: node map.
+    """
+    st.PyIInteger(nodemap.get_node(WIDTH))
+    st.PyIFloat(nodemap.get_node(EXPOSURE_TIME))
+    st.PyIEnumeration(nodemap.get_node(PIXEL_FORMAT))
+
+
+def read_per_access(nodemap):
+    """
+    Read the values as the samples do.
+
+    :param nodemap: node map.
+    :return: tuple of the values.
+    """
+    width = st.PyIInteger(nodemap.get_node(WIDTH)).value
+    exposure_time = st.PyIFloat(nodemap.get_node(EXPOSURE_TIME)).value
+    pixel_format = st.PyIEnumeration(nodemap.get_node(PIXEL_FORMAT))
+    return (width, exposure_time,
+            st.PyIEnumEntry(pixel_format.current_entry).symbolic_value)
+
+
+def measure(function, argument) -> float:
+    """
+    Measure the average time of function(argument).
+
+    :param function: access function.
+    :param argument: argument of the function.
+    :return: average time per call in microseconds.
+    """
+    function(argument)
+    start_time = time.perf_counter()
+    for _ in range(number_of_iterations):
+        function(argument)
+    return (time.perf_counter() - start_time) * 1000000.0 / \
+        number_of_iterations
+
+
+if __name__ == "__main__":
+    try:
+        # Initialize StApi before using.
+        st.initialize()
+
+        # Create a system object for device scan and connection.
+        st_system = st.create_system()
+
+        # Connect to first detected device.
+        st_device = st_system.create_first_device()
+
+        # Display DisplayName of the device.
+        print('Device=', st_device.info.display_name)
+
+        nodemap = st_device.remote_port.nodemap
+        with CNodeRegistry(nodemap) as registry:
+            width = registry[WIDTH]
+            exposure_time = registry[EXPOSURE_TIME]
+            pixel_format = registry[PIXEL_FORMAT]
+
+            def lookup_cached(registry):
+                registry.get(WIDTH)
+                registry.get(EXPOSURE_TIME)
+                registry.get(PIXEL_FORMAT)
+
+            def read_cached(registry):
+                return (width.value, exposure_time.value,
+                        pixel_format.symbolic_value)
+
+            # Check that both accesses give the same values.
+            print("Values:", read_per_access(nodemap),
+                  "identical" if read_per_access(nodemap) ==
+                  read_cached(registry) else "DIFFERENT")
+
+            lookup_ms = measure(lookup_per_access, nodemap)
+            registry_lookup_ms = measure(lookup_cached, registry)
+            print("Lookup: per-access={0:.2f}[us] registry={1:.2f}[us] "
+                  "x{2:.1f}".format(lookup_ms, registry_lookup_ms,
+                                    lookup_ms / registry_lookup_ms))
+            read_ms = measure(read_per_access, nodemap)
+            registry_read_ms = measure(read_cached, registry)
+            print("Read: per-access={0:.2f}[us] registry={1:.2f}[us] "
+                  "x{2:.1f}".format(read_ms, registry_read_ms,
+                                    read_ms / registry_read_ms))
+
+            # Write without the registry: the node callback drops the cache.
+            node = st.PyIFloat(nodemap.get_node(EXPOSURE_TIME))
+            node.value = node.value * 2
+            print("ExposureTime after write: node={0} registry={1} {2}"
+                  .format(node.value, exposure_time.value,
+                          "identical" if node.value == exposure_time.value
+                          else "DIFFERENT"))
+            print("Cache:", registry.statistics())
+
+    except Exception as exception:
+        print(exception)
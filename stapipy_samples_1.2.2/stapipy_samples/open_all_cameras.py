@@ -0,0 +1,94 @@
+"""
+ This sample shows how to discover and open all the cameras of all the
+ GenTL producers in parallel, then get images from them.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Create the systems of all available GenTL producers
+ - Update the device lists of all interfaces concurrently
+ - Open the cameras and create their datastreams in a thread pool, with a
+   limited number of opens at the same time on each interface
+ - Display the time taken by each interface and camera
+ - Acquire image from the list of camera
+ Set MAX_OPENS_PER_INTERFACE to 1 to open the cameras of an interface one
+ by one and compare the total time.
+"""
+
+import time
+
+import stapipy as st
+
+from device_discovery import CDeviceDiscovery, create_systems
+
+# Number of images to grab
+number_of_images_to_grab = 10
+
+# Maximum number of cameras opened at the same time on one interface.
+MAX_OPENS_PER_INTERFACE = 4
+
+try:
+    # Initialize StApi before using.
+    st.initialize()
+
+    # Create the systems of all available GenTL producers.
+    systems = create_systems()
+
+    # Discover and open all the cameras.
+    start_time = time.perf_counter()
+    discovery = CDeviceDiscovery(systems, MAX_OPENS_PER_INTERFACE)
+    reports = discovery.open_all()
+    total_time = time.perf_counter() - start_time
+
+    # Display the time taken by each interface and camera.
+    for interface_id, update_time in discovery.interface_times.items():
+        print("Interface {0}: update={1:.1f}[ms]".format(
+              interface_id, update_time * 1000.0))
+        if interface_id in discovery.interface_errors:
+            print("Interface {0}: {1}".format(
+                  interface_id, discovery.interface_errors[interface_id]))
+    for report in reports:
+        if report.is_opened:
+            print("{0} ({1}): wait={2:.1f}[ms] open={3:.1f}[ms] "
+                  "datastream={4:.1f}[ms]".format(
+                      report.display_name, report.serial_number,
+                      report.wait_time * 1000.0, report.open_time * 1000.0,
+                      report.datastream_time * 1000.0))
+        else:
+            print("{0} ({1}): {2}".format(report.display_name,
+                                          report.serial_number,
+                                          report.error))
+    print("{0} cameras opened in {1:.1f}[ms]".format(
+          len(discovery.devices), total_time * 1000.0))
+
+    if not discovery.devices:
+        raise RuntimeError("No camera could be opened.")
+    device_list = discovery.device_list
+    stream_list = discovery.datastream_list
+
+    # Start the image acquisition of the host side.
+    stream_list.start_acquisition(number_of_images_to_grab)
+
+    # Start the image acquisition of the camera side.
+    device_list.acquisition_start()
+
+    # Loop for aquiring data and checking status
+    while stream_list.is_grabbing_any:
+        # Retrieve data buffer of image data from any camera with a timeout
+        # of 5000ms.
+        with stream_list.retrieve_buffer(5000) as st_buffer:
+            # Check if the acquired data contains image data.
+            if st_buffer.info.is_image_present:
+                print("{0} : BlockID={1} {2:.2f}FPS".format(
+                      st_buffer.datastream.device.info.display_name,
+                      st_buffer.info.frame_id,
+                      st_buffer.datastream.current_fps))
+            else:
+                print("Image data does not exist.")
+
+    # Stop the image acquisition of the camera side.
+    device_list.acquisition_stop()
+
+    # Stop the image acquisition of the host side.
+    stream_list.stop_acquisition()
+
+except Exception as exception:
+    print(exception)
@@ -0,0 +1,55 @@
+"""
+ This sample shows how to reduce the open time of the cameras with the
+ GenApi cache, and how to keep the XML file of each camera model.
+ The following points will be demonstrated in this sample code:
+ - Enable the GenApi cache before initializing StApi
+ - Initialize StApi
+ - Open all the cameras and measure the open time of each camera
+ - Save the XML file of each camera model once in the cache directory
+ Run this sample twice: the second run builds the nodemaps from the
+ GenApi cache. Set USE_GENICAM_CACHE to False to measure without it.
+"""
+
+import os
+import tempfile
+
+import stapipy as st
+
+from xml_cache import CXmlCache, enable_genicam_cache, measure_open
+
+# Cache directories.
+CACHE_DIRECTORY = os.path.join(tempfile.gettempdir(), "genicam_cache")
+XML_DIRECTORY = os.path.join(tempfile.gettempdir(), "xml_cache")
+
+# True to enable the GenApi cache.
+USE_GENICAM_CACHE = True
+
+try:
+    # Enable the GenApi cache before StApi loads GenApi.
+    if USE_GENICAM_CACHE:
+        print("GenApi cache:", enable_genicam_cache(CACHE_DIRECTORY))
+
+    # Initialize StApi before using.
+    st.initialize()
+
+    # Create a system object for device scan and connection.
+    st_system = st.create_system()
+
+    # Open all the cameras.
+    results = measure_open(st_system)
+
+    # Save the XML file of each camera model.
+    xml_cache = CXmlCache(XML_DIRECTORY)
+    total_time = 0.0
+    for st_device, open_time, nodemap_time in results:
+        filename, is_saved = xml_cache.store(st_device.remote_port)
+        total_time += open_time + nodemap_time
+        print("{0}: open={1:.1f}[ms] nodemap={2:.1f}[ms] XML={3} ({4})"
+              .format(st_device.info.display_name, open_time * 1000.0,
+                      nodemap_time * 1000.0, os.path.basename(filename),
+                      "saved" if is_saved else "cached"))
+    print("{0} cameras: {1:.1f}[ms]".format(len(results),
+                                            total_time * 1000.0))
+
+except Exception as exception:
+    print(exception)
@@ -0,0 +1,352 @@
+"""
+ This module provides a declarative image processing chain of StApi
+ converters, StApi filters and NumPy functions.
+ The following points are covered by this module:
+ - Describe the chain as a list of stages (CConverterStage, CFilterStage,
+   CNdarrayStage)
+ - Fuse a vertical Reverse converter into the following PixelFormat
+   converter (PyStPixelFormatConverter.reverse_y)
+ - Reuse the input copy (PyStImage.create_buffer) and the NumPy output
+   arrays of each processing context instead of allocating them per frame
+ - Run the chain for several frames in a thread pool and deliver the
+   results in the order of submission
+ - Measure the time of each stage
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import collections
+import concurrent.futures
+import threading
+import time
+
+import numpy as np
+import stapipy as st
+
+from image_ndarray import as_ndarray
+from latency_stats import CLatencyStats
+
+
+class CConverterStage:
+    """
+    Stage converting the image with a PyStConverter.
+    """
+
+    def __init__(self, converter_type, name=None, **settings):
+        """
+        :param converter_type: EStConverterType.
+        :param name: name of the stage in the statistics.
+        :param settings: properties set to the converter (e.g.
+            destination_pixel_format=st.EStPixelFormatNamingConvention.BGR8).
+        """
+        self.converter_type = converter_type
+        self.name = name if name else converter_type.name
+        self.settings = settings
+
+    def create(self):
+        """Create the converter of one processing context."""
+        st_converter = st.create_converter(self.converter_type)
+        for key, value in self.settings.items():
+            setattr(st_converter, key, value)
+        return st_converter
+
+    @staticmethod
+    def run(st_converter, st_image, out):
+        """Convert the image. The converter allocates the result."""
+        return st_converter.convert(st_image)
+
+
+class CFilterStage:
+    """
+    Stage applying a PyStFilter. The filter overwrites its input image.
+    """
+
+    def __init__(self, filter_type, name=None, **settings):
+        """
+        :param filter_type: EStFilterType.
+        :param name: name of the stage in the statistics.
+        :param settings: properties set to the filter (e.g. strength=5).
+        """
+        self.filter_type = filter_type
+        self.name = name if name else filter_type.name
+        self.settings = settings
+
+    def create(self):
+        """Create the filter of one processing context."""
+        st_filter = st.create_filter(self.filter_type)
+        for key, value in self.settings.items():
+            setattr(st_filter, key, value)
+        return st_filter
+
+    @staticmethod
+    def run(st_filter, st_image, out):
+        """Apply the filter in place."""
+        return st_filter.apply_filter(st_image)
+
+
+class CNdarrayStage:
+    """
+    Stage processing a NumPy array.
+
+    func(nparr, out) gets the input as numpy.ndarray (a read-only view of
+    the PyStImage for the first NumPy stage) and out, the array it returned
+    for the previous frame of the same processing context (None the first
+    time). It returns the result, typically out after filling it.
+    """
+
+    def __init__(self, func, name=None):
+        """
+        :param func: function(nparr, out) returning numpy.ndarray.
+        :param name: name of the stage in the statistics.
+        """
+        self.func = func
+        self.name = name if name else func.__name__
+
+    def create(self):
+        """Nothing to create."""
+        return None
+
+    def run(self, instance, nparr, out):
+        """Call func."""
+        if not isinstance(nparr, np.ndarray):
+            nparr = as_ndarray(nparr)
+        return self.func(nparr, out)
+
+
+def fuse_stages(stages):
+    """
+    Fuse the stages which can run as one StApi call.
+
+    A Reverse converter which only sets reverse_y, followed by a
+    PixelFormat converter, becomes one PixelFormat converter with reverse_y.
+
+    :param stages: list of stages.
+    :return: list of stages.
+    """
+    fused = []
+    for stage in stages:
+        previous = fused[-1] if fused else None
+        if isinstance(stage, CConverterStage) and \
+                isinstance(previous, CConverterStage) and \
+                previous.converter_type == st.EStConverterType.Reverse and \
+                set(previous.settings) <= {'reverse_y'} and \
+                stage.converter_type == st.EStConverterType.PixelFormat:
+            settings = dict(stage.settings)
+            settings['reverse_y'] = settings.get('reverse_y', False) != \
+                previous.settings.get('reverse_y', False)
+            fused[-1] = CConverterStage(
+                stage.converter_type, previous.name + '+' + stage.name,
+                **settings)
+        else:
+            fused.append(stage)
+    return fused
+
+
+class CChainContext:
+    """
+    Converters, filters and reusable buffers used to process one frame.
+    """
+
+    def __init__(self, stages):
+        self.instances = [stage.create() for stage in stages]
+        self.outputs = [None] * len(stages)
+        self.input_image = None
+        self.is_input_reusable = True
+
+    def copy_input(self, st_image):
+        """
+        Copy an image into the reusable input image.
+
+        :param st_image: PyStImage (e.g. of a stream buffer).
+        :return: PyStImage owned by this context.
+        """
+        input_image = self.input_image
+        if input_image is None or input_image.width != st_image.width or \
+                input_image.height != st_image.height or \
+                input_image.pixel_format != st_image.pixel_format:
+            input_image = st.PyStImage.create_buffer(
+                st_image.width, st_image.height, st_image.pixel_format)
+            self.input_image = input_image
+            # The data can be copied as is only with the same padding.
+            self.is_input_reusable = \
+                input_image.line_pitch == st_image.line_pitch
+        if self.is_input_reusable:
+            source = st_image.get_image_data().cast('B')
+            try:
+                input_image.get_image_data().cast('B')[:source.nbytes] = \
+                    source
+                return input_image
+            except TypeError:
+                # The image data is read-only.
+                self.is_input_reusable = False
+        return st_image.clone()
+
+
+class CProcessingChain:
+    """
+    Class that runs a chain of stages on a thread pool.
+
+    Each frame in flight uses one CChainContext: its converters and
+    filters are not shared with other threads, and its buffers are reused
+    once result_func has returned for the frame. StApi converters allocate
+    their result image, so only the input copy and the NumPy outputs are
+    reused. The results must not be kept after result_func returns; copy
+    them if needed.
+    """
+
+    def __init__(self, stages, result_func, worker_count=2,
+                 max_pending_count=None, fuse=True):
+        """
+        :param stages: list of CConverterStage, CFilterStage and
+            CNdarrayStage, run in order. NumPy stages must be the last ones.
+        :param result_func: function(frame_id, result) called in order of
+            submission in the delivery thread.
+        :param worker_count: number of worker threads.
+        :param max_pending_count: maximum number of frames in flight
+            (default: twice worker_count). submit() waits when reached.
+        :param fuse: True to fuse the stages with fuse_stages().
+        """
+        if fuse:
+            stages = fuse_stages(stages)
+        is_ndarray = False
+        for stage in stages:
+            if isinstance(stage, CNdarrayStage):
+                is_ndarray = True
+            elif is_ndarray:
+                raise ValueError("StApi stages must precede the NumPy "
+                                 "stages.")
+        self.stages = stages
+        self._result_func = result_func
+        if max_pending_count is None:
+            max_pending_count = worker_count * 2
+        self._contexts = collections.deque(
+            CChainContext(stages) for _ in range(max_pending_count))
+        self._condition = threading.Condition()
+        self._executor = concurrent.futures.ThreadPoolExecutor(worker_count)
+        self._pending = collections.deque()
+        self._is_closed = False
+        self._error = None
+        self._delivered_count = 0
+        self._deliverer = threading.Thread(target=self._deliver)
+        self._deliverer.start()
+        self.stage_stats = collections.OrderedDict(
+            (stage.name, CLatencyStats()) for stage in stages)
+        self.total_stats = CLatencyStats()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def stage_names(self) -> list:
+        """Property: names of the stages after fusion."""
+        return [stage.name for stage in self.stages]
+
+    @property
+    def delivered_count(self) -> int:
+        """Property: number of results delivered to result_func."""
+        return self._delivered_count
+
+    def submit(self, frame_id, st_image):
+        """
+        Copy an image and queue it. Waits while max_pending_count frames
+        are in flight.
+
+        :param frame_id: ID given to result_func with the result.
+        :param st_image: PyStImage. It can be released after this call.
+        """
+        with self._condition:
+            while not self._contexts:
+                self._condition.wait()
+            if self._error is not None:
+                raise self._error
+            context = self._contexts.popleft()
+        submitted_time = time.perf_counter()
+        image = context.copy_input(st_image)
+        future = self._executor.submit(self._run, context, image)
+        with self._condition:
+            self._pending.append((frame_id, context, future, submitted_time))
+            self._condition.notify_all()
+
+    def process(self, st_image):
+        """
+        Run the chain on the calling thread, without copying the input.
+
+        :param st_image: PyStImage. It is overwritten by a filter stage.
+        :return: result of the last stage. It is valid until the next call
+            of process().
+        """
+        with self._condition:
+            while not self._contexts:
+                self._condition.wait()
+            context = self._contexts.popleft()
+        try:
+            return self._run(context, st_image)
+        finally:
+            with self._condition:
+                self._contexts.appendleft(context)
+                self._condition.notify_all()
+
+    def close(self):
+        """
+        Deliver the queued frames and stop the threads. An exception raised
+        by a stage or result_func is raised again here.
+        """
+        with self._condition:
+            self._is_closed = True
+            self._condition.notify_all()
+        self._deliverer.join()
+        self._executor.shutdown()
+        if self._error is not None:
+            raise self._error
+
+    def statistics(self) -> dict:
+        """
+        Get the time of each stage.
+
+        :return: dict of latency summaries in milliseconds for each stage
+            name and 'total', and the number of delivered results.
+        """
+        statistics = collections.OrderedDict(
+            (name, stats.summary())
+            for name, stats in self.stage_stats.items())
+        statistics['total'] = self.total_stats.summary()
+        statistics['delivered'] = self._delivered_count
+        return statistics
+
+    def _run(self, context, data):
+        """Run the stages in a worker thread."""
+        for index, stage in enumerate(self.stages):
+            start_time = time.perf_counter()
+            data = stage.run(context.instances[index], data,
+                             context.outputs[index])
+            if isinstance(stage, CNdarrayStage):
+                context.outputs[index] = data
+            self.stage_stats[stage.name].add(
+                time.perf_counter() - start_time)
+        return data
+
+    def _deliver(self):
+        """Delivery thread: call result_func in the order of submission."""
+        while True:
+            with self._condition:
+                while not self._pending and not self._is_closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                frame_id, context, future, submitted_time = \
+                    self._pending.popleft()
+            try:
+                result = future.result()
+                self.total_stats.add(time.perf_counter() - submitted_time)
+                if self._error is None:
+                    self._result_func(frame_id, result)
+                    self._delivered_count += 1
+            except Exception as exception:
+                if self._error is None:
+                    self._error = exception
+            with self._condition:
+                self._contexts.append(context)
+                self._condition.notify_all()
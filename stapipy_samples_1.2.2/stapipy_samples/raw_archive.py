@@ -0,0 +1,429 @@
+"""
+ This module provides a container file for recorded raw frames with an
+ index for random access.
+ The following points are covered by this module:
+ - Append raw frames and their metadata (frame_id, timestamp_ns,
+   pixel_format, width, height, chunk values) into one archive file
+ - Write an index of all frames at the end of the file, so that opening
+   an archive only reads the footer regardless of its size
+ - Find frames by frame_id or by a range of frame IDs or timestamps
+ - Get frames as zero-copy NumPy views, mapping only the frame (an
+   archive can be larger than the address space), or as PyStImage
+ - Iterate with decimation and process frames in a thread pool
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import concurrent.futures
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+import stapipy as st
+
+from image_ndarray import create_ndarray, get_ndarray_layout
+
+# Identifiers and version of the archive file.
+ARCHIVE_FILE_MAGIC = b'STRAWARC'
+ARCHIVE_INDEX_MAGIC = b'STARCIDX'
+ARCHIVE_FILE_VERSION = 2
+
+# Versions which can be read. Version 1 has no line pitch (packed lines).
+_READABLE_VERSIONS = (1, 2)
+
+# File header: magic, version. The frames start at _FRAME_ALIGNMENT.
+_FILE_HEADER = struct.Struct('<8sI')
+
+# Trailer at the end of the file: index offset, frame count, size of the
+# JSON list of the chunk names, index magic.
+_TRAILER = struct.Struct('<QQQ8s')
+
+# The image data of each frame is aligned to the page size.
+_FRAME_ALIGNMENT = 4096
+
+# Flags of a frame.
+FRAME_FLAG_INCOMPLETE = 1
+
+
+def _get_index_dtype(chunk_count):
+    """Get the dtype of one index entry."""
+    return np.dtype([('frame_id', '<i8'), ('timestamp_ns', '<i8'),
+                     ('offset', '<u8'), ('data_size', '<u4'),
+                     ('pixel_format', '<u4'), ('width', '<u4'),
+                     ('height', '<u4'), ('flags', '<u4'),
+                     ('line_pitch', '<u4'),
+                     ('chunk_values', '<f8', (chunk_count,))])
+
+
+class CArchiveFrame:
+    """
+    Metadata of one frame in an archive.
+    """
+    __slots__ = ('position', 'frame_id', 'timestamp_ns', 'pixel_format',
+                 'width', 'height', 'line_pitch', 'is_incomplete',
+                 'chunk_values')
+
+    def __init__(self, position, entry, chunk_names):
+        self.position = position
+        self.frame_id = int(entry['frame_id'])
+        self.timestamp_ns = int(entry['timestamp_ns'])
+        self.pixel_format = int(entry['pixel_format'])
+        self.width = int(entry['width'])
+        self.height = int(entry['height'])
+        self.line_pitch = int(entry['line_pitch'])
+        self.is_incomplete = bool(entry['flags'] & FRAME_FLAG_INCOMPLETE)
+        self.chunk_values = dict(zip(chunk_names,
+                                     entry['chunk_values'].tolist()))
+
+
+class CRawArchiveWriter:
+    """
+    Class that appends raw frames to an archive file and writes the index
+    when it is closed. An archive without index (e.g. the writer crashed)
+    cannot be opened.
+    """
+
+    def __init__(self, path, chunk_names=()):
+        """
+        :param path: path of the archive file. It is overwritten.
+        :param chunk_names: names of the chunk values of each frame.
+        """
+        self._chunk_names = list(chunk_names)
+        self._file = open(path, 'wb')
+        self._file.write(_FILE_HEADER.pack(ARCHIVE_FILE_MAGIC,
+                                           ARCHIVE_FILE_VERSION))
+        self._offset = _FILE_HEADER.size
+        self._padding = bytes(_FRAME_ALIGNMENT)
+        self._entries = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def frame_count(self) -> int:
+        """Property: number of frames written."""
+        return len(self._entries)
+
+    def write(self, buffer_info, st_image, chunk_values=()):
+        """
+        Write a retrieved image.
+
+        :param buffer_info: PyStStreamBufferInfo of the buffer.
+        :param st_image: PyStImage of the buffer.
+        :param chunk_values: values in the order of chunk_names.
+        """
+        self.write_frame(
+            buffer_info.frame_id, buffer_info.timestamp_ns,
+            st_image.pixel_format.value, st_image.width, st_image.height,
+            st_image.get_image_data(), chunk_values,
+            buffer_info.is_incomplete, st_image.line_pitch)
+
+    def write_raw_frame(self, raw_frame):
+        """
+        Write a frame read from a ring file of CRawRingRecorder.
+
+        :param raw_frame: CRawFrame.
+        """
+        self.write_frame(
+            raw_frame.frame_id, raw_frame.timestamp_ns,
+            raw_frame.pixel_format, raw_frame.width, raw_frame.height,
+            raw_frame.data, [raw_frame.chunk_values.get(name, np.nan)
+                             for name in self._chunk_names],
+            line_pitch=raw_frame.line_pitch)
+
+    def write_frame(self, frame_id, timestamp_ns, pixel_format, width,
+                    height, data, chunk_values=(), is_incomplete=False,
+                    line_pitch=None):
+        """
+        Append a frame.
+
+        :param frame_id: frame ID.
+        :param timestamp_ns: timestamp in nanoseconds.
+        :param pixel_format: value of EStPixelFormatNamingConvention.
+        :param width: width of the image.
+        :param height: height of the image.
+        :param data: bytes-like object of the image data.
+        :param chunk_values: values in the order of chunk_names.
+        :param is_incomplete: True if the frame is incomplete.
+        :param line_pitch: number of bytes of one line, or None to divide
+            the size of data by height.
+        """
+        if len(chunk_values) != len(self._chunk_names):
+            raise ValueError("{0} chunk values are required.".format(
+                len(self._chunk_names)))
+        data = memoryview(data).cast('B')
+        if line_pitch is None:
+            line_pitch = data.nbytes // height if height else 0
+
+        # Align the image data.
+        padding_size = -self._offset % _FRAME_ALIGNMENT
+        if padding_size:
+            self._file.write(self._padding[:padding_size])
+            self._offset += padding_size
+        self._file.write(data)
+        self._entries.append((frame_id, timestamp_ns, self._offset,
+                              data.nbytes, pixel_format, width, height,
+                              FRAME_FLAG_INCOMPLETE if is_incomplete else 0,
+                              line_pitch, tuple(chunk_values)))
+        self._offset += data.nbytes
+
+    def close(self):
+        """Write the index and close the archive file."""
+        if self._file is None:
+            return
+        index = np.array(self._entries,
+                         _get_index_dtype(len(self._chunk_names)))
+        names = json.dumps(self._chunk_names).encode('utf-8')
+        padding_size = -self._offset % 8
+        self._file.write(self._padding[:padding_size])
+        index_offset = self._offset + padding_size
+        self._file.write(index.tobytes())
+        self._file.write(names)
+        self._file.write(_TRAILER.pack(index_offset, len(index), len(names),
+                                       ARCHIVE_INDEX_MAGIC))
+        self._file.close()
+        self._file = None
+
+
+class CRawArchiveReader:
+    """
+    Class that reads an archive file with random access.
+
+    Opening reads the header, the trailer and the index only, so it does
+    not depend on the size of the image data. The image data of a frame
+    is memory-mapped when it is requested; the mapping belongs to the
+    returned view and is released with it. The lookup tables by frame ID
+    and timestamp are sorted on first use.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of the archive file.
+        """
+        self._file = open(path, 'rb')
+        try:
+            self._read_index(path)
+        except Exception:
+            self._file.close()
+            raise
+        self._frame_id_order = None
+        self._timestamp_order = None
+        self._layouts = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def chunk_names(self) -> list:
+        """Property: names of the chunk values."""
+        return list(self._chunk_names)
+
+    def get_frame(self, position) -> CArchiveFrame:
+        """
+        Get the metadata of a frame.
+
+        :param position: position of the frame in the archive.
+        :return: CArchiveFrame.
+        """
+        return CArchiveFrame(position, self.index[position],
+                             self._chunk_names)
+
+    def find_frame_id(self, frame_id) -> int:
+        """
+        Find a frame by its frame ID.
+
+        :param frame_id: frame ID.
+        :return: position of the frame.
+        """
+        order = self._get_frame_id_order()
+        frame_ids = self.index['frame_id']
+        found = np.searchsorted(frame_ids[order], frame_id)
+        if found == len(order) or frame_ids[order[found]] != frame_id:
+            raise KeyError("Frame ID {0} is not found.".format(frame_id))
+        return int(order[found])
+
+    def find_frame_id_range(self, first_frame_id, last_frame_id):
+        """
+        Find the frames with frame_id from first_frame_id to last_frame_id.
+
+        :param first_frame_id: first frame ID.
+        :param last_frame_id: last frame ID (included).
+        :return: numpy.ndarray of the positions in the order of frame ID.
+        """
+        order = self._get_frame_id_order()
+        frame_ids = self.index['frame_id'][order]
+        return order[np.searchsorted(frame_ids, first_frame_id, 'left'):
+                     np.searchsorted(frame_ids, last_frame_id, 'right')]
+
+    def find_time_range(self, begin_ns, end_ns):
+        """
+        Find the frames with begin_ns <= timestamp_ns < end_ns.
+
+        :param begin_ns: first timestamp in nanoseconds.
+        :param end_ns: end of the range in nanoseconds (excluded).
+        :return: numpy.ndarray of the positions in the order of timestamp.
+        """
+        order = self._get_timestamp_order()
+        timestamps = self.index['timestamp_ns'][order]
+        return order[np.searchsorted(timestamps, begin_ns, 'left'):
+                     np.searchsorted(timestamps, end_ns, 'left')]
+
+    def get_ndarray(self, position):
+        """
+        Get a read-only NumPy view of the image data of a frame. Only the
+        frame is mapped (no copy); the mapping is released with the view.
+
+        :param position: position of the frame in the archive.
+        :return: numpy.ndarray with shape (height, width) or
+            (height, width, components), with the line pitch as stride.
+        """
+        entry = self.index[position]
+        mapped, data_offset = self._map_frame(entry)
+        return create_ndarray(mapped, int(entry['width']),
+                              int(entry['height']), int(entry['line_pitch']),
+                              self._get_layout(int(entry['pixel_format'])),
+                              data_offset)
+
+    def get_image(self, position):
+        """
+        Get a frame as PyStImage. The data is copied without the line
+        padding.
+
+        :param position: position of the frame in the archive.
+        :return: PyStImage.
+        """
+        entry = self.index[position]
+        # tobytes() copies the lines without the padding of line_pitch.
+        data = self.get_ndarray(position).tobytes()
+        return st.PyStImage.create_from_data(
+            int(entry['width']), int(entry['height']),
+            st.EStPixelFormatNamingConvention(int(entry['pixel_format'])),
+            data)
+
+    def frames(self, positions=None, step=1):
+        """
+        Iterate the frames.
+
+        :param positions: positions to iterate (default: all frames in
+            the order of writing).
+        :param step: decimation; every step-th position is iterated.
+        :return: generator of (CArchiveFrame, numpy.ndarray).
+        """
+        if positions is None:
+            positions = range(len(self.index))
+        for position in positions[::step]:
+            position = int(position)
+            yield self.get_frame(position), self.get_ndarray(position)
+
+    def map(self, func, positions=None, step=1, worker_count=4):
+        """
+        Process the frames in a thread pool. NumPy and OpenCV release the
+        GIL, so the frames are processed in parallel.
+
+        :param func: function(CArchiveFrame, numpy.ndarray) for one frame.
+        :param positions: positions to process (default: all frames).
+        :param step: decimation; every step-th position is processed.
+        :param worker_count: number of worker threads.
+        :return: list of the return values in the order of positions.
+        """
+        if positions is None:
+            positions = range(len(self.index))
+        with concurrent.futures.ThreadPoolExecutor(worker_count) as executor:
+            return list(executor.map(
+                lambda position: func(self.get_frame(int(position)),
+                                      self.get_ndarray(int(position))),
+                positions[::step]))
+
+    def close(self):
+        """
+        Close the archive file. The views returned by get_ndarray() own
+        their mapping and can still be used.
+        """
+        if self._file is None:
+            return
+        self.index = None
+        self._file.close()
+        self._file = None
+
+    def _get_frame_id_order(self):
+        if self._frame_id_order is None:
+            self._frame_id_order = np.argsort(self.index['frame_id'],
+                                              kind='stable')
+        return self._frame_id_order
+
+    def _get_timestamp_order(self):
+        if self._timestamp_order is None:
+            self._timestamp_order = np.argsort(self.index['timestamp_ns'],
+                                               kind='stable')
+        return self._timestamp_order
+
+    def _get_layout(self, pixel_format):
+        """Get the layout (see get_ndarray_layout) of a pixel format."""
+        layout = self._layouts.get(pixel_format)
+        if layout is None:
+            layout = self._layouts[pixel_format] = get_ndarray_layout(
+                st.get_pixel_format_info(
+                    st.EStPixelFormatNamingConvention(pixel_format)))
+        return layout
+
+    def _read(self, offset, size):
+        """Read size bytes at offset of the file."""
+        self._file.seek(offset)
+        data = self._file.read(size)
+        if len(data) != size:
+            raise ValueError("{0} is truncated.".format(self._file.name))
+        return data
+
+    def _read_index(self, path):
+        """Check the header and the trailer, and read the index."""
+        file_size = os.fstat(self._file.fileno()).st_size
+        is_valid = file_size >= _FILE_HEADER.size + _TRAILER.size
+        if is_valid:
+            magic, version = _FILE_HEADER.unpack(
+                self._read(0, _FILE_HEADER.size))
+            index_offset, frame_count, names_size, index_magic = \
+                _TRAILER.unpack(self._read(file_size - _TRAILER.size,
+                                           _TRAILER.size))
+            is_valid = magic == ARCHIVE_FILE_MAGIC and \
+                version in _READABLE_VERSIONS and \
+                index_magic == ARCHIVE_INDEX_MAGIC
+        if not is_valid:
+            # e.g. the writer was not closed.
+            raise ValueError("{0} is not a complete archive file."
+                             .format(path))
+        names_offset = file_size - _TRAILER.size - names_size
+        self._chunk_names = json.loads(
+            self._read(names_offset, names_size).decode('utf-8'))
+        index_dtype = _get_index_dtype(len(self._chunk_names))
+        self.index = np.frombuffer(bytearray(self._read(
+            index_offset, frame_count * index_dtype.itemsize)), index_dtype)
+        if version == 1:
+            # The lines are packed.
+            heights = np.maximum(self.index['height'], 1)
+            self.index['line_pitch'] = self.index['data_size'] // heights
+
+    def _map_frame(self, entry):
+        """
+        Map the image data of a frame.
+
+        :return: tuple of (mmap, offset of the image data in the mmap).
+        """
+        offset = int(entry['offset'])
+        map_offset = offset - offset % mmap.ALLOCATIONGRANULARITY
+        data_offset = offset - map_offset
+        # A length of 0 would map the whole file.
+        length = max(data_offset + int(entry['data_size']), 1)
+        return mmap.mmap(self._file.fileno(), length,
+                         access=mmap.ACCESS_READ,
+                         offset=map_offset), data_offset
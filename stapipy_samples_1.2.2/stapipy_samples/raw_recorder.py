@@ -0,0 +1,390 @@
+"""
+ This module provides a raw burst recorder writing the frames into a
+ preallocated memory-mapped ring file.
+ The following points are covered by this module:
+ - Preallocate a file of fixed-size slots and map it into memory
+ - Append the raw image data and the buffer metadata (frame_id,
+   timestamp_ns, pixel_format, width, height, line_pitch and chunk
+   values) in O(1)
+   without system calls or allocation of buffers per frame
+ - Keep only the latest frames (e.g. the last N seconds) in the ring
+ - Freeze the ring on an event, optionally after a number of post-trigger
+   frames
+ - Read the recorded frames back in the order of acquisition
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+
+# Identifier and version of the ring file.
+RING_FILE_MAGIC = b'STRAWRNG'
+RING_FILE_VERSION = 2
+
+# Versions which can be read. Version 1 has no line pitch (packed lines).
+_READABLE_VERSIONS = (1, 2)
+
+# File header: magic, version, header size, slot count, slot size, maximum
+# data size, chunk count, frozen flag, next sequence, trigger sequence.
+# The JSON list of the chunk names follows, padded with zeros.
+_FILE_HEADER = struct.Struct('<8sIIIIIIIqq')
+_FILE_HEADER_SIZE = 4096
+_NEXT_SEQUENCE_OFFSET = 36
+_FROZEN_OFFSET = 32
+_TRIGGER_SEQUENCE_OFFSET = 44
+
+# Slot header: sequence (0 for an empty slot), frame ID, timestamp in ns,
+# pixel format, width, height, line pitch, data size. The chunk values
+# (float64) follow.
+_SLOT_HEADER = struct.Struct('<qqqIIIII')
+
+# Slot header of version 1, without the line pitch.
+_SLOT_HEADER_V1 = struct.Struct('<qqqIIII')
+
+# Slots are aligned to the page size for fast copies.
+_SLOT_ALIGNMENT = 4096
+
+
+def _align_up(value, alignment):
+    """Round up value to a multiple of alignment."""
+    return (value + alignment - 1) // alignment * alignment
+
+
+class CRawFrame:
+    """
+    One frame read from a ring file. data is a memoryview of the mapped
+    file, valid until the reader is closed.
+    """
+    __slots__ = ('sequence', 'frame_id', 'timestamp_ns', 'pixel_format',
+                 'width', 'height', 'line_pitch', 'chunk_values', 'data')
+
+    def __init__(self, sequence, frame_id, timestamp_ns, pixel_format,
+                 width, height, line_pitch, chunk_values, data):
+        self.sequence = sequence
+        self.frame_id = frame_id
+        self.timestamp_ns = timestamp_ns
+        self.pixel_format = pixel_format
+        self.width = width
+        self.height = height
+        self.line_pitch = line_pitch
+        self.chunk_values = chunk_values
+        self.data = data
+
+
+class CRawRingRecorder:
+    """
+    Class that records raw frames into a memory-mapped ring file.
+
+    Each frame is copied into the next slot of the mapping; the operating
+    system writes the pages back to the file in the background, so the
+    acquisition loop only pays for one memory copy per frame. Call write()
+    from one thread; trigger() and freeze() may be called from any thread.
+    """
+
+    def __init__(self, path, slot_count, max_data_size, chunk_names=()):
+        """
+        :param path: path of the ring file. It is overwritten.
+        :param slot_count: number of frames kept.
+        :param max_data_size: maximum size of the image data of one frame
+            in bytes (e.g. PyStDataStreamInfo.payload_size).
+        :param chunk_names: names of the chunk values recorded with each
+            frame.
+        """
+        if slot_count <= 0 or max_data_size <= 0:
+            raise ValueError("slot_count and max_data_size must be larger "
+                             "than 0.")
+        self._chunk_names = list(chunk_names)
+        names = json.dumps(self._chunk_names).encode('utf-8')
+        if _FILE_HEADER.size + len(names) >= _FILE_HEADER_SIZE:
+            raise ValueError("Too many chunk names.")
+        self._chunk_struct = struct.Struct(
+            '<' + 'd' * len(self._chunk_names))
+        self._slot_count = slot_count
+        self._max_data_size = max_data_size
+        self._data_offset = _align_up(
+            _SLOT_HEADER.size + self._chunk_struct.size, 64)
+        self._slot_size = _align_up(self._data_offset + max_data_size,
+                                    _SLOT_ALIGNMENT)
+        file_size = _FILE_HEADER_SIZE + self._slot_size * slot_count
+
+        # Preallocate the file and map it.
+        self._file = open(path, 'w+b')
+        try:
+            if hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(self._file.fileno(), 0, file_size)
+            else:
+                self._file.truncate(file_size)
+            self._mmap = mmap.mmap(self._file.fileno(), file_size)
+        except Exception:
+            self._file.close()
+            raise
+        self._view = memoryview(self._mmap)
+        _FILE_HEADER.pack_into(
+            self._mmap, 0, RING_FILE_MAGIC, RING_FILE_VERSION,
+            _FILE_HEADER_SIZE, slot_count, self._slot_size, max_data_size,
+            len(self._chunk_names), 0, 1, 0)
+        self._mmap[_FILE_HEADER.size:_FILE_HEADER.size + len(names)] = names
+
+        self._lock = threading.Lock()
+        self._next_sequence = 1
+        self._is_frozen = False
+        self._remaining_count = -1
+        self._trigger_sequence = 0
+        self._rejected_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def slot_count_for(seconds, frame_rate) -> int:
+        """
+        Get the number of slots keeping a duration.
+
+        :param seconds: duration to keep in seconds.
+        :param frame_rate: frame rate in frames per second.
+        :return: number of slots.
+        """
+        return max(int(math.ceil(seconds * frame_rate)), 1)
+
+    @property
+    def slot_count(self) -> int:
+        """Property: number of slots in the ring."""
+        return self._slot_count
+
+    @property
+    def frame_count(self) -> int:
+        """Property: number of frames written since the file was created."""
+        return self._next_sequence - 1
+
+    @property
+    def rejected_count(self) -> int:
+        """Property: number of frames not written because of the freeze."""
+        return self._rejected_count
+
+    @property
+    def is_frozen(self) -> bool:
+        """Property: True if the ring does not accept frames any more."""
+        return self._is_frozen
+
+    def write(self, buffer_info, st_image, chunk_values=()) -> bool:
+        """
+        Write a retrieved image.
+
+        :param buffer_info: PyStStreamBufferInfo of the buffer.
+        :param st_image: PyStImage of the buffer.
+        :param chunk_values: values in the order of chunk_names.
+        :return: False if the ring is frozen.
+        """
+        return self.write_frame(
+            buffer_info.frame_id, buffer_info.timestamp_ns,
+            st_image.pixel_format.value, st_image.width, st_image.height,
+            st_image.get_image_data(), chunk_values, st_image.line_pitch)
+
+    def write_frame(self, frame_id, timestamp_ns, pixel_format, width,
+                    height, data, chunk_values=(), line_pitch=None) -> bool:
+        """
+        Write a frame into the next slot.
+
+        :param frame_id: frame ID.
+        :param timestamp_ns: timestamp in nanoseconds.
+        :param pixel_format: value of EStPixelFormatNamingConvention.
+        :param width: width of the image.
+        :param height: height of the image.
+        :param data: bytes-like object of the image data.
+        :param chunk_values: values in the order of chunk_names.
+        :param line_pitch: number of bytes of one line, or None to divide
+            the size of data by height.
+        :return: False if the ring is frozen.
+        """
+        with self._lock:
+            if self._is_frozen:
+                self._rejected_count += 1
+                return False
+            data_size = data.nbytes if isinstance(data, memoryview) \
+                else len(data)
+            if data_size > self._max_data_size:
+                raise ValueError("Image data ({0} bytes) is larger than "
+                                 "max_data_size.".format(data_size))
+            if line_pitch is None:
+                line_pitch = data_size // height if height else 0
+            sequence = self._next_sequence
+            slot_offset = _FILE_HEADER_SIZE + \
+                (sequence - 1) % self._slot_count * self._slot_size
+
+            # Invalidate the slot while it is being overwritten so that a
+            # reader of a crashed recording never gets mixed frames.
+            _SLOT_HEADER.pack_into(self._mmap, slot_offset, 0, 0, 0, 0, 0,
+                                   0, 0, 0)
+            data_offset = slot_offset + self._data_offset
+            self._view[data_offset:data_offset + data_size] = \
+                data.cast('B') if isinstance(data, memoryview) else data
+            if self._chunk_names:
+                self._chunk_struct.pack_into(
+                    self._mmap, slot_offset + _SLOT_HEADER.size,
+                    *chunk_values)
+            _SLOT_HEADER.pack_into(self._mmap, slot_offset, sequence,
+                                   frame_id, timestamp_ns, pixel_format,
+                                   width, height, line_pitch, data_size)
+            self._next_sequence = sequence + 1
+            struct.pack_into('<q', self._mmap, _NEXT_SEQUENCE_OFFSET,
+                             self._next_sequence)
+
+            # Count down the post-trigger frames.
+            if self._remaining_count > 0:
+                self._remaining_count -= 1
+                if self._remaining_count == 0:
+                    self._freeze_locked()
+            return True
+
+    def trigger(self, post_trigger_count=0):
+        """
+        Freeze the ring after a number of further frames. The frames
+        before the trigger are the pre-trigger frames.
+
+        :param post_trigger_count: number of frames written before the
+            ring is frozen (0 to freeze now).
+        """
+        with self._lock:
+            if self._is_frozen or self._trigger_sequence:
+                return
+            self._trigger_sequence = self._next_sequence
+            struct.pack_into('<q', self._mmap, _TRIGGER_SEQUENCE_OFFSET,
+                             self._trigger_sequence)
+            if post_trigger_count <= 0:
+                self._freeze_locked()
+            else:
+                self._remaining_count = post_trigger_count
+
+    def freeze(self):
+        """Stop accepting frames now."""
+        with self._lock:
+            self._freeze_locked()
+
+    def flush(self):
+        """Write the modified pages to the file (blocking)."""
+        self._mmap.flush()
+
+    def close(self):
+        """Flush and close the ring file."""
+        if self._mmap is None:
+            return
+        self._view.release()
+        self._mmap.flush()
+        self._mmap.close()
+        self._file.close()
+        self._mmap = None
+
+    def _freeze_locked(self):
+        if not self._is_frozen:
+            self._is_frozen = True
+            struct.pack_into('<I', self._mmap, _FROZEN_OFFSET, 1)
+
+
+class CRawRingReader:
+    """
+    Class that reads a ring file written by CRawRingRecorder.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of the ring file.
+        """
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        (magic, version, header_size, self._slot_count, self._slot_size,
+         self._max_data_size, chunk_count, frozen, self._next_sequence,
+         self._trigger_sequence) = _FILE_HEADER.unpack_from(self._mmap, 0)
+        if magic != RING_FILE_MAGIC or version not in _READABLE_VERSIONS:
+            self.close()
+            raise ValueError("{0} is not a ring file.".format(path))
+        self._is_frozen = bool(frozen)
+        names_end = self._mmap.find(b'\0', _FILE_HEADER.size, header_size)
+        self._chunk_names = json.loads(
+            self._mmap[_FILE_HEADER.size:names_end].decode('utf-8'))
+        self._chunk_struct = struct.Struct('<' + 'd' * chunk_count)
+        self._slot_header = _SLOT_HEADER if version >= 2 else _SLOT_HEADER_V1
+        self._data_offset = _align_up(
+            self._slot_header.size + self._chunk_struct.size, 64)
+        self._header_size = header_size
+        self._view = memoryview(self._mmap)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return min(self._next_sequence - 1, self._slot_count)
+
+    def __iter__(self):
+        return self.frames()
+
+    @property
+    def chunk_names(self) -> list:
+        """Property: names of the recorded chunk values."""
+        return list(self._chunk_names)
+
+    @property
+    def is_frozen(self) -> bool:
+        """Property: True if the ring was frozen."""
+        return self._is_frozen
+
+    @property
+    def trigger_sequence(self) -> int:
+        """Property: sequence of the first post-trigger frame (0 if none)."""
+        return self._trigger_sequence
+
+    def frames(self):
+        """
+        Iterate the recorded frames from the oldest.
+
+        :return: generator of CRawFrame.
+        """
+        last_sequence = self._next_sequence - 1
+        first_sequence = max(last_sequence - self._slot_count + 1, 1)
+        for sequence in range(first_sequence, last_sequence + 1):
+            slot_offset = self._header_size + \
+                (sequence - 1) % self._slot_count * self._slot_size
+            values = self._slot_header.unpack_from(self._mmap, slot_offset)
+            if self._slot_header is _SLOT_HEADER_V1:
+                # The lines are packed.
+                values = values[:6] + \
+                    (values[6] // values[5] if values[5] else 0,) + \
+                    values[6:]
+            (slot_sequence, frame_id, timestamp_ns, pixel_format, width,
+             height, line_pitch, data_size) = values
+            if slot_sequence != sequence:
+                # Being overwritten when the recording stopped.
+                continue
+            chunk_values = dict(zip(
+                self._chunk_names, self._chunk_struct.unpack_from(
+                    self._mmap, slot_offset + self._slot_header.size)))
+            data_offset = slot_offset + self._data_offset
+            yield CRawFrame(sequence, frame_id, timestamp_ns, pixel_format,
+                            width, height, line_pitch, chunk_values,
+                            self._view[data_offset:data_offset + data_size])
+
+    def close(self):
+        """
+        Close the ring file. Release the data of the frames (or drop the
+        frames) before closing.
+        """
+        if self._mmap is None:
+            return
+        if hasattr(self, '_view'):
+            self._view.release()
+        self._mmap.close()
+        self._file.close()
+        self._mmap = None
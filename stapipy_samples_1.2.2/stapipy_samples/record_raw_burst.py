@@ -0,0 +1,159 @@
+"""
+ This sample shows how to record raw images at a high frame rate with
+ CRawRingRecorder, keeping the last seconds before an event.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Connect to camera
+ - Record the raw images and chunk values into a memory-mapped ring file
+ - Freeze the ring on an event (an incomplete frame, or half of the
+   frames) after some post-trigger frames
+ - Load the recorded frames as PyStImage, without the line padding
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import os
+import tempfile
+
+import stapipy as st
+
+from image_ndarray import create_ndarray, get_ndarray_layout
+from raw_recorder import CRawRingReader, CRawRingRecorder
+
+# Number of images to grab
+number_of_images_to_grab = 1000
+
+# Seconds kept before the event, and number of frames recorded after it.
+PRE_TRIGGER_SECONDS = 1.0
+POST_TRIGGER_COUNT = 50
+
+# Frame rate used to size the ring if the camera does not tell it.
+DEFAULT_FRAME_RATE = 200.0
+
+# Feature names
+ACQUISITION_FRAME_RATE = "AcquisitionFrameRate"
+CHUNK_MODE_ACTIVE = "ChunkModeActive"
+CHUNK_SELECTOR = "ChunkSelector"
+CHUNK_ENABLE = "ChunkEnable"
+
+# Chunk values recorded with each frame if the camera has them.
+CHUNK_NAMES = ["ChunkExposureTime", "ChunkGain"]
+
+try:
+    # Initialize StApi before using.
+    st.initialize()
+
+    # Create a system object for device scan and connection.
+    st_system = st.create_system()
+
+    # Connect to first detected device.
+    st_device = st_system.create_first_device()
+
+    # Display DisplayName of the device.
+    print('Device=', st_device.info.display_name)
+
+    # Create a datastream object for handling image stream data.
+    st_datastream = st_device.create_datastream()
+
+    # Get the nodemap object to access current setting of the camera.
+    st_nodemap_remote = st_device.remote_port.nodemap
+
+    # Get the frame rate to size the ring.
+    frame_rate = DEFAULT_FRAME_RATE
+    st_frame_rate = st_nodemap_remote.get_node(ACQUISITION_FRAME_RATE)
+    if st_frame_rate and st_frame_rate.is_readable:
+        frame_rate = st_frame_rate.value
+
+    # Activate the chunks, enable the recorded ones and get their nodes.
+    st_chunk_mode_active = st_nodemap_remote.get_node(CHUNK_MODE_ACTIVE)
+    if st_chunk_mode_active and st_chunk_mode_active.is_writable:
+        st_chunk_mode_active.value = True
+    st_chunk_selector = st_nodemap_remote.get_node(CHUNK_SELECTOR)
+    st_chunk_enable = st_nodemap_remote.get_node(CHUNK_ENABLE)
+    st_chunk_value_list = []
+    for chunk_name in CHUNK_NAMES:
+        chunk_value = st_nodemap_remote.get_node(chunk_name)
+        if not chunk_value:
+            continue
+        if st_chunk_selector and st_chunk_enable:
+            # The entry of the selector is the name without "Chunk".
+            chunk_item = st.PyIEnumeration(st_chunk_selector)[
+                chunk_name[len("Chunk"):]]
+            if not chunk_item.is_available:
+                continue
+            st.PyIEnumeration(st_chunk_selector).set_int_value(
+                chunk_item.value)
+            if st_chunk_enable.is_writable:
+                st_chunk_enable.value = True
+        st_chunk_value_list.append(chunk_value)
+
+    # Create the ring file.
+    file_location = os.path.join(tempfile.gettempdir(),
+                                 st_device.info.display_name + ".ring")
+    slot_count = CRawRingRecorder.slot_count_for(PRE_TRIGGER_SECONDS,
+                                                 frame_rate) + \
+        POST_TRIGGER_COUNT
+    recorder = CRawRingRecorder(
+        file_location, slot_count, st_datastream.info.payload_size,
+        [chunk_value.name for chunk_value in st_chunk_value_list])
+    print("Recording {0} frames into {1}".format(slot_count, file_location))
+
+    # Start the image acquisition of the host (local machine) side.
+    st_datastream.start_acquisition(number_of_images_to_grab)
+
+    # Start the image acquisition of the camera side.
+    st_device.acquisition_start()
+
+    # A while loop for acquiring data and checking status
+    received_count = 0
+    with recorder:
+        while st_datastream.is_grabbing and not recorder.is_frozen:
+            with st_datastream.retrieve_buffer() as st_buffer:
+                if not st_buffer.info.is_image_present:
+                    continue
+                received_count += 1
+
+                # Record the image with the chunk values.
+                recorder.write(st_buffer.info, st_buffer.get_image(),
+                               [chunk_value.value
+                                for chunk_value in st_chunk_value_list])
+
+                # Trigger on the event.
+                if st_buffer.info.is_incomplete or \
+                        received_count == number_of_images_to_grab // 2:
+                    print("Event at BlockID={0}".format(
+                          st_buffer.info.frame_id))
+                    recorder.trigger(POST_TRIGGER_COUNT)
+
+    # Stop the image acquisition of the camera side
+    st_device.acquisition_stop()
+
+    # Stop the image acquisition of the host side
+    st_datastream.stop_acquisition()
+
+    # Load the recorded frames.
+    with CRawRingReader(file_location) as reader:
+        print("Recorded {0} frames, frozen={1}".format(len(reader),
+                                                       reader.is_frozen))
+        for frame in reader.frames():
+            if frame.sequence == reader.trigger_sequence:
+                # Create a PyStImage of the first post-trigger frame,
+                # copying the lines without the padding of line_pitch.
+                pixel_format = \
+                    st.EStPixelFormatNamingConvention(frame.pixel_format)
+                nparr = create_ndarray(
+                    frame.data, frame.width, frame.height, frame.line_pitch,
+                    get_ndarray_layout(st.get_pixel_format_info(
+                        pixel_format)))
+                st_image = st.PyStImage.create_from_data(
+                    frame.width, frame.height, pixel_format, nparr.tobytes())
+                del nparr
+                print("BlockID={0} Size={1} x {2} First Byte={3} "
+                      "Timestamp={4} {5}".format(
+                          frame.frame_id, st_image.width, st_image.height,
+                          st_image.get_image_data()[0], frame.timestamp_ns,
+                          frame.chunk_values))
+            frame.data.release()
+
+except Exception as exception:
+    print(exception)
@@ -0,0 +1,131 @@
+"""
+ This sample shows how to record video files without stalling the
+ acquisition, with CVideoRecorder.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Connect to camera
+ - Queue the images to the recorder and requeue the buffers immediately
+ - Number the video frames from the timestamps and the timestamp frequency
+   of the device, repeating the previous frame for dropped frames
+ - Roll the video files every 10 seconds and write an index of each file
+ - Use PyStVideoFiler, or OpenCV with CDisplayConverter in worker threads
+ Note: opencv-python and numpy packages are required:
+    pip install numpy
+    pip install opencv-python
+"""
+
+import os
+import tempfile
+import threading
+
+import cv2
+import numpy as np
+import stapipy as st
+
+from acquisition_pipeline import EBackPressure
+from display_converter import CDisplayConverter
+from video_recorder import COpenCVVideoBackend, CStVideoFilerBackend, \
+    CVideoRecorder
+
+# Number of images to grab
+number_of_images_to_grab = 1000
+
+# Maximum duration of one video file in seconds.
+MAX_DURATION = 10.0
+
+# True to encode with OpenCV instead of PyStVideoFiler.
+USE_OPENCV = False
+
+# CDisplayConverter of each worker thread (it reuses its buffers).
+converters = threading.local()
+
+
+def to_video_frame(st_image):
+    """
+    Convert an image to 8bit Mono or BGR for OpenCV VideoWriter.
+
+    :param st_image: PyStImage (Mono or Bayer).
+    :return: numpy.ndarray.
+    """
+    converter = getattr(converters, 'converter', None)
+    if converter is None:
+        converter = converters.converter = CDisplayConverter()
+    frame = np.empty(converter.output_shape(st_image), np.uint8)
+    converter.convert(st_image, dst=frame)
+    if frame.ndim == 3:
+        # CDisplayConverter gives RGB, VideoWriter takes BGR.
+        cv2.cvtColor(frame, cv2.COLOR_RGB2BGR, dst=frame)
+    return frame
+
+
+try:
+    # Initialize StApi before using.
+    st.initialize()
+
+    # Create a system object for device scan and connection.
+    st_system = st.create_system()
+
+    # Connect to first detected device.
+    st_device = st_system.create_first_device()
+
+    # Display DisplayName of the device.
+    print('Device=', st_device.info.display_name)
+
+    # Get the acquisition fps of the camera.
+    fps = 60.0
+    acquisition_frame_rate = st_device.remote_port.nodemap.get_node(
+        "AcquisitionFrameRate")
+    if acquisition_frame_rate:
+        fps = acquisition_frame_rate.value
+
+    # Create the recorder.
+    path_prefix = os.path.join(tempfile.gettempdir(),
+                               st_device.info.display_name)
+    if USE_OPENCV:
+        backend = COpenCVVideoBackend()
+        convert_func = to_video_frame
+    else:
+        backend = CStVideoFilerBackend()
+        convert_func = None
+    recorder = CVideoRecorder(
+        path_prefix, fps, st_device.info.timestamp_frequency, backend,
+        max_duration=MAX_DURATION, convert_func=convert_func,
+        back_pressure=EBackPressure.DropOldest)
+
+    # Create a datastream object for handling image stream data.
+    st_datastream = st_device.create_datastream()
+
+    # Start the image acquisition of the host (local machine) side.
+    st_datastream.start_acquisition(number_of_images_to_grab)
+
+    # Start the image acquisition of the camera side.
+    st_device.acquisition_start()
+
+    with recorder:
+        while st_datastream.is_grabbing:
+            with st_datastream.retrieve_buffer() as st_buffer:
+                # Queue the image. It is cloned, so the buffer is requeued
+                # at the end of this block.
+                if st_buffer.info.is_image_present:
+                    recorder.submit_buffer(st_buffer)
+
+    # Stop the image acquisition of the camera side
+    st_device.acquisition_stop()
+
+    # Stop the image acquisition of the host side
+    st_datastream.stop_acquisition()
+
+    # Display the statistics and the files.
+    statistics = recorder.statistics()
+    print("Written={0} Dropped={1} Filled={2} Write={3:.3f}[ms] "
+          "Total={4:.3f}[ms]".format(
+              statistics['written'], statistics['dropped'],
+              statistics['filled'], statistics['write']['mean_ms'],
+              statistics['total']['mean_ms']))
+    for segment in recorder.segments:
+        print("{0}: {1} frames, {2} video frames, index {3}".format(
+              segment.path, segment.frame_count, segment.video_frame_count,
+              segment.index_path))
+
+except Exception as exception:
+    print(exception)
@@ -0,0 +1,108 @@
+"""
+ This sample shows how to record raw images into an archive file and find
+ them again with CRawArchiveReader.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Connect to camera
+ - Record the raw images with their metadata into one archive file
+ - Find a frame by frame ID and the frames within a time range
+ - Compute the mean of every 10th frame in a thread pool
+ - Load a frame as PyStImage
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import os
+import tempfile
+
+import stapipy as st
+
+from raw_archive import CRawArchiveReader, CRawArchiveWriter
+
+# Number of images to grab
+number_of_images_to_grab = 500
+
+# Decimation of the frames to compute the mean.
+MEAN_STEP = 10
+
+
+def get_mean(frame, nparr):
+    """
+    Get the mean of the pixel values of a frame.
+
+    :param frame: CArchiveFrame.
+    :param nparr: NumPy view of the image data.
+    :return: tuple of frame ID and mean.
+    """
+    return frame.frame_id, float(nparr.mean())
+
+
+try:
+    # Initialize StApi before using.
+    st.initialize()
+
+    # Create a system object for device scan and connection.
+    st_system = st.create_system()
+
+    # Connect to first detected device.
+    st_device = st_system.create_first_device()
+
+    # Display DisplayName of the device.
+    print('Device=', st_device.info.display_name)
+
+    # Create a datastream object for handling image stream data.
+    st_datastream = st_device.create_datastream()
+
+    # File for the archive
+    file_location = os.path.join(tempfile.gettempdir(),
+                                 st_device.info.display_name + ".rawarc")
+
+    # Start the image acquisition of the host (local machine) side.
+    st_datastream.start_acquisition(number_of_images_to_grab)
+
+    # Start the image acquisition of the camera side.
+    st_device.acquisition_start()
+
+    # Record the images until the acquisition ends.
+    print("Recording {0} ... ".format(file_location), end="")
+    with CRawArchiveWriter(file_location) as writer:
+        while st_datastream.is_grabbing:
+            with st_datastream.retrieve_buffer() as st_buffer:
+                if st_buffer.info.is_image_present:
+                    writer.write(st_buffer.info, st_buffer.get_image())
+    print("done.")
+
+    # Stop the image acquisition of the camera side
+    st_device.acquisition_stop()
+
+    # Stop the image acquisition of the host side
+    st_datastream.stop_acquisition()
+
+    # Open the archive. Only the index at the end of the file is read.
+    with CRawArchiveReader(file_location) as reader:
+        print("Frames={0}".format(len(reader)))
+
+        # Find the frame in the middle of the archive by its frame ID.
+        middle_frame_id = int(reader.index['frame_id'][len(reader) // 2])
+        position = reader.find_frame_id(middle_frame_id)
+        frame = reader.get_frame(position)
+        print("BlockID={0} at position {1} Timestamp={2}".format(
+              frame.frame_id, position, frame.timestamp_ns))
+
+        # Find the frames within 100ms after it.
+        positions = reader.find_time_range(frame.timestamp_ns,
+                                           frame.timestamp_ns + 100000000)
+        print("{0} frames within 100ms".format(len(positions)))
+
+        # Compute the mean of every 10th frame in parallel.
+        for frame_id, mean in reader.map(get_mean, step=MEAN_STEP):
+            print("BlockID={0} Mean={1:.1f}".format(frame_id, mean))
+
+        # Load the frame as PyStImage.
+        st_image = reader.get_image(position)
+        print("Size={0} x {1} First Byte={2}".format(
+              st_image.width, st_image.height,
+              st_image.get_image_data()[0]))
+
+except Exception as exception:
+    print(exception)
@@ -0,0 +1,299 @@
+"""
+ This module provides a host side ROI tiling engine which converts the image
+ once and gives all ROI tiles as NumPy views.
+ The following points are covered by this module:
+ - Regular grids (optionally overlapping) and arbitrary rectangles
+ - Tile positions and sizes aligned to pixel_increment_x/y, so that raw
+   Bayer tiles keep the color filter phase of the full image
+ - Demosaic/scale the full image once with CDisplayConverter and slice the
+   tiles out of it without copying
+ - Dispatch per-tile analysis to a thread pool
+ Note: opencv-python and numpy packages are required:
+    pip install numpy
+    pip install opencv-python
+"""
+
+import concurrent.futures
+
+import stapipy as st
+
+from display_converter import CDisplayConverter
+from image_ndarray import as_ndarray
+
+
+def align_down(value, increment):
+    """Round value down to a multiple of increment."""
+    return value - value % increment
+
+
+def align_up(value, increment):
+    """Round value up to a multiple of increment."""
+    return align_down(value + increment - 1, increment)
+
+
+class CTile:
+    """
+    One ROI tile. image is a view of the full image.
+    """
+    __slots__ = ('index', 'row', 'column', 'x', 'y', 'width', 'height',
+                 'image')
+
+    def __init__(self, index, row, column, x, y, width, height, image):
+        self.index = index
+        self.row = row
+        self.column = column
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.image = image
+
+
+class CTileLayout:
+    """
+    Set of ROI rectangles aligned to the pixel increment.
+    """
+
+    def __init__(self, rects, pixel_increment_x=1, pixel_increment_y=1,
+                 column_count=None):
+        """
+        :param rects: list of (offset_x, offset_y, width, height).
+        :param pixel_increment_x: horizontal setting unit of the pixel
+            format (PyStPixelFormatInfo.pixel_increment_x).
+        :param pixel_increment_y: vertical setting unit of the pixel format
+            (PyStPixelFormatInfo.pixel_increment_y).
+        :param column_count: number of columns for CTile.row/column, or
+            None if the rectangles are not a grid.
+        """
+        self._rects = []
+        for x, y, width, height in rects:
+            if width <= 0 or height <= 0 or x < 0 or y < 0:
+                raise ValueError("Invalid ROI ({0}, {1}, {2}, {3})."
+                                 .format(x, y, width, height))
+            if x % pixel_increment_x or width % pixel_increment_x or \
+                    y % pixel_increment_y or height % pixel_increment_y:
+                raise ValueError("ROI ({0}, {1}, {2}, {3}) is not aligned to "
+                                 "the pixel increment {4} x {5}.".format(
+                                     x, y, width, height, pixel_increment_x,
+                                     pixel_increment_y))
+            self._rects.append((x, y, width, height))
+        self._pixel_increment_x = pixel_increment_x
+        self._pixel_increment_y = pixel_increment_y
+        self._column_count = column_count
+
+    @classmethod
+    def grid(cls, image_width, image_height, horizontal_count,
+             vertical_count, overlap_x=0, overlap_y=0, pixel_increment_x=1,
+             pixel_increment_y=1):
+        """
+        Create a regular grid covering the whole image.
+
+        All tiles have the same size. Neighbouring tiles overlap by at least
+        overlap_x/overlap_y pixels (rounded up to the pixel increment).
+
+        :param image_width: width of the image.
+        :param image_height: height of the image.
+        :param horizontal_count: number of tiles in each row.
+        :param vertical_count: number of tiles in each column.
+        :param overlap_x: horizontal overlap of neighbouring tiles.
+        :param overlap_y: vertical overlap of neighbouring tiles.
+        :param pixel_increment_x: horizontal setting unit of the pixel
+            format.
+        :param pixel_increment_y: vertical setting unit of the pixel format.
+        :return: CTileLayout.
+        """
+        positions_x, width = cls._split(image_width, horizontal_count,
+                                        overlap_x, pixel_increment_x)
+        positions_y, height = cls._split(image_height, vertical_count,
+                                         overlap_y, pixel_increment_y)
+        rects = [(x, y, width, height)
+                 for y in positions_y for x in positions_x]
+        return cls(rects, pixel_increment_x, pixel_increment_y,
+                   horizontal_count)
+
+    @classmethod
+    def for_image(cls, st_image, horizontal_count, vertical_count,
+                  overlap_x=0, overlap_y=0):
+        """
+        Create a regular grid for the size and pixel format of st_image.
+
+        :param st_image: PyStImage.
+        :param horizontal_count: number of tiles in each row.
+        :param vertical_count: number of tiles in each column.
+        :param overlap_x: horizontal overlap of neighbouring tiles.
+        :param overlap_y: vertical overlap of neighbouring tiles.
+        :return: CTileLayout.
+        """
+        pixel_format_info = st.get_pixel_format_info(st_image.pixel_format)
+        return cls.grid(st_image.width, st_image.height, horizontal_count,
+                        vertical_count, overlap_x, overlap_y,
+                        pixel_format_info.pixel_increment_x,
+                        pixel_format_info.pixel_increment_y)
+
+    @staticmethod
+    def _split(length, count, overlap, increment):
+        """
+        Split length into count aligned segments.
+
+        :return: tuple of (list of positions, segment size).
+        """
+        if count < 1:
+            raise ValueError("Tile count must be 1 or more.")
+        length = align_down(length, increment)
+        overlap = align_up(max(overlap, 0), increment)
+        size = align_up(-(-(length + (count - 1) * overlap) // count),
+                        increment)
+        if size > length or size <= 0:
+            raise ValueError("{0} tiles with overlap {1} do not fit in {2} "
+                             "pixels.".format(count, overlap, length))
+        if count == 1:
+            return [0], size
+        # Spread the tiles evenly so that the last tile ends at the edge.
+        positions = [align_down(index * (length - size) // (count - 1),
+                                increment) for index in range(count)]
+        return positions, size
+
+    @property
+    def rects(self) -> list:
+        """Property: list of (offset_x, offset_y, width, height)."""
+        return list(self._rects)
+
+    @property
+    def pixel_increment(self) -> tuple:
+        """Property: (pixel_increment_x, pixel_increment_y)."""
+        return self._pixel_increment_x, self._pixel_increment_y
+
+    def __len__(self):
+        return len(self._rects)
+
+    def __iter__(self):
+        return iter(self._rects)
+
+    def fits(self, width, height) -> bool:
+        """
+        Check if all tiles are inside an image.
+
+        :param width: width of the image.
+        :param height: height of the image.
+        :return: True if all tiles are inside the image.
+        """
+        return all(x + tile_width <= width and y + tile_height <= height
+                   for x, y, tile_width, tile_height in self._rects)
+
+    def tiles(self, nparr, scale=1):
+        """
+        Slice the tiles out of an image without copying.
+
+        :param nparr: numpy.ndarray of shape (height, width[, channels]).
+        :param scale: size of nparr relative to the layout (e.g. 0.5 for an
+            image resized to the half).
+        :return: list of CTile. The images are views of nparr.
+        """
+        image_height, image_width = nparr.shape[:2]
+        if scale == 1 and not self.fits(image_width, image_height):
+            raise ValueError("The tiles do not fit in the image of {0} x {1}."
+                             .format(image_width, image_height))
+        tiles = []
+        for index, (x, y, width, height) in enumerate(self._rects):
+            if scale != 1:
+                # Rounding may go one pixel beyond the resized image.
+                x, y = int(round(x * scale)), int(round(y * scale))
+                width = min(int(round(width * scale)), image_width - x)
+                height = min(int(round(height * scale)), image_height - y)
+            row, column = (index // self._column_count,
+                           index % self._column_count) \
+                if self._column_count else (0, index)
+            tiles.append(CTile(index, row, column, x, y, width, height,
+                               nparr[y:y + height, x:x + width]))
+        return tiles
+
+
+class CRoiTiler:
+    """
+    Class to convert an image once and analyze its ROI tiles in parallel.
+
+    The converted image is kept in the buffers of the converter, so the
+    tiles are valid until the next call of split(). Use one tiler per
+    acquisition thread.
+
+    Usage:
+        with CRoiTiler(layout) as tiler:
+            tiles = tiler.split(st_image)
+            results = tiler.map(analyze, tiles)
+    """
+
+    def __init__(self, layout, worker_count=4, converter=None):
+        """
+        :param layout: CTileLayout.
+        :param worker_count: number of threads for map(), or 0 to analyze
+            the tiles in the calling thread.
+        :param converter: CDisplayConverter used to demosaic/scale the
+            image. The default converter keeps the original size.
+        """
+        self._layout = layout
+        self._converter = converter if converter is not None else \
+            CDisplayConverter()
+        self._executor = None
+        if worker_count > 0:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                worker_count, thread_name_prefix='roi_tiling')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def layout(self) -> CTileLayout:
+        """Property: layout of the tiles."""
+        return self._layout
+
+    def convert(self, st_image):
+        """
+        Convert the whole image once.
+
+        :param st_image: PyStImage (Mono or Bayer).
+        :return: converted numpy.ndarray (overwritten by the next call).
+        """
+        return self._converter.convert(st_image)
+
+    def split(self, st_image):
+        """
+        Convert the whole image once and slice the tiles.
+
+        :param st_image: PyStImage (Mono or Bayer).
+        :return: list of CTile of the converted image.
+        """
+        return self._layout.tiles(self.convert(st_image),
+                                  self._converter.resize_factor)
+
+    def split_raw(self, st_image):
+        """
+        Slice the tiles out of the raw image data without any conversion.
+
+        :param st_image: PyStImage.
+        :return: list of CTile. The images are read-only views of st_image.
+        """
+        return self._layout.tiles(as_ndarray(st_image))
+
+    def map(self, func, tiles):
+        """
+        Call func(tile) for each tile in the thread pool.
+
+        NumPy and OpenCV release the GIL, so the tiles are analyzed in
+        parallel.
+
+        :param func: function(CTile) returning the analysis result.
+        :param tiles: list of CTile.
+        :return: list of the results in the order of tiles.
+        """
+        if self._executor is None:
+            return [func(tile) for tile in tiles]
+        return list(self._executor.map(func, tiles))
+
+    def close(self):
+        """Shut down the thread pool."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
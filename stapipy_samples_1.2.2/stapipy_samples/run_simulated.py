@@ -0,0 +1,83 @@
+"""
+ This sample shows how to run the other samples without a camera by using
+ the simulated backend stapipy_sim.
+ The following points will be demonstrated in this sample code:
+ - Configure the simulated cameras (count, resolution, pixel format,
+   frame rate, open time)
+ - Inject dropped frames, incomplete frames and device lost
+ - Install stapipy_sim as 'stapipy' and run a sample unmodified
+ Usage:
+    python run_simulated.py grab.py
+    python run_simulated.py --cameras 2 multiple_cameras.py
+    python run_simulated.py --lost-after 50 --reconnect-after 1 \
+        event_device_lost.py
+    python run_simulated.py --fps 0 acquisition_benchmark.py --json out.json
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import argparse
+import runpy
+import sys
+
+import stapipy_sim
+
+
+def parse_arguments():
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(
+        description="Run a sample with simulated cameras.")
+    parser.add_argument('sample', help="path of the sample to run")
+    parser.add_argument('sample_arguments', nargs=argparse.REMAINDER,
+                        help="arguments passed to the sample")
+    parser.add_argument('--cameras', type=int, default=1,
+                        help="number of cameras (default: 1)")
+    parser.add_argument('--width', type=int, default=640,
+                        help="image width (default: 640)")
+    parser.add_argument('--height', type=int, default=480,
+                        help="image height (default: 480)")
+    parser.add_argument('--pixel-format', default='Mono8',
+                        help="pixel format, e.g. Mono8 or BayerRG8 "
+                             "(default: Mono8)")
+    parser.add_argument('--fps', type=float, default=100.0,
+                        help="frame rate, 0 for on-demand (default: 100)")
+    parser.add_argument('--interface', default='USB3Vision',
+                        choices=['USB3Vision', 'GigEVision'],
+                        help="interface type (default: USB3Vision)")
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help="ratio of dropped frames (default: 0)")
+    parser.add_argument('--incomplete-rate', type=float, default=0.0,
+                        help="ratio of incomplete frames (default: 0)")
+    parser.add_argument('--lost-after', type=int, default=-1,
+                        help="frames sent before the device is lost "
+                             "(default: never)")
+    parser.add_argument('--reconnect-after', type=float, default=None,
+                        help="seconds before a lost device is connected "
+                             "again (default: never)")
+    parser.add_argument('--open-delay', type=float, default=0.0,
+                        help="seconds taken to open each device "
+                             "(default: 0)")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="seed of the injected faults (default: 0)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    # Create the simulated cameras.
+    stapipy_sim.reset_cameras(
+        args.cameras, width=args.width, height=args.height,
+        pixel_format=stapipy_sim.EStPixelFormatNamingConvention[
+            args.pixel_format],
+        fps=args.fps,
+        interface_type=stapipy_sim.EStInterfaceType[args.interface],
+        drop_rate=args.drop_rate, incomplete_rate=args.incomplete_rate,
+        lost_after_frames=args.lost_after,
+        reconnect_after=args.reconnect_after, seed=args.seed,
+        open_delay=args.open_delay)
+
+    # Install the simulator as 'stapipy' and run the sample.
+    sys.modules['stapipy'] = stapipy_sim
+    sys.argv = [args.sample] + args.sample_arguments
+    runpy.run_path(args.sample, run_name='__main__')
@@ -0,0 +1,73 @@
+"""
+ This sample shows how to list and search the features of a camera with
+ the feature tree index of CFeatureTree.
+ The following points will be demonstrated in this sample code:
+ - Initialize StApi
+ - Connect to camera
+ - Build the index of the feature tree, or read it from the cache
+   directory if the same model was already indexed
+ - Display the tree from the index
+ - Look up a feature by name and search by prefix and substring
+ - Display the timing of the index and of the searches
+"""
+
+import os
+import tempfile
+import time
+
+import stapipy as st
+
+from feature_tree import CFeatureTree
+
+# Directory of the index files.
+CACHE_DIRECTORY = os.path.join(tempfile.gettempdir(), "feature_tree")
+
+# Searches to run.
+PREFIX = "Exposure"
+SUBSTRING = "trigger"
+
+try:
+    # Initialize StApi before using.
+    st.initialize()
+
+    # Create a system object for device scan and connection.
+    st_system = st.create_system()
+
+    # Connect to first detected device.
+    st_device = st_system.create_first_device()
+
+    # Display DisplayName of the device.
+    print('Device=', st_device.info.display_name)
+
+    # Build the index, or read it from the cache.
+    start_time = time.perf_counter()
+    tree = CFeatureTree.from_device(st_device, CACHE_DIRECTORY)
+    node_count = len(tree)
+    print("Index: {0} nodes in {1:.1f}[ms] ({2}) key={3}".format(
+          node_count, (time.perf_counter() - start_time) * 1000.0,
+          "cache" if tree.is_loaded_from_cache else "walk", tree.cache_key))
+
+    # Display the tree.
+    for depth, info in tree.walk():
+        print("{0}{1} : {2}{3}".format(
+              "  " * depth, info.interface_type.name, info.name,
+              " [{0}]".format(", ".join(symbolic for symbolic, _ in
+                                        info.entries))
+              if info.entries else ""))
+
+    # Look up a feature and run the searches.
+    start_time = time.perf_counter()
+    info = tree.get("PixelFormat")
+    prefix_result = tree.find_prefix(PREFIX)
+    substring_result = tree.search(SUBSTRING)
+    print("Search: {0:.3f}[ms]".format(
+          (time.perf_counter() - start_time) * 1000.0))
+    if info:
+        print("PixelFormat: {0} {1}".format(info.path, info.access_mode.name))
+    print("Prefix {0}: {1}".format(PREFIX, [item.name for item in
+                                            prefix_result]))
+    print("Contains {0}: {1}".format(SUBSTRING, [item.path for item in
+                                                 substring_result]))
+
+except Exception as exception:
+    print(exception)
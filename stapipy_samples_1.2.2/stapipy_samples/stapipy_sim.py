@@ -0,0 +1,3185 @@
+"""
+ This module provides a pure-Python simulated camera backend with the same
+ interface as stapipy, for running acquisition code without a camera.
+ The following points are covered by this module:
+ - initialize/create_system/create_first_device/create_datastream
+ - PyStSystem, PyStInterface, PyStDevice, PyStDataStream and the lists
+ - retrieve_buffer and GenTLDataStreamNewBuffer callbacks
+ - PyStImage with get_image_data/get_roi_image/clone
+ - Remote and local nodemaps with get_node, PyIEnumeration, PyIFloat,
+   PyIInteger, PyIBoolean, PyIString, PyICommand and PyICategory
+ - Configurable frame rate, resolution and pixel format (Mono8/10/12,
+   BayerRG/GB/GR/BG 8/10/12) through CSimCamera or the nodemap
+ - Software trigger (TriggerMode/TriggerSource/TriggerSoftware)
+ - Finite buffer_count: frames arriving while all buffers are checked out
+   or waiting are counted in num_underrun, like GenTL
+ - Drop and incomplete-frame injection
+ - Device lost (EventDeviceLost node callback, is_device_lost)
+ - ExposureEnd camera event (EventExposureEndTimestamp node callback)
+ - Chunk data (ChunkModeActive/ChunkSelector/ChunkEnable, ChunkFrameID,
+   ChunkTimestamp, ChunkExposureTime and ChunkGain)
+ - Interface nodemap (DeviceSelector, GevDeviceIPAddress, ForceIP),
+   DeviceLinkHeartbeatTimeout and GenTLDeviceListUpdated callbacks
+ The samples can be run unmodified with run_simulated.py, which installs
+ this module as 'stapipy'.
+ Image processing (converter, filter, filer), feature bags and user sets
+ are not simulated, so the samples using them (e.g. user_set_ctrl.py,
+ load_features_incremental.py and the samples with a converter or filter)
+ stop with an error.
+ Note: numpy package is required:
+    pip install numpy
+"""
+
+import enum
+import hashlib
+import queue
+import random
+import threading
+import time
+
+import numpy as np
+
+
+class EStPixelFormatNamingConvention(enum.Enum):
+    """Pixel format (PFNC value)."""
+    Unknown = 0xffffffff
+    Mono8 = 0x1080001
+    Mono10 = 0x1100003
+    Mono12 = 0x1100005
+    Mono16 = 0x1100007
+    BayerGR8 = 0x1080008
+    BayerRG8 = 0x1080009
+    BayerGB8 = 0x108000a
+    BayerBG8 = 0x108000b
+    BayerGR10 = 0x110000c
+    BayerRG10 = 0x110000d
+    BayerGB10 = 0x110000e
+    BayerBG10 = 0x110000f
+    BayerGR12 = 0x1100010
+    BayerRG12 = 0x1100011
+    BayerGB12 = 0x1100012
+    BayerBG12 = 0x1100013
+    BayerGR16 = 0x110002e
+    BayerRG16 = 0x110002f
+    BayerGB16 = 0x1100030
+    BayerBG16 = 0x1100031
+    RGB8 = 0x2180014
+    BGR8 = 0x2180015
+
+
+class EStPixelColorFilter(enum.Enum):
+    """Pixel color filter."""
+    Unknown = 0
+    ColorFilterNone = 1
+    BayerRG = 2
+    BayerGR = 3
+    BayerGB = 4
+    BayerBG = 5
+
+
+class EStTimeoutHandling(enum.Enum):
+    """Timeout handling type."""
+    Return = 0
+    ThrowException = 1
+    Count = 2
+
+
+class EStMemoryInitialization(enum.Enum):
+    """Memory initialization of PyStImage.create_buffer."""
+    DoNothing = 0
+    Zero = 1
+
+
+class EStCallbackType(enum.Enum):
+    """Callback type."""
+    GenTLSystemError = 0
+    GenTLInterfaceError = 1
+    GenTLDeviceError = 2
+    GenTLDataStreamError = 3
+    GenTLStreamBufferError = 4
+    GenTLDataStreamNewBuffer = 5
+    StApiIPVideoFilerOpen = 6
+    StApiIPVideoFilerClose = 7
+    StApiIPVideoFilerError = 8
+    GenTLInterfaceClosing = 14
+    GenTLInterfaceListUpdated = 15
+    GenTLDeviceListUpdated = 16
+
+
+class EStSystemVendor(enum.Enum):
+    """Supported GenTL Producer vendor."""
+    Default = 0
+    Sentech = 0
+    Euresys = 1
+    Kaya = 2
+    SiliconSoftware = 3
+    ActiveSilicon = 4
+    Matrox = 5
+    TeledyneDALSA = 6
+    AvalData = 7
+    Count = 8
+
+
+class EStInterfaceType(enum.Enum):
+    """Interface type."""
+    Unknown = 0
+    USB3Vision = 1
+    GigEVision = 2
+    CoaXPress = 4
+    CameraLink = 8
+    VirtualFrameGrabber = 16
+    All = -1
+
+
+class ETLDeviceAccessFlags(enum.Enum):
+    """Device access flags."""
+    AccessUnknown = 0
+    AccessNone = 1
+    AccessReadOnly = 2
+    AccessControl = 3
+    AccessExclusive = 4
+
+
+class ETLDeviceAccessStatus(enum.Enum):
+    """Device access status."""
+    StatusUnknown = 0
+    StatusReadWrite = 1
+    StatusReadOnly = 2
+    StatusNoAccess = 3
+    StatusBusy = 4
+    StatusOpenReadWrite = 5
+    StatusOpenRead = 6
+
+
+class EGCInterfaceType(enum.Enum):
+    """Interface type of a node."""
+    IValue = 0
+    IBase = 1
+    IInteger = 2
+    IBoolean = 3
+    ICommand = 4
+    IFloat = 5
+    IString = 6
+    IRegister = 7
+    ICategory = 8
+    IEnumeration = 9
+    IEnumEntry = 10
+    IPort = 11
+
+
+class EGCAccessMode(enum.Enum):
+    """Access mode of a node."""
+    NI = 0
+    NA = 1
+    WO = 2
+    RO = 3
+    RW = 4
+    UndefinedAccessMode = 5
+    CycleDetectAccessMode = 6
+
+
+class EGCIncMode(enum.Enum):
+    """Increment mode."""
+    NoIncrement = 0
+    FixedIncrement = 1
+    ListIncrement = 2
+
+
+class EGCCallbackType(enum.Enum):
+    """Type of node callback."""
+    InsideLock = 1
+    OutsideLock = 2
+
+
+class EGCLinkType(enum.Enum):
+    """Link type of the node children."""
+    ParentNodes = 0
+    ReadingChildren = 1
+    WritingChildren = 2
+    InvalidatingChildren = 3
+    DependingNodes = 4
+    TerminalNodes = 5
+
+
+class EGCVisibility(enum.Enum):
+    """Recommended visibility of a node."""
+    Beginner = 0
+    Expert = 1
+    Guru = 2
+    Invisible = 3
+    UndefinedVisibility = 4
+
+
+class EGCRepresentation(enum.Enum):
+    """Recommended representation of a node value."""
+    Linear = 0
+    Logarithmic = 1
+    Boolean = 2
+    PureNumber = 3
+    HexNumber = 4
+    IPV4Address = 5
+    MACAddress = 6
+
+
+class PyStError(Exception):
+    """Exception raised by the simulated module."""
+
+
+def initialize():
+    """Initialize the simulated StApi (nothing to do)."""
+
+
+def terminate():
+    """Uninitialize the simulated StApi (nothing to do)."""
+
+
+def get_version(as_text=True):
+    """
+    Get the version of the simulated StApi.
+
+    :param as_text: if True, return the version as string.
+    :return: version string or numeric version.
+    """
+    return "1.2.2 (simulated)" if as_text else 0x01020002
+
+
+# ---------------------------------------------------------------------------
+# Pixel format
+# ---------------------------------------------------------------------------
+
+def get_pixel_layout(pixel_format):
+    """
+    Get the memory layout of a simulated pixel format.
+
+    :param pixel_format: EStPixelFormatNamingConvention.
+    :return: tuple of (component count, component total bits, valid bits).
+    """
+    name = pixel_format.name
+    if name in ('RGB8', 'BGR8'):
+        return 3, 8, 8
+    if name == 'Unknown':
+        raise PyStError("Unknown pixel format.")
+    valid_bit_count = int(name.lstrip('MonoBayerRGB'))
+    return 1, (8 if valid_bit_count == 8 else 16), valid_bit_count
+
+
+class PyStPixelFormatInfo:
+    """
+    Simulated pixel format information.
+    """
+
+    def __init__(self, pixel_format):
+        component_count, component_bits, valid_bit_count = \
+            get_pixel_layout(pixel_format)
+        self._pixel_format = pixel_format
+        self.name = pixel_format.name
+        self.value = pixel_format.value
+        self.description = pixel_format.name
+        self.each_component_total_bit_count = component_bits
+        self.each_component_valid_bit_count = valid_bit_count
+        self.each_pixel_total_component_count = component_count
+        self.each_pixel_total_bit_count = component_bits * component_count
+        self.plane_count = 1
+        self.is_mono = self.name.startswith('Mono')
+        self.is_bayer = self.name.startswith('Bayer')
+        self.is_color = not self.is_mono
+        self.is_compressed = False
+        self.is_polarization = False
+        self.pixel_increment_x = 2 if self.is_bayer else 1
+        self.pixel_increment_y = 2 if self.is_bayer else 1
+
+    def get_pixel_color_filter(self):
+        """
+        Get the color filter of the pixel format.
+
+        :return: EStPixelColorFilter.
+        """
+        if self.is_bayer:
+            return EStPixelColorFilter['Bayer' + self.name[5:7]]
+        return EStPixelColorFilter.ColorFilterNone
+
+
+def _to_pixel_format(pixel_format):
+    """Convert an int value or a name to EStPixelFormatNamingConvention."""
+    if isinstance(pixel_format, EStPixelFormatNamingConvention):
+        return pixel_format
+    try:
+        if isinstance(pixel_format, str):
+            return EStPixelFormatNamingConvention[pixel_format]
+        return EStPixelFormatNamingConvention(pixel_format)
+    except (KeyError, ValueError):
+        raise PyStError("Pixel format {0} is not supported by the "
+                        "simulator.".format(pixel_format))
+
+
+def get_pixel_format_info(pixelformat) -> PyStPixelFormatInfo:
+    """
+    Get pixel format information of the given pixel format.
+
+    :param pixelformat: EStPixelFormatNamingConvention or its int value.
+    :return: PyStPixelFormatInfo.
+    """
+    return PyStPixelFormatInfo(_to_pixel_format(pixelformat))
+
+
+# ---------------------------------------------------------------------------
+# Image
+# ---------------------------------------------------------------------------
+
+def _get_image_dtype_shape(width, height, pixel_format):
+    component_count, component_bits, _ = get_pixel_layout(pixel_format)
+    dtype = np.uint8 if component_bits == 8 else np.dtype('<u2')
+    shape = (height, width)
+    if component_count > 1:
+        shape += (component_count,)
+    return dtype, shape
+
+
+class PyStImage:
+    """
+    Simulated image object holding a numpy.ndarray.
+    """
+
+    def __init__(self, nparr, pixel_format):
+        """
+        :param nparr: image data of shape (height, width) or
+            (height, width, components).
+        :param pixel_format: EStPixelFormatNamingConvention.
+        """
+        self._nparr = nparr
+        self._pixel_format = pixel_format
+
+    @staticmethod
+    def create_buffer(width, height, pixel_format,
+                      initialize_memory=EStMemoryInitialization.DoNothing):
+        """Create an image buffer."""
+        pixel_format = _to_pixel_format(pixel_format)
+        dtype, shape = _get_image_dtype_shape(width, height, pixel_format)
+        return PyStImage(np.zeros(shape, dtype), pixel_format)
+
+    @staticmethod
+    def create_from_data(image_width, image_height, image_pixel_format,
+                         image_data=None):
+        """Create PyStImage from a bytearray. The data is copied."""
+        image_pixel_format = _to_pixel_format(image_pixel_format)
+        dtype, shape = _get_image_dtype_shape(image_width, image_height,
+                                              image_pixel_format)
+        if image_data is None:
+            nparr = np.zeros(shape, dtype)
+        else:
+            nparr = np.frombuffer(bytearray(image_data), dtype).reshape(shape)
+        return PyStImage(nparr, image_pixel_format)
+
+    @property
+    def width(self) -> int:
+        """Property: width of the image."""
+        return self._nparr.shape[1]
+
+    @property
+    def height(self) -> int:
+        """Property: height of the image."""
+        return self._nparr.shape[0]
+
+    @property
+    def line_pitch(self) -> int:
+        """Property: number of bytes within one line."""
+        return self._nparr.strides[0]
+
+    @property
+    def plane_pitch(self) -> int:
+        """Property: number of bytes of one plane."""
+        return self._nparr.nbytes
+
+    @property
+    def pixel_format(self):
+        """Property: EStPixelFormatNamingConvention of the image."""
+        return self._pixel_format
+
+    def get_image_data(self):
+        """Get the raw image data as memoryview."""
+        return memoryview(self._nparr).cast('B')
+
+    def clone(self):
+        """Make a deep copy of the image."""
+        return PyStImage(self._nparr.copy(), self._pixel_format)
+
+    def get_roi_image(self, pos_x, pos_y, width, height):
+        """Get a deep copy of the ROI of the image."""
+        if pos_x + width > self.width or pos_y + height > self.height:
+            raise PyStError("ROI is out of the image.")
+        return PyStImage(
+            self._nparr[pos_y:pos_y + height, pos_x:pos_x + width].copy(),
+            self._pixel_format)
+
+    def is_same_image(self, image) -> bool:
+        """Check if the given image has the same size, format and data."""
+        return self._pixel_format == image.pixel_format and \
+            np.array_equal(self._nparr, image._nparr)
+
+
+def create_synthetic_frames(width, height, pixel_format, frame_count=4,
+                            offset_x=0, offset_y=0, sensor_width=None,
+                            sensor_height=None):
+    """
+    Create deterministic synthetic frames (moving gradient). The frames are
+    read-only.
+
+    :param width: width of the frames.
+    :param height: height of the frames.
+    :param pixel_format: EStPixelFormatNamingConvention.
+    :param frame_count: number of distinct frames.
+    :param offset_x: horizontal offset of the frames in the sensor.
+    :param offset_y: vertical offset of the frames in the sensor.
+    :param sensor_width: width of the sensor (default: width).
+    :param sensor_height: height of the sensor (default: height).
+    :return: list of numpy.ndarray.
+    """
+    component_count, _, valid_bit_count = get_pixel_layout(pixel_format)
+    dtype, _ = _get_image_dtype_shape(width, height, pixel_format)
+    span = max((sensor_width or width) + (sensor_height or height), 1)
+    max_value = (1 << valid_bit_count) - 1
+    pos_y, pos_x = np.mgrid[offset_y:offset_y + height,
+                            offset_x:offset_x + width]
+    frames = []
+    for index in range(frame_count):
+        nparr = ((pos_x + pos_y + index * 16) * max_value // span) % \
+            (max_value + 1)
+        nparr = nparr.astype(dtype)
+        if component_count > 1:
+            nparr = np.repeat(nparr[:, :, np.newaxis], component_count, 2)
+        nparr = np.ascontiguousarray(nparr)
+        nparr.flags.writeable = False
+        frames.append(nparr)
+    return frames
+
+
+# ---------------------------------------------------------------------------
+# Callbacks
+# ---------------------------------------------------------------------------
+
+class PyStRegisteredCallback:
+    """
+    Simulated registered callback. For StApi callbacks it is also passed to
+    the callback function as the handle.
+    """
+
+    def __init__(self, callback_func, user_data, callback_type=None,
+                 module=None, node=None):
+        self.callback_func = callback_func
+        self.user_data = user_data
+        self.callback_type = callback_type
+        self.module = module
+        self.node = node
+        self.data = {}
+        self.error = (None, None)
+        self.is_released = False
+
+    def release(self):
+        """Release the callback."""
+        self.is_released = True
+
+    def _invoke(self):
+        if not self.is_released:
+            if self.node is not None:
+                self.callback_func(self.node, self.user_data)
+            else:
+                self.callback_func(self, self.user_data)
+
+
+class CCallbackList:
+    """
+    List of registered callbacks of a simulated module.
+    """
+
+    def __init__(self, module, callback_type=None):
+        self._module = module
+        self._callback_type = callback_type
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def register(self, callback_func, user_data=None):
+        registered_cb = PyStRegisteredCallback(
+            callback_func, user_data, self._callback_type, self._module)
+        with self._lock:
+            self._callbacks.append(registered_cb)
+        return registered_cb
+
+    def deregister(self, registered_cb):
+        with self._lock:
+            if registered_cb in self._callbacks:
+                self._callbacks.remove(registered_cb)
+        registered_cb.is_released = True
+
+    def deregister_all(self):
+        with self._lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for registered_cb in callbacks:
+            registered_cb.is_released = True
+
+    def get_all(self):
+        with self._lock:
+            return list(self._callbacks) or None
+
+    def fire(self, callback_type=None, data=None):
+        """Invoke all callbacks with the given type and data."""
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for registered_cb in callbacks:
+            if callback_type is not None:
+                registered_cb.callback_type = callback_type
+            registered_cb.data = data or {}
+            registered_cb._invoke()
+
+    def __bool__(self):
+        return bool(self._callbacks)
+
+
+class CCallbackModule:
+    """
+    Mixin providing register_callback and deregister_callback(s).
+    """
+
+    def register_callback(self, callback_func, user_data=None):
+        """Register a callback function for this module."""
+        return self._callback_list.register(callback_func, user_data)
+
+    def deregister_callback(self, registered_cb, check_all=False):
+        """Deregister a callback."""
+        self._callback_list.deregister(registered_cb)
+
+    def deregister_callbacks(self, check_all=False):
+        """Deregister all callbacks."""
+        self._callback_list.deregister_all()
+
+    def get_registered_callbacks(self, check_all=False):
+        """Get the list of registered callbacks."""
+        return self._callback_list.get_all()
+
+    def start_event_acquisition(self):
+        """Start the event acquisition thread."""
+        self._is_event_acquiring = True
+
+    def stop_event_acquisition(self):
+        """Stop the event acquisition thread."""
+        self._is_event_acquiring = False
+
+
+# ---------------------------------------------------------------------------
+# GenApi nodes
+# ---------------------------------------------------------------------------
+
+class PyLock:
+    """
+    Simulated GenApi lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    def lock(self):
+        """Do lock."""
+        self._lock.acquire()
+
+    def try_lock(self) -> bool:
+        """Try to lock."""
+        return self._lock.acquire(False)
+
+    def unlock(self):
+        """Unlock."""
+        self._lock.release()
+
+
+class PyNode:
+    """
+    Simulated GenApi node.
+
+    Limits (min, max, inc) and the access mode may be callables evaluated
+    on each access. A node selected by a selector keeps one value per
+    selector value.
+    """
+
+    def __init__(self, name, interface_type, access_mode=EGCAccessMode.RW,
+                 value=None, display_name=None, description='',
+                 visibility=EGCVisibility.Beginner, unit='',
+                 min_value=None, max_value=None, inc=None, max_length=64,
+                 is_cachable=True):
+        self._name = name
+        self._interface_type = interface_type
+        self._access_mode = access_mode
+        self._value = value
+        self._display_name = display_name or name
+        self._description = description
+        self._visibility = visibility
+        self._unit = unit
+        self._min = min_value
+        self._max = max_value
+        self._inc = inc
+        self._max_length = max_length
+        self._is_cachable = is_cachable
+        self._nodemap = None
+        self._selector = None
+        self._selected_values = {}
+        self._selected_nodes = []
+        self._invalidated_nodes = []
+        self._entries = []
+        self._features = []
+        self._symbolic = None
+        self._on_write = None
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    # Node information.
+    @property
+    def name(self) -> str:
+        """Property: name of the node."""
+        return self._name
+
+    @property
+    def display_name(self) -> str:
+        """Property: display name of the node."""
+        return self._display_name
+
+    @property
+    def description(self) -> str:
+        """Property: description of the node."""
+        return self._description
+
+    @property
+    def tooltip(self) -> str:
+        """Property: tooltip of the node."""
+        return self._description
+
+    @property
+    def visibility(self):
+        """Property: EGCVisibility of the node."""
+        return self._visibility
+
+    @property
+    def principal_interface_type(self):
+        """Property: EGCInterfaceType of the node."""
+        return self._interface_type
+
+    @property
+    def access_mode(self):
+        """Property: EGCAccessMode of the node."""
+        if callable(self._access_mode):
+            return self._access_mode()
+        return self._access_mode
+
+    @property
+    def is_implemented(self) -> bool:
+        """Property: True if the node is implemented."""
+        return self.access_mode != EGCAccessMode.NI
+
+    @property
+    def is_available(self) -> bool:
+        """Property: True if the node is available."""
+        return self.access_mode not in (EGCAccessMode.NI, EGCAccessMode.NA)
+
+    @property
+    def is_readable(self) -> bool:
+        """Property: True if the node is readable."""
+        return self.access_mode in (EGCAccessMode.RO, EGCAccessMode.RW)
+
+    @property
+    def is_writable(self) -> bool:
+        """Property: True if the node is writable."""
+        return self.access_mode in (EGCAccessMode.WO, EGCAccessMode.RW)
+
+    @property
+    def is_cachable(self) -> bool:
+        """Property: True if the value of the node can be cached."""
+        return self._is_cachable
+
+    @property
+    def is_feature(self) -> bool:
+        """Property: True if the node is a feature."""
+        return self._interface_type != EGCInterfaceType.IEnumEntry
+
+    @property
+    def device_name(self) -> str:
+        """Property: device name of the nodemap of the node."""
+        return self._nodemap.device_name if self._nodemap else ''
+
+    def get_nodemap(self):
+        """Get the nodemap of the node."""
+        return self._nodemap
+
+    def get_children(self, link_type=None):
+        """Get the list of child nodes."""
+        if link_type == EGCLinkType.DependingNodes:
+            return self._selected_nodes + self._invalidated_nodes
+        return list(self._features or self._entries)
+
+    @property
+    def children_name(self):
+        """Property: list of the names of the child nodes."""
+        return [node.name for node in self.get_children()]
+
+    def get_property(self, property_name):
+        """
+        Get the property value and attribute.
+
+        :param property_name: name of the property.
+        :return: tuple of (value, attribute) as strings.
+        """
+        properties = {'Name': self._name,
+                      'DisplayName': self._display_name,
+                      'Description': self._description,
+                      'Visibility': self._visibility.name,
+                      'Unit': self._unit}
+        if self._interface_type in (EGCInterfaceType.IInteger,
+                                    EGCInterfaceType.IFloat):
+            properties['Min'] = str(self._get_min())
+            properties['Max'] = str(self._get_max())
+        if property_name not in properties:
+            raise PyStError("Property {0} not found.".format(property_name))
+        return properties[property_name], ''
+
+    @property
+    def property_names(self):
+        """Property: list of the property names."""
+        return ['Name', 'DisplayName', 'Description', 'Visibility', 'Unit']
+
+    def get(self):
+        """
+        Get the interface class based on the interface type of the node.
+
+        :return: PyIInteger, PyIFloat, PyIEnumeration, ... of the node.
+        """
+        return _INTERFACE_CLASSES[self._interface_type](self)
+
+    # Value.
+    @property
+    def value(self):
+        """
+        Property: value of the node. For Enumeration type, the numeric
+        value is used.
+        """
+        return self._get_value()
+
+    @value.setter
+    def value(self, value):
+        self._set_value(value)
+
+    def _get_value(self):
+        if not self.is_readable:
+            raise PyStError("GenICam error: node {0} is not readable."
+                            .format(self._name))
+        if self._interface_type in (EGCInterfaceType.ICategory,
+                                    EGCInterfaceType.ICommand):
+            raise PyStError("GenICam error: node {0} has no value."
+                            .format(self._name))
+        if self._selector is not None:
+            return self._selected_values.get(self._selector._value,
+                                             self._value)
+        if callable(self._value):
+            return self._value()
+        return self._value
+
+    def _set_value(self, value):
+        if not self.is_writable:
+            raise PyStError("GenICam error: node {0} is not writable."
+                            .format(self._name))
+        value = self._validate(value)
+        if self._selector is not None:
+            self._selected_values[self._selector._value] = value
+        else:
+            self._value = value
+        if self._on_write is not None:
+            self._on_write(self, value)
+        self._fire_callbacks()
+        for node in self._selected_nodes + self._invalidated_nodes:
+            node._fire_callbacks()
+
+    def _validate(self, value):
+        interface_type = self._interface_type
+        if interface_type == EGCInterfaceType.IInteger:
+            value = int(value)
+            min_value, max_value = self._get_min(), self._get_max()
+            if not min_value <= value <= max_value:
+                raise PyStError("GenICam error: {0} value {1} is out of "
+                                "range [{2}, {3}].".format(
+                                    self._name, value, min_value, max_value))
+            if self._inc and (value - min_value) % self._inc:
+                raise PyStError("GenICam error: {0} value {1} does not "
+                                "match the increment {2}.".format(
+                                    self._name, value, self._inc))
+        elif interface_type == EGCInterfaceType.IFloat:
+            value = float(value)
+            min_value, max_value = self._get_min(), self._get_max()
+            if not min_value <= value <= max_value:
+                raise PyStError("GenICam error: {0} value {1} is out of "
+                                "range [{2}, {3}].".format(
+                                    self._name, value, min_value, max_value))
+        elif interface_type == EGCInterfaceType.IBoolean:
+            value = bool(value)
+        elif interface_type == EGCInterfaceType.IString:
+            value = str(value)
+            if len(value) > self._max_length:
+                raise PyStError("GenICam error: {0} value is too long."
+                                .format(self._name))
+        elif interface_type == EGCInterfaceType.IEnumeration:
+            entry = self._find_entry(lambda entry: entry._value == value)
+            value = entry._value
+        return value
+
+    def _get_min(self):
+        return self._min() if callable(self._min) else self._min
+
+    def _get_max(self):
+        return self._max() if callable(self._max) else self._max
+
+    def _find_entry(self, predicate):
+        for entry in self._entries:
+            if predicate(entry):
+                if not entry.is_available:
+                    raise PyStError("GenICam error: entry {0} of {1} is not "
+                                    "available.".format(entry._symbolic,
+                                                        self._name))
+                return entry
+        raise PyStError("GenICam error: entry not found in {0}."
+                        .format(self._name))
+
+    # Callbacks.
+    def register_callback(self, callback_func, user_data=None,
+                          callback_type=EGCCallbackType.InsideLock):
+        """
+        Register a callback function for this node. The callback is fired
+        when the node is written or invalidated.
+        """
+        registered_cb = PyStRegisteredCallback(callback_func, user_data,
+                                               node=self)
+        with self._callbacks_lock:
+            self._callbacks.append(registered_cb)
+        return registered_cb
+
+    def deregister_callback(self, registered_cb, check_all=False):
+        """Deregister a callback."""
+        with self._callbacks_lock:
+            if registered_cb in self._callbacks:
+                self._callbacks.remove(registered_cb)
+        registered_cb.is_released = True
+
+    def deregister_callbacks(self, check_all=False):
+        """Deregister all callbacks."""
+        with self._callbacks_lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for registered_cb in callbacks:
+            registered_cb.is_released = True
+
+    def get_registered_callbacks(self, check_all=False):
+        """Get the list of registered callbacks."""
+        with self._callbacks_lock:
+            return list(self._callbacks) or None
+
+    def invalidate_node(self):
+        """Invalidate the node. The registered callbacks are fired."""
+        self._fire_callbacks()
+
+    def _fire_callbacks(self):
+        with self._callbacks_lock:
+            callbacks = list(self._callbacks)
+        for registered_cb in callbacks:
+            registered_cb._invoke()
+
+
+class PyNodeMap:
+    """
+    Simulated GenApi nodemap.
+    """
+
+    def __init__(self, device_name=''):
+        self._device_name = device_name
+        self._nodes = {}
+        self._lock = PyLock()
+
+    @property
+    def device_name(self) -> str:
+        """Property: device name of the nodemap."""
+        return self._device_name
+
+    @property
+    def lock(self) -> PyLock:
+        """Property: lock which guards the nodemap."""
+        return self._lock
+
+    @property
+    def nodes_count(self) -> int:
+        """Property: number of nodes."""
+        return len(self._nodes)
+
+    def get_node(self, node_name):
+        """
+        Get node.
+
+        :param node_name: node name.
+        :return: PyNode or None if not found.
+        """
+        return self._nodes.get(node_name)
+
+    def get_nodes_name(self, full_qualified=False):
+        """Get the names of all nodes."""
+        return list(self._nodes)
+
+    def invalidate_nodes(self):
+        """Invalidate all nodes."""
+        for node in list(self._nodes.values()):
+            node.invalidate_node()
+
+    def poll(self, elapsed_time):
+        """Poll the nodes (nothing to do)."""
+
+    def set_suppress_callback_mode(self, value):
+        """Set the callback suppression mode (nothing to do)."""
+
+    def add_node(self, node, category=None):
+        """
+        Add a node to the nodemap (simulator only).
+
+        :param node: PyNode to add.
+        :param category: PyNode of the category containing the node.
+        :return: the added node.
+        """
+        node._nodemap = self
+        self._nodes[node.name] = node
+        for entry in node._entries:
+            entry._nodemap = self
+            self._nodes[entry.name] = entry
+        if category is not None:
+            category._features.append(node)
+        return node
+
+
+class PyIValue:
+    """
+    Simulated base interface of the node value classes.
+    """
+    _interface_types = ()
+
+    def __init__(self, node):
+        if isinstance(node, PyIValue):
+            node = node.node
+        if node is None:
+            raise PyStError("GenICam error: node is None.")
+        if self._interface_types and \
+                node.principal_interface_type not in self._interface_types:
+            raise PyStError("GenICam error: node {0} is not {1}.".format(
+                            node.name, self.__class__.__name__[2:]))
+        self._node = node
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    @property
+    def node(self) -> PyNode:
+        """Property: PyNode of this interface."""
+        return self._node
+
+    @property
+    def access_mode(self):
+        """Property: EGCAccessMode of the node."""
+        return self._node.access_mode
+
+    @property
+    def is_value_cache_valid(self) -> bool:
+        """Property: True if the cached value is valid."""
+        return True
+
+    def to_string(self, verify=False, ignore_cache=False) -> str:
+        """Get the value as string."""
+        return str(self._node.value)
+
+    def from_string(self, value, verify=True):
+        """Set the value from string."""
+        self._node.value = value
+
+
+class PyIValueNumber(PyIValue):
+    """
+    Common part of PyIInteger and PyIFloat.
+    """
+
+    @property
+    def value(self):
+        """Property: value of the node."""
+        return self._node.value
+
+    @value.setter
+    def value(self, value):
+        self._node.value = value
+
+    def get_value(self, verify=False, ignore_cache=False):
+        """Get the node value."""
+        return self._node.value
+
+    def set_value(self, value, verify=True):
+        """Set the node value."""
+        self._node.value = value
+
+    @property
+    def min(self):
+        """Property: minimum value."""
+        return self._node._get_min()
+
+    @property
+    def max(self):
+        """Property: maximum value."""
+        return self._node._get_max()
+
+    @property
+    def inc(self):
+        """Property: increment."""
+        return self._node._inc or 1
+
+    @property
+    def inc_mode(self):
+        """Property: EGCIncMode."""
+        if self._node._inc:
+            return EGCIncMode.FixedIncrement
+        return EGCIncMode.NoIncrement
+
+    @property
+    def unit(self) -> str:
+        """Property: unit of the value."""
+        return self._node._unit
+
+    @property
+    def representation(self):
+        """Property: EGCRepresentation."""
+        return EGCRepresentation.Linear
+
+    def get_valid_values(self, bounded=True):
+        """Get the list of valid values (only for ListIncrement)."""
+        return []
+
+
+class PyIInteger(PyIValueNumber):
+    """
+    Simulated Integer interface.
+    """
+    _interface_types = (EGCInterfaceType.IInteger,)
+
+
+class PyIFloat(PyIValueNumber):
+    """
+    Simulated Float interface.
+    """
+    _interface_types = (EGCInterfaceType.IFloat,)
+
+    @property
+    def has_inc(self) -> bool:
+        """Property: True if the node has an increment."""
+        return bool(self._node._inc)
+
+    @property
+    def display_precision(self) -> int:
+        """Property: display precision."""
+        return 6
+
+
+class PyIBoolean(PyIValue):
+    """
+    Simulated Boolean interface.
+    """
+    _interface_types = (EGCInterfaceType.IBoolean,)
+
+    @property
+    def value(self) -> bool:
+        """Property: value of the node."""
+        return self._node.value
+
+    @value.setter
+    def value(self, value):
+        self._node.value = value
+
+    def get_value(self, verify=False, ignore_cache=False) -> bool:
+        """Get the node value."""
+        return self._node.value
+
+    def set_value(self, value, verify=True):
+        """Set the node value."""
+        self._node.value = value
+
+    def from_string(self, value, verify=True):
+        """Set the value from string."""
+        self._node.value = str(value).lower() in ('1', 'true')
+
+
+class PyIString(PyIBoolean):
+    """
+    Simulated String interface.
+    """
+    _interface_types = (EGCInterfaceType.IString,)
+
+    @property
+    def max_length(self) -> int:
+        """Property: maximum length of the string."""
+        return self._node._max_length
+
+    def get_max_length(self) -> int:
+        """Get the maximum length of the string."""
+        return self._node._max_length
+
+    def from_string(self, value, verify=True):
+        """Set the value from string."""
+        self._node.value = value
+
+
+class PyICommand(PyIValue):
+    """
+    Simulated Command interface.
+    """
+    _interface_types = (EGCInterfaceType.ICommand,)
+
+    def execute(self, verify=False):
+        """Execute the command node."""
+        node = self._node
+        if not node.is_writable:
+            raise PyStError("GenICam error: node {0} is not writable."
+                            .format(node.name))
+        if node._on_write is not None:
+            node._on_write(node, None)
+        node._fire_callbacks()
+
+    @property
+    def is_done(self) -> bool:
+        """Property: True if the command is done."""
+        return True
+
+    def to_string(self, verify=False, ignore_cache=False) -> str:
+        raise PyStError("GenICam error: command has no value.")
+
+
+class PyICategory(PyIValue):
+    """
+    Simulated Category interface.
+    """
+    _interface_types = (EGCInterfaceType.ICategory,)
+
+    @property
+    def feature_list(self):
+        """Property: list of the feature nodes (PyNode)."""
+        return list(self._node._features)
+
+    def to_string(self, verify=False, ignore_cache=False) -> str:
+        raise PyStError("GenICam error: category has no value.")
+
+
+class PyIEnumEntry(PyIValue):
+    """
+    Simulated EnumEntry interface.
+    """
+    _interface_types = (EGCInterfaceType.IEnumEntry,)
+
+    @property
+    def value(self) -> int:
+        """Property: numeric value of the entry."""
+        return self._node._value
+
+    @property
+    def numeric_value(self) -> float:
+        """Property: numeric value of the entry as float."""
+        return float(self._node._value)
+
+    @property
+    def symbolic_value(self) -> str:
+        """Property: symbolic value of the entry."""
+        return self._node._symbolic
+
+    @property
+    def is_self_clearing(self) -> bool:
+        """Property: True if the entry is self clearing."""
+        return False
+
+    def to_string(self, verify=False, ignore_cache=False) -> str:
+        return self._node._symbolic
+
+
+class PyIEnumeration(PyIValue):
+    """
+    Simulated Enumeration interface.
+    """
+    _interface_types = (EGCInterfaceType.IEnumeration,)
+
+    def __getitem__(self, symbolic):
+        for entry in self._node._entries:
+            if entry._symbolic == symbolic:
+                return entry
+        raise PyStError("GenICam error: entry {0} not found in {1}."
+                        .format(symbolic, self._node.name))
+
+    @property
+    def value(self) -> int:
+        """Property: numeric value of the current entry."""
+        return self._node.value
+
+    @value.setter
+    def value(self, value):
+        self._node.value = value
+
+    def get_int_value(self, verify=False, ignore_cache=False) -> int:
+        """Get the numeric value of the current entry."""
+        return self._node.value
+
+    def set_int_value(self, value, verify=True):
+        """Set the value with the numeric value of an entry."""
+        self._node.value = value
+
+    def set_symbolic_value(self, value, verify=True):
+        """Set the value with the symbolic value of an entry."""
+        entry = self._node._find_entry(
+            lambda entry: entry._symbolic == value)
+        self._node.value = entry._value
+
+    def set_entry_value(self, entry, verify=True):
+        """Set the value with an entry (PyIEnumEntry or PyNode)."""
+        self._node.value = PyIEnumEntry(entry).value
+
+    @property
+    def current_entry(self) -> PyNode:
+        """Property: PyNode of the current entry."""
+        value = self._node.value
+        for entry in self._node._entries:
+            if entry._value == value:
+                return entry
+        raise PyStError("GenICam error: current entry not found.")
+
+    @property
+    def symbolic_value(self) -> str:
+        """Property: symbolic value of the current entry."""
+        return self.current_entry._symbolic
+
+    @property
+    def entries(self):
+        """Property: list of PyNode of the entries."""
+        return list(self._node._entries)
+
+    @property
+    def entries_count(self) -> int:
+        """Property: number of entries."""
+        return len(self._node._entries)
+
+    @property
+    def symbolics_list(self):
+        """Property: list of the symbolic values of the entries."""
+        return [entry._symbolic for entry in self._node._entries]
+
+    def to_string(self, verify=False, ignore_cache=False) -> str:
+        return self.current_entry._symbolic
+
+    def from_string(self, value, verify=True):
+        self.set_symbolic_value(value, verify)
+
+
+_INTERFACE_CLASSES = {
+    EGCInterfaceType.IInteger: PyIInteger,
+    EGCInterfaceType.IFloat: PyIFloat,
+    EGCInterfaceType.IBoolean: PyIBoolean,
+    EGCInterfaceType.IString: PyIString,
+    EGCInterfaceType.ICommand: PyICommand,
+    EGCInterfaceType.ICategory: PyICategory,
+    EGCInterfaceType.IEnumeration: PyIEnumeration,
+    EGCInterfaceType.IEnumEntry: PyIEnumEntry,
+}
+
+
+def create_category(name, **kwargs):
+    """Create a category node (simulator only)."""
+    return PyNode(name, EGCInterfaceType.ICategory, EGCAccessMode.RO,
+                  **kwargs)
+
+
+def create_enumeration(name, symbolics, value=None,
+                       access_mode=EGCAccessMode.RW, **kwargs):
+    """
+    Create an enumeration node with its entries (simulator only).
+
+    :param name: name of the node.
+    :param symbolics: list of symbolic values, or list of tuples
+        (symbolic value, numeric value).
+    :param value: symbolic value of the initial entry (default: first).
+    :param access_mode: EGCAccessMode or callable.
+    :return: PyNode.
+    """
+    node = PyNode(name, EGCInterfaceType.IEnumeration, access_mode,
+                  **kwargs)
+    for index, symbolic in enumerate(symbolics):
+        if isinstance(symbolic, tuple):
+            symbolic, numeric = symbolic
+        else:
+            numeric = index
+        entry = PyNode("EnumEntry_{0}_{1}".format(name, symbolic),
+                       EGCInterfaceType.IEnumEntry, EGCAccessMode.RO,
+                       numeric, display_name=symbolic)
+        entry._symbolic = symbolic
+        node._entries.append(entry)
+    initial = node._entries[0]
+    if value is not None:
+        initial = PyIEnumeration(node)[value]
+    node._value = initial._value
+    return node
+
+
+def set_selector(selector, *selected_nodes):
+    """
+    Make nodes selected by a selector node (simulator only).
+
+    :param selector: PyNode of the selector.
+    :param selected_nodes: PyNode selected by the selector.
+    """
+    for node in selected_nodes:
+        node._selector = selector
+        selector._selected_nodes.append(node)
+
+
+# ---------------------------------------------------------------------------
+# Simulated camera
+# ---------------------------------------------------------------------------
+
+# Origin of the timestamps. The clocks of all simulated cameras are
+# synchronized, like PTP synchronized GigE cameras.
+_clock_epoch = time.perf_counter()
+
+# Subnet of the simulated GigE Vision interface (192.168.0.1/24).
+SIM_SUBNET_IP_ADDRESS = 0xC0A80000
+SIM_SUBNET_MASK = 0xFFFFFF00
+
+# Seconds before a camera uses the address set by GevDeviceForceIP.
+FORCE_IP_DELAY = 0.5
+
+# Chunks of the simulated cameras (ChunkSelector entry, interface type).
+CHUNKS = (('FrameID', EGCInterfaceType.IInteger),
+          ('Timestamp', EGCInterfaceType.IInteger),
+          ('ExposureTime', EGCInterfaceType.IFloat),
+          ('Gain', EGCInterfaceType.IFloat))
+
+
+class CSimCamera:
+    """
+    Simulated physical camera (simulator only).
+
+    The camera owns the remote nodemap, so its settings are kept while
+    devices are opened and closed, like a real camera. Drop, incomplete-frame
+    and device-lost injection are configured with the attributes of the
+    same names and can be changed at any time.
+    """
+    _serial_counter = 0
+    _address_counter = 0
+
+    def __init__(self, model='STC-SIM', serial_number=None, width=640,
+                 height=480,
+                 pixel_format=EStPixelFormatNamingConvention.Mono8,
+                 fps=1000.0, sensor_width=None, sensor_height=None,
+                 interface_type=EStInterfaceType.USB3Vision,
+                 timestamp_frequency=1000000000, user_defined_name='',
+                 drop_rate=0.0, incomplete_rate=0.0, lost_after_frames=-1,
+                 reconnect_after=None, seed=0, open_delay=0.0):
+        """
+        :param model: model name.
+        :param serial_number: serial number (default: generated).
+        :param width: initial Width.
+        :param height: initial Height.
+        :param pixel_format: initial EStPixelFormatNamingConvention. A Bayer
+            format makes a color camera with that color filter.
+        :param fps: initial AcquisitionFrameRate. 0 produces a frame
+            whenever one is requested (as fast as the host retrieves).
+        :param sensor_width: width of the sensor (default: width).
+        :param sensor_height: height of the sensor (default: height).
+        :param interface_type: EStInterfaceType.USB3Vision or GigEVision.
+        :param timestamp_frequency: timestamp ticks per second.
+        :param user_defined_name: initial DeviceUserID.
+        :param drop_rate: probability that a frame is lost in transfer.
+        :param incomplete_rate: probability that a frame is incomplete.
+        :param lost_after_frames: number of frames after which the camera
+            is disconnected once (-1: never).
+        :param reconnect_after: seconds after which a camera disconnected
+            by lost_after_frames is connected again (None: never).
+        :param seed: seed of the random injection (combined with the
+            serial number).
+        :param open_delay: seconds taken to open the device (e.g. control
+            channel and XML file transfer).
+        """
+        if serial_number is None:
+            CSimCamera._serial_counter += 1
+            serial_number = "SIM{0:05d}".format(CSimCamera._serial_counter)
+        CSimCamera._address_counter += 1
+        pixel_format = _to_pixel_format(pixel_format)
+        self.model = model
+        self.serial_number = serial_number
+        self.interface_type = interface_type
+        self.timestamp_frequency = timestamp_frequency
+        self.drop_rate = drop_rate
+        self.incomplete_rate = incomplete_rate
+        self.lost_after_frames = lost_after_frames
+        self.reconnect_after = reconnect_after
+        self.open_delay = open_delay
+        # GigE Vision addresses (192.168.0.x/24).
+        self.ip_address = SIM_SUBNET_IP_ADDRESS + 10 + \
+            CSimCamera._address_counter
+        self.subnet_mask = SIM_SUBNET_MASK
+        self.mac_address = 0x00111C000000 + CSimCamera._address_counter
+        self.frame_count = 0
+        self.dropped_count = 0
+        self.incomplete_count = 0
+        self.sensor_width = sensor_width or width
+        self.sensor_height = sensor_height or height
+        # Each camera has its own fault sequence.
+        self._random = random.Random("{0}:{1}".format(seed, serial_number))
+        self._epoch = _clock_epoch
+        self._lock = threading.RLock()
+        self._is_connected = True
+        self._device = None
+        self._is_acquiring = False
+        self._frames_left = -1
+        self._frames_key = None
+        self._frames = None
+        self._chunk_values = {}
+        self._power_on_settings = (width, height, pixel_format, fps,
+                                   user_defined_name)
+        self.remote_nodemap = self._create_remote_nodemap(
+            *self._power_on_settings)
+
+    @property
+    def device_id(self) -> str:
+        """Property: GenTL device ID of the camera."""
+        return "SIM-{0}".format(self.serial_number)
+
+    @property
+    def is_connected(self) -> bool:
+        """Property: True while the camera is connected."""
+        return self._is_connected
+
+    @property
+    def is_opened(self) -> bool:
+        """Property: True while a PyStDevice of the camera is open."""
+        return self._device is not None
+
+    @property
+    def is_acquiring(self) -> bool:
+        """Property: True while the camera side acquisition is running."""
+        return self._is_acquiring
+
+    def connect(self):
+        """Connect (plug in) the camera."""
+        self._is_connected = True
+
+    def disconnect(self, reconnect_after=None):
+        """
+        Disconnect (unplug) the camera. The open device becomes lost.
+
+        :param reconnect_after: seconds after which the camera is
+            connected again, or None.
+        """
+        with self._lock:
+            self._is_connected = False
+            self._is_acquiring = False
+            device, self._device = self._device, None
+            self.remote_nodemap.get_node('TLParamsLocked')._value = 0
+        if device is not None:
+            device._on_device_lost()
+        if reconnect_after is not None:
+            timer = threading.Timer(reconnect_after, self.connect)
+            timer.daemon = True
+            timer.start()
+
+    def reset_settings(self):
+        """
+        Restore the power-on settings, like a camera which was power
+        cycled. The camera must not be open.
+        """
+        with self._lock:
+            if self._device is not None:
+                raise PyStError("GenTL error: device {0} is opened."
+                                .format(self.device_id))
+            self.remote_nodemap = self._create_remote_nodemap(
+                *self._power_on_settings)
+
+    def force_ip(self, ip_address, subnet_mask, delay=FORCE_IP_DELAY):
+        """
+        Change the IP address of the camera (GevDeviceForceIP). The new
+        address is used after the camera restarted its network stack.
+
+        :param ip_address: new IP address.
+        :param subnet_mask: new subnet mask.
+        :param delay: seconds before the new address is used.
+        """
+        def apply():
+            self.ip_address = ip_address
+            self.subnet_mask = subnet_mask
+        timer = threading.Timer(delay, apply)
+        timer.daemon = True
+        timer.start()
+
+    def get_node_value(self, node_name):
+        """Get a value of the remote nodemap regardless of the access."""
+        node = self.remote_nodemap.get_node(node_name)
+        if node._selector is not None:
+            return node._selected_values.get(node._selector._value,
+                                             node._value)
+        return node._value() if callable(node._value) else node._value
+
+    def _create_remote_nodemap(self, width, height, pixel_format, fps,
+                               user_defined_name):
+        nodemap = PyNodeMap(self.model)
+        root = nodemap.add_node(create_category('Root'))
+        pixel_format_info = PyStPixelFormatInfo(pixel_format)
+
+        def tl_locked():
+            return EGCAccessMode.RO if nodemap.get_node(
+                'TLParamsLocked')._value else EGCAccessMode.RW
+
+        def color_only():
+            return EGCAccessMode.RW if pixel_format_info.is_bayer else \
+                EGCAccessMode.NA
+
+        # DeviceControl.
+        category = nodemap.add_node(create_category('DeviceControl'), root)
+        for name, value in (('DeviceVendorName', 'Simulated'),
+                            ('DeviceModelName', self.model),
+                            ('DeviceVersion', '1.0'),
+                            ('DeviceSerialNumber', self.serial_number)):
+            nodemap.add_node(PyNode(name, EGCInterfaceType.IString,
+                                    EGCAccessMode.RO, value), category)
+        nodemap.add_node(PyNode('DeviceUserID', EGCInterfaceType.IString,
+                                EGCAccessMode.RW, user_defined_name,
+                                max_length=16), category)
+        if self.interface_type == EStInterfaceType.GigEVision:
+            nodemap.add_node(PyNode(
+                'DeviceLinkHeartbeatTimeout', EGCInterfaceType.IFloat,
+                EGCAccessMode.RW, 3000000.0, unit='us', min_value=500000.0,
+                max_value=600000000.0), category)
+
+        # ImageFormatControl.
+        category = nodemap.add_node(create_category('ImageFormatControl'),
+                                    root)
+        nodemap.add_node(PyNode('SensorWidth', EGCInterfaceType.IInteger,
+                                EGCAccessMode.RO, self.sensor_width),
+                         category)
+        nodemap.add_node(PyNode('SensorHeight', EGCInterfaceType.IInteger,
+                                EGCAccessMode.RO, self.sensor_height),
+                         category)
+        nodemap.add_node(PyNode('WidthMax', EGCInterfaceType.IInteger,
+                                EGCAccessMode.RO, self.sensor_width),
+                         category)
+        nodemap.add_node(PyNode('HeightMax', EGCInterfaceType.IInteger,
+                                EGCAccessMode.RO, self.sensor_height),
+                         category)
+        nodemap.add_node(create_enumeration('RegionSelector', ['Region0'],
+                                            access_mode=EGCAccessMode.NI),
+                         category)
+        sizes = (('Width', 'OffsetX', self.sensor_width, width, 4),
+                 ('Height', 'OffsetY', self.sensor_height, height, 2))
+        for size_name, offset_name, sensor_size, size, inc in sizes:
+            size_node = nodemap.add_node(PyNode(
+                size_name, EGCInterfaceType.IInteger, tl_locked, size,
+                min_value=inc * 4, inc=inc), category)
+            offset_node = nodemap.add_node(PyNode(
+                offset_name, EGCInterfaceType.IInteger, tl_locked, 0,
+                min_value=0, inc=inc), category)
+            size_node._max = (lambda sensor_size=sensor_size,
+                              node=offset_node: sensor_size - node._value)
+            offset_node._max = (lambda sensor_size=sensor_size,
+                                node=size_node: sensor_size - node._value)
+            size_node._invalidated_nodes.append(offset_node)
+            offset_node._invalidated_nodes.append(size_node)
+        if pixel_format_info.is_bayer:
+            prefix = pixel_format.name[:7]
+        else:
+            prefix = 'Mono'
+        formats = [EStPixelFormatNamingConvention[prefix + bits]
+                   for bits in ('8', '10', '12')]
+        nodemap.add_node(create_enumeration(
+            'PixelFormat', [(item.name, item.value) for item in formats],
+            pixel_format.name, tl_locked), category)
+
+        # AcquisitionControl.
+        category = nodemap.add_node(create_category('AcquisitionControl'),
+                                    root)
+        nodemap.add_node(create_enumeration(
+            'AcquisitionMode', ['Continuous', 'SingleFrame', 'MultiFrame'],
+            access_mode=tl_locked), category)
+        nodemap.add_node(PyNode('AcquisitionFrameCount',
+                                EGCInterfaceType.IInteger, EGCAccessMode.RW,
+                                1, min_value=1, max_value=65535), category)
+        node = nodemap.add_node(PyNode('AcquisitionStart',
+                                       EGCInterfaceType.ICommand,
+                                       EGCAccessMode.WO), category)
+        node._on_write = lambda node, value: self._start_acquisition()
+        node = nodemap.add_node(PyNode('AcquisitionStop',
+                                       EGCInterfaceType.ICommand,
+                                       EGCAccessMode.WO), category)
+        node._on_write = lambda node, value: self._stop_acquisition()
+        node = nodemap.add_node(PyNode(
+            'AcquisitionFrameRate', EGCInterfaceType.IFloat,
+            EGCAccessMode.RW, float(fps), unit='Hz', min_value=0.0,
+            max_value=100000.0,
+            description='0 produces a frame whenever one is requested '
+                        '(simulator only).'), category)
+        node._on_write = lambda node, value: self._on_frame_period_changed()
+        nodemap.add_node(create_enumeration(
+            'ExposureMode', ['Timed', 'TriggerWidth']), category)
+        node = nodemap.add_node(PyNode(
+            'ExposureTime', EGCInterfaceType.IFloat, EGCAccessMode.RW, 100.0,
+            unit='us', min_value=10.0, max_value=1000000.0), category)
+        node._on_write = lambda node, value: self._on_frame_period_changed()
+        nodemap.add_node(create_enumeration(
+            'ExposureAuto', ['Off', 'Once', 'Continuous']), category)
+        trigger_selector = nodemap.add_node(create_enumeration(
+            'TriggerSelector', ['FrameStart', 'ExposureStart']), category)
+        trigger_mode = nodemap.add_node(create_enumeration(
+            'TriggerMode', ['Off', 'On']), category)
+        trigger_source = nodemap.add_node(create_enumeration(
+            'TriggerSource', ['Software', 'Line0']), category)
+        trigger_software = nodemap.add_node(PyNode(
+            'TriggerSoftware', EGCInterfaceType.ICommand, EGCAccessMode.WO),
+            category)
+        trigger_software._on_write = \
+            lambda node, value: self._trigger_software()
+        set_selector(trigger_selector, trigger_mode, trigger_source,
+                     trigger_software)
+
+        # AnalogControl.
+        category = nodemap.add_node(create_category('AnalogControl'), root)
+        nodemap.add_node(create_enumeration(
+            'GainAuto', ['Off', 'Once', 'Continuous']), category)
+        nodemap.add_node(PyNode('Gain', EGCInterfaceType.IFloat,
+                                EGCAccessMode.RW, 0.0, unit='dB',
+                                min_value=0.0, max_value=24.0), category)
+        nodemap.add_node(PyNode('AutoLightTarget', EGCInterfaceType.IInteger,
+                                EGCAccessMode.RW, 128, min_value=0,
+                                max_value=255), category)
+        nodemap.add_node(create_enumeration(
+            'BalanceWhiteAuto', ['Off', 'Once', 'Continuous'],
+            access_mode=color_only), category)
+        balance_ratio_selector = nodemap.add_node(create_enumeration(
+            'BalanceRatioSelector', ['Red', 'Blue'], access_mode=color_only),
+            category)
+        balance_ratio = nodemap.add_node(PyNode(
+            'BalanceRatio', EGCInterfaceType.IFloat, color_only, 1.0,
+            min_value=0.1, max_value=8.0), category)
+        set_selector(balance_ratio_selector, balance_ratio)
+
+        # LUTControl. LUTIndex is a selector without the Selector suffix.
+        category = nodemap.add_node(create_category('LUTControl'), root)
+        nodemap.add_node(PyNode('LUTEnable', EGCInterfaceType.IBoolean,
+                                EGCAccessMode.RW, False), category)
+        lut_index = nodemap.add_node(PyNode(
+            'LUTIndex', EGCInterfaceType.IInteger, EGCAccessMode.RW, 0,
+            min_value=0, max_value=255), category)
+        lut_value = nodemap.add_node(PyNode(
+            'LUTValue', EGCInterfaceType.IInteger, EGCAccessMode.RW, 0,
+            min_value=0, max_value=255), category)
+        set_selector(lut_index, lut_value)
+
+        # EventControl. The data of an event is set when it is fired.
+        category = nodemap.add_node(create_category('EventControl'), root)
+        event_selector = nodemap.add_node(create_enumeration(
+            'EventSelector', [('ExposureEnd', 0x9001)]), category)
+        event_notification = nodemap.add_node(create_enumeration(
+            'EventNotification', ['Off', 'On']), category)
+        set_selector(event_selector, event_notification)
+        for name in ('EventExposureEnd', 'EventExposureEndTimestamp',
+                     'EventExposureEndFrameID'):
+            nodemap.add_node(PyNode(name, EGCInterfaceType.IInteger,
+                                    EGCAccessMode.RO, 0), category)
+
+        # ChunkDataControl. The chunk nodes hold the data of the last
+        # retrieved buffer.
+        category = nodemap.add_node(create_category('ChunkDataControl'),
+                                    root)
+        nodemap.add_node(PyNode('ChunkModeActive', EGCInterfaceType.IBoolean,
+                                tl_locked, False), category)
+        chunk_selector = nodemap.add_node(create_enumeration(
+            'ChunkSelector', [name for name, _ in CHUNKS]), category)
+        chunk_enable = nodemap.add_node(PyNode(
+            'ChunkEnable', EGCInterfaceType.IBoolean, tl_locked, False),
+            category)
+        set_selector(chunk_selector, chunk_enable)
+        for name, interface_type in CHUNKS:
+            nodemap.add_node(PyNode(
+                'Chunk' + name, interface_type,
+                lambda name=name: EGCAccessMode.RO
+                if name in self._chunk_values else EGCAccessMode.NA,
+                lambda name=name: self._chunk_values[name]), category)
+
+        # TransportLayerControl.
+        category = nodemap.add_node(create_category('TransportLayerControl'),
+                                    root)
+        payload_size = nodemap.add_node(PyNode(
+            'PayloadSize', EGCInterfaceType.IInteger, EGCAccessMode.RO,
+            self._get_payload_size), category)
+        nodemap.add_node(PyNode('TLParamsLocked', EGCInterfaceType.IInteger,
+                                EGCAccessMode.RW, 0, min_value=0,
+                                max_value=1,
+                                visibility=EGCVisibility.Invisible),
+                         category)
+        for name in ('Width', 'Height', 'PixelFormat'):
+            nodemap.get_node(name)._invalidated_nodes.append(payload_size)
+        return nodemap
+
+    def _get_image_settings(self):
+        return (self.get_node_value('Width'), self.get_node_value('Height'),
+                EStPixelFormatNamingConvention(
+                    self.get_node_value('PixelFormat')),
+                self.get_node_value('OffsetX'),
+                self.get_node_value('OffsetY'))
+
+    def _get_payload_size(self):
+        width, height, pixel_format, _, _ = self._get_image_settings()
+        component_count, component_bits, _ = get_pixel_layout(pixel_format)
+        return width * height * component_count * component_bits // 8
+
+    def _get_frames(self):
+        """Get the synthetic frames of the current image settings."""
+        key = self._get_image_settings()
+        if key != self._frames_key:
+            width, height, pixel_format, offset_x, offset_y = key
+            self._frames = create_synthetic_frames(
+                width, height, pixel_format, offset_x=offset_x,
+                offset_y=offset_y, sensor_width=self.sensor_width,
+                sensor_height=self.sensor_height)
+            self._frames_key = key
+        return key[2], self._frames
+
+    def _get_frame_period(self):
+        """Frame period in seconds (0: produced when requested)."""
+        fps = self.get_node_value('AcquisitionFrameRate')
+        if fps <= 0:
+            return 0.0
+        return max(1.0 / fps, self.get_node_value('ExposureTime') * 1e-6)
+
+    def _is_software_triggered(self):
+        """True if FrameStart is triggered by TriggerSoftware."""
+        nodemap = self.remote_nodemap
+        selector = PyIEnumeration(nodemap.get_node('TriggerSelector'))
+        frame_start = selector['FrameStart']._value
+        mode = nodemap.get_node('TriggerMode')
+        return mode._selected_values.get(frame_start, mode._value) == 1
+
+    def _start_acquisition(self):
+        with self._lock:
+            if self._is_acquiring:
+                return
+            mode = PyIEnumeration(
+                self.remote_nodemap.get_node('AcquisitionMode'))
+            if mode.symbolic_value == 'SingleFrame':
+                self._frames_left = 1
+            elif mode.symbolic_value == 'MultiFrame':
+                self._frames_left = self.get_node_value(
+                    'AcquisitionFrameCount')
+            else:
+                self._frames_left = -1
+            self._is_acquiring = True
+            device = self._device
+        if device is not None:
+            device._on_camera_start(time.perf_counter(),
+                                    self._get_frame_period(),
+                                    self._is_software_triggered())
+
+    def _stop_acquisition(self):
+        with self._lock:
+            self._is_acquiring = False
+            device = self._device
+        if device is not None:
+            device._on_camera_stop(time.perf_counter())
+
+    def _trigger_software(self):
+        nodemap = self.remote_nodemap
+        if PyIEnumeration(nodemap.get_node('TriggerSelector')) \
+                .symbolic_value != 'FrameStart':
+            return
+        source = PyIEnumeration(nodemap.get_node('TriggerSource'))
+        device = self._device
+        if self._is_acquiring and device is not None and \
+                source.symbolic_value == 'Software':
+            device._on_trigger(time.perf_counter())
+
+    def _on_frame_period_changed(self):
+        device = self._device
+        if self._is_acquiring and device is not None:
+            device._on_frame_period_changed(time.perf_counter(),
+                                            self._get_frame_period())
+
+    def _is_event_notified(self, event_name):
+        """True if EventNotification of the event is On."""
+        nodemap = self.remote_nodemap
+        event = PyIEnumeration(nodemap.get_node('EventSelector'))[event_name]
+        notification = nodemap.get_node('EventNotification')
+        return notification._selected_values.get(
+            event._value, notification._value) == 1
+
+    def _attach_chunk_data(self, frame_id, timestamp):
+        """
+        Set the chunk nodes to the data of a retrieved buffer.
+
+        :param frame_id: frame ID of the buffer.
+        :param timestamp: timestamp of the buffer.
+        :return: True if the buffer has chunk data.
+        """
+        nodemap = self.remote_nodemap
+        if not nodemap.get_node('ChunkModeActive')._value:
+            self._chunk_values = {}
+            return False
+        selector = PyIEnumeration(nodemap.get_node('ChunkSelector'))
+        enable = nodemap.get_node('ChunkEnable')
+        values = {'FrameID': frame_id, 'Timestamp': timestamp,
+                  'ExposureTime': self.get_node_value('ExposureTime'),
+                  'Gain': self.get_node_value('Gain')}
+        self._chunk_values = {
+            name: value for name, value in values.items()
+            if enable._selected_values.get(selector[name]._value,
+                                           enable._value)}
+        return True
+
+    def _open(self, device):
+        with self._lock:
+            if not self._is_connected:
+                raise PyStError("GenTL error: device {0} is not connected."
+                                .format(self.device_id))
+            if self._device is not None:
+                raise PyStError("GenTL error: device {0} is already "
+                                "opened.".format(self.device_id))
+            self._device = device
+
+    def _close(self, device):
+        with self._lock:
+            if self._device is not device:
+                return
+            self._device = None
+            self._is_acquiring = False
+            self.remote_nodemap.get_node('TLParamsLocked')._value = 0
+
+    def _emit_frames(self, count):
+        """
+        Account frames sent by the camera.
+
+        :param count: number of frames due.
+        :return: tuple of (number of frames sent, camera stopped,
+            camera lost).
+        """
+        with self._lock:
+            if not self._is_acquiring:
+                return 0, True, False
+            is_stopped = is_lost = False
+            if self._frames_left >= 0:
+                count = min(count, self._frames_left)
+                self._frames_left -= count
+                if self._frames_left == 0:
+                    self._is_acquiring = False
+                    is_stopped = True
+            if self.lost_after_frames >= 0 and \
+                    self.frame_count + count >= self.lost_after_frames:
+                count = max(self.lost_after_frames - self.frame_count, 0)
+                self.lost_after_frames = -1
+                is_lost = True
+            self.frame_count += count
+            return count, is_stopped, is_lost
+
+    def _is_dropped(self):
+        if self.drop_rate and self._random.random() < self.drop_rate:
+            self.dropped_count += 1
+            return True
+        return False
+
+    def _is_incomplete(self):
+        if self.incomplete_rate and \
+                self._random.random() < self.incomplete_rate:
+            self.incomplete_count += 1
+            return True
+        return False
+
+
+_cameras = []
+
+
+def get_cameras():
+    """
+    Get the simulated cameras (simulator only).
+
+    :return: list of CSimCamera.
+    """
+    return list(_cameras)
+
+
+def add_camera(camera=None, **settings):
+    """
+    Add a simulated camera (simulator only).
+
+    :param camera: CSimCamera, or None to create one with the settings.
+    :param settings: keyword arguments of CSimCamera.
+    :return: the added CSimCamera.
+    """
+    if camera is None:
+        camera = CSimCamera(**settings)
+    _cameras.append(camera)
+    return camera
+
+
+def remove_camera(camera):
+    """
+    Disconnect and remove a simulated camera (simulator only).
+
+    :param camera: CSimCamera to remove.
+    """
+    camera.disconnect()
+    _cameras.remove(camera)
+
+
+def reset_cameras(camera_count=1, **settings):
+    """
+    Replace all simulated cameras (simulator only).
+
+    :param camera_count: number of cameras to create.
+    :param settings: keyword arguments of CSimCamera.
+    :return: list of the created CSimCamera.
+    """
+    for camera in list(_cameras):
+        remove_camera(camera)
+    CSimCamera._serial_counter = 0
+    CSimCamera._address_counter = 0
+    return [add_camera(**settings) for _ in range(camera_count)]
+
+
+# ---------------------------------------------------------------------------
+# GenTL modules
+# ---------------------------------------------------------------------------
+
+_TL_TYPES = {EStInterfaceType.USB3Vision: 'U3V',
+             EStInterfaceType.GigEVision: 'GEV'}
+
+
+class PyStPortInfo:
+    """
+    Simulated port information.
+    """
+
+    def __init__(self, port_name, model='', vendor='Simulated', tl_type=''):
+        self.port_name = port_name
+        self.port_id = port_name
+        self.model = model
+        self.vendor = vendor
+        self.version = '1.0'
+        self.tl_type = tl_type
+        self.module = port_name
+        self.is_access_read = True
+        self.is_access_write = True
+        self.is_access_na = False
+        self.is_access_ni = False
+        self.is_big_endian = False
+        self.is_little_endian = True
+
+
+class PyStPortURLInfo:
+    """
+    Simulated URL information of the XML file of a port.
+    """
+
+    def __init__(self, filename, xml_data, file_version=(1, 0, 0)):
+        self.file_ver_major, self.file_ver_minor, self.file_ver_subminor = \
+            file_version
+        self.schema_ver_major = 1
+        self.schema_ver_minor = 1
+        self.filename = filename
+        self.url = 'Local:{0};0;{1:X}'.format(filename, len(xml_data))
+        self.scheme = 'Local'
+        self.filesize = len(xml_data)
+        self.file_register_address = 0
+        self.sha1_hash = hashlib.sha1(xml_data).digest()
+
+
+class PyStPort:
+    """
+    Simulated port giving access to a nodemap. The XML file lists the
+    nodes of the nodemap (simulator only).
+    """
+
+    def __init__(self, nodemap, info):
+        self._nodemap = nodemap
+        self._info = info
+        lines = ['<?xml version="1.0" encoding="utf-8"?>',
+                 '<RegisterDescription ModelName="{0}" VendorName="{1}" '
+                 'MajorVersion="1" MinorVersion="0" SubMinorVersion="0">'
+                 .format(info.model, info.vendor)]
+        lines.extend('  <{0} Name="{1}"/>'.format(
+            node.principal_interface_type.name[1:], node.name)
+            for node in nodemap._nodes.values())
+        lines.append('</RegisterDescription>')
+        self._xml_data = '\n'.join(lines).encode()
+        self._url_info = PyStPortURLInfo(
+            '{0}_{1}.xml'.format(info.model, info.port_name), self._xml_data)
+
+    @property
+    def nodemap(self) -> PyNodeMap:
+        """Property: nodemap of the port."""
+        return self._nodemap
+
+    @property
+    def info(self) -> PyStPortInfo:
+        """Property: information of the port."""
+        return self._info
+
+    @property
+    def url_count(self) -> int:
+        """Property: number of URLs of the port."""
+        return 1
+
+    @property
+    def url_index(self) -> int:
+        """Property: index of the URL of url_info."""
+        return 0
+
+    @property
+    def url_info(self) -> PyStPortURLInfo:
+        """Property: URL information of the XML file of the port."""
+        return self._url_info
+
+    @property
+    def xml_filename(self) -> str:
+        """Property: XML file name."""
+        return self._url_info.filename
+
+    def save_xml_file(self, filename):
+        """Save the XML data of the port to a file."""
+        with open(filename, 'wb') as file:
+            file.write(self._xml_data)
+
+
+class PyStSystemInfo:
+    """
+    Simulated system information.
+    """
+
+    def __init__(self):
+        self.display_name = 'Simulated GenTL Producer'
+        self.name = 'stapipy_sim'
+        self.model = 'Simulated'
+        self.vendor = 'Simulated'
+        self.version = get_version()
+        self.tl_id = 'SIM'
+        self.tl_type = 'Mixed'
+        self.path_name = __file__
+        self.gentl_version_major = 1
+        self.gentl_version_minor = 5
+        self.char_encoding = None
+
+
+class PyStSystem(CCallbackModule):
+    """
+    Simulated system module with one interface per interface type.
+    """
+
+    def __init__(self, system_vendor=EStSystemVendor.Default,
+                 interface_type=EStInterfaceType.All):
+        if system_vendor != EStSystemVendor.Default:
+            raise PyStError("GenTL error: GenTL producer of {0} is not "
+                            "found.".format(system_vendor.name))
+        self._vendor = system_vendor
+        self._info = PyStSystemInfo()
+        self._callback_list = CCallbackList(self)
+        self._is_event_acquiring = False
+        self._interfaces = [PyStInterface(self, item) for item in _TL_TYPES
+                            if interface_type in (item,
+                                                  EStInterfaceType.All)]
+
+    @property
+    def info(self) -> PyStSystemInfo:
+        """Property: information of the system."""
+        return self._info
+
+    @property
+    def vendor(self):
+        """Property: EStSystemVendor of the system."""
+        return self._vendor
+
+    @property
+    def interface_count(self) -> int:
+        """Property: number of interfaces."""
+        return len(self._interfaces)
+
+    def get_interface(self, index):
+        """
+        Get an interface.
+
+        :param index: index of the interface.
+        :return: PyStInterface.
+        """
+        return self._interfaces[index]
+
+    def update_interface_list(self) -> bool:
+        """Update the interface list. The list never changes."""
+        return False
+
+    def create_first_device(self,
+                            access_flags=ETLDeviceAccessFlags.AccessControl):
+        """
+        Open the first available device of all interfaces.
+
+        :param access_flags: ETLDeviceAccessFlags.
+        :return: PyStDevice.
+        """
+        for st_interface in self._interfaces:
+            st_device = st_interface._create_first_device(access_flags)
+            if st_device is not None:
+                return st_device
+        raise PyStError("GenTL error: no available device found.")
+
+    def release(self):
+        """Release the system."""
+        self.deregister_callbacks()
+
+
+class PyStSystemList:
+    """
+    Simulated list of systems.
+    """
+
+    def __init__(self):
+        self._systems = []
+
+    def __len__(self):
+        return len(self._systems)
+
+    def register(self, item) -> int:
+        """Register a system. Return the number of systems."""
+        self._systems.append(item)
+        return len(self._systems)
+
+    def deregister(self, index):
+        """Unregister the system at index."""
+        return self._systems.pop(index)
+
+    def create_first_device(self,
+                            access_flags=ETLDeviceAccessFlags.AccessControl):
+        """Open the first available device of all systems."""
+        for st_system in self._systems:
+            try:
+                return st_system.create_first_device(access_flags)
+            except PyStError:
+                pass
+        raise PyStError("GenTL error: no available device found.")
+
+    def release(self):
+        """Release all systems."""
+        self._systems = []
+
+
+class PyStInterfaceInfo:
+    """
+    Simulated interface information.
+    """
+
+    def __init__(self, interface_type):
+        tl_type = _TL_TYPES[interface_type]
+        self.display_name = 'Simulated {0} Interface'.format(tl_type)
+        self.interface_id = 'SIM-{0}'.format(tl_type)
+        self.tl_type = tl_type
+
+
+class PyStDeviceInfo:
+    """
+    Simulated device information (snapshot).
+    """
+
+    def __init__(self, camera):
+        self.model = camera.model
+        self.serial_number = camera.serial_number
+        self.display_name = "{0}({1})".format(camera.model,
+                                              camera.serial_number)
+        self.user_defined_name = camera.get_node_value('DeviceUserID')
+        self.vendor = 'Simulated'
+        self.version = '1.0'
+        self.device_id = camera.device_id
+        self.tl_type = _TL_TYPES[camera.interface_type]
+        self.timestamp_frequency = camera.timestamp_frequency
+        if not camera.is_connected:
+            self.access_status = ETLDeviceAccessStatus.StatusNoAccess
+        elif camera.is_opened:
+            self.access_status = ETLDeviceAccessStatus.StatusOpenReadWrite
+        else:
+            self.access_status = ETLDeviceAccessStatus.StatusReadWrite
+
+
+class PyStInterface(CCallbackModule):
+    """
+    Simulated interface module listing the cameras of one interface type.
+    """
+
+    def __init__(self, st_system, interface_type):
+        self._system = st_system
+        self._interface_type = interface_type
+        self._info = PyStInterfaceInfo(interface_type)
+        self._callback_list = CCallbackList(self)
+        self._is_event_acquiring = False
+        self._cameras = []
+        self._addresses = []
+        self.update_device_list_timeout = 1000
+        self._port = PyStPort(
+            self._create_nodemap(),
+            PyStPortInfo('Interface', 'Interface',
+                         tl_type=self._info.tl_type))
+        self.update_device_list()
+
+    @property
+    def info(self) -> PyStInterfaceInfo:
+        """Property: information of the interface."""
+        return self._info
+
+    @property
+    def interface_type(self):
+        """Property: EStInterfaceType of the interface."""
+        return self._interface_type
+
+    @property
+    def port(self) -> PyStPort:
+        """Property: port of the interface nodemap."""
+        return self._port
+
+    @property
+    def device_count(self) -> int:
+        """Property: number of devices found at the last update."""
+        return len(self._cameras)
+
+    def update_device_list(self) -> bool:
+        """
+        Update the device list.
+
+        :return: True if the device list changed.
+        """
+        cameras = [camera for camera in _cameras
+                   if camera.interface_type == self._interface_type and
+                   camera.is_connected]
+        # A camera found with another IP address is also a change.
+        addresses = [camera.ip_address for camera in cameras]
+        is_changed = cameras != self._cameras or \
+            addresses != self._addresses
+        self._cameras = cameras
+        self._addresses = addresses
+        if is_changed:
+            self._callback_list.fire(
+                EStCallbackType.GenTLDeviceListUpdated)
+        return is_changed
+
+    def get_device_info(self, index) -> PyStDeviceInfo:
+        """Get the information of a device of the device list."""
+        return PyStDeviceInfo(self._cameras[index])
+
+    def is_device_available(self, index,
+                            access_flags=ETLDeviceAccessFlags.AccessControl):
+        """Check if a device of the device list can be opened."""
+        camera = self._cameras[index]
+        return camera.is_connected and not camera.is_opened
+
+    def create_device_by_index(
+            self, index, access_flags=ETLDeviceAccessFlags.AccessControl):
+        """Open a device of the device list."""
+        if not 0 <= index < len(self._cameras):
+            raise PyStError("GenTL error: invalid device index {0}."
+                            .format(index))
+        return PyStDevice(self, self._cameras[index], access_flags)
+
+    def create_device_by_id(self, device_id,
+                            access_flags=ETLDeviceAccessFlags.AccessControl):
+        """Open a device with its device ID."""
+        self.update_device_list()
+        for camera in self._cameras:
+            if camera.device_id == device_id:
+                return PyStDevice(self, camera, access_flags)
+        raise PyStError("GenTL error: device {0} not found."
+                        .format(device_id))
+
+    def create_first_device(self,
+                            access_flags=ETLDeviceAccessFlags.AccessControl):
+        """Open the first available device of the interface."""
+        st_device = self._create_first_device(access_flags)
+        if st_device is None:
+            raise PyStError("GenTL error: no available device found.")
+        return st_device
+
+    def _create_first_device(self, access_flags):
+        self.update_device_list()
+        for camera in self._cameras:
+            if camera.is_connected and not camera.is_opened:
+                return PyStDevice(self, camera, access_flags)
+        return None
+
+    def _create_nodemap(self):
+        nodemap = PyNodeMap(self._info.interface_id)
+        root = nodemap.add_node(create_category('Root'))
+        category = nodemap.add_node(create_category('DeviceEnumeration'),
+                                    root)
+        device_selector = nodemap.add_node(PyNode(
+            'DeviceSelector', EGCInterfaceType.IInteger, value=0,
+            min_value=0, max_value=lambda: max(len(self._cameras) - 1, 0)),
+            category)
+
+        def selected_camera():
+            index = device_selector._value
+            return self._cameras[index] if index < len(self._cameras) \
+                else None
+
+        def selected_access():
+            return EGCAccessMode.RO if selected_camera() else \
+                EGCAccessMode.NA
+
+        def selected_value(attribute):
+            return lambda: getattr(selected_camera(), attribute)
+
+        nodemap.add_node(PyNode('DeviceID', EGCInterfaceType.IString,
+                                selected_access,
+                                selected_value('device_id')), category)
+        if self._interface_type != EStInterfaceType.GigEVision:
+            return nodemap
+        for name, value in (('GevInterfaceSubnetIPAddress',
+                             SIM_SUBNET_IP_ADDRESS + 1),
+                            ('GevInterfaceSubnetMask', SIM_SUBNET_MASK)):
+            nodemap.add_node(PyNode(name, EGCInterfaceType.IInteger,
+                                    EGCAccessMode.RO, value), root)
+        for name, attribute in (('GevDeviceIPAddress', 'ip_address'),
+                                ('GevDeviceSubnetMask', 'subnet_mask'),
+                                ('GevDeviceMACAddress', 'mac_address')):
+            nodemap.add_node(PyNode(name, EGCInterfaceType.IInteger,
+                                    selected_access,
+                                    selected_value(attribute)), category)
+        force_nodes = [nodemap.add_node(PyNode(
+            name, EGCInterfaceType.IInteger, value=0, min_value=0,
+            max_value=0xFFFFFFFF), category)
+            for name in ('GevDeviceForceIPAddress',
+                         'GevDeviceForceSubnetMask')]
+        force_ip = nodemap.add_node(PyNode(
+            'GevDeviceForceIP', EGCInterfaceType.ICommand,
+            EGCAccessMode.WO), category)
+        force_ip._on_write = lambda node, value: selected_camera().force_ip(
+            force_nodes[0]._value, force_nodes[1]._value)
+        return nodemap
+
+
+class PyStDevice(CCallbackModule):
+    """
+    Simulated device module of a CSimCamera.
+    """
+
+    def __init__(self, st_interface, camera,
+                 access_flags=ETLDeviceAccessFlags.AccessControl):
+        if camera.open_delay:
+            time.sleep(camera.open_delay)
+        camera._open(self)
+        self._camera = camera
+        self._interface = st_interface
+        self._access_flags = access_flags
+        self._info = PyStDeviceInfo(camera)
+        self._callback_list = CCallbackList(self)
+        self._is_event_acquiring = False
+        self._event_queue = queue.Queue()
+        self._event_thread = None
+        self._is_device_lost = False
+        self._is_released = False
+        self._datastreams = []
+        tl_type = _TL_TYPES[camera.interface_type]
+        self._remote_port = PyStPort(
+            camera.remote_nodemap,
+            PyStPortInfo('Device', camera.model, tl_type=tl_type))
+        self._local_port = PyStPort(
+            self._create_local_nodemap(),
+            PyStPortInfo('TLDevice', camera.model, tl_type=tl_type))
+
+    def __del__(self):
+        try:
+            self.release()
+        except Exception:
+            pass
+
+    @property
+    def info(self) -> PyStDeviceInfo:
+        """Property: information of the device."""
+        return self._info
+
+    @property
+    def interface(self) -> PyStInterface:
+        """Property: interface of the device."""
+        return self._interface
+
+    @property
+    def remote_port(self) -> PyStPort:
+        """Property: port of the camera side settings."""
+        return self._remote_port
+
+    @property
+    def local_port(self) -> PyStPort:
+        """Property: port of the host side settings."""
+        return self._local_port
+
+    @property
+    def is_device_lost(self) -> bool:
+        """Property: True if the device is lost."""
+        return self._is_device_lost
+
+    @property
+    def datastream_count(self) -> int:
+        """Property: number of datastreams."""
+        return 1
+
+    @property
+    def sim_camera(self) -> CSimCamera:
+        """Property: CSimCamera of this device (simulator only)."""
+        return self._camera
+
+    def create_datastream(self, index=0):
+        """
+        Open a datastream.
+
+        :param index: index of the datastream (0 only).
+        :return: PyStDataStream.
+        """
+        if index != 0:
+            raise PyStError("GenTL error: invalid datastream index {0}."
+                            .format(index))
+        self._check_device()
+        st_datastream = PyStDataStream(device=self)
+        self._datastreams.append(st_datastream)
+        return st_datastream
+
+    def acquisition_start(self):
+        """Start the image acquisition of the camera side."""
+        self._check_device()
+        PyICommand(self._camera.remote_nodemap.get_node(
+            'AcquisitionStart')).execute()
+
+    def acquisition_stop(self):
+        """Stop the image acquisition of the camera side."""
+        self._check_device()
+        PyICommand(self._camera.remote_nodemap.get_node(
+            'AcquisitionStop')).execute()
+
+    def release(self):
+        """Close the device."""
+        if self._is_released:
+            return
+        self._is_released = True
+        for st_datastream in self._datastreams:
+            st_datastream.release()
+        self._datastreams = []
+        self._camera._close(self)
+        self.stop_event_acquisition()
+        self.deregister_callbacks()
+
+    def start_event_acquisition(self):
+        """Start the event acquisition thread."""
+        if self._event_thread is None:
+            self._event_thread = threading.Thread(target=self._run_events,
+                                                  daemon=True)
+            self._event_thread.start()
+        self._is_event_acquiring = True
+
+    def stop_event_acquisition(self):
+        """Stop the event acquisition thread."""
+        self._is_event_acquiring = False
+        event_thread, self._event_thread = self._event_thread, None
+        if event_thread is not None:
+            self._event_queue.put(None)
+            if event_thread is not threading.current_thread():
+                event_thread.join()
+
+    def _check_device(self):
+        if self._is_device_lost:
+            raise PyStError("GenTL error: device {0} is lost."
+                            .format(self._camera.device_id))
+        if self._is_released:
+            raise PyStError("GenTL error: device is released.")
+
+    def _create_local_nodemap(self):
+        nodemap = PyNodeMap(self._camera.model)
+        root = nodemap.add_node(create_category('Root'))
+        category = nodemap.add_node(create_category('DeviceInformation'),
+                                    root)
+        nodemap.add_node(PyNode('DeviceID', EGCInterfaceType.IString,
+                                EGCAccessMode.RO, self._camera.device_id),
+                         category)
+        category = nodemap.add_node(create_category('EventControl'), root)
+        event_selector = nodemap.add_node(create_enumeration(
+            'EventSelector', [('DeviceLost', 0)]), category)
+        event_notification = nodemap.add_node(create_enumeration(
+            'EventNotification', ['Off', 'On']), category)
+        set_selector(event_selector, event_notification)
+        nodemap.add_node(PyNode('EventDeviceLost', EGCInterfaceType.IInteger,
+                                EGCAccessMode.RO, 0), category)
+        return nodemap
+
+    def _on_device_lost(self):
+        self._is_device_lost = True
+        for st_datastream in list(self._datastreams):
+            st_datastream._on_device_lost()
+        nodemap = self._local_port.nodemap
+        notification = nodemap.get_node('EventNotification')
+        if self._is_event_acquiring and \
+                notification._selected_values.get(0, notification._value):
+            # Fired from the event acquisition thread.
+            threading.Thread(target=nodemap.get_node(
+                'EventDeviceLost').invalidate_node, daemon=True).start()
+
+    def _on_exposure_end(self, frame_id, timestamp):
+        """Queue the ExposureEnd event of a frame sent by the camera."""
+        self._event_queue.put(
+            (('EventExposureEnd', 0x9001),
+             ('EventExposureEndTimestamp', timestamp),
+             ('EventExposureEndFrameID', frame_id)))
+
+    def _run_events(self):
+        """Event thread: set the data of the events and fire them."""
+        while True:
+            event_data = self._event_queue.get()
+            if event_data is None:
+                return
+            nodemap = self._camera.remote_nodemap
+            nodes = []
+            for name, value in event_data:
+                node = nodemap.get_node(name)
+                node._value = value
+                nodes.append(node)
+            for node in nodes:
+                node.invalidate_node()
+
+    def _on_camera_start(self, now, frame_period, is_triggered):
+        for st_datastream in list(self._datastreams):
+            st_datastream._on_camera_start(now, frame_period, is_triggered)
+
+    def _on_camera_stop(self, now):
+        for st_datastream in list(self._datastreams):
+            st_datastream._on_camera_stop(now)
+
+    def _on_trigger(self, now):
+        for st_datastream in list(self._datastreams):
+            st_datastream._on_trigger(now)
+
+    def _on_frame_period_changed(self, now, frame_period):
+        for st_datastream in list(self._datastreams):
+            st_datastream._on_frame_period_changed(now, frame_period)
+
+
+class PyStDeviceList:
+    """
+    Simulated list of devices.
+    """
+
+    def __init__(self):
+        self._devices = []
+
+    def __len__(self):
+        return len(self._devices)
+
+    def register(self, item) -> int:
+        """Register a device. Return the number of devices."""
+        self._devices.append(item)
+        return len(self._devices)
+
+    def deregister(self, index):
+        """Unregister the device at index."""
+        return self._devices.pop(index)
+
+    def acquisition_start(self):
+        """Start the image acquisition of the camera side of all devices."""
+        for st_device in self._devices:
+            st_device.acquisition_start()
+
+    def acquisition_stop(self):
+        """Stop the image acquisition of the camera side of all devices."""
+        for st_device in self._devices:
+            st_device.acquisition_stop()
+
+    def release(self):
+        """Release all devices."""
+        self._devices = []
+
+
+def create_system(system_vendor=EStSystemVendor.Default,
+                  interface_type=EStInterfaceType.All) -> PyStSystem:
+    """
+    Open the simulated system module.
+
+    :param system_vendor: EStSystemVendor (Default only).
+    :param interface_type: EStInterfaceType.
+    :return: PyStSystem.
+    """
+    return PyStSystem(system_vendor, interface_type)
+
+
+class PyStStreamBufferInfo:
+    """
+    Simulated stream buffer information.
+    """
+
+    def __init__(self, frame_id, timestamp, timestamp_ns, image,
+                 is_incomplete=False, size_filled=None):
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.timestamp_ns = timestamp_ns
+        self.is_image_present = image is not None
+        self.is_incomplete = is_incomplete
+        self.width = image.width if image is not None else 0
+        self.height = image.height if image is not None else 0
+        self.pixel_format = image.pixel_format if image is not None else \
+            EStPixelFormatNamingConvention.Unknown
+        self.buffer_size = image.plane_pitch if image is not None else 0
+        self.size_filled = size_filled if size_filled is not None else \
+            self.buffer_size
+        self.data_size = self.size_filled
+        self.offset_x = 0
+        self.offset_y = 0
+        self.padding_x = 0
+        self.padding_y = 0
+        self.image_offset = 0
+        self.has_chunk_data = False
+        self.is_new_data = True
+        self.is_queued = False
+        self.is_acquiring = False
+        self.tl_type = 'Simulated'
+
+
+class PyStStreamBuffer:
+    """
+    Simulated stream buffer. The buffer is requeued when it is released or
+    when the 'with' block is left.
+    """
+
+    def __init__(self, datastream, info, image):
+        self._datastream = datastream
+        self._info = info
+        self._image = image
+        self._is_released = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    @property
+    def info(self) -> PyStStreamBufferInfo:
+        """Property: information of this buffer."""
+        return self._info
+
+    @property
+    def datastream(self):
+        """Property: PyStDataStream this buffer belongs to."""
+        return self._datastream
+
+    def get_image(self) -> PyStImage:
+        """Get the image of this buffer (valid until release)."""
+        if self._image is None:
+            raise PyStError("Image data does not exist.")
+        return self._image
+
+    def release(self):
+        """Requeue this buffer."""
+        if not self._is_released:
+            self._is_released = True
+            self._datastream._requeue_buffer()
+
+
+class PyStDataStreamInfo:
+    """
+    Simulated datastream information (snapshot of the counters).
+    """
+
+    def __init__(self, datastream):
+        self.is_grabbing = datastream._is_grabbing_locked()
+        self.num_announced = datastream.buffer_count
+        self.num_await_delivery = len(datastream._pending)
+        self.num_queued = datastream.buffer_count - \
+            len(datastream._pending) - datastream._checked_out_count
+        self.num_delivered = datastream._delivered_count
+        self.num_underrun = datastream._underrun_count
+        self.num_started = datastream._started_count
+        self.payload_size = datastream.payload_size
+        self.buf_announce_min = 1
+        self.buf_alignment = 1
+        self.num_chunks_max = 0
+        self.datastream_id = 'Stream0'
+        self.is_payloadsize_defined = True
+        self.tl_type = 'Simulated'
+
+
+class PyStDataStream(CCallbackModule):
+    """
+    Simulated datastream producing synthetic frames.
+
+    Frames are produced on a virtual clock: when the datastream is polled,
+    every frame due since the last poll is put into a free buffer, or
+    counted as underrun if no buffer is free. Frames are only produced while
+    both the host side (start_acquisition) and the camera side
+    (acquisition_start) are started.
+
+    A datastream created without a device uses a private CSimCamera whose
+    camera side starts together with the host side.
+    """
+
+    def __init__(self, width=640, height=480,
+                 pixel_format=EStPixelFormatNamingConvention.Mono8,
+                 fps=1000.0, buffer_count=16, timestamp_frequency=1000000000,
+                 device=None):
+        """
+        :param width: width of the frames (without device).
+        :param height: height of the frames (without device).
+        :param pixel_format: EStPixelFormatNamingConvention of the frames
+            (without device).
+        :param fps: frame rate (without device). 0 produces a frame
+            whenever one is requested.
+        :param buffer_count: number of stream buffers.
+        :param timestamp_frequency: timestamp ticks per second (without
+            device).
+        :param device: PyStDevice this datastream belongs to.
+        """
+        if device is None:
+            self._camera = CSimCamera(
+                width=width, height=height, pixel_format=pixel_format,
+                fps=fps, timestamp_frequency=timestamp_frequency)
+        else:
+            self._camera = device.sim_camera
+        self._device = device
+        self._buffer_count = buffer_count
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._callback_list = CCallbackList(
+            self, EStCallbackType.GenTLDataStreamNewBuffer)
+        self._is_event_acquiring = False
+        self._callback_thread = None
+        self._pixel_format, self._frames = self._camera._get_frames()
+        self._is_grabbing = False
+        self._is_camera_active = False
+        self._is_lost = False
+        self._num_to_acquire = -1
+        self._frame_period = 0.0
+        self._is_triggered = False
+        self._trigger_times = []
+        self._clock_start = 0.0
+        self._clock_base = 0
+        self._produced_count = 0
+        self._next_frame_id = 0
+        self._pending = []
+        self._checked_out_count = 0
+        self._delivered_count = 0
+        self._underrun_count = 0
+        self._started_count = 0
+        self._filled_count = 0
+        self._signalled_count = 0
+        self._fps_times = []
+
+    @property
+    def device(self):
+        """Property: PyStDevice of this datastream."""
+        return self._device
+
+    @property
+    def sim_camera(self) -> CSimCamera:
+        """Property: CSimCamera of this datastream (simulator only)."""
+        return self._camera
+
+    @property
+    def buffer_count(self) -> int:
+        """Property: number of stream buffers."""
+        return self._buffer_count
+
+    @buffer_count.setter
+    def buffer_count(self, value):
+        if self._is_grabbing:
+            raise PyStError("buffer_count cannot be changed while grabbing.")
+        self._buffer_count = value
+
+    @property
+    def payload_size(self) -> int:
+        """Property: size of one frame in bytes."""
+        return self._frames[0].nbytes
+
+    @property
+    def is_grabbing(self) -> bool:
+        """Property: True while frames remain to be acquired."""
+        with self._lock:
+            return self._is_grabbing_locked()
+
+    @property
+    def info(self) -> PyStDataStreamInfo:
+        """Property: snapshot of the datastream counters."""
+        with self._lock:
+            self._produce_locked(time.perf_counter())
+            return PyStDataStreamInfo(self)
+
+    @property
+    def current_fps(self) -> float:
+        """Property: frame rate of the delivered frames."""
+        with self._lock:
+            times = self._fps_times
+            if len(times) < 2 or times[-1] == times[0]:
+                return 0.0
+            return (len(times) - 1) / (times[-1] - times[0])
+
+    @property
+    def current_bps(self) -> float:
+        """Property: bit rate of the delivered frames."""
+        return self.current_fps * self.payload_size * 8
+
+    @property
+    def port(self):
+        """Property: port of the datastream (no nodemap)."""
+        return None
+
+    def start_acquisition(self, num_to_acquire=-1, start_flags=None):
+        """Start the acquisition of the host side."""
+        camera = self._camera
+        if self._device is not None:
+            self._device._check_device()
+        camera.remote_nodemap.get_node('TLParamsLocked')._value = 1
+        pixel_format, frames = camera._get_frames()
+        with self._condition:
+            if self._is_grabbing:
+                raise PyStError("GenTL error: acquisition already started.")
+            self._pixel_format = pixel_format
+            self._frames = frames
+            self._is_grabbing = True
+            self._is_camera_active = False
+            self._num_to_acquire = num_to_acquire
+            self._started_count = 0
+            self._pending = []
+            self._trigger_times = []
+            self._fps_times = []
+            self._filled_count = 0
+            self._signalled_count = 0
+            if self._device is None:
+                camera._is_acquiring = True
+            if camera.is_acquiring:
+                self._start_camera_locked(time.perf_counter(),
+                                          camera._get_frame_period(),
+                                          camera._is_software_triggered())
+            if self._callback_list:
+                self._callback_thread = threading.Thread(
+                    target=self._run_callbacks, daemon=True)
+                self._callback_thread.start()
+
+    def stop_acquisition(self, stop_flags=None):
+        """Stop the acquisition of the host side."""
+        with self._condition:
+            was_grabbing = self._is_grabbing
+            self._is_grabbing = False
+            self._is_camera_active = False
+            self._pending = []
+            self._condition.notify_all()
+            callback_thread = self._callback_thread
+            self._callback_thread = None
+        if was_grabbing:
+            if self._device is None:
+                self._camera._is_acquiring = False
+            self._camera.remote_nodemap.get_node('TLParamsLocked')._value = 0
+        if callback_thread is not None and \
+                callback_thread is not threading.current_thread():
+            callback_thread.join()
+
+    def release(self):
+        """Close the datastream."""
+        self.stop_acquisition()
+        self.deregister_callbacks()
+
+    def retrieve_buffer(self, timeout=5000,
+                        handling_timeout=EStTimeoutHandling.ThrowException):
+        """
+        Retrieve the next buffer.
+
+        :param timeout: timeout in milliseconds.
+        :param handling_timeout: EStTimeoutHandling.
+        :return: PyStStreamBuffer, or None on timeout with
+            EStTimeoutHandling.Return.
+        """
+        deadline = time.perf_counter() + timeout / 1000.0
+        with self._condition:
+            while True:
+                now = time.perf_counter()
+                self._produce_locked(now, True)
+                if self._pending:
+                    return self._deliver_locked(now)
+                if self._is_lost:
+                    raise PyStError("GenTL error: device is lost.")
+                if not self._is_grabbing_locked() or now >= deadline:
+                    break
+                self._condition.wait(min(deadline - now,
+                                         self._get_wait_time_locked(now)))
+        if handling_timeout == EStTimeoutHandling.Return:
+            return None
+        raise PyStError("GenTL error: timeout (retrieve_buffer).")
+
+    def _is_grabbing_locked(self):
+        return self._is_grabbing and (
+            self._num_to_acquire < 0 or
+            self._started_count < self._num_to_acquire)
+
+    def _next_frame_time(self):
+        """Time when the next frame is due (perf_counter)."""
+        now = time.perf_counter()
+        return now + self._get_wait_time_locked(now)
+
+    def _get_wait_time_locked(self, now):
+        """Time to wait for the next frame in seconds."""
+        if not self._is_camera_active or self._is_triggered:
+            return 0.05
+        if self._frame_period <= 0:
+            return 0.0005
+        next_time = self._clock_start + \
+            (self._produced_count - self._clock_base) * self._frame_period
+        return max(next_time - now, 0.0)
+
+    def _start_camera_locked(self, now, frame_period, is_triggered):
+        self._is_camera_active = True
+        self._frame_period = frame_period
+        self._is_triggered = is_triggered
+        self._trigger_times = []
+        self._clock_start = now
+        self._clock_base = self._produced_count
+        self._condition.notify_all()
+
+    def _on_camera_start(self, now, frame_period, is_triggered):
+        with self._condition:
+            if self._is_grabbing:
+                self._start_camera_locked(now, frame_period, is_triggered)
+
+    def _on_camera_stop(self, now):
+        with self._condition:
+            self._produce_locked(now)
+            self._is_camera_active = False
+            self._condition.notify_all()
+
+    def _on_trigger(self, now):
+        with self._condition:
+            if self._is_camera_active and self._is_triggered:
+                self._trigger_times.append(now)
+                self._condition.notify_all()
+
+    def _on_frame_period_changed(self, now, frame_period):
+        with self._condition:
+            if self._is_camera_active:
+                self._produce_locked(now)
+                self._start_camera_locked(now, frame_period,
+                                          self._is_triggered)
+
+    def _on_device_lost(self):
+        with self._condition:
+            self._is_lost = True
+            self._is_camera_active = False
+            self._condition.notify_all()
+
+    def _produce_locked(self, now, is_requested=False):
+        """
+        Put the frames due at 'now' into the free buffers.
+
+        :param now: current time (perf_counter).
+        :param is_requested: True if a buffer is requested (used when the
+            frame rate is 0).
+        """
+        if not (self._is_grabbing and self._is_camera_active):
+            return
+        frame_times = None
+        if self._is_triggered:
+            frame_times = self._trigger_times
+            self._trigger_times = []
+            new_count = len(frame_times)
+        elif self._frame_period <= 0:
+            if not is_requested or self._pending:
+                return
+            frame_times = [now]
+            new_count = 1
+        else:
+            due_count = self._clock_base + 1 + \
+                int((now - self._clock_start) / self._frame_period)
+            new_count = due_count - self._produced_count
+        if new_count <= 0:
+            return
+        first_index = self._produced_count - self._clock_base
+        self._produced_count += new_count
+
+        camera = self._camera
+        sent_count, is_stopped, is_lost = camera._emit_frames(new_count)
+        first_id = self._next_frame_id
+        self._next_frame_id += sent_count
+
+        def get_frame_time(offset):
+            if frame_times is not None:
+                return frame_times[offset]
+            return self._clock_start + \
+                (first_index + offset) * self._frame_period
+
+        device = self._device
+        if sent_count and device is not None and \
+                device._is_event_acquiring and \
+                camera._is_event_notified('ExposureEnd'):
+            for offset in range(sent_count):
+                device._on_exposure_end(first_id + offset, int(
+                    (get_frame_time(offset) - camera._epoch) *
+                    camera.timestamp_frequency))
+
+        # Frames after num_to_acquire are not acquired at all.
+        acquire_count = sent_count
+        if self._num_to_acquire >= 0:
+            acquire_count = max(min(sent_count, self._num_to_acquire -
+                                    self._started_count -
+                                    len(self._pending)), 0)
+        free_count = self._buffer_count - len(self._pending) - \
+            self._checked_out_count
+        filled_count = 0
+        for offset in range(acquire_count):
+            if free_count <= 0:
+                self._underrun_count += acquire_count - offset
+                break
+            if camera._is_dropped():
+                continue
+            frame_time = get_frame_time(offset)
+            self._pending.append((first_id + offset, frame_time,
+                                  camera._is_incomplete()))
+            free_count -= 1
+            filled_count += 1
+        if filled_count:
+            self._filled_count += filled_count
+            self._condition.notify_all()
+        if is_stopped:
+            self._is_camera_active = False
+        if is_lost:
+            self._is_lost = True
+            self._is_camera_active = False
+            self._condition.notify_all()
+            threading.Thread(target=camera.disconnect,
+                             args=(camera.reconnect_after,),
+                             daemon=True).start()
+
+    def _deliver_locked(self, now):
+        """Check out the oldest filled buffer."""
+        frame_id, frame_time, is_incomplete = self._pending.pop(0)
+        self._checked_out_count += 1
+        self._delivered_count += 1
+        self._started_count += 1
+        seconds = frame_time - self._camera._epoch
+        nparr = self._frames[frame_id % len(self._frames)]
+        size_filled = None
+        if is_incomplete:
+            # The latter half of the frame did not arrive.
+            nparr = nparr.copy()
+            nparr[nparr.shape[0] // 2:] = 0
+            size_filled = nparr.nbytes // 2
+        image = PyStImage(nparr, self._pixel_format)
+        self._fps_times.append(now)
+        if len(self._fps_times) > 32:
+            del self._fps_times[0]
+        timestamp = int(seconds * self._camera.timestamp_frequency)
+        info = PyStStreamBufferInfo(frame_id, timestamp, int(seconds * 1e9),
+                                    image, is_incomplete, size_filled)
+        info.has_chunk_data = self._camera._attach_chunk_data(frame_id,
+                                                              timestamp)
+        return PyStStreamBuffer(self, info, image)
+
+    def _run_callbacks(self):
+        """Callback thread: fire the callbacks once per filled buffer."""
+        with self._condition:
+            while self._is_grabbing:
+                now = time.perf_counter()
+                self._produce_locked(now, True)
+                if self._filled_count > self._signalled_count:
+                    self._signalled_count += 1
+                    self._condition.release()
+                    try:
+                        self._callback_list.fire()
+                    finally:
+                        self._condition.acquire()
+                    continue
+                if self._is_lost:
+                    break
+                self._condition.wait(max(self._get_wait_time_locked(now),
+                                         0.0005))
+
+    def _requeue_buffer(self):
+        with self._condition:
+            self._checked_out_count -= 1
+            self._condition.notify_all()
+
+
+class PyStDataStreamList:
+    """
+    Simulated list of datastreams.
+    """
+
+    def __init__(self):
+        self._datastreams = []
+        self._next_index = 0
+
+    def __len__(self):
+        return len(self._datastreams)
+
+    def register(self, item) -> int:
+        """Register a datastream. Return the number of datastreams."""
+        self._datastreams.append(item)
+        return len(self._datastreams)
+
+    def deregister(self, index):
+        """Unregister the datastream at index."""
+        return self._datastreams.pop(index)
+
+    @property
+    def is_grabbing_any(self) -> bool:
+        """Property: True if any datastream is grabbing."""
+        return any(item.is_grabbing for item in self._datastreams)
+
+    @property
+    def is_grabbing_all(self) -> bool:
+        """Property: True if all datastreams are grabbing."""
+        return all(item.is_grabbing for item in self._datastreams)
+
+    def start_acquisition(self, num_to_acquire=-1, start_flags=None):
+        """Start the acquisition of all datastreams."""
+        for item in self._datastreams:
+            item.start_acquisition(num_to_acquire)
+
+    def stop_acquisition(self, stop_flags=None):
+        """Stop the acquisition of all datastreams."""
+        for item in self._datastreams:
+            item.stop_acquisition()
+
+    def release(self):
+        """Release the list."""
+        self._datastreams = []
+
+    def retrieve_buffer(self, timeout=5000,
+                        handling_timeout=EStTimeoutHandling.ThrowException):
+        """
+        Retrieve the next buffer of any datastream (round robin).
+
+        :param timeout: timeout in milliseconds.
+        :param handling_timeout: EStTimeoutHandling.
+        :return: PyStStreamBuffer, or None on timeout with
+            EStTimeoutHandling.Return.
+        """
+        deadline = time.perf_counter() + timeout / 1000.0
+        while True:
+            count = len(self._datastreams)
+            for offset in range(count):
+                item = self._datastreams[(self._next_index + offset) % count]
+                if not item.is_grabbing:
+                    continue
+                st_buffer = item.retrieve_buffer(0, EStTimeoutHandling.Return)
+                if st_buffer is not None:
+                    self._next_index = (self._next_index + offset + 1) % count
+                    return st_buffer
+            now = time.perf_counter()
+            if now >= deadline or not self.is_grabbing_any:
+                break
+            next_time = min(item._next_frame_time()
+                            for item in self._datastreams)
+            time.sleep(min(max(next_time - now, 0.0001), deadline - now))
+        if handling_timeout == EStTimeoutHandling.Return:
+            return None
+        raise PyStError("GenTL error: timeout (retrieve_buffer).")
+
+
+# One camera is connected by default.
+reset_cameras()
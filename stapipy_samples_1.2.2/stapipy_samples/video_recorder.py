@@ -0,0 +1,429 @@
+"""
+ This module provides a video recorder which encodes in background threads
+ and numbers the video frames from the device timestamps.
+ The following points are covered by this module:
+ - Queue the frames in a bounded queue with a back-pressure policy, so that
+   the acquisition loop does not wait for the encoder
+ - Convert the frames (e.g. demosaic) in a pool of worker threads and
+   write them in order in a writer thread; a frame is converted once it
+   leaves the queue, so the frames dropped by the back-pressure policy
+   cost no conversion
+ - Compute the video frame number from the timestamp and the
+   timestamp_frequency of the device, and fill dropped frames by
+   repeating the previous frame
+ - Roll the video files by duration, size or number of frames
+ - Write a CSV index next to each video file mapping each video frame,
+   including the repeated ones, to the frame_id and timestamp
+ - Encode with PyStVideoFiler or OpenCV VideoWriter
+ Note: opencv-python package is required:
+    pip install opencv-python
+"""
+
+import collections
+import concurrent.futures
+import csv
+import os
+import threading
+import time
+
+import cv2
+import stapipy as st
+
+from acquisition_pipeline import CFrameQueue, EBackPressure
+from latency_stats import CLatencyStats
+
+
+class CStVideoFilerBackend:
+    """
+    Video backend using PyStVideoFiler. The frame numbers given to
+    register_image keep the timing of the video when frames are skipped.
+    """
+    extension = '.avi'
+
+    def __init__(self, compression=None, file_format=None, quality=None):
+        """
+        :param compression: EStVideoFileCompression (default: MotionJPEG).
+        :param file_format: EStVideoFileFormat (default: AVI2).
+        :param quality: quality of the compression, or None.
+        """
+        self._st_videofiler = st.create_filer(st.EStFilerType.Video)
+        self._st_videofiler.video_file_format = file_format \
+            if file_format is not None else st.EStVideoFileFormat.AVI2
+        self._st_videofiler.video_file_compression = compression \
+            if compression is not None \
+            else st.EStVideoFileCompression.MotionJPEG
+        if quality is not None:
+            self._st_videofiler.quality = quality
+
+    def open(self, path, fps):
+        """Start a video file."""
+        self._st_videofiler.reset()
+        self._st_videofiler.fps = fps
+        # The recorder rolls the files by itself.
+        self._st_videofiler.maximum_frame_count_per_file = 0x7fffffff
+        self._st_videofiler.register_filename(path)
+
+    def write(self, image, frame_no):
+        """Add a PyStImage with its frame number in the file."""
+        self._st_videofiler.register_image(image, frame_no)
+
+    def close(self):
+        """Close the video file."""
+        self._st_videofiler.reset()
+
+    def release(self):
+        """Release PyStVideoFiler."""
+        self._st_videofiler.release()
+
+
+class COpenCVVideoBackend:
+    """
+    Video backend using cv2.VideoWriter. The images must be 8bit NumPy
+    arrays (Mono or BGR); the skipped frame numbers are filled with the
+    previous image.
+    """
+
+    def __init__(self, fourcc='MJPG', extension='.avi'):
+        """
+        :param fourcc: FourCC code of the codec.
+        :param extension: file extension of the videos.
+        """
+        self.extension = extension
+        self._fourcc = fourcc
+        self._video_writer = None
+        self._fps = 0.0
+        self._path = None
+        self._last_image = None
+        self._next_frame_no = 0
+
+    def open(self, path, fps):
+        """Start a video file. It is created with the first image."""
+        self._path = path
+        self._fps = fps
+        self._last_image = None
+        self._next_frame_no = 0
+
+    def write(self, image, frame_no):
+        """Add a NumPy array with its frame number in the file."""
+        if self._video_writer is None:
+            self._video_writer = cv2.VideoWriter(
+                self._path, cv2.VideoWriter_fourcc(*self._fourcc), self._fps,
+                (image.shape[1], image.shape[0]), image.ndim == 3)
+            if not self._video_writer.isOpened():
+                self._video_writer = None
+                raise ValueError("{0} cannot be opened.".format(self._path))
+        # Repeat the previous image for the dropped frames.
+        while self._last_image is not None and \
+                self._next_frame_no < frame_no:
+            self._video_writer.write(self._last_image)
+            self._next_frame_no += 1
+        self._video_writer.write(image)
+        self._last_image = image
+        self._next_frame_no = frame_no + 1
+
+    def close(self):
+        """Close the video file."""
+        if self._video_writer is not None:
+            self._video_writer.release()
+            self._video_writer = None
+        self._last_image = None
+
+    def release(self):
+        """Nothing to release."""
+
+
+class CVideoSegment:
+    """
+    One video file written by CVideoRecorder.
+    """
+    __slots__ = ('path', 'index_path', 'first_timestamp', 'frame_count',
+                 'video_frame_count', 'last_frame_id', 'last_timestamp')
+
+    def __init__(self, path, index_path, first_timestamp):
+        self.path = path
+        self.index_path = index_path
+        self.first_timestamp = first_timestamp
+        self.frame_count = 0
+        self.video_frame_count = 0
+        self.last_frame_id = None
+        self.last_timestamp = None
+
+
+class CVideoRecorder:
+    """
+    Class that records frames into video files in background threads.
+
+    The video frame number of a frame is round((timestamp - first
+    timestamp) / timestamp_frequency * fps) within each file, so the video
+    keeps the real time even if frames are dropped by the camera, the
+    datastream or the back-pressure policy.
+    """
+
+    def __init__(self, path_prefix, fps, timestamp_frequency, backend,
+                 max_duration=None, max_file_size=None, max_frame_count=None,
+                 convert_func=None, worker_count=2, queue_size=64,
+                 back_pressure=EBackPressure.Block, fill_gaps=True):
+        """
+        :param path_prefix: path of the video files without the number and
+            the extension.
+        :param fps: frame rate of the videos.
+        :param timestamp_frequency: timestamp ticks per second of the
+            device (PyStDeviceInfo.timestamp_frequency).
+        :param backend: CStVideoFilerBackend, COpenCVVideoBackend or an
+            object with the same methods.
+        :param max_duration: maximum video time of one file in seconds.
+        :param max_file_size: maximum size of one file in bytes. The size is
+            checked after each frame, so a file can be larger by one frame.
+        :param max_frame_count: maximum number of video frames of one file.
+        :param convert_func: function(image) run in the worker threads to
+            get the image given to the backend, or None.
+        :param worker_count: number of worker threads of convert_func.
+        :param queue_size: maximum number of frames waiting to be written.
+        :param back_pressure: EBackPressure when the queue is full.
+        :param fill_gaps: False to number the frames consecutively instead
+            of by timestamp (the index still has the timestamps).
+        """
+        if fps <= 0 or timestamp_frequency <= 0:
+            raise ValueError("fps and timestamp_frequency must be larger "
+                             "than 0.")
+        self._path_prefix = path_prefix
+        self._fps = fps
+        self._timestamp_frequency = timestamp_frequency
+        self._backend = backend
+        self._max_duration = max_duration
+        self._max_file_size = max_file_size
+        self._max_frame_count = max_frame_count
+        self._convert_func = convert_func
+        self._fill_gaps = fill_gaps
+        self._executor = concurrent.futures.ThreadPoolExecutor(worker_count) \
+            if convert_func is not None else None
+        # Number of frames converted ahead of the writes.
+        self._convert_ahead_count = worker_count \
+            if convert_func is not None else 1
+        self._queue = CFrameQueue(queue_size, back_pressure)
+        self._writer = threading.Thread(target=self._write_frames)
+        self._segment = None
+        self._index_file = None
+        self._index_writer = None
+        self._error = None
+        self._submitted_count = 0
+        self._written_count = 0
+        self._filled_count = 0
+        self.segments = []
+        self.convert_stats = CLatencyStats()
+        self.write_stats = CLatencyStats()
+        self.total_stats = CLatencyStats()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def queue_depth(self) -> int:
+        """Property: number of frames waiting to be written."""
+        return len(self._queue)
+
+    @property
+    def dropped_count(self) -> int:
+        """Property: number of frames dropped by the back-pressure policy."""
+        return self._queue.dropped_count
+
+    @property
+    def written_count(self) -> int:
+        """Property: number of frames written."""
+        return self._written_count
+
+    @property
+    def filled_count(self) -> int:
+        """Property: number of video frames filled for dropped frames."""
+        return self._filled_count
+
+    def start(self):
+        """Start the writer thread."""
+        self._writer.start()
+
+    def close(self):
+        """
+        Write the queued frames, close the last file and stop the threads.
+        An exception raised in the writer thread is raised again here.
+        """
+        self._queue.close()
+        if self._writer.is_alive():
+            self._writer.join()
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._backend.release()
+        if self._error is not None:
+            raise self._error
+
+    def submit_buffer(self, st_buffer) -> bool:
+        """
+        Queue the image of a stream buffer. The image is cloned, so the
+        buffer can be requeued.
+
+        :param st_buffer: PyStStreamBuffer with an image.
+        :return: False if the frame was dropped or the writer failed.
+        """
+        return self.submit(st_buffer.info.frame_id, st_buffer.info.timestamp,
+                           st_buffer.get_image().clone())
+
+    def submit(self, frame_id, timestamp, image) -> bool:
+        """
+        Queue a frame. image must not be modified afterwards.
+
+        :param frame_id: frame ID.
+        :param timestamp: timestamp in ticks of timestamp_frequency.
+        :param image: PyStImage (or the input of convert_func).
+        :return: False if the frame was dropped or the writer failed.
+        """
+        if self._error is not None:
+            return False
+        submitted_time = time.perf_counter()
+        self._submitted_count += 1
+        return self._queue.put((frame_id, timestamp, image, submitted_time))
+
+    def statistics(self) -> dict:
+        """
+        Get the counters and the latency.
+
+        :return: dict of counters and latency summaries in milliseconds.
+        """
+        return {'submitted': self._submitted_count,
+                'written': self._written_count,
+                'dropped': self.dropped_count,
+                'filled': self._filled_count,
+                'files': len(self.segments),
+                'queue_depth': self.queue_depth,
+                'convert': self.convert_stats.summary(),
+                'write': self.write_stats.summary(),
+                'total': self.total_stats.summary()}
+
+    def _convert(self, image):
+        """Run convert_func in a worker thread."""
+        start_time = time.perf_counter()
+        image = self._convert_func(image)
+        self.convert_stats.add(time.perf_counter() - start_time)
+        return image
+
+    def _write_frames(self):
+        """
+        Writer thread: start the conversion of the frames taken from the
+        queue, and write them in the order of submission.
+        """
+        converting = collections.deque()
+        try:
+            while True:
+                # Write when enough frames are being converted or no frame
+                # is waiting, else take the next frame.
+                if converting and \
+                        (len(converting) >= self._convert_ahead_count or
+                         not len(self._queue)):
+                    self._write_item(converting.popleft())
+                    continue
+                item = self._queue.get()
+                if item is None:
+                    break
+                frame_id, timestamp, image, submitted_time = item
+                if self._executor is not None:
+                    image = self._executor.submit(self._convert, image)
+                converting.append((frame_id, timestamp, image,
+                                   submitted_time))
+            while converting:
+                self._write_item(converting.popleft())
+        except Exception as exception:
+            self._error = exception
+            # Unblock and drop the frames of the acquisition loop.
+            while self._queue.get() is not None:
+                pass
+        finally:
+            self._close_segment()
+
+    def _write_item(self, item):
+        """Wait for the conversion of a frame and write it."""
+        frame_id, timestamp, image, submitted_time = item
+        if self._executor is not None:
+            image = image.result()
+        start_time = time.perf_counter()
+        self._write_frame(frame_id, timestamp, image)
+        end_time = time.perf_counter()
+        self.write_stats.add(end_time - start_time)
+        self.total_stats.add(end_time - submitted_time)
+
+    def _write_frame(self, frame_id, timestamp, image):
+        """Write a frame, rolling the file if needed."""
+        segment = self._segment
+        if segment is not None:
+            frame_no = self._get_frame_no(segment, timestamp)
+            # Start a new file when the file is full or the timestamps
+            # restarted (e.g. the camera was reset).
+            if timestamp < segment.first_timestamp or \
+                    self._is_full(segment, frame_no):
+                self._close_segment()
+                segment = None
+        if segment is None:
+            segment = self._open_segment(timestamp)
+            frame_no = 0
+
+        self._backend.write(image, frame_no)
+        # The video frames of a gap repeat the previous frame.
+        for filled_no in range(segment.video_frame_count, frame_no):
+            self._index_writer.writerow([filled_no, segment.last_frame_id,
+                                         segment.last_timestamp, 1])
+        self._index_writer.writerow([frame_no, frame_id, timestamp, 0])
+        self._filled_count += frame_no - segment.video_frame_count
+        segment.frame_count += 1
+        segment.video_frame_count = frame_no + 1
+        segment.last_frame_id = frame_id
+        segment.last_timestamp = timestamp
+        self._written_count += 1
+
+    def _get_frame_no(self, segment, timestamp):
+        """Get the video frame number of a timestamp in a file."""
+        if not self._fill_gaps:
+            return segment.video_frame_count
+        frame_no = int(round((timestamp - segment.first_timestamp) *
+                             self._fps / self._timestamp_frequency))
+        # Two frames within one video frame period keep their order.
+        return max(frame_no, segment.video_frame_count)
+
+    def _is_full(self, segment, frame_no):
+        """Check if a frame does not fit in the current file."""
+        if self._max_frame_count is not None and \
+                frame_no >= self._max_frame_count:
+            return True
+        if self._max_duration is not None and \
+                frame_no >= self._max_duration * self._fps:
+            return True
+        if self._max_file_size is not None and \
+                os.path.exists(segment.path) and \
+                os.path.getsize(segment.path) >= self._max_file_size:
+            return True
+        return False
+
+    def _open_segment(self, timestamp):
+        """Start a new video file and its index."""
+        path = "{0}_{1:04d}{2}".format(self._path_prefix, len(self.segments),
+                                       self._backend.extension)
+        segment = CVideoSegment(path, os.path.splitext(path)[0] + '.csv',
+                                timestamp)
+        self._backend.open(path, self._fps)
+        self._index_file = open(segment.index_path, 'w', newline='')
+        self._index_writer = csv.writer(self._index_file)
+        self._index_writer.writerow(['video_frame', 'frame_id', 'timestamp',
+                                     'filled'])
+        self._segment = segment
+        self.segments.append(segment)
+        return segment
+
+    def _close_segment(self):
+        """Close the current video file and its index."""
+        if self._segment is None:
+            return
+        self._segment = None
+        try:
+            self._backend.close()
+        finally:
+            self._index_file.close()
@@ -0,0 +1,197 @@
+"""
+ This module provides a local cache of the GenICam XML files of the
+ devices, and enables the cache of the preprocessed XML files of GenApi.
+ The following points are covered by this module:
+ - Save each distinct XML file once (PyStPort.save_xml_file), keyed by the
+   model and the SHA1 hash or file version of PyStPortURLInfo
+ - Check the cached files with the SHA1 hash of their content, and the
+   hash reported by the device when it matches the saved data
+ - Point the GenApi cache (GENICAM_CACHE_V3_x environment variables) to a
+   directory before StApi is initialized, so that the nodemap of a model
+   is built from the preprocessed XML file on the next opens
+ - Measure the open time of the devices
+
+ StApi has no API to give the device an XML file when it is opened: the
+ device still provides its XML file through the port, and the open time
+ is reduced by the GenApi cache. The saved XML files can be used without
+ the device (e.g. to review or compare the features of a model).
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from feature_tree import CFeatureTree
+
+# Environment variables of the GenApi cache for each GenICam version.
+GENICAM_CACHE_VARIABLES = ('GENICAM_CACHE_V3_0', 'GENICAM_CACHE_V3_1',
+                           'GENICAM_CACHE_V3_2', 'GENICAM_CACHE_V3_3',
+                           'GENICAM_CACHE_V3_4')
+
+# Name of the index file of the cache directory.
+INDEX_FILENAME = "index.json"
+
+
+def enable_genicam_cache(directory) -> dict:
+    """
+    Point the GenApi cache to a directory. Call it before st.initialize():
+    GenApi reads the variables when it is loaded. Variables which are
+    already set (e.g. by the installer) are kept.
+
+    :param directory: cache directory.
+    :return: dict of the GENICAM_CACHE variables in effect.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name in GENICAM_CACHE_VARIABLES:
+        os.environ.setdefault(name, directory)
+    return {name: value for name, value in os.environ.items()
+            if name.startswith('GENICAM_CACHE')}
+
+
+def get_file_sha1(filename) -> str:
+    """
+    Get the SHA1 hash of a file.
+
+    :param filename: file name.
+    :return: hexadecimal hash.
+    """
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as file:
+        for data in iter(lambda: file.read(1 << 20), b''):
+            sha1.update(data)
+    return sha1.hexdigest()
+
+
+class CXmlCache:
+    """
+    Class that keeps the XML files of the devices in a directory.
+
+    The index file lists for each key the cached file, the SHA1 hash of
+    its content, the hash and the file version reported by the device and
+    whether both hashes match (the device may report the hash of a
+    compressed file).
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: cache directory.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._index = self._load_index()
+
+    @staticmethod
+    def get_key(st_port) -> str:
+        """
+        Get the key of the XML file of a port.
+
+        :param st_port: PyStPort (e.g. st_device.remote_port).
+        :return: model and SHA1 hash (or file version).
+        """
+        return CFeatureTree.get_cache_key(st_port)
+
+    def get(self, st_port):
+        """
+        Get the cached XML file of a port.
+
+        :param st_port: PyStPort.
+        :return: file name, or None if it is not cached or was modified.
+        """
+        return self._get(self.get_key(st_port))
+
+    def store(self, st_port) -> tuple:
+        """
+        Save the XML file of a port unless it is already cached.
+
+        :param st_port: PyStPort.
+        :return: (file name, True if the file was saved by this call).
+        """
+        key = self.get_key(st_port)
+        filename = self._get(key)
+        if filename is not None:
+            return filename, False
+        url_info = st_port.url_info
+        filename = os.path.join(self.directory, key + '.xml')
+        temporary_filename = filename + '.tmp'
+        st_port.save_xml_file(temporary_filename)
+        content_sha1 = get_file_sha1(temporary_filename)
+        os.replace(temporary_filename, filename)
+        device_sha1 = bytes(url_info.sha1_hash or b'').hex()
+        self._index[key] = {
+            'filename': os.path.basename(filename),
+            'model': st_port.info.model,
+            'xml_filename': st_port.xml_filename,
+            'url': url_info.url,
+            'file_version': [url_info.file_ver_major,
+                             url_info.file_ver_minor,
+                             url_info.file_ver_subminor],
+            'device_sha1': device_sha1,
+            'content_sha1': content_sha1,
+            'is_hash_verified': device_sha1 == content_sha1,
+            'saved_time': time.time()}
+        self._save_index()
+        return filename, True
+
+    def entries(self) -> dict:
+        """
+        Get the index.
+
+        :return: dict of key to dict of the cached file information.
+        """
+        return dict(self._index)
+
+    def _get(self, key):
+        """Get the file of a key after checking its content."""
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        filename = os.path.join(self.directory, entry['filename'])
+        if os.path.isfile(filename) and \
+                get_file_sha1(filename) == entry['content_sha1']:
+            return filename
+        # Missing or modified: save it again.
+        del self._index[key]
+        self._save_index()
+        return None
+
+    def _load_index(self) -> dict:
+        filename = os.path.join(self.directory, INDEX_FILENAME)
+        if not os.path.isfile(filename):
+            return {}
+        try:
+            with open(filename, 'r') as file:
+                return json.load(file)
+        except ValueError:
+            return {}
+
+    def _save_index(self):
+        filename = os.path.join(self.directory, INDEX_FILENAME)
+        with open(filename + '.tmp', 'w') as file:
+            json.dump(self._index, file, indent=1)
+        os.replace(filename + '.tmp', filename)
+
+
+def measure_open(st_system, max_device_count=None) -> list:
+    """
+    Open the devices one by one and measure the time to open each device
+    and to get its remote nodemap.
+
+    :param st_system: PyStSystem.
+    :param max_device_count: maximum number of devices, or None for all.
+    :return: list of (PyStDevice, open time, nodemap time) in seconds.
+    """
+    results = []
+    while max_device_count is None or len(results) < max_device_count:
+        start_time = time.perf_counter()
+        try:
+            st_device = st_system.create_first_device()
+        except Exception:
+            if not results:
+                raise
+            break
+        open_time = time.perf_counter() - start_time
+        st_device.remote_port.nodemap.get_node("Root")
+        results.append((st_device, open_time,
+                        time.perf_counter() - start_time - open_time))
+    return results